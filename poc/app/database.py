@@ -2,10 +2,12 @@
 Database connections for PostgreSQL and Redis.
 """
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 import redis.asyncio as redis
-from typing import AsyncGenerator
+import asyncio
+from typing import Any, AsyncGenerator, Callable, Coroutine, Set
 
 from app.config import settings
 
@@ -50,15 +52,65 @@ redis_pool = redis.ConnectionPool.from_url(
 )
 
 
+# One long-lived client per worker, shared by get_redis and every service; it takes a pooled connection per command
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+
 async def get_redis() -> redis.Redis:
-    """Get Redis connection from pool."""
-    return redis.Redis(connection_pool=redis_pool)
+    """Get the shared Redis client."""
+    return redis_client
+
+
+# Work run after commit: services queue side effects (Redis counters, events,
+# cache invalidation) on the session; they run once the transaction commits
+# and are dropped if it rolls back.
+AFTER_COMMIT_KEY = "after_commit"
+_background: Set[asyncio.Task] = set()
+
+
+def on_commit(session, key: str, handler: Callable[[Any], Any], factory: Callable[[], Any] = list):
+    """
+    The container of work queued on `session` under `key` (made by `factory`
+    on first use), for the caller to add to. After commit `handler(pending)`
+    is called once; a coroutine it returns runs in the background.
+    """
+    queued = session.info.setdefault(AFTER_COMMIT_KEY, {})
+    if key not in queued:
+        queued[key] = (handler, factory())
+    return queued[key][1]
+
+
+def run_in_background(coroutine: Coroutine) -> bool:
+    """Run a coroutine as a task of the running loop; without one it is dropped (returns False)."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coroutine.close()
+        print(f"⚠️ Background work skipped, no running event loop: {coroutine.__qualname__}")
+        return False
+    task = loop.create_task(coroutine)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    for key, (handler, pending) in session.info.pop(AFTER_COMMIT_KEY, {}).items():
+        if not pending:
+            continue
+        try:
+            result = handler(pending)
+        except Exception as e:
+            print(f"⚠️ After-commit work {key} failed: {e}")
+            continue
+        if asyncio.iscoroutine(result):
+            run_in_background(result)
 
 
-async def init_db():
-    """Initialize database tables (for development)."""
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+@event.listens_for(Session, "after_rollback")
+def _drop_after_commit(session):
+    session.info.pop(AFTER_COMMIT_KEY, None)
 
 
 async def close_db():
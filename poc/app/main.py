@@ -9,7 +9,22 @@ from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.database import init_db, close_db
+from app.database import close_db
+from app.migrations import run_migrations
+from app.scheduler import register_job, start_jobs, stop_jobs
+from app.services.archive_service import run_archive_job
+from app.services.partition_service import run_partition_maintenance
+from app.services.kpi_counters import run_kpi_reconciliation
+from app.services.rollup_service import run_rollup_job
+from app.services.heavy_hitters import run_heavy_hitter_flush, flush_heavy_hitters
+from app.services.trend_service import run_trend_refresh
+from app.services.analytics_store import run_export_job
+from app.services.live_events import broadcaster
+from app.services.signal_ingest import signal_buffer
+from app.services import rules_engine
+from app.services.agent_load import run_agent_load_refresh, run_agent_load_reconciliation
+from app.services.call_queue import run_call_queue_sweep
+from app.services.call_scheduler import run_call_scheduler_tick
 from app.routers import (
     webhooks_router,
     context_router,
@@ -20,7 +35,9 @@ from app.routers import (
     messages_router,
     call_router,
     freshdesk_router,
-    freshdesk_sync_router
+    freshdesk_sync_router,
+    search_router,
+    events_router
 )
 
 
@@ -30,15 +47,70 @@ async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting Support-Led Ordering System POC...")
     try:
-        await init_db()
-        print("✅ Database initialized")
+        applied = await run_migrations()
+        print(f"✅ Database migrated ({len(applied)} new migration(s))")
     except Exception as e:
-        print(f"⚠️ Database init skipped (might already exist): {e}")
+        if not settings.MIGRATION_FAILURE_ALLOWED:
+            print(f"❌ Database migration failed: {e}")
+            raise
+        print(f"⚠️ Database migration failed, starting anyway (MIGRATION_FAILURE_ALLOWED): {e}")
+    
+    await rules_engine.start()
+    
+    if settings.BACKGROUND_JOBS_ENABLED:
+        register_job("archive_resolved", settings.ARCHIVE_INTERVAL_SECONDS, run_archive_job)
+        register_job(
+            "partition_maintenance",
+            settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+            run_partition_maintenance
+        )
+        register_job("analytics_rollup", settings.ROLLUP_INTERVAL_SECONDS, run_rollup_job)
+        register_job("trend_refresh", settings.TREND_REFRESH_INTERVAL_SECONDS, run_trend_refresh)
+        if settings.KPI_COUNTERS_ENABLED:
+            register_job(
+                "kpi_reconciliation",
+                settings.KPI_RECONCILE_INTERVAL_SECONDS,
+                run_kpi_reconciliation
+            )
+        if settings.AGENT_LOAD_ENABLED:
+            register_job("agent_load_refresh", settings.AGENT_LOAD_REFRESH_SECONDS, run_agent_load_refresh)
+            register_job(
+                "agent_load_reconciliation",
+                settings.AGENT_LOAD_RECONCILE_INTERVAL_SECONDS,
+                run_agent_load_reconciliation
+            )
+        if settings.CALL_QUEUE_ENABLED:
+            register_job("call_queue_sweep", settings.CALL_QUEUE_SWEEP_INTERVAL_SECONDS, run_call_queue_sweep)
+            register_job("call_scheduler", settings.CALL_SCHEDULER_TICK_SECONDS, run_call_scheduler_tick)
+        if settings.ANALYTICS_EXPORT_ENABLED:
+            register_job(
+                "analytics_export",
+                settings.ANALYTICS_EXPORT_INTERVAL_SECONDS,
+                run_export_job
+            )
+        if settings.HEAVY_HITTERS_ENABLED:
+            register_job(
+                "heavy_hitter_flush",
+                settings.HEAVY_HITTER_FLUSH_SECONDS,
+                run_heavy_hitter_flush
+            )
+        start_jobs()
     
     yield
     
     # Shutdown
     print("👋 Shutting down...")
+    await stop_jobs()
+    await broadcaster.stop()
+    await rules_engine.stop()
+    try:
+        await signal_buffer.stop()
+    except Exception as e:
+        print(f"⚠️ Friction signal flush on shutdown failed: {e}")
+    try:
+        await flush_heavy_hitters()
+    except Exception as e:
+        print(f"⚠️ Heavy-hitter flush on shutdown failed: {e}")
     await close_db()
 
 
@@ -89,6 +161,8 @@ app.include_router(messages_router)
 app.include_router(call_router)
 app.include_router(freshdesk_router)
 app.include_router(freshdesk_sync_router)
+app.include_router(search_router)
+app.include_router(events_router)
 
 
 @app.get("/", tags=["Health"])
@@ -106,7 +180,9 @@ async def root():
             "incidences": "/api/v1/incidences",
             "channel": "/api/v1/channel/route",
             "friction": "/api/v1/friction/detect",
-            "analytics": "/api/v1/analytics/kpis"
+            "analytics": "/api/v1/analytics/kpis",
+            "search": "/api/v1/search/incidences",
+            "events": "/api/v1/events/stream"
         }
     }
 
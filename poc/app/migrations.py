@@ -0,0 +1,242 @@
+"""
+Versioned schema migrations.
+
+The database schema is owned by the SQL files in ``poc/migrations``, named
+``NNNN_description.sql`` and applied in version order. Applied versions are
+recorded in the ``schema_migrations`` table, and a PostgreSQL advisory lock
+keeps several app workers from migrating at the same time.
+
+A file whose first line is ``-- migrate: no-transaction`` is executed one
+statement at a time outside a transaction (required for
+``CREATE INDEX CONCURRENTLY``); such files must be idempotent.
+
+Data backfills too large for one startup transaction run out of band in
+committed batches; ``rekey`` re-keys UUIDv4 rows to UUIDv7 (0004).
+
+Usage:
+    python -m app.migrations            # apply pending migrations
+    python -m app.migrations status     # show applied / pending versions
+    python -m app.migrations rekey [batch_size]   # 0004 backfill, default 5,000 rows per batch
+"""
+
+import asyncio
+import re
+import sys
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import asyncpg
+
+from app.config import settings
+
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+ADVISORY_LOCK_ID = 4_726_001  # Arbitrary, shared by every worker
+
+_FILENAME_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# 0004 backfill: rows whose id is not yet UUIDv7 (version nibble is the 15th
+# character of the text form). Each batch takes the next ids after a cursor,
+# so it walks the primary key index once instead of rescanning the table.
+NOT_V7 = "substr(id::text, 15, 1) <> '7'"
+REKEY_INCIDENCES = f"""
+    WITH batch AS (
+        SELECT id, uuid_v7_at(COALESCE(created_at, NOW()) AT TIME ZONE 'UTC') AS new_id
+        FROM incidences
+        WHERE id > $2 AND {NOT_V7}
+        ORDER BY id
+        LIMIT $1
+        FOR UPDATE
+    ), mapped AS (
+        INSERT INTO incidence_id_map (old_id, new_id)
+        SELECT id, new_id FROM batch
+        ON CONFLICT (old_id) DO UPDATE SET new_id = EXCLUDED.new_id
+    )
+    UPDATE incidences AS i SET id = b.new_id
+    FROM batch AS b
+    WHERE i.id = b.id
+    RETURNING b.id
+"""
+REKEY_ROWS = f"""
+    WITH batch AS (
+        SELECT id FROM {{table}}
+        WHERE id > $2 AND {NOT_V7}
+        ORDER BY id
+        LIMIT $1
+    )
+    UPDATE {{table}} AS t SET id = uuid_v7_at(COALESCE(t.created_at, NOW()) AT TIME ZONE 'UTC')
+    FROM batch AS b
+    WHERE t.id = b.id
+    RETURNING b.id
+"""
+REKEY_TABLES = {
+    "incidences": REKEY_INCIDENCES,  # Timeline rows follow via ON UPDATE CASCADE
+    "incidence_timeline": REKEY_ROWS.format(table="incidence_timeline"),
+    "friction_signals": REKEY_ROWS.format(table="friction_signals"),
+    "analytics_daily": REKEY_ROWS.format(table="analytics_daily"),
+}
+
+
+@dataclass
+class Migration:
+    """A single versioned SQL migration file."""
+    version: int
+    name: str
+    sql: str
+    
+    @property
+    def transactional(self) -> bool:
+        return not self.sql.lstrip().startswith(NO_TRANSACTION_MARKER)
+
+
+def load_migrations(directory: Path = MIGRATIONS_DIR) -> List[Migration]:
+    """Load migration files sorted by version."""
+    migrations = []
+    for path in directory.glob("*.sql"):
+        match = _FILENAME_PATTERN.match(path.name)
+        if not match:
+            continue
+        migrations.append(Migration(
+            version=int(match.group(1)),
+            name=match.group(2),
+            sql=path.read_text(encoding="utf-8")
+        ))
+    
+    migrations.sort(key=lambda m: m.version)
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def asyncpg_dsn(database_url: str = None) -> str:
+    """Convert the SQLAlchemy DATABASE_URL into a plain asyncpg DSN."""
+    return (database_url or settings.DATABASE_URL).replace("+asyncpg", "")
+
+
+def _split_statements(sql: str) -> List[str]:
+    """Split a no-transaction migration into single statements.
+    
+    Only line comments and statements terminated by ``;`` at end of line are
+    supported, which is all CONCURRENTLY index migrations need.
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    statements = re.split(r";\s*$", "\n".join(lines), flags=re.MULTILINE)
+    return [s.strip() for s in statements if s.strip()]
+
+
+async def _ensure_migrations_table(conn: asyncpg.Connection):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+async def applied_versions(conn: asyncpg.Connection) -> List[int]:
+    """Versions already recorded in schema_migrations."""
+    await _ensure_migrations_table(conn)
+    rows = await conn.fetch("SELECT version FROM schema_migrations ORDER BY version")
+    return [row["version"] for row in rows]
+
+
+async def apply_migrations(conn: asyncpg.Connection) -> List[int]:
+    """Apply pending migrations on an open connection. Returns applied versions."""
+    await conn.execute("SELECT pg_advisory_lock($1)", ADVISORY_LOCK_ID)
+    try:
+        done = set(await applied_versions(conn))
+        newly_applied = []
+        
+        for migration in load_migrations():
+            if migration.version in done:
+                continue
+            
+            print(f"⬆️ Applying migration {migration.version:04d}_{migration.name}")
+            if migration.transactional:
+                async with conn.transaction():
+                    await conn.execute(migration.sql)
+                    await conn.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                        migration.version, migration.name
+                    )
+            else:
+                for statement in _split_statements(migration.sql):
+                    await conn.execute(statement)
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    migration.version, migration.name
+                )
+            newly_applied.append(migration.version)
+        
+        return newly_applied
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+
+
+async def run_migrations(dsn: Optional[str] = None) -> List[int]:
+    """Connect to the configured database and apply pending migrations."""
+    conn = await asyncpg.connect(asyncpg_dsn(dsn))
+    try:
+        return await apply_migrations(conn)
+    finally:
+        await conn.close()
+
+
+async def rekey_uuid7(conn: asyncpg.Connection, batch_size: int = 5_000) -> Dict[str, int]:
+    """
+    Re-key UUIDv4 rows to UUIDv7 from their created_at (0004's backfill).
+    
+    Each batch commits on its own, so locks are short and an interrupted run
+    resumes where it stopped. Returns rows re-keyed per table.
+    """
+    rekeyed = {}
+    for table, sql in REKEY_TABLES.items():
+        total = await conn.fetchval(f"SELECT count(*) FROM {table} WHERE {NOT_V7}")
+        done = 0
+        cursor = uuid.UUID(int=0)
+        while total:
+            async with conn.transaction():
+                rows = await conn.fetch(sql, batch_size, cursor)
+            if not rows:
+                break
+            cursor = max(row["id"] for row in rows)
+            done += len(rows)
+            print(f"🔑 {table}: {done:,} / {total:,} re-keyed")
+        rekeyed[table] = done
+    return rekeyed
+
+
+async def _rekey(batch_size: int):
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        rekeyed = await rekey_uuid7(conn, batch_size)
+    finally:
+        await conn.close()
+    print(f"✅ Re-keyed {sum(rekeyed.values()):,} row(s); run REINDEX TABLE on {', '.join(rekeyed)}")
+
+
+async def _status():
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        done = set(await applied_versions(conn))
+    finally:
+        await conn.close()
+    
+    for migration in load_migrations():
+        state = "applied" if migration.version in done else "pending"
+        print(f"{migration.version:04d}_{migration.name}: {state}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "status":
+        asyncio.run(_status())
+    elif len(sys.argv) > 1 and sys.argv[1] == "rekey":
+        asyncio.run(_rekey(int(sys.argv[2]) if len(sys.argv) > 2 else 5_000))
+    else:
+        applied = asyncio.run(run_migrations())
+        print(f"✅ Applied {len(applied)} migration(s)" if applied else "✅ Schema up to date")
@@ -1,2 +1,7 @@
 # Models package
-from app.models.incidence import Incidence, IncidenceTimeline, FrictionSignal, AnalyticsDaily
+from app.models.incidence import (
+    Incidence, IncidenceIdMap, IncidenceTimeline, ArchivedIncidence, ArchivedIncidenceTimeline,
+    FrictionSignal, AnalyticsDaily, LatencySketch, HeavyHitterSketch,
+    IncidenceTrend, FrictionSignalTrend, RoutingRuleSet
+)
+from app.models.ids import uuid7, uuid7_floor
@@ -0,0 +1,77 @@
+"""
+Time-ordered UUIDv7 primary key generation (RFC 9562).
+
+Layout: 48-bit unix timestamp (ms) | version 7 | 12-bit counter | variant | 62 random bits.
+
+The 12-bit counter is seeded randomly each millisecond and incremented for
+further ids in the same millisecond, so ids generated by one process are
+strictly increasing. B-tree inserts therefore append to the right-most leaf,
+and "ORDER BY id" matches creation order.
+"""
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+
+_COUNTER_MAX = 0xFFF
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7(timestamp_ms: Optional[int] = None) -> uuid.UUID:
+    """
+    Generate a UUIDv7.
+    
+    Args:
+        timestamp_ms: Unix time in milliseconds to embed (defaults to now).
+            Passing an explicit timestamp skips the monotonic counter.
+    """
+    global _last_ms, _counter
+    
+    rand = int.from_bytes(os.urandom(10), "big")
+    
+    if timestamp_ms is not None:
+        counter = rand >> 68
+    else:
+        with _lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > _last_ms:
+                _last_ms = now_ms
+                _counter = (rand >> 68) & 0x7FF  # Leave headroom before overflow
+            else:
+                _counter += 1
+                if _counter > _COUNTER_MAX:
+                    # Counter exhausted: borrow the next millisecond
+                    _last_ms += 1
+                    _counter = 0
+            timestamp_ms = _last_ms
+            counter = _counter
+    
+    value = (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+    value |= 0x7 << 76
+    value |= (counter & _COUNTER_MAX) << 64
+    value |= 0b10 << 62
+    value |= rand & ((1 << 62) - 1)
+    return uuid.UUID(int=value)
+
+
+def uuid7_at(moment: datetime) -> uuid.UUID:
+    """UUIDv7 for a naive-UTC datetime (e.g. a stored created_at)."""
+    epoch = datetime(1970, 1, 1)
+    return uuid7(int((moment - epoch).total_seconds() * 1000))
+
+
+def uuid7_datetime(value: uuid.UUID) -> datetime:
+    """Extract the embedded creation time (naive UTC) from a UUIDv7."""
+    return datetime.utcfromtimestamp((value.int >> 80) / 1000)
+
+
+def uuid7_floor(moment: datetime) -> uuid.UUID:
+    """Smallest UUIDv7 at a naive-UTC datetime, for id range filters by creation time."""
+    epoch = datetime(1970, 1, 1)
+    return uuid.UUID(int=int((moment - epoch).total_seconds() * 1000) << 80)
@@ -1,15 +1,21 @@
 """
 SQLAlchemy models for the Support-Led Ordering System.
+
+The schema itself is owned by the SQL migrations in ``poc/migrations``;
+these models mirror it (types, CHECKs and indexes) and must be kept in sync.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Text, DateTime, ForeignKey, Enum, JSON
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, String, Integer, BigInteger, Numeric, Float, Text, Date, DateTime, ForeignKey,
+    CheckConstraint, Index, text
+)
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, mapped_column
 from datetime import datetime
-import uuid
 import enum
 
 from app.database import Base
+from app.models.ids import uuid7
 
 
 class StageEnum(str, enum.Enum):
@@ -48,17 +54,12 @@ class ActorEnum(str, enum.Enum):
     SYSTEM = "SYSTEM"
 
 
-class Incidence(Base):
-    """
-    Core entity representing every support interaction.
-    Replaces traditional 'lead' concept.
-    """
-    __tablename__ = "incidences"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(String(255), nullable=False, index=True)
+class IncidenceColumns:
+    """Columns shared by the live and archived incidence tables."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    user_id = Column(String(255), nullable=False)
     order_id = Column(String(255), nullable=True)
-    conversation_id = Column(String(255), unique=True, index=True)
+    conversation_id = Column(String(255), unique=True)
     
     # Classification
     stage = Column(String(20), nullable=False)
@@ -67,10 +68,10 @@ class Incidence(Base):
     
     # Context at creation
     app_screen = Column(String(100))
-    cart_value = Column(Float, default=0)
+    cart_value = Column(Numeric(10, 2, asdecimal=False), default=0)
     guest_count = Column(Integer)
     event_type = Column(String(50))
-    friction_score = Column(Float, default=0)
+    friction_score = Column(Numeric(5, 2, asdecimal=False), default=0)
     
     # Resolution
     outcome = Column(String(20), default="IN_PROGRESS")
@@ -83,62 +84,306 @@ class Incidence(Base):
     agent_id = Column(String(255))
     user_phone = Column(String(20))  # For call callback feature
     call_notes = Column(Text)  # Agent notes after call
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    call_window_start = Column(DateTime)  # Requested call-back window, UTC (migration 0016)
+    call_window_end = Column(DateTime)
+    created_at = Column(DateTime, default=datetime.utcnow)
     resolved_at = Column(DateTime)
     time_to_resolve_seconds = Column(Integer)
+    first_response_at = Column(DateTime)  # First AGENT timeline event (migration 0010)
+    # Database clock at the last write or timeline insert, set by triggers (migration 0013)
+    updated_at = Column(DateTime)
     
-    # Relationships
-    timeline = relationship("IncidenceTimeline", back_populates="incidence", cascade="all, delete-orphan")
+    # Full-text search, maintained by a trigger (migration 0007); not loaded by default
+    search_vector = mapped_column(TSVECTOR, deferred=True)
 
 
-class IncidenceTimeline(Base):
-    """Timeline events for an incidence (chat history, actions)."""
-    __tablename__ = "incidence_timeline"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    incidence_id = Column(UUID(as_uuid=True), ForeignKey("incidences.id", ondelete="CASCADE"), index=True)
+class TimelineColumns:
+    """Columns shared by the live and archived timeline tables (except the FK)."""
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     
     event_type = Column(String(50), nullable=False)
     actor = Column(String(20), nullable=False)
     content = Column(Text)
-    event_metadata = Column(JSON)  # Renamed from 'metadata' - reserved in SQLAlchemy
+    event_metadata = Column(JSONB)  # Renamed from 'metadata' - reserved in SQLAlchemy
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    # Database clock, so the changes feed can window on it (migration 0013)
+    created_at = Column(DateTime, server_default=text("(clock_timestamp() AT TIME ZONE 'utc')"))
+    
+    # Full-text search over content, maintained by a trigger (migration 0007)
+    search_vector = mapped_column(TSVECTOR, deferred=True)
+
+
+class Incidence(IncidenceColumns, Base):
+    """
+    Core entity representing every support interaction.
+    Replaces traditional 'lead' concept.
+    """
+    __tablename__ = "incidences"
+    __table_args__ = (
+        CheckConstraint("stage IN ('PRE_ORDER', 'POST_ORDER')", name="incidences_stage_check"),
+        CheckConstraint("channel IN ('IN_APP_CHAT', 'CALL', 'WHATSAPP')", name="incidences_channel_check"),
+        CheckConstraint("trigger IN ('USER_INITIATED', 'SYSTEM_INITIATED')", name="incidences_trigger_check"),
+        CheckConstraint(
+            "outcome IN ('IN_PROGRESS', 'RESOLVED', 'DROPPED', 'CONVERTED')",
+            name="incidences_outcome_check"
+        ),
+        CheckConstraint(
+            "order_impact IN ('PLACED', 'MODIFIED', 'LOST', 'NONE')",
+            name="incidences_order_impact_check"
+        ),
+        Index("idx_incidences_created_at", "created_at"),
+        Index("idx_incidences_outcome", "outcome"),
+        Index("idx_incidences_user_created", "user_id", "created_at"),
+        Index("idx_incidences_channel_outcome_created", "channel", "outcome", "created_at"),
+        Index(
+            "idx_incidences_in_progress", "created_at",
+            postgresql_where=text("outcome = 'IN_PROGRESS'")
+        ),
+        Index("idx_incidences_unlinked_created", text("(conversation_id IS NULL)"), "created_at"),
+        Index("idx_incidences_updated_at", "updated_at"),
+        Index(
+            "idx_incidences_resolved_at", "resolved_at",
+            postgresql_where=text("outcome <> 'IN_PROGRESS'")
+        ),
+        Index("idx_incidences_search", "search_vector", postgresql_using="gin"),
+        Index("idx_incidences_user_id_trgm", "user_id",
+              postgresql_using="gin", postgresql_ops={"user_id": "gin_trgm_ops"}),
+        Index("idx_incidences_user_phone_trgm", "user_phone",
+              postgresql_using="gin", postgresql_ops={"user_phone": "gin_trgm_ops"}),
+    )
+    
+    # Relationships
+    timeline = relationship("IncidenceTimeline", back_populates="incidence", cascade="all, delete-orphan")
+
+
+class IncidenceIdMap(Base):
+    """Pre-UUIDv7 incidence ids, kept because they were shared with Freshchat/Freshdesk."""
+    __tablename__ = "incidence_id_map"
+    
+    old_id = Column(UUID(as_uuid=True), primary_key=True)
+    new_id = Column(UUID(as_uuid=True), nullable=False)
+
+
+class IncidenceTimeline(TimelineColumns, Base):
+    """
+    Timeline events for an incidence (chat history, actions).
+    
+    Partitioned by month on incidence_id (a UUIDv7, so its prefix is the
+    incidence's creation time); the table's primary key is (id, incidence_id).
+    """
+    __tablename__ = "incidence_timeline"
+    __table_args__ = (
+        CheckConstraint("actor IN ('USER', 'AGENT', 'SYSTEM')", name="incidence_timeline_actor_check"),
+        Index("idx_timeline_incidence_id", "incidence_id", "created_at"),
+        Index("idx_timeline_created_at", "created_at"),
+        Index("idx_timeline_search", "search_vector", postgresql_using="gin"),
+        {"postgresql_partition_by": "RANGE (incidence_id)"},
+    )
+    
+    incidence_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("incidences.id", ondelete="CASCADE", onupdate="CASCADE"),
+        nullable=False
+    )
     
     # Relationships
     incidence = relationship("Incidence", back_populates="timeline")
 
 
+class ArchivedIncidence(IncidenceColumns, Base):
+    """
+    Resolved incidence moved out of the live table by ArchiveService.
+    Read-only: IncidenceService restores it to `incidences` before any write.
+    """
+    __tablename__ = "incidences_archive"
+    __table_args__ = (
+        Index("idx_incidences_archive_user_created", "user_id", "created_at"),
+        Index("idx_incidences_archive_created_at", "created_at"),
+        Index("idx_incidences_archive_search", "search_vector", postgresql_using="gin"),
+        Index("idx_incidences_archive_user_id_trgm", "user_id",
+              postgresql_using="gin", postgresql_ops={"user_id": "gin_trgm_ops"}),
+        Index("idx_incidences_archive_user_phone_trgm", "user_phone",
+              postgresql_using="gin", postgresql_ops={"user_phone": "gin_trgm_ops"}),
+    )
+    
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    timeline = relationship(
+        "ArchivedIncidenceTimeline",
+        primaryjoin="ArchivedIncidence.id == foreign(ArchivedIncidenceTimeline.incidence_id)",
+        viewonly=True
+    )
+
+
+class ArchivedIncidenceTimeline(TimelineColumns, Base):
+    """Timeline events of an archived incidence."""
+    __tablename__ = "incidence_timeline_archive"
+    __table_args__ = (
+        Index("idx_timeline_archive_incidence_id", "incidence_id"),
+        Index("idx_timeline_archive_search", "search_vector", postgresql_using="gin"),
+    )
+    
+    incidence_id = Column(UUID(as_uuid=True))
+
+
 class FrictionSignal(Base):
-    """Tracked friction signals for users."""
+    """
+    Tracked friction signals for users.
+    
+    Partitioned by month on created_at; the table's primary key is (id, created_at).
+    """
     __tablename__ = "friction_signals"
+    __table_args__ = (
+        Index("idx_friction_user_session", "user_id", "session_id"),
+        Index("idx_friction_created_at", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     user_id = Column(String(255), nullable=False)
     session_id = Column(String(255), nullable=False)
     
     signal_type = Column(String(50), nullable=False)
-    value = Column(Float)
+    value = Column(Numeric(10, 2, asdecimal=False))
     screen = Column(String(100))
     
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
 
 class AnalyticsDaily(Base):
-    """Pre-computed daily analytics."""
+    """
+    Pre-computed daily analytics, written by RollupService.
+    
+    Rows are mergeable: averages keep their sums/counts and the top_* maps
+    hold every category / screen with its count, so a date range is the sum
+    of its days.
+    """
     __tablename__ = "analytics_daily"
+    __table_args__ = (
+        Index("idx_analytics_date", "date"),
+    )
     
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    date = Column(DateTime, unique=True, nullable=False, index=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    date = Column(Date, unique=True, nullable=False)
     
     total_orders = Column(Integer, default=0)
     orders_without_help = Column(Integer, default=0)
     orders_with_help = Column(Integer, default=0)
     
     total_incidences = Column(Integer, default=0)
+    converted_count = Column(Integer, default=0, nullable=False)
     avg_time_to_resolve_seconds = Column(Integer, default=0)
+    resolved_count = Column(Integer, default=0, nullable=False)
+    resolution_seconds_total = Column(BigInteger, default=0, nullable=False)
     
-    top_issue_categories = Column(JSON)
-    top_friction_screens = Column(JSON)
+    top_issue_categories = Column(JSONB)  # {category: incidences}
+    top_friction_screens = Column(JSONB)  # {app_screen: incidences}
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class LatencySketch(Base):
+    """
+    Quantile sketch of one latency metric for a day, channel and stage.
+    
+    `sketch` is a serialized QuantileSketch ({bucket: count}); rows are
+    updated in place with the SQL function sketch_merge() and merged in
+    Python to answer a date range (see LatencySketchService).
+    """
+    __tablename__ = "latency_sketches"
+    __table_args__ = (
+        CheckConstraint("metric IN ('resolution', 'first_response')", name="latency_sketches_metric_check"),
+    )
+    
+    day = Column(Date, primary_key=True)
+    metric = Column(String(30), primary_key=True)
+    channel = Column(String(20), primary_key=True)
+    stage = Column(String(20), primary_key=True)
+    
+    sketch = Column(JSONB, nullable=False, default=dict)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class HeavyHitterSketch(Base):
+    """
+    Space-Saving summary of one dimension (screen / category) for an hour or a day.
+    
+    Written by the heavy-hitter flush job; see app/services/heavy_hitters.py.
+    """
+    __tablename__ = "heavy_hitter_sketches"
+    __table_args__ = (
+        CheckConstraint("granularity IN ('hour', 'day')", name="heavy_hitter_sketches_granularity_check"),
+    )
+    
+    dimension = Column(String(30), primary_key=True)
+    granularity = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    
+    sketch = Column(JSONB, nullable=False)  # {capacity, total, items: {name: [count, error]}}
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class IncidenceTrend(Base):
+    """
+    Incidence measures for one time bucket and dimension combination.
+    
+    Additive only (counts and sums), so buckets and groups merge by summing;
+    maintained by the trend refresh job (app/services/trend_service.py).
+    """
+    __tablename__ = "incidence_trends"
+    __table_args__ = (
+        CheckConstraint("granularity IN ('minute', 'hour', 'day')", name="incidence_trends_granularity_check"),
+        Index("idx_incidence_trends_updated_at", "updated_at"),
+    )
+    
+    granularity = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    app_screen = Column(String(100), primary_key=True, default="")
+    event_type = Column(String(50), primary_key=True, default="")
+    channel = Column(String(20), primary_key=True)
+    stage = Column(String(20), primary_key=True)
+    
+    incidences = Column(Integer, default=0, nullable=False)
+    converted = Column(Integer, default=0, nullable=False)
+    friction_sum = Column(Float, default=0, nullable=False)
+    friction_count = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class FrictionSignalTrend(Base):
+    """Friction signal measures for one time bucket, screen and signal type."""
+    __tablename__ = "friction_signal_trends"
+    __table_args__ = (
+        CheckConstraint(
+            "granularity IN ('minute', 'hour', 'day')", name="friction_signal_trends_granularity_check"
+        ),
+        Index("idx_friction_signal_trends_updated_at", "updated_at"),
+    )
+    
+    granularity = Column(String(10), primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    screen = Column(String(100), primary_key=True, default="")
+    signal_type = Column(String(50), primary_key=True)
+    
+    signals = Column(Integer, default=0, nullable=False)
+    value_sum = Column(Float, default=0, nullable=False)
+    value_count = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class RoutingRuleSet(Base):
+    """
+    One version of the routing / friction rules document; the highest is active.
+    
+    Rows are append-only; see app/services/rules_engine.py.
+    """
+    __tablename__ = "routing_rules"
+    
+    version = Column(Integer, primary_key=True, autoincrement=True)
+    rules = Column(JSONB, nullable=False)
+    comment = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
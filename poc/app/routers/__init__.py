@@ -9,3 +9,5 @@ from app.routers.messages import router as messages_router
 from app.routers.call import router as call_router
 from app.routers.freshdesk import router as freshdesk_router
 from app.routers.freshdesk_sync import router as freshdesk_sync_router
+from app.routers.search import router as search_router
+from app.routers.events import router as events_router
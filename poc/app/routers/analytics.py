@@ -2,28 +2,204 @@
 Analytics API - Dashboard KPIs and reports.
 """
 
-from fastapi import APIRouter, Depends
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
-from app.database import get_db
+from app.config import settings
+from app.database import async_session_maker, get_db
 from app.services.analytics_service import AnalyticsService
-from app.schemas.analytics import KPIResponse, WeeklyReportResponse
+from app.schemas.analytics import (
+    KPIResponse, WeeklyReportResponse, DailyAnalytics, PercentilesResponse, TopItemsResponse, TrendResponse,
+    AnalyticsQueryResponse
+)
+from app.services import response_cache
+from app.services.analytics_store import REPORTS, AnalyticsStoreUnavailable, run_report
+from app.services.trend_service import BUCKETS, FILLS, SOURCES, TrendService
+from app.services.heavy_hitters import DIMENSIONS, HeavyHitterService
+from app.services.latency_sketches import METRICS, GROUP_BY
 
 router = APIRouter(prefix="/api/v1/analytics", tags=["Analytics"])
 
 
+async def _compute_kpis() -> dict:
+    # Own session: may run as a background refresh after the request is done
+    async with async_session_maker() as db:
+        return (await AnalyticsService(db).get_kpis()).model_dump(mode="json")
+
+
+async def _compute_weekly_report() -> dict:
+    async with async_session_maker() as db:
+        report = await AnalyticsService(db).get_weekly_report()
+        # Keep the rollups of missing days that get_days wrote on the spot
+        await db.commit()
+        return report.model_dump(mode="json")
+
+
 @router.get("/kpis", response_model=KPIResponse)
-async def get_kpis(db: AsyncSession = Depends(get_db)):
-    """Get current dashboard KPIs."""
-    service = AnalyticsService(db)
-    return await service.get_kpis()
+async def get_kpis(response: Response):
+    """Get current dashboard KPIs (cached; the Age header gives the age in seconds)."""
+    cached = await response_cache.get_or_compute(
+        "analytics:kpis", _compute_kpis, settings.ANALYTICS_CACHE_TTL_SECONDS
+    )
+    response_cache.set_headers(response, cached)
+    return cached.value
 
 
 @router.get("/weekly-report", response_model=WeeklyReportResponse)
-async def get_weekly_report(db: AsyncSession = Depends(get_db)):
-    """Get weekly analytics report."""
+async def get_weekly_report(response: Response):
+    """Get weekly analytics report (cached; the Age header gives the age in seconds)."""
+    cached = await response_cache.get_or_compute(
+        "analytics:weekly-report", _compute_weekly_report, settings.ANALYTICS_CACHE_REPORT_TTL_SECONDS
+    )
+    response_cache.set_headers(response, cached)
+    return cached.value
+
+
+@router.get("/daily", response_model=List[DailyAnalytics])
+async def get_daily_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Per-day analytics for a date range (default: the last 7 days and today)."""
+    end = end or date.today()
+    start = start or end - timedelta(days=7)
+    if start > end or (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="start must be before end, at most 366 days apart")
+    
+    service = AnalyticsService(db)
+    return await service.get_daily(start, end)
+
+
+@router.get("/percentiles", response_model=PercentilesResponse)
+async def get_percentiles(
+    metric: str = Query("resolution", description="resolution | first_response"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    group_by: Optional[str] = Query(None, description="channel | stage | day"),
+    db: AsyncSession = Depends(get_db)
+):
+    """p50/p90/p99 latency for a date range (default: the last 7 days and today)."""
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(METRICS)}")
+    if group_by is not None and group_by not in GROUP_BY:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(GROUP_BY)}")
+    end = end or date.today()
+    start = start or end - timedelta(days=7)
+    if start > end or (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="start must be before end, at most 366 days apart")
+    
     service = AnalyticsService(db)
-    return await service.get_weekly_report()
+    return await service.get_percentiles(metric, start, end, group_by)
+
+
+@router.get("/top", response_model=TopItemsResponse)
+async def get_top_items(
+    dimension: str = Query("screen", description="screen | category"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    hours: Optional[int] = Query(None, ge=1, le=168, description="Last N hours instead of start/end"),
+    k: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Top-k friction screens or issue categories with their error bounds.
+    
+    Screens count incidences created on them; categories count categorisation
+    events, so an incidence recategorised twice counts once for each category.
+    Default window: the last 7 days and today. Counts are upper bounds; each
+    item's true count is at least count - error.
+    """
+    if dimension not in DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"dimension must be one of {', '.join(DIMENSIONS)}")
+    if hours:
+        window_end = datetime.utcnow()
+        window_start = window_end - timedelta(hours=hours)
+    else:
+        end = end or date.today()
+        start = start or end - timedelta(days=7)
+        if start > end or (end - start).days > 366:
+            raise HTTPException(status_code=400, detail="start must be before end, at most 366 days apart")
+        window_start = datetime.combine(start, datetime.min.time())
+        window_end = datetime.combine(end + timedelta(days=1), datetime.min.time())
+    
+    service = HeavyHitterService(db)
+    return await service.top_k(dimension, window_start, window_end, k)
+
+
+@router.get("/trends", response_model=TrendResponse)
+async def get_trends(
+    source: str = Query("incidences", description="incidences | friction_signals"),
+    metric: str = Query(
+        "count", description="incidences: count | avg_friction | conversion_rate; friction_signals: count | avg_value"
+    ),
+    bucket: str = Query("hour", description="minute | hour | day"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    group_by: Optional[str] = Query(None, description="screen | event_type | channel | stage | signal_type"),
+    fill: str = Query("null", description="Value of empty buckets for averages and rates: null | zero | previous"),
+    limit: int = Query(10, ge=1, le=50, description="Series with the most samples"),
+    max_points: Optional[int] = Query(None, ge=10, le=5000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Time series from the pre-aggregated trend buckets (default: the last 7 days, hourly).
+    
+    Every bucket of the range has a point (gap filled); long ranges are
+    downsampled by merging consecutive buckets.
+    """
+    spec = SOURCES.get(source)
+    if spec is None:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(SOURCES)}")
+    if metric not in spec.metrics:
+        raise HTTPException(status_code=400, detail=f"metric must be one of {', '.join(spec.metrics)}")
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(BUCKETS)}")
+    if group_by is not None and group_by not in spec.dimensions:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(spec.dimensions)}")
+    if fill not in FILLS:
+        raise HTTPException(status_code=400, detail=f"fill must be one of {', '.join(FILLS)}")
+    
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    if start >= end or (end - start).days > 366:
+        raise HTTPException(status_code=400, detail="start must be before end, at most 366 days apart")
+    if bucket == "minute" and start < datetime.utcnow() - timedelta(days=settings.TREND_MINUTE_RETENTION_DAYS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"minute buckets are kept for {settings.TREND_MINUTE_RETENTION_DAYS} days, use hour or day"
+        )
+    
+    service = TrendService(db)
+    return await service.series(source, metric, bucket, start, end, group_by, fill, limit, max_points)
+
+
+@router.get("/query", response_model=AnalyticsQueryResponse)
+async def query_analytics_store(
+    report: str = Query(..., description="funnel | cohorts | monthly_trends | screen_friction | conversation_depth"),
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    """
+    Run a heavy report on the analytics store (DuckDB over the Parquet export).
+    
+    Does not touch PostgreSQL; data is as fresh as the last export
+    (`exported_at`). Default window: the last 90 days.
+    """
+    if report not in REPORTS:
+        raise HTTPException(status_code=400, detail=f"report must be one of {', '.join(REPORTS)}")
+    end = end or date.today()
+    start = start or end - timedelta(days=90)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    try:
+        return await asyncio.to_thread(run_report, report, start, end)
+    except AnalyticsStoreUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 @router.get("/health")
@@ -37,7 +213,11 @@ async def analytics_health():
             "self_serve_rate",
             "assisted_count",
             "avg_resolution_time",
+            "resolution_time_percentiles",
+            "first_response_percentiles",
             "top_friction_screens",
-            "top_issue_categories"
+            "top_issue_categories",
+            "top_k_with_error_bounds",
+            "trends"
         ]
     }
@@ -2,15 +2,22 @@
 Call Request API - Handle call-back requests from Freshchat widget.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 from uuid import UUID
+from datetime import datetime, timedelta, timezone
+import time
 
+from app.config import settings
 from app.database import get_db
+from app.services import agent_load, call_queue, call_scheduler
 from app.services.incidence_service import IncidenceService
-from app.schemas.incidence import IncidenceCreate, TimelineEventCreate, ActorEnum, StageEnum, ChannelEnum, TriggerEnum
+from app.services.latency_sketches import LatencySketchService
+from app.schemas.incidence import (
+    IncidenceCreate, IncidenceUpdate, TimelineEventCreate, ActorEnum, StageEnum, ChannelEnum, TriggerEnum
+)
 
 router = APIRouter(prefix="/api/v1/call", tags=["Call"])
 
@@ -24,6 +31,8 @@ class CallRequestPayload(BaseModel):
     event_type: Optional[str] = None
     friction_score: Optional[float] = 0
     app_screen: Optional[str] = None
+    window_start: Optional[datetime] = None  # Call me later: preferred window (naive = UTC)
+    window_end: Optional[datetime] = None  # Defaults to CALL_SCHEDULE_WINDOW_SECONDS after the start
 
 
 class CallRequestResponse(BaseModel):
@@ -32,6 +41,69 @@ class CallRequestResponse(BaseModel):
     message: str
     incidence_id: str
     phone: str
+    scheduled_for: Optional[datetime] = None
+
+
+class CallClaimRequest(BaseModel):
+    """An agent asking for the next call-back."""
+    agent_id: str
+    group: Optional[str] = None  # Any group's best call if omitted
+
+
+class CallClaimResponse(BaseModel):
+    """A leased call-back; ack it with the token before the lease expires."""
+    incidence_id: str
+    token: str
+    lease_expires_at: float
+    group: str
+    user_id: str
+    phone: str
+    cart_value: float
+    event_type: Optional[str] = None
+    friction_score: float
+    waited_seconds: int
+    claims: int
+
+
+class CallLeaseRequest(BaseModel):
+    """Proof of a lease."""
+    token: str
+    agent_id: Optional[str] = None  # Required for ack
+
+
+def _call_window(data: CallRequestPayload) -> Optional[Tuple[datetime, datetime]]:
+    """The requested window as naive UTC (how timestamps are stored), or None to call now."""
+    if data.window_start is None:
+        if data.window_end is not None:
+            raise HTTPException(status_code=400, detail="window_end needs a window_start")
+        return None
+    
+    def utc(at: datetime) -> datetime:
+        return at.astimezone(timezone.utc).replace(tzinfo=None) if at.tzinfo else at
+    
+    start = utc(data.window_start)
+    end = utc(data.window_end) if data.window_end else start + timedelta(seconds=settings.CALL_SCHEDULE_WINDOW_SECONDS)
+    now = datetime.utcnow()
+    if end <= start:
+        raise HTTPException(status_code=400, detail="window_end must be after window_start")
+    if end <= now:
+        raise HTTPException(status_code=400, detail="The requested window is already over")
+    if start > now + timedelta(days=settings.CALL_SCHEDULE_MAX_DAYS):
+        raise HTTPException(
+            status_code=400, detail=f"Call-backs can be scheduled at most {settings.CALL_SCHEDULE_MAX_DAYS} days ahead"
+        )
+    return start, end
+
+
+def _window_metadata(window: Optional[Tuple[datetime, datetime]]) -> dict:
+    if not window:
+        return {}
+    return {"window_start": window[0].isoformat(), "window_end": window[1].isoformat()}
+
+
+def _require_queue():
+    if not settings.CALL_QUEUE_ENABLED:
+        raise HTTPException(status_code=503, detail="Call-back queue is disabled")
 
 
 @router.post("/request", response_model=CallRequestResponse)
@@ -43,25 +115,39 @@ async def request_call(
     Handle a call-back request from the Freshchat widget.
     Creates or updates an incidence with call channel.
     """
+    window = _call_window(data)
+    window_start, window_end = window or (None, None)
+    rescheduled = False
     service = IncidenceService(db)
     incidence = None
     
     # If incidence_id provided, update existing incidence
     if data.incidence_id:
         try:
-            incidence = await service.get_by_id(UUID(data.incidence_id))
+            incidence = await service.get_by_id(UUID(data.incidence_id), restore_archived=True)
             if incidence:
-                # Update to call channel
+                # Update to call channel; a past resolution time moves to the CALL sketch with it
+                if incidence.channel != "CALL" and incidence.resolved_at and incidence.time_to_resolve_seconds is not None:
+                    await LatencySketchService(service.db).record_resolution(
+                        "CALL", incidence.stage, incidence.resolved_at, incidence.time_to_resolve_seconds,
+                        previous=(
+                            incidence.channel, incidence.stage,
+                            incidence.resolved_at, incidence.time_to_resolve_seconds
+                        )
+                    )
                 incidence.channel = "CALL"
                 incidence.user_phone = data.phone
+                rescheduled = incidence.call_window_start != window_start
+                incidence.call_window_start, incidence.call_window_end = window_start, window_end
                 await service.db.flush()
+                agent_load.record(service.db, incidence)
                 
                 # Log timeline event
                 timeline_event = TimelineEventCreate(
                     event_type="CALL_REQUESTED",
                     actor=ActorEnum.USER,
                     content=f"User requested a call back to {data.phone}",
-                    metadata={"phone": data.phone, "source": "freshchat_widget"}
+                    metadata={"phone": data.phone, "source": "freshchat_widget", **_window_metadata(window)}
                 )
                 await service.log_timeline(incidence.id, timeline_event)
                 print(f"📞 Call request added to incidence {incidence.id}")
@@ -83,22 +169,57 @@ async def request_call(
             user_phone=data.phone
         )
         incidence = await service.create(incidence_data)
+        if window:
+            incidence.call_window_start, incidence.call_window_end = window_start, window_end
+            await service.db.flush()
+            agent_load.record(service.db, incidence)
         
         # Log call request event
         timeline_event = TimelineEventCreate(
             event_type="CALL_REQUESTED",
             actor=ActorEnum.USER,
             content=f"User requested a call back to {data.phone}",
-            metadata={"phone": data.phone, "source": "freshchat_widget"}
+            metadata={"phone": data.phone, "source": "freshchat_widget", **_window_metadata(window)}
         )
         await service.log_timeline(incidence.id, timeline_event)
         print(f"📞 Created new call request incidence {incidence.id}")
     
     await service.db.commit()
+    if settings.CALL_QUEUE_ENABLED:
+        try:
+            if rescheduled:
+                await call_queue.discard(str(incidence.id))
+            release_at = await call_queue.enqueue(incidence)
+            if window and release_at is not None:
+                call_scheduler.track(str(incidence.id), release_at)
+        except Exception as e:
+            print(f"⚠️ Call-back not queued (the queue sweep will add it): {e}")
+    
+    if window:
+        shown_start = data.window_start
+        shown_end = data.window_end or shown_start + timedelta(seconds=settings.CALL_SCHEDULE_WINDOW_SECONDS)
+        return CallRequestResponse(
+            success=True,
+            message=(
+                f"Call-back scheduled! An agent will call you between "
+                f"{shown_start:%d %b %H:%M} and {shown_end:%H:%M}."
+            ),
+            incidence_id=str(incidence.id),
+            phone=data.phone,
+            scheduled_for=window_start
+        )
+    
+    # Promise what the agent queue can keep, not a fixed time
+    wait = agent_load.estimated_call_wait(incidence.cart_value, incidence.event_type)
+    if wait is None:
+        eta = "as soon as an agent is free"
+    else:
+        minutes = max(1, -(-wait // 60))
+        eta = f"within {minutes} minute{'s' if minutes != 1 else ''}"
     
     return CallRequestResponse(
         success=True,
-        message="Call request submitted successfully! An agent will call you within 5 minutes.",
+        message=f"Call request submitted successfully! An agent will call you {eta}.",
         incidence_id=str(incidence.id),
         phone=data.phone
     )
@@ -107,9 +228,32 @@ async def request_call(
 @router.get("/pending")
 async def get_pending_calls(
     db: AsyncSession = Depends(get_db),
-    limit: int = 20
+    limit: int = 20,
+    group: Optional[str] = None
 ):
-    """Get list of pending call requests for agent dashboard."""
+    """
+    Get list of pending call requests for agent dashboard, in the order they
+    will be claimed (from the call-back queue; the database if it is unavailable).
+    """
+    if settings.CALL_QUEUE_ENABLED:
+        try:
+            now = time.time()
+            return [
+                {
+                    "id": item["incidence_id"],
+                    "user_id": item["user_id"],
+                    "phone": item["phone"],
+                    "cart_value": item["cart_value"],
+                    "event_type": item["event_type"],
+                    "group": item["group"],
+                    "waited_seconds": round(now - item["enqueued_at"]),
+                    "friction_score": item["friction_score"]
+                }
+                for item in await call_queue.peek(group, limit)
+            ]
+        except Exception as e:
+            print(f"⚠️ Call-back queue unavailable, listing from the database: {e}")
+    
     from sqlalchemy import select, and_
     from app.models.incidence import Incidence
     
@@ -140,3 +284,103 @@ async def get_pending_calls(
         }
         for inc in incidences
     ]
+
+
+@router.post("/claim", response_model=CallClaimResponse, responses={204: {"description": "No call-back waiting"}})
+async def claim_call(data: CallClaimRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Lease the highest-priority call-back to an agent. Ack it within
+    CALL_LEASE_SECONDS (or renew the lease), or it goes back to the queue.
+    """
+    _require_queue()
+    service = IncidenceService(db)
+    for _ in range(5):
+        item = await call_queue.claim(data.group, data.agent_id)
+        if item is None:
+            return Response(status_code=204)
+        # Resolved or picked up since it was queued: drop it and take the next one
+        incidence = await service.get_by_id(UUID(item["incidence_id"]))
+        if incidence is None or incidence.outcome != "IN_PROGRESS" or incidence.agent_id:
+            await call_queue.discard(item["incidence_id"])
+            continue
+        return CallClaimResponse(
+            incidence_id=item["incidence_id"],
+            token=item["token"],
+            lease_expires_at=item["lease_expires_at"],
+            group=item["group"],
+            user_id=item["user_id"],
+            phone=item["phone"],
+            cart_value=item["cart_value"],
+            event_type=item["event_type"],
+            friction_score=item["friction_score"],
+            waited_seconds=round(time.time() - item["enqueued_at"]),
+            claims=item["claims"]
+        )
+    return Response(status_code=204)
+
+
+@router.post("/{incidence_id}/renew")
+async def renew_call_lease(incidence_id: UUID, data: CallLeaseRequest):
+    """Extend the lease on a claimed call-back by CALL_LEASE_SECONDS."""
+    _require_queue()
+    expires = await call_queue.renew(str(incidence_id), data.token)
+    if expires is None:
+        raise HTTPException(status_code=409, detail="Lease expired or held by another agent")
+    return {"incidence_id": str(incidence_id), "lease_expires_at": expires}
+
+
+@router.post("/{incidence_id}/ack")
+async def ack_call(incidence_id: UUID, data: CallLeaseRequest, db: AsyncSession = Depends(get_db)):
+    """Confirm a claimed call-back: assigns the agent on the incidence and removes the call from the queue."""
+    _require_queue()
+    if not data.agent_id:
+        raise HTTPException(status_code=400, detail="agent_id is required")
+    # Taken atomically before the write, so the lease cannot lapse to another agent meanwhile
+    if not await call_queue.ack(str(incidence_id), data.token, data.agent_id):
+        raise HTTPException(status_code=409, detail="Lease expired or held by another agent")
+    
+    service = IncidenceService(db)
+    try:
+        incidence = await service.update(incidence_id, IncidenceUpdate(agent_id=data.agent_id))
+        if incidence:
+            await service.log_timeline(incidence.id, TimelineEventCreate(
+                event_type="CALL_CLAIMED",
+                actor=ActorEnum.AGENT,
+                content=f"Call-back to {incidence.user_phone} taken by agent {data.agent_id}",
+                metadata={"agent_id": data.agent_id}
+            ))
+            await service.db.commit()
+    except Exception:
+        try:
+            await call_queue.requeue(str(incidence_id), data.token)
+        except Exception as e:
+            print(f"⚠️ Call-back not requeued (its lease expiry will requeue it): {e}")
+        raise
+    if not incidence:
+        await call_queue.discard(str(incidence_id))
+        raise HTTPException(status_code=404, detail="Incidence not found")
+    await call_queue.complete(str(incidence_id), data.token)
+    return {"incidence_id": str(incidence_id), "agent_id": data.agent_id, "status": "claimed"}
+
+
+@router.get("/queue/stats")
+async def get_call_queue_stats():
+    """Call-back queue depth per group, leased calls, and wait percentiles (seconds) of the queued calls."""
+    _require_queue()
+    try:
+        return await call_queue.stats()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Call-back queue unavailable: {e}")
+
+
+@router.get("/schedule/stats")
+async def get_call_schedule_stats():
+    """
+    Scheduled call-backs, calls past their SLA deadline (window end, or the
+    promised call-back time), and scheduled calls released per hour ahead.
+    """
+    _require_queue()
+    try:
+        return await call_scheduler.stats()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Call-back queue unavailable: {e}")
@@ -2,9 +2,19 @@
 Channel Router API - Determine allowed support channels.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+
+from app.database import get_db
+from app.services import agent_load, rules_engine
 from app.services.channel_router import ChannelRouter
-from app.schemas.channel import ChannelRouteRequest, ChannelRouteResponse
+from app.config import settings
+from app.schemas.channel import (
+    ChannelRouteRequest, ChannelRouteResponse, ChannelRouteBatchRequest, ChannelRouteBatchResponse,
+    AgentGroupLoad, AgentCapacityUpdate
+)
+from app.schemas.rules import RuleSetUpdate, RuleSetResponse
 
 router = APIRouter(prefix="/api/v1/channel", tags=["Channel Router"])
 
@@ -25,41 +35,65 @@ async def get_allowed_channels(request: ChannelRouteRequest):
     return channel_router.get_allowed_channels(request)
 
 
-@router.get("/rules")
-async def get_routing_rules():
-    """Get current channel routing rules."""
-    from app.config import settings
+@router.post("/route/batch", response_model=ChannelRouteBatchResponse)
+async def get_allowed_channels_batch(request: ChannelRouteBatchRequest):
+    """
+    Routing decisions for many carts / quotes in one call (cart and platter
+    listing screens).
     
-    return {
-        "thresholds": {
-            "low": settings.THRESHOLD_LOW,
-            "high": settings.THRESHOLD_HIGH
-        },
-        "rules": [
-            {
-                "condition": f"order_value < ₹{settings.THRESHOLD_LOW:,.0f}",
-                "channels": [],
-                "priority": "LOW",
-                "description": "Self-serve only"
-            },
-            {
-                "condition": f"₹{settings.THRESHOLD_LOW:,.0f} <= order_value < ₹{settings.THRESHOLD_HIGH:,.0f}",
-                "channels": ["CHAT"],
-                "priority": "NORMAL",
-                "description": "Chat support"
-            },
-            {
-                "condition": f"order_value >= ₹{settings.THRESHOLD_HIGH:,.0f}",
-                "channels": ["CHAT", "CALL"],
-                "priority": "HIGH",
-                "description": "Premium support"
-            },
-            {
-                "condition": "High-importance event (WEDDING, CORPORATE, RELIGIOUS)",
-                "channels": ["CHAT", "CALL"],
-                "priority": "HIGH",
-                "description": "Premium support regardless of value"
-            }
-        ],
-        "high_importance_events": channel_router.HIGH_IMPORTANCE_EVENTS
-    }
+    `decisions` holds each distinct outcome once; `decision_index[i]` is the
+    decision of item i. Set `include_reasons` for per-item reason texts.
+    """
+    if len(request.order_values) > settings.CHANNEL_ROUTE_BATCH_MAX:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.CHANNEL_ROUTE_BATCH_MAX} items per batch"
+        )
+    return channel_router.route_batch(request.order_values, request.event_types, request.include_reasons)
+
+
+@router.get("/rules", response_model=RuleSetResponse)
+async def get_routing_rules():
+    """Get the active channel routing and friction rules (version 0 = built-in defaults)."""
+    rules = rules_engine.current()
+    return RuleSetResponse(
+        version=rules.version, rules=rules.document, comment=rules.comment, created_at=rules.created_at
+    )
+
+
+@router.put("/rules", response_model=RuleSetResponse)
+async def publish_routing_rules(update: RuleSetUpdate, db: AsyncSession = Depends(get_db)):
+    """
+    Publish a new rules version. Every worker switches to it within moments of
+    the commit, without a redeploy; to roll back, publish an older document again.
+    """
+    try:
+        row = await rules_engine.publish(db, update.rules, update.comment)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RuleSetResponse(version=row.version, rules=update.rules, comment=row.comment, created_at=row.created_at)
+
+
+@router.get("/agent-load", response_model=List[AgentGroupLoad])
+async def get_agent_load():
+    """Live load of each agent group, as routing sees it."""
+    try:
+        groups = await agent_load.load()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agent load index unavailable: {e}")
+    return [
+        AgentGroupLoad(group=group, **vars(load), estimated_wait_seconds=load.wait_seconds())
+        for group, load in sorted(groups.items())
+    ]
+
+
+@router.put("/agent-load/{group}/capacity", response_model=AgentGroupLoad)
+async def set_agent_capacity(group: str, update: AgentCapacityUpdate):
+    """
+    Set how many conversations / calls a group handles at once (agents on
+    shift x concurrent chats each). Overrides AGENT_GROUP_CAPACITY until changed again.
+    """
+    try:
+        load = await agent_load.set_capacity(group, update.capacity)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agent load index unavailable: {e}")
+    return AgentGroupLoad(group=group, **vars(load), estimated_wait_seconds=load.wait_seconds())
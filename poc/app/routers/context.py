@@ -2,52 +2,92 @@
 Context API - Update user context from mobile app.
 """
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-import redis.asyncio as redis
-import json
+from datetime import datetime
+from typing import Optional
+import asyncio
+import time
 
-from app.database import get_db, get_redis
-from app.schemas.context import ContextUpdate, FrictionSignalCreate
+from app.database import get_db
+from app.schemas.context import (
+    ContextBatchItem, ContextBatchRequest, ContextBatchResponse, ContextUpdate, FrictionSignalCreate
+)
 from app.models.incidence import FrictionSignal
+from app.config import settings
+from app.services import friction_stream, user_context
+from app.services.incidence_service import IncidenceService
+from app.services.signal_ingest import (
+    BufferFull, InvalidPayload, PayloadTooLarge, UnsupportedPayload, parse_batch, read_body, signal_buffer,
+    to_records
+)
 
 router = APIRouter(prefix="/api/v1/context", tags=["Context"])
 
 
 @router.post("/update")
-async def update_context(
-    context: ContextUpdate,
-    redis_client: redis.Redis = Depends(get_redis)
-):
+async def update_context(context: ContextUpdate):
     """
     Update user context from mobile app.
-    Stores in Redis for fast access by agents.
+    Only the fields sent are written; the others keep their last value.
+    Stored in Redis for fast access by agents.
     """
-    # Store context in Redis with 30 minute TTL
-    key = f"user_context:{context.user_id}"
-    
-    context_data = context.model_dump(exclude_none=True)
-    await redis_client.setex(key, 1800, json.dumps(context_data))  # 30 min TTL
+    fields = await user_context.update(context)
     
     return {
         "status": "updated",
         "user_id": context.user_id,
-        "ttl_seconds": 1800
+        "fields": fields,
+        "ttl_seconds": settings.CONTEXT_TTL_SECONDS
     }
 
 
+@router.post("/batch", response_model=ContextBatchResponse)
+async def get_contexts(
+    request: ContextBatchRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Contexts of many users in one call, for the agent console's list view.
+    All contexts are read in one Redis round trip; with include_open_incidence
+    each user's latest open incidence id is looked up alongside.
+    """
+    if len(request.user_ids) > settings.CONTEXT_BATCH_MAX_USERS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.CONTEXT_BATCH_MAX_USERS} users per batch")
+    if request.fields:
+        unknown = user_context.unknown_fields(request.fields)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown context fields: {', '.join(unknown)}")
+    
+    if request.include_open_incidence:
+        contexts, open_ids = await asyncio.gather(
+            user_context.read_many(request.user_ids, request.fields),
+            IncidenceService(db).get_open_ids_by_user(list(set(request.user_ids)))
+        )
+    else:
+        contexts, open_ids = await user_context.read_many(request.user_ids, request.fields), {}
+    
+    return ContextBatchResponse(contexts=[
+        ContextBatchItem(user_id=user_id, context=contexts[user_id], open_incidence_id=open_ids.get(user_id))
+        for user_id in request.user_ids
+    ])
+
+
 @router.get("/{user_id}")
 async def get_context(
     user_id: str,
-    redis_client: redis.Redis = Depends(get_redis)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to read, e.g. cart_value,current_screen")
 ):
-    """Get current user context from Redis."""
-    key = f"user_context:{user_id}"
-    data = await redis_client.get(key)
+    """Get current user context from Redis (all fields, or only those in `fields`)."""
+    names = [name.strip() for name in fields.split(",") if name.strip()] if fields else None
+    if names:
+        unknown = user_context.unknown_fields(names)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown context fields: {', '.join(unknown)}")
     
-    if data:
-        return {"user_id": user_id, "context": json.loads(data)}
-    return {"user_id": user_id, "context": None}
+    return {"user_id": user_id, "context": await user_context.read(user_id, names)}
 
 
 @router.post("/friction-signal")
@@ -57,8 +97,10 @@ async def log_friction_signal(
 ):
     """
     Log a friction signal from mobile app.
-    Used for analytics and friction score calculation.
+    Used for analytics and friction score calculation; once committed it also
+    updates the session's streaming friction score.
     """
+    received_at = time.perf_counter()
     friction_signal = FrictionSignal(
         user_id=signal.user_id,
         session_id=signal.session_id,
@@ -69,9 +111,73 @@ async def log_friction_signal(
     
     db.add(friction_signal)
     await db.flush()
+    friction_stream.record(db, [friction_stream.StreamSignal(
+        user_id=signal.user_id,
+        session_id=signal.session_id,
+        signal_type=signal.signal_type,
+        value=signal.value,
+        screen=signal.screen,
+        received_at=received_at
+    )])
     
     return {
         "status": "logged",
         "signal_type": signal.signal_type,
         "user_id": signal.user_id
     }
+
+
+@router.post("/friction-signals/batch", status_code=202)
+async def log_friction_signals(request: Request):
+    """
+    Log many friction signals in one call: {"signals": [...]} or a bare array.
+    
+    Send JSON (optionally with Content-Encoding: gzip) or msgpack
+    (Content-Type: application/msgpack). Bodies over SIGNAL_INGEST_MAX_BODY_BYTES,
+    before or after decompression, get a 413. Signals are buffered and written
+    in bulk within SIGNAL_INGEST_FLUSH_SECONDS; a 503 means the buffer is full
+    and the batch should be retried later.
+    """
+    received_at = time.perf_counter()
+    try:
+        signals = parse_batch(
+            await read_body(request.stream(), request.headers.get("content-length")),
+            request.headers.get("content-type"),
+            request.headers.get("content-encoding")
+        )
+    except UnsupportedPayload as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except PayloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidPayload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    if len(signals) > settings.SIGNAL_INGEST_MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SIGNAL_INGEST_MAX_BATCH} signals per batch")
+    
+    try:
+        await signal_buffer.add(to_records(signals, datetime.utcnow()))
+    except BufferFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    
+    # Buffered rows are not committed yet; the session scores update right away
+    friction_stream.submit([
+        friction_stream.StreamSignal(
+            user_id=s.user_id,
+            session_id=s.session_id,
+            signal_type=s.signal_type,
+            value=s.value,
+            screen=s.screen,
+            received_at=received_at
+        )
+        for s in signals
+    ])
+    
+    return {"status": "accepted", "accepted": len(signals)}
+
+
+@router.get("/friction-signals/stats")
+async def get_friction_signal_ingest_stats():
+    """Bulk ingestion counters of this worker's signal buffer."""
+    return signal_buffer.stats()
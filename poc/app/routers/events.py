@@ -0,0 +1,99 @@
+"""
+Events API - Live incidence, timeline, KPI and friction events for consoles (SSE / WebSocket).
+"""
+
+import json
+from contextlib import aclosing
+from fastapi import APIRouter, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from uuid import UUID
+
+from app.config import settings
+from app.services.live_events import EVENT_TYPES, EventFilter, broadcaster, valid_cursor
+
+router = APIRouter(prefix="/api/v1/events", tags=["Events"])
+
+TYPE_PREFIXES = set(EVENT_TYPES) | {event_type.split(".")[0] for event_type in EVENT_TYPES}
+
+
+def _subscription_args(
+    types: Optional[str],
+    channel: Optional[str],
+    incidence_id: Optional[UUID],
+    user_id: Optional[str],
+    cursor: Optional[str]
+) -> EventFilter:
+    """Validate the query parameters shared by both transports."""
+    if not settings.LIVE_EVENTS_ENABLED:
+        raise HTTPException(status_code=503, detail="Live events are disabled")
+    prefixes = frozenset(t.strip() for t in (types or "").split(",") if t.strip())
+    if prefixes - TYPE_PREFIXES:
+        raise HTTPException(status_code=400, detail=f"types must be among {', '.join(sorted(TYPE_PREFIXES))}")
+    if cursor and not valid_cursor(cursor):
+        raise HTTPException(status_code=400, detail="cursor must be an event id")
+    return EventFilter(
+        types=prefixes, channel=channel, incidence_id=str(incidence_id) if incidence_id else None, user_id=user_id
+    )
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    types: Optional[str] = Query(None, description="Comma-separated types or prefixes, e.g. incidence,timeline"),
+    channel: Optional[str] = Query(None, description="CHAT | CALL"),
+    incidence_id: Optional[UUID] = None,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Resume after this event id"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events stream. EventSource reconnects with Last-Event-ID and
+    receives what it missed; a `reset` event means reload from the REST API.
+    """
+    cursor = cursor or last_event_id
+    event_filter = _subscription_args(types, channel, incidence_id, user_id, cursor)
+    
+    async def stream():
+        yield "retry: 3000\n\n"
+        async with aclosing(broadcaster.subscribe(event_filter, cursor)) as live_events:
+            async for live_event in live_events:
+                if await request.is_disconnected():
+                    break
+                if live_event.type == "heartbeat":
+                    yield ": heartbeat\n\n"
+                    continue
+                lines = f"id: {live_event.id}\n" if live_event.id else ""
+                yield f"{lines}event: {live_event.type}\ndata: {json.dumps(live_event.data)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/ws")
+async def websocket_events(
+    websocket: WebSocket,
+    types: Optional[str] = None,
+    channel: Optional[str] = None,
+    incidence_id: Optional[UUID] = None,
+    user_id: Optional[str] = None,
+    cursor: Optional[str] = None
+):
+    """WebSocket stream of {"id", "type", "data"} messages; same filters and cursor as /stream."""
+    try:
+        event_filter = _subscription_args(types, channel, incidence_id, user_id, cursor)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    await websocket.accept()
+    try:
+        async with aclosing(broadcaster.subscribe(event_filter, cursor)) as live_events:
+            async for live_event in live_events:
+                await websocket.send_json({"id": live_event.id, "type": live_event.type, "data": live_event.data})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -2,9 +2,13 @@
 Friction Detection API - Calculate friction scores.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from app.config import settings
+from app.services import friction_stream, rules_engine
 from app.services.friction_service import FrictionService
-from app.schemas.context import FrictionDetectRequest, FrictionDetectResponse
+from app.schemas.context import (
+    FrictionDetectRequest, FrictionDetectResponse, FrictionBatchRequest, FrictionBatchResponse
+)
 
 router = APIRouter(prefix="/api/v1/friction", tags=["Friction Detection"])
 
@@ -22,14 +26,71 @@ async def detect_friction(request: FrictionDetectRequest):
     return friction_service.calculate_score(request)
 
 
+@router.post("/detect/batch", response_model=FrictionBatchResponse)
+async def detect_friction_batch(request: FrictionBatchRequest):
+    """
+    Score many sessions in one call (back-office rescoring, session monitoring).
+    
+    Takes and returns columns (one list per field) and applies the same rules
+    as /detect, vectorised.
+    """
+    size = len(request.user_ids)
+    if size > settings.FRICTION_BATCH_MAX_SESSIONS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {settings.FRICTION_BATCH_MAX_SESSIONS} sessions per batch"
+        )
+    
+    result = friction_service.calculate_scores(
+        inactivity_seconds=request.inactivity_seconds or [0] * size,
+        back_nav_count=request.back_nav_count or [0] * size,
+        price_check_count=request.price_check_count or [0] * size,
+        payment_retry_count=request.payment_retry_count or [0] * size,
+        is_first_time_user=request.is_first_time_user or [False] * size,
+        event_type=request.event_type or [None] * size,
+        current_screen=request.current_screen or [None] * size
+    )
+    return {
+        "user_ids": request.user_ids,
+        "friction_scores": result["friction_score"].tolist(),
+        "should_show_help": result["should_show_help"].tolist(),
+        "help_messages": result["help_message"].tolist(),
+        "breakdown": (
+            {signal: points.tolist() for signal, points in result["breakdown"].items()}
+            if request.include_breakdown else None
+        )
+    }
+
+
+@router.get("/sessions/{session_id}")
+async def get_session_friction(session_id: str):
+    """
+    Rolling friction state of a live session: the signal counters the
+    streaming engine has accumulated and the score they give.
+    """
+    if not settings.FRICTION_STREAM_ENABLED:
+        raise HTTPException(status_code=503, detail="Friction streaming is disabled")
+    state = await friction_stream.get_session(session_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="No recent signals for this session")
+    return state
+
+
+@router.get("/stream/stats")
+async def get_stream_stats():
+    """Signals streamed and help triggers emitted by this worker, with signal-to-trigger latency."""
+    return friction_stream.stats()
+
+
 @router.get("/thresholds")
 async def get_thresholds():
-    """Get current friction detection thresholds and weights."""
+    """Get current friction detection thresholds and weights (see /api/v1/channel/rules)."""
+    rules = rules_engine.current()
     return {
-        "weights": friction_service.WEIGHTS,
-        "thresholds": friction_service.THRESHOLDS,
-        "trigger_threshold": 50,
-        "high_value_events": friction_service.HIGH_VALUE_EVENTS,
+        "version": rules.version,
+        "weights": rules.weights,
+        "thresholds": rules.thresholds,
+        "trigger_threshold": rules.help_threshold,
+        "high_value_events": sorted(rules.high_value_events.events),
         "help_messages": friction_service.HELP_MESSAGES
     }
 
@@ -40,5 +101,5 @@ async def interpret_score(score: float):
     return {
         "score": score,
         "interpretation": friction_service.get_score_interpretation(score),
-        "should_show_help": score >= 50
+        "should_show_help": score >= rules_engine.current().help_threshold
     }
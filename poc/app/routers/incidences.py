@@ -2,15 +2,16 @@
 Incidences API - CRUD operations for incidences.
 """
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from uuid import UUID
 
 from app.database import get_db
 from app.services.incidence_service import IncidenceService
 from app.schemas.incidence import (
-    IncidenceCreate, IncidenceUpdate, IncidenceResponse,
+    IncidenceCreate, IncidenceUpdate, IncidenceResponse, IncidenceChangesResponse,
     TimelineEventCreate, TimelineEventResponse
 )
 
@@ -72,6 +73,23 @@ async def create_incidence(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/changes", response_model=IncidenceChangesResponse)
+async def get_changes(
+    since: Optional[datetime] = Query(None, description="cursor from the previous call"),
+    limit: int = Query(200, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Incidences created or updated and timeline events added since `cursor`.
+    
+    Call without `since` to get a starting cursor (then load the list), and
+    pass each response's cursor back as `since`. Incidences may repeat across
+    windows when they change again; apply them by id.
+    """
+    service = IncidenceService(db)
+    return await service.get_changes(since, limit)
+
+
 @router.get("/{incidence_id}", response_model=IncidenceResponse)
 async def get_incidence(
     incidence_id: UUID,
@@ -141,11 +159,16 @@ async def get_user_incidences(
 @router.get("/", response_model=List[IncidenceResponse])
 async def get_open_incidences(
     limit: int = 50,
+    before: Optional[UUID] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    """Get all open incidences."""
+    """
+    Get the latest incidences, newest first.
+    
+    Pass the last id of a page as `before` to fetch the next page.
+    """
     service = IncidenceService(db)
-    incidences = await service.get_open_incidences(limit)
+    incidences = await service.get_open_incidences(limit, before)
     
     # Convert to dicts within async context to avoid greenlet issues
     result = []
@@ -185,6 +208,7 @@ async def get_open_incidences(
             "created_at": inc.created_at,
             "resolved_at": inc.resolved_at,
             "time_to_resolve_seconds": inc.time_to_resolve_seconds,
+            "updated_at": inc.updated_at,
             "timeline": timeline_events
         })
     
@@ -201,9 +225,9 @@ async def add_timeline_event(
     service = IncidenceService(db)
     
     # Verify incidence exists
-    incidence = await service.get_by_id(incidence_id)
+    incidence = await service.get_by_id(incidence_id, restore_archived=True)
     if not incidence:
         raise HTTPException(status_code=404, detail="Incidence not found")
     
-    timeline_event = await service.log_timeline(incidence_id, event)
+    timeline_event = await service.log_timeline(incidence.id, event)
     return timeline_event
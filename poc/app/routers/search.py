@@ -0,0 +1,49 @@
+"""
+Search API - Find past incidences by conversation content, fields or user.
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime
+
+from app.config import settings
+from app.database import get_db
+from app.services.search_service import SearchService
+from app.schemas.search import SearchResponse
+
+router = APIRouter(prefix="/api/v1/search", tags=["Search"])
+
+
+@router.get("/incidences", response_model=SearchResponse)
+async def search_incidences(
+    q: Optional[str] = Query(None, max_length=200, description="Text to find, web-search syntax"),
+    user: Optional[str] = Query(None, min_length=3, description="Part of a user id or phone"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    include_archived: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=settings.SEARCH_MAX_CANDIDATES),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Search live and archived incidences by timeline content, key fields
+    (category, root cause, call notes, order id...) and/or partial user
+    id / phone.
+    
+    Results are ranked by relevance; page with `offset`.
+    """
+    if not q and not user:
+        raise HTTPException(status_code=400, detail="Provide q and/or user")
+    
+    service = SearchService(db)
+    found = await service.search(
+        query=q,
+        user=user,
+        since=since,
+        until=until,
+        include_archived=include_archived,
+        limit=limit,
+        offset=offset
+    )
+    return {**found, "limit": limit, "offset": offset}
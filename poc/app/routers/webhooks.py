@@ -196,7 +196,7 @@ async def handle_message_create(payload: dict, service: IncidenceService):
             print(f"🔗 Found incidence_id from frontend: {incidence_id_str}")
             try:
                 from uuid import UUID
-                incidence = await service.get_by_id(UUID(incidence_id_str))
+                incidence = await service.get_by_id(UUID(incidence_id_str), restore_archived=True)
                 if incidence:
                     # Link the conversation to this incidence
                     incidence.conversation_id = conversation_id
@@ -0,0 +1,55 @@
+"""
+Background job scheduler - runs periodic maintenance jobs inside the app process.
+
+Jobs are plain coroutines registered with an interval. Every worker runs its
+own copy of each job, so jobs must be safe to run concurrently (claim rows with
+SKIP LOCKED, take an advisory lock, or be idempotent).
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List
+
+
+@dataclass
+class Job:
+    """A periodic background job."""
+    name: str
+    interval_seconds: float
+    func: Callable[[], Awaitable]
+
+
+_jobs: List[Job] = []
+_tasks: List[asyncio.Task] = []
+
+
+def register_job(name: str, interval_seconds: float, func: Callable[[], Awaitable]):
+    """Register a coroutine function to run every `interval_seconds`."""
+    _jobs.append(Job(name=name, interval_seconds=interval_seconds, func=func))
+
+
+async def _run_periodically(job: Job):
+    while True:
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Background job {job.name} failed: {e}")
+        await asyncio.sleep(job.interval_seconds)
+
+
+def start_jobs():
+    """Start all registered jobs (call from the app lifespan)."""
+    for job in _jobs:
+        _tasks.append(asyncio.create_task(_run_periodically(job), name=f"job:{job.name}"))
+    if _jobs:
+        print(f"⏰ Started background jobs: {', '.join(job.name for job in _jobs)}")
+
+
+async def stop_jobs():
+    """Cancel running jobs and wait for them to finish."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
@@ -1,8 +1,18 @@
 # Schemas package
 from app.schemas.incidence import (
-    IncidenceCreate, IncidenceUpdate, IncidenceResponse,
+    IncidenceCreate, IncidenceUpdate, IncidenceResponse, IncidenceChangesResponse,
     TimelineEventCreate, TimelineEventResponse
 )
-from app.schemas.context import ContextUpdate, FrictionSignalCreate
-from app.schemas.channel import ChannelRouteRequest, ChannelRouteResponse
-from app.schemas.analytics import KPIResponse
+from app.schemas.context import (
+    ContextUpdate, ContextBatchRequest, ContextBatchResponse, FrictionSignalCreate, FrictionSignalBatch
+)
+from app.schemas.channel import (
+    ChannelRouteRequest, ChannelRouteResponse, ChannelRouteBatchRequest, ChannelRouteBatchResponse,
+    AgentGroupLoad, AgentCapacityUpdate
+)
+from app.schemas.analytics import (
+    KPIResponse, DailyAnalytics, PercentilesResponse, TopItemsResponse, TrendResponse,
+    AnalyticsQueryResponse
+)
+from app.schemas.search import SearchResult, SearchResponse
+from app.schemas.rules import RuleSet, RuleSetUpdate, RuleSetResponse
@@ -4,7 +4,7 @@ Pydantic schemas for analytics.
 
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
-from datetime import date
+from datetime import date, datetime
 
 
 class KPIResponse(BaseModel):
@@ -19,6 +19,12 @@ class KPIResponse(BaseModel):
     total_incidences_today: int = Field(default=0, description="New incidences today")
     open_incidences: int = Field(default=0, description="Currently open incidences")
     avg_resolution_time_seconds: int = Field(default=0, description="Average resolution time")
+    resolution_time_percentiles: Dict[str, Optional[int]] = Field(
+        default={}, description="p50/p90/p99 resolution seconds of incidences resolved today"
+    )
+    first_response_percentiles: Dict[str, Optional[int]] = Field(
+        default={}, description="p50/p90/p99 seconds to the first agent response, for responses today"
+    )
     
     # Conversion
     assisted_conversion_rate: float = Field(default=0, description="Assisted to order rate")
@@ -38,9 +44,95 @@ class WeeklyReportResponse(BaseModel):
     self_serve_rate: float
     total_incidences: int
     avg_resolution_time_minutes: float
+    resolution_time_percentiles: Dict[str, Optional[int]] = {}  # p50/p90/p99 seconds
+    first_response_percentiles: Dict[str, Optional[int]] = {}  # p50/p90/p99 seconds
     
     # Top issues
     top_friction_reasons: List[Dict[str, Any]]  # Fixed: 'any' -> 'Any'
     
     # Recommendations
     product_recommendations: List[str]
+
+
+class DailyAnalytics(BaseModel):
+    """One day of analytics (a rollup, or live for today)."""
+    date: date
+    total_orders: int = 0
+    orders_without_help: int = 0
+    orders_with_help: int = 0
+    total_incidences: int = 0
+    converted_count: int = 0
+    resolved_count: int = 0
+    avg_time_to_resolve_seconds: int = 0
+    top_issue_categories: Dict[str, int] = Field(default={}, description="Incidences per category")
+    top_friction_screens: Dict[str, int] = Field(default={}, description="Incidences per screen")
+
+
+class LatencyPercentiles(BaseModel):
+    """Percentiles of one latency metric for a group (channel, stage, day or overall)."""
+    group: Optional[str] = None
+    count: int = 0
+    p50: Optional[int] = Field(default=None, description="Seconds")
+    p90: Optional[int] = Field(default=None, description="Seconds")
+    p99: Optional[int] = Field(default=None, description="Seconds")
+
+
+class PercentilesResponse(BaseModel):
+    """Latency percentiles for a date range, merged from the daily sketches."""
+    metric: str
+    start: date
+    end: date
+    group_by: Optional[str] = None
+    groups: List[LatencyPercentiles]
+
+
+class HeavyHitter(BaseModel):
+    """One top item; its true count is between count - error and count."""
+    name: str
+    count: int
+    error: int = 0
+
+
+class TopItemsResponse(BaseModel):
+    """Top-K screens or categories of a window, merged from Space-Saving sketches."""
+    dimension: str
+    start: datetime
+    end: datetime
+    total: int = Field(default=0, description="Occurrences in the window")
+    max_error: int = Field(default=0, description="Largest over-count among the items")
+    items: List[HeavyHitter]
+
+
+class TrendPoint(BaseModel):
+    """One point of a series: the bucket start, the metric and its sample size."""
+    t: datetime
+    value: Optional[float] = None
+    samples: int = 0
+
+
+class TrendSeries(BaseModel):
+    group: Optional[str] = None
+    points: List[TrendPoint]
+
+
+class TrendResponse(BaseModel):
+    """Gap-filled time series; `step_seconds` is the point width after downsampling."""
+    source: str
+    metric: str
+    bucket: str
+    step_seconds: int
+    start: datetime
+    end: datetime
+    group_by: Optional[str] = None
+    series: List[TrendSeries]
+
+
+class AnalyticsQueryResponse(BaseModel):
+    """Result of a named report run on the analytics store (DuckDB over Parquet)."""
+    report: str
+    start: date
+    end: date
+    columns: List[str]
+    rows: List[List[Any]]
+    exported_at: Optional[datetime] = Field(default=None, description="Oldest export the data reflects")
+    elapsed_ms: float = 0
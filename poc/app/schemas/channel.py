@@ -2,8 +2,8 @@
 Pydantic schemas for channel routing.
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict
 from enum import Enum
 
 
@@ -28,3 +28,53 @@ class ChannelRouteResponse(BaseModel):
     help_trigger_text: Optional[str] = Field(None, description="Text to show on help trigger")
     route_to_group: Optional[str] = Field(None, description="Agent group to route to")
     reason: str = Field(..., description="Reason for routing decision")
+    estimated_wait_seconds: Optional[Dict[str, int]] = Field(
+        None, description="Estimated queue wait per allowed channel, from live agent load"
+    )
+
+
+class ChannelRouteBatchRequest(BaseModel):
+    """Columnar batch for channel routing: one entry per cart / quote."""
+    order_values: List[float] = Field(..., description="Order value in INR of each item")
+    event_types: Optional[List[Optional[str]]] = Field(None, description="Event type of each item")
+    include_reasons: bool = Field(default=False, description="Format a reason per item")
+    
+    @model_validator(mode="after")
+    def check_lengths(self) -> "ChannelRouteBatchRequest":
+        if self.event_types is not None and len(self.event_types) != len(self.order_values):
+            raise ValueError(
+                f"event_types has {len(self.event_types)} entries, order_values has {len(self.order_values)}"
+            )
+        return self
+
+
+class ChannelDecision(BaseModel):
+    """A routing outcome shared by every batch item it applies to."""
+    allowed_channels: List[str]
+    show_help_button: bool
+    priority: str
+    help_trigger_text: Optional[str] = None
+    route_to_group: Optional[str] = None
+    estimated_wait_seconds: Optional[Dict[str, int]] = None
+
+
+class ChannelRouteBatchResponse(BaseModel):
+    """Distinct decisions plus, per item in request order, the index of its decision."""
+    rules_version: int
+    decisions: List[ChannelDecision]
+    decision_index: List[int]
+    reasons: Optional[List[str]] = None
+
+
+class AgentGroupLoad(BaseModel):
+    """Live load of one agent group."""
+    group: str
+    active: int = Field(..., description="Open conversations with an agent")
+    pending_calls: int = Field(..., description="Call-backs waiting for an agent")
+    capacity: int = Field(..., description="Conversations / calls the group handles at once")
+    estimated_wait_seconds: Optional[int] = Field(None, description="For a new conversation or call-back")
+
+
+class AgentCapacityUpdate(BaseModel):
+    """Request schema for overriding a group's capacity."""
+    capacity: int = Field(..., ge=0, le=100_000)
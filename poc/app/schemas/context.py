@@ -2,9 +2,10 @@
 Pydantic schemas for user context and friction signals.
 """
 
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Optional, List, Dict
 from datetime import datetime
+from uuid import UUID
 
 
 class CartItem(BaseModel):
@@ -38,13 +39,37 @@ class ContextUpdate(BaseModel):
     payment_retry_count: Optional[int] = Field(None, description="Payment retry count")
 
 
+class ContextBatchRequest(BaseModel):
+    """Schema for reading many users' contexts at once."""
+    user_ids: List[str] = Field(..., description="User identifiers, in display order")
+    fields: Optional[List[str]] = Field(None, description="Context fields to read (default: all)")
+    include_open_incidence: bool = Field(default=False, description="Add each user's latest open incidence id")
+
+
+class ContextBatchItem(BaseModel):
+    """Context of one user; context is None once it has expired."""
+    user_id: str
+    context: Optional[dict] = None
+    open_incidence_id: Optional[UUID] = None
+
+
+class ContextBatchResponse(BaseModel):
+    """Contexts in request order."""
+    contexts: List[ContextBatchItem]
+
+
 class FrictionSignalCreate(BaseModel):
     """Schema for logging a friction signal."""
-    user_id: str = Field(..., description="User identifier")
-    session_id: str = Field(..., description="Session identifier")
-    signal_type: str = Field(..., description="Type of friction signal")
-    value: Optional[float] = Field(None, description="Signal value")
-    screen: Optional[str] = Field(None, description="Current screen")
+    user_id: str = Field(..., max_length=255, description="User identifier")
+    session_id: str = Field(..., max_length=255, description="Session identifier")
+    signal_type: str = Field(..., max_length=50, description="Type of friction signal")
+    value: Optional[float] = Field(None, gt=-1e8, lt=1e8, description="Signal value")
+    screen: Optional[str] = Field(None, max_length=100, description="Current screen")
+
+
+class FrictionSignalBatch(BaseModel):
+    """Schema for bulk friction signal ingestion."""
+    signals: List[FrictionSignalCreate] = Field(..., description="Signals, oldest first")
 
 
 class FrictionDetectRequest(BaseModel):
@@ -70,3 +95,45 @@ class FrictionDetectResponse(BaseModel):
     should_show_help: bool = Field(..., description="Whether to show help prompt")
     help_message: Optional[str] = Field(None, description="Suggested help message")
     breakdown: dict = Field(..., description="Score breakdown by signal")
+
+
+# A behaviour counter of the columnar batch; bounded so every column fits the int64 arrays it is scored in
+BatchCounter = Annotated[int, Field(ge=0, le=2_147_483_647)]
+
+
+class FrictionBatchRequest(BaseModel):
+    """
+    Columnar batch for friction scoring: one list per field, one entry per
+    session. Omitted columns take the FrictionDetectRequest defaults.
+    """
+    user_ids: List[str] = Field(..., description="User identifier of each session")
+    
+    inactivity_seconds: Optional[List[BatchCounter]] = None
+    back_nav_count: Optional[List[BatchCounter]] = None
+    price_check_count: Optional[List[BatchCounter]] = None
+    payment_retry_count: Optional[List[BatchCounter]] = None
+    
+    is_first_time_user: Optional[List[bool]] = None
+    event_type: Optional[List[Optional[str]]] = None
+    current_screen: Optional[List[Optional[str]]] = None
+    
+    include_breakdown: bool = Field(default=True, description="Return per-signal points")
+    
+    @model_validator(mode="after")
+    def check_lengths(self) -> "FrictionBatchRequest":
+        size = len(self.user_ids)
+        for name in ("inactivity_seconds", "back_nav_count", "price_check_count", "payment_retry_count",
+                     "is_first_time_user", "event_type", "current_screen"):
+            column = getattr(self, name)
+            if column is not None and len(column) != size:
+                raise ValueError(f"{name} has {len(column)} entries, user_ids has {size}")
+        return self
+
+
+class FrictionBatchResponse(BaseModel):
+    """Columnar friction scores, in request order."""
+    user_ids: List[str]
+    friction_scores: List[float]
+    should_show_help: List[bool]
+    help_messages: List[Optional[str]]
+    breakdown: Optional[Dict[str, List[int]]] = Field(None, description="Points per signal (0 = not fired)")
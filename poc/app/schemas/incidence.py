@@ -124,11 +124,22 @@ class IncidenceResponse(BaseModel):
     agent_id: Optional[str] = None
     user_phone: Optional[str] = None
     call_notes: Optional[str] = None
+    call_window_start: Optional[datetime] = None
+    call_window_end: Optional[datetime] = None
     created_at: datetime
     resolved_at: Optional[datetime]
     time_to_resolve_seconds: Optional[int]
+    updated_at: Optional[datetime] = None
     
     timeline: List[TimelineEventResponse] = []
     
     class Config:
         from_attributes = True
+
+
+class IncidenceChangesResponse(BaseModel):
+    """Incidences and timeline events changed in one window of the changes feed."""
+    incidences: List[IncidenceResponse]  # Without timelines; new events are in `events`
+    events: List[TimelineEventResponse]
+    cursor: datetime  # Pass back as `since`
+    has_more: bool  # The window was cut at `limit`; fetch again right away
@@ -0,0 +1,74 @@
+"""
+Pydantic schemas for the routing and friction rules store.
+"""
+
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, List, Dict
+from datetime import datetime
+
+
+class ChannelOutcome(BaseModel):
+    """What a routing rule grants. `reason` may use {order_value}, {min}, {max} and {event_type}."""
+    allowed_channels: List[str] = Field(default_factory=list, description="CHAT and/or CALL")
+    priority: str = Field(..., description="HIGH | NORMAL | LOW")
+    help_trigger_text: Optional[str] = None
+    route_to_group: Optional[str] = None
+    reason: str = Field(..., description="Reason template")
+
+
+class ChannelTier(ChannelOutcome):
+    """Outcome for order values from `min_order_value` up to the next tier."""
+    min_order_value: float = Field(..., ge=0, description="Inclusive lower bound in INR")
+
+
+class ChannelRules(BaseModel):
+    """Order value tiers, overridden by high-importance event types."""
+    tiers: List[ChannelTier] = Field(..., min_length=1)
+    high_importance_events: List[str] = Field(default_factory=list)
+    high_importance: ChannelOutcome
+    
+    @model_validator(mode="after")
+    def check_tiers(self):
+        bounds = [tier.min_order_value for tier in self.tiers]
+        if bounds[0] != 0:
+            raise ValueError("The first tier must start at min_order_value 0")
+        if any(low >= high for low, high in zip(bounds, bounds[1:])):
+            raise ValueError("Tiers must be sorted by strictly increasing min_order_value")
+        return self
+
+
+class FrictionRules(BaseModel):
+    """Friction score weights and the thresholds that fire them."""
+    weights: Dict[str, int]
+    thresholds: Dict[str, int]
+    high_value_events: List[str] = Field(default_factory=list)
+    help_threshold: float = Field(..., ge=0, le=100, description="Score at which help is offered")
+    
+    @model_validator(mode="after")
+    def check_keys(self):
+        weights = {"inactivity", "back_nav", "price_check", "payment_failure", "high_value_event", "first_time_user"}
+        thresholds = {"inactivity_seconds", "back_nav_count", "price_check_count", "payment_retry_count"}
+        missing = sorted((weights - self.weights.keys()) | (thresholds - self.thresholds.keys()))
+        if missing:
+            raise ValueError(f"Missing weights / thresholds: {', '.join(missing)}")
+        return self
+
+
+class RuleSet(BaseModel):
+    """The whole rules document; one version of it is active at a time."""
+    channel: ChannelRules
+    friction: FrictionRules
+
+
+class RuleSetUpdate(BaseModel):
+    """Request schema for publishing a new rules version."""
+    rules: RuleSet
+    comment: Optional[str] = Field(None, max_length=500)
+
+
+class RuleSetResponse(BaseModel):
+    """The active rules version."""
+    version: int = Field(..., description="0 = built-in defaults")
+    rules: RuleSet
+    comment: Optional[str] = None
+    created_at: Optional[datetime] = None
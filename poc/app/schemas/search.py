@@ -0,0 +1,37 @@
+"""
+Pydantic schemas for incidence search.
+"""
+
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from uuid import UUID
+
+
+class SearchResult(BaseModel):
+    """One matching incidence with its best matching timeline event."""
+    id: UUID
+    user_id: str
+    user_phone: Optional[str] = None
+    order_id: Optional[str] = None
+    conversation_id: Optional[str] = None
+    stage: str
+    channel: str
+    outcome: Optional[str] = None
+    issue_category: Optional[str] = None
+    created_at: datetime
+    resolved_at: Optional[datetime] = None
+    archived: bool = Field(default=False, description="Incidence lives in the archive tables")
+    
+    score: float = Field(default=0, description="Relevance (0 for user-only searches)")
+    event_id: Optional[UUID] = Field(None, description="Best matching timeline event")
+    event_created_at: Optional[datetime] = None
+    snippet: Optional[str] = Field(None, description="Highlighted excerpt, matches wrapped in <mark>")
+
+
+class SearchResponse(BaseModel):
+    """A page of search results, ranked by relevance."""
+    results: List[SearchResult] = []
+    limit: int
+    offset: int
+    has_more: bool = False
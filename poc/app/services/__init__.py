@@ -3,3 +3,8 @@ from app.services.incidence_service import IncidenceService
 from app.services.channel_router import ChannelRouter
 from app.services.friction_service import FrictionService
 from app.services.analytics_service import AnalyticsService
+from app.services.archive_service import ArchiveService
+from app.services.search_service import SearchService
+from app.services.rollup_service import RollupService
+from app.services.heavy_hitters import HeavyHitterService
+from app.services.trend_service import TrendService
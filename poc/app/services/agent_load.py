@@ -0,0 +1,343 @@
+"""
+Agent Load - Live per-group agent load index in Redis, consulted by channel routing.
+
+    agent_load                hash: {group}:active, {group}:pending_calls, {group}:capacity
+    agent_load:conversations  hash: incidence_id -> group its conversation is counted in
+    agent_load:calls          hash: incidence_id -> group its pending call-back is counted in
+
+An open incidence with an agent is an active conversation of its group; an
+open CALL incidence with a phone number and no agent yet is a pending call,
+once its call window (if it asked for one) is about to open.
+Its group is the one the active rules route its cart to. IncidenceService
+records every create / update / close (so the Freshchat conversation_assignment
+and conversation_resolution webhooks and call-back requests all feed the
+index) and, after the transaction commits, moves the incidence between groups
+with one Lua script per membership hash. The membership hashes make the
+updates idempotent: a redelivered webhook or a repeated update changes no
+counter. Anything missed is repaired by the reconciliation job, which
+rebuilds the index from PostgreSQL and reports the drift.
+
+Routing stays synchronous: each worker keeps a snapshot of the `agent_load`
+hash (one HGETALL every AGENT_LOAD_REFRESH_SECONDS), so consulting it is a
+dict lookup, and the adjusted outcome of each rules outcome is memoised per
+snapshot. Capacities default to AGENT_GROUP_CAPACITY and can be overridden
+per group at runtime. Without a fresh snapshot (Redis down, index disabled)
+routing is exactly what the rules say.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker, on_commit, redis_client
+from app.models.incidence import Incidence
+from app.services import rules_engine
+from app.services.rules_engine import Outcome
+
+
+LOAD_KEY = "agent_load"
+CONVERSATIONS_KEY = "agent_load:conversations"
+CALLS_KEY = "agent_load:calls"
+PENDING_KEY = "agent_load_changes"
+DEFAULT_GROUP = "general_support"  # For incidences the rules give no group (assigned anyway)
+
+# KEYS: load hash, membership hash; ARGV: incidence id, group ("" = not counted), counter suffix
+MOVE_SCRIPT = """
+local old = redis.call('HGET', KEYS[2], ARGV[1])
+local new = ARGV[2]
+if (old or '') == new then return 0 end
+if old then redis.call('HINCRBY', KEYS[1], old .. ARGV[3], -1) end
+if new == '' then
+    redis.call('HDEL', KEYS[2], ARGV[1])
+else
+    redis.call('HSET', KEYS[2], ARGV[1], new)
+    redis.call('HINCRBY', KEYS[1], new .. ARGV[3], 1)
+end
+return 1
+"""
+
+_redis = redis_client
+_move = _redis.register_script(MOVE_SCRIPT)
+
+
+@dataclass(frozen=True)
+class GroupLoad:
+    """Load of one agent group."""
+    active: int
+    pending_calls: int
+    capacity: int
+    
+    @property
+    def queued(self) -> int:
+        return self.active + self.pending_calls
+    
+    @property
+    def has_room(self) -> bool:
+        return self.queued < self.capacity
+    
+    @property
+    def utilisation(self) -> float:
+        return self.queued / self.capacity if self.capacity > 0 else math.inf
+    
+    def wait_seconds(self) -> Optional[int]:
+        """Estimated wait of a new conversation or call-back; None when the group has no capacity."""
+        if self.capacity <= 0:
+            return None
+        ahead = self.queued - self.capacity + 1
+        return 0 if ahead <= 0 else math.ceil(ahead * settings.AGENT_AVG_HANDLE_SECONDS / self.capacity)
+
+
+@dataclass
+class LoadSnapshot:
+    """One worker's copy of the index, replaced wholesale on every refresh."""
+    groups: Dict[str, GroupLoad]
+    taken_at: float  # time.monotonic()
+    adjusted: Dict[Outcome, Tuple[Outcome, Optional[Dict[str, int]]]] = field(default_factory=dict)
+
+
+_snapshot: Optional[LoadSnapshot] = None
+
+
+def group_for(cart_value: Optional[float], event_type: Optional[str]) -> str:
+    return rules_engine.route(cart_value or 0, event_type).route_to_group or DEFAULT_GROUP
+
+
+def _memberships(incidence) -> Tuple[str, str]:
+    """(active conversation group, pending call group) of an incidence; "" where it is not counted."""
+    if incidence.outcome not in (None, "IN_PROGRESS"):
+        return "", ""
+    if incidence.agent_id:
+        return group_for(incidence.cart_value, incidence.event_type), ""
+    if incidence.channel == "CALL" and incidence.user_phone and (
+        incidence.call_window_start is None
+        or incidence.call_window_start <= datetime.utcnow() + timedelta(seconds=settings.CALL_SCHEDULE_LEAD_SECONDS)
+    ):
+        return "", group_for(incidence.cart_value, incidence.event_type)
+    return "", ""
+
+
+def record(session, incidence):
+    """Queue the incidence's current load membership on the session; applied to Redis after commit."""
+    if not settings.AGENT_LOAD_ENABLED or incidence is None:
+        return
+    on_commit(session, PENDING_KEY, _apply_safely, dict)[str(incidence.id)] = _memberships(incidence)
+
+
+async def apply_changes(changes: Dict[str, Tuple[str, str]]):
+    async with _redis.pipeline(transaction=False) as pipe:
+        for incidence_id, (active_group, call_group) in changes.items():
+            await _move(keys=[LOAD_KEY, CONVERSATIONS_KEY], args=[incidence_id, active_group, ":active"], client=pipe)
+            await _move(keys=[LOAD_KEY, CALLS_KEY], args=[incidence_id, call_group, ":pending_calls"], client=pipe)
+        await pipe.execute()
+
+
+async def calls_released(released: Dict[str, str]):
+    """Count scheduled call-backs whose window opened ({incidence_id: group}) as pending."""
+    async with _redis.pipeline(transaction=False) as pipe:
+        for incidence_id, group in released.items():
+            await _move(keys=[LOAD_KEY, CALLS_KEY], args=[incidence_id, group, ":pending_calls"], client=pipe)
+        await pipe.execute()
+
+
+async def _apply_safely(changes):
+    try:
+        await apply_changes(changes)
+    except Exception as e:
+        print(f"⚠️ Agent load update failed (reconciliation will repair it): {e}")
+
+
+# Reading ---------------------------------------------------------------------
+
+def _parse(raw: Dict[str, str]) -> Dict[str, GroupLoad]:
+    """GroupLoad per group from the `agent_load` hash, capacities defaulting to settings."""
+    counters: Dict[str, Dict[str, int]] = {
+        group: {"capacity": capacity} for group, capacity in settings.AGENT_GROUP_CAPACITY.items()
+    }
+    for name, value in raw.items():
+        group, _, counter = name.rpartition(":")
+        if group:
+            counters.setdefault(group, {})[counter] = int(value)
+    return {
+        group: GroupLoad(
+            active=max(values.get("active", 0), 0),
+            pending_calls=max(values.get("pending_calls", 0), 0),
+            capacity=values.get("capacity", 0)
+        )
+        for group, values in counters.items()
+    }
+
+
+async def load() -> Dict[str, GroupLoad]:
+    """Current load of every known group, straight from Redis."""
+    return _parse(await _redis.hgetall(LOAD_KEY))
+
+
+async def set_capacity(group: str, capacity: int) -> GroupLoad:
+    """Override a group's capacity (agents on shift x concurrent conversations each)."""
+    await _redis.hset(LOAD_KEY, f"{group}:capacity", capacity)
+    await refresh()
+    return _snapshot.groups[group]
+
+
+async def refresh() -> Dict[str, GroupLoad]:
+    """Replace this worker's snapshot with the index as it is now."""
+    global _snapshot
+    groups = await load()
+    _snapshot = LoadSnapshot(groups=groups, taken_at=time.monotonic())
+    return groups
+
+
+async def run_agent_load_refresh():
+    """Background job: keep the routing snapshot fresh."""
+    await refresh()
+
+
+def snapshot() -> Optional[Dict[str, GroupLoad]]:
+    """The groups of the routing snapshot, or None when there is no fresh one."""
+    current = _snapshot
+    if current is None or time.monotonic() - current.taken_at > settings.AGENT_LOAD_STALE_SECONDS:
+        return None
+    return current.groups
+
+
+# Routing ---------------------------------------------------------------------
+
+def _note(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _adjust(outcome: Outcome, groups: Dict[str, GroupLoad]) -> Tuple[Outcome, Optional[Dict[str, int]]]:
+    group = outcome.route_to_group
+    load = groups.get(group)
+    if load is None:
+        return outcome, None
+    
+    reason = outcome.reason
+    if not load.has_room:
+        fallbacks = [
+            name for name in settings.AGENT_GROUP_FALLBACKS.get(group, ())
+            if name in groups and groups[name].has_room
+        ]
+        if fallbacks:
+            name = min(fallbacks, key=lambda name: groups[name].utilisation)
+            reason += _note(f"; {group} is at capacity, routed to {name}")
+            group, load = name, groups[name]
+    
+    wait = load.wait_seconds()
+    channels = outcome.allowed_channels
+    if "CALL" in channels and (wait is None or wait > settings.CALL_PROMISE_SECONDS):
+        channels = tuple(channel for channel in channels if channel != "CALL")
+        reason += _note(f"; call-backs paused, {group} is at capacity")
+    
+    adjusted = replace(
+        outcome,
+        allowed_channels=channels,
+        show_help_button=bool(channels),
+        route_to_group=group,
+        reason=reason
+    )
+    waits = {channel: wait for channel in channels} if wait is not None and channels else None
+    return (outcome if adjusted == outcome else adjusted), waits
+
+
+def adjust(outcome: Outcome) -> Tuple[Outcome, Optional[Dict[str, int]]]:
+    """
+    The outcome under current agent load, plus the estimated wait in seconds
+    per allowed channel (None when unknown).
+    
+    A group without room hands over to its least-loaded fallback group that
+    has some; CALL is withdrawn when a call-back could not be made within
+    CALL_PROMISE_SECONDS. Memoised per snapshot, so this is a dict hit per request.
+    """
+    current = _snapshot
+    if (
+        current is None or outcome.route_to_group is None
+        or time.monotonic() - current.taken_at > settings.AGENT_LOAD_STALE_SECONDS
+    ):
+        return outcome, None
+    try:
+        return current.adjusted[outcome]
+    except KeyError:
+        result = current.adjusted[outcome] = _adjust(outcome, current.groups)
+        return result
+
+
+def estimated_call_wait(cart_value: Optional[float], event_type: Optional[str]) -> Optional[int]:
+    """Estimated seconds until a call-back for this cart, or None when unknown."""
+    outcome, waits = adjust(rules_engine.route(cart_value or 0, event_type))
+    if waits is None:
+        return None
+    return waits.get("CALL", waits.get("CHAT"))
+
+
+# Reconciliation --------------------------------------------------------------
+
+async def _memberships_from_db() -> Tuple[Dict[str, str], Dict[str, str]]:
+    query = select(
+        Incidence.id, Incidence.outcome, Incidence.agent_id, Incidence.channel,
+        Incidence.user_phone, Incidence.cart_value, Incidence.event_type, Incidence.call_window_start
+    ).where(Incidence.outcome == "IN_PROGRESS")
+    conversations, calls = {}, {}
+    async with async_session_maker() as session:
+        for row in await session.execute(query):
+            active_group, call_group = _memberships(row)
+            if active_group:
+                conversations[str(row.id)] = active_group
+            if call_group:
+                calls[str(row.id)] = call_group
+    return conversations, calls
+
+
+def _counts(members: Dict[str, str]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for group in members.values():
+        counts[group] = counts.get(group, 0) + 1
+    return counts
+
+
+async def run_agent_load_reconciliation() -> Dict[str, int]:
+    """
+    Rebuild the index from the open incidences and report the drift found,
+    {"{group}:{counter}": indexed - expected}. Capacity overrides are kept.
+    
+    Changes committed between the PostgreSQL read and the Redis rewrite can
+    leave a small drift behind; the next run repairs it.
+    """
+    conversations, calls = await _memberships_from_db()
+    expected: Dict[str, int] = {}
+    for suffix, members in ((":active", conversations), (":pending_calls", calls)):
+        expected.update({f"{group}{suffix}": count for group, count in _counts(members).items()})
+    
+    raw = await _redis.hgetall(LOAD_KEY)
+    actual = {name: int(value) for name, value in raw.items() if not name.endswith(":capacity")}
+    drift = {
+        name: actual.get(name, 0) - expected.get(name, 0)
+        for name in set(actual) | set(expected)
+        if actual.get(name, 0) != expected.get(name, 0)
+    }
+    
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.delete(CONVERSATIONS_KEY, CALLS_KEY)
+        if actual:
+            pipe.hdel(LOAD_KEY, *actual)
+        if expected:
+            pipe.hset(LOAD_KEY, mapping=expected)
+        if conversations:
+            pipe.hset(CONVERSATIONS_KEY, mapping=conversations)
+        if calls:
+            pipe.hset(CALLS_KEY, mapping=calls)
+        await pipe.execute()
+    if drift:
+        print(f"📐 Agent load index drifted, rebuilt: {drift}")
+    await refresh()
+    return drift
+
+
+if __name__ == "__main__":
+    print(asyncio.run(run_agent_load_reconciliation()))
@@ -0,0 +1,136 @@
+"""
+Aggregation layer - Declarative metrics and dimensions pushed down to SQL.
+
+A report is declared as a list of Metrics (aggregate expressions such as
+COUNT(*) FILTER (WHERE ...) or AVG(...)) and Dimensions (columns to break
+the metrics down by). `aggregate()` answers all of it with a single query
+using GROUPING SETS, so the database scans the rows once and only the
+aggregates travel back:
+
+    SELECT GROUPING(app_screen, issue_category), app_screen, issue_category,
+           count(*), count(*) FILTER (WHERE outcome = 'CONVERTED'), ...
+    FROM incidences WHERE created_at >= :start
+    GROUP BY GROUPING SETS ((), (app_screen), (issue_category))
+
+Dimensions should be low-cardinality columns: every group of every
+dimension is returned and top-N is applied afterwards.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+
+@dataclass(frozen=True)
+class Metric:
+    """A named aggregate expression."""
+    name: str
+    expression: ColumnElement
+
+
+@dataclass(frozen=True)
+class Dimension:
+    """A column to break metrics down by, keeping the `limit` largest groups."""
+    name: str
+    column: ColumnElement
+    order_by: str  # Metric name
+    limit: Optional[int] = None
+    skip_empty: bool = True  # Drop the NULL / '' group
+
+
+@dataclass
+class AggregateResult:
+    totals: Dict[str, Any]
+    breakdowns: Dict[str, List[Dict[str, Any]]]
+
+
+def count(name: str, *conditions) -> Metric:
+    """COUNT(*), optionally FILTER (WHERE conditions)."""
+    expression = func.count()
+    if conditions:
+        expression = expression.filter(and_(*conditions))
+    return Metric(name, expression)
+
+
+def average(name: str, column, *conditions) -> Metric:
+    """AVG(column), optionally FILTER (WHERE conditions). NULL when no rows match."""
+    expression = func.avg(column)
+    if conditions:
+        expression = expression.filter(and_(*conditions))
+    return Metric(name, expression)
+
+
+def total(name: str, column, *conditions) -> Metric:
+    """SUM(column), optionally FILTER (WHERE conditions). NULL when no rows match."""
+    expression = func.sum(column)
+    if conditions:
+        expression = expression.filter(and_(*conditions))
+    return Metric(name, expression)
+
+
+async def aggregate(
+    db: AsyncSession,
+    source,
+    metrics: Sequence[Metric],
+    dimensions: Sequence[Dimension] = (),
+    where: Sequence = ()
+) -> AggregateResult:
+    """
+    Compute `metrics` over `source` (a model or table) in one query.
+    
+    Returns the overall totals plus, for every dimension, one row per group
+    ({dimension.name: value, metric.name: value, ...}) sorted by the
+    dimension's `order_by` metric, largest first.
+    """
+    metric_columns = [m.expression.label(m.name) for m in metrics]
+    dimension_columns = [d.column.label(d.name) for d in dimensions]
+    
+    query = select(*metric_columns).select_from(source).where(*where)
+    if dimensions:
+        grouping_sets = [tuple_()] + [tuple_(d.column) for d in dimensions]
+        query = (
+            select(
+                func.grouping(*[d.column for d in dimensions]).label("grouping_id"),
+                *dimension_columns,
+                *metric_columns
+            )
+            .select_from(source)
+            .where(*where)
+            .group_by(func.grouping_sets(*grouping_sets))
+        )
+    
+    rows = (await db.execute(query)).mappings().all()
+    
+    if not dimensions:
+        return AggregateResult(totals=dict(rows[0]), breakdowns={})
+    
+    # GROUPING() sets bit (n - 1 - i) when dimension i is rolled up
+    all_rolled_up = (1 << len(dimensions)) - 1
+    totals = {m.name: None for m in metrics}
+    breakdowns = {d.name: [] for d in dimensions}
+    for row in rows:
+        if row["grouping_id"] == all_rolled_up:
+            totals = {m.name: row[m.name] for m in metrics}
+            continue
+        for i, dimension in enumerate(dimensions):
+            if row["grouping_id"] == all_rolled_up ^ (1 << (len(dimensions) - 1 - i)):
+                value = row[dimension.name]
+                if dimension.skip_empty and not value:
+                    break
+                breakdowns[dimension.name].append(
+                    {dimension.name: value, **{m.name: row[m.name] for m in metrics}}
+                )
+                break
+    
+    for dimension in dimensions:
+        groups = sorted(
+            breakdowns[dimension.name],
+            key=lambda group: group[dimension.order_by] or 0,
+            reverse=True
+        )
+        breakdowns[dimension.name] = groups[:dimension.limit] if dimension.limit else groups
+    
+    return AggregateResult(totals=totals, breakdowns=breakdowns)
@@ -3,17 +3,44 @@ Analytics Service - Generates reports and KPIs.
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 from datetime import datetime, date, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from app.models.incidence import Incidence, AnalyticsDaily
-from app.schemas.analytics import KPIResponse, WeeklyReportResponse
+from app.schemas.analytics import KPIResponse, WeeklyReportResponse, PercentilesResponse
+from app.config import settings
+from app.services import kpi_counters
+from app.services.aggregation import Dimension, aggregate, average, count
+from app.services.latency_sketches import LatencySketchService
+from app.services.rollup_service import RollupService, merge_days
+
+
+# KPI definitions: add a metric or dimension here and read it from the result
+RESOLVED_WITH_TIME = Incidence.time_to_resolve_seconds > 0
+
+KPI_METRICS = [
+    count("total"),
+    count("converted", Incidence.outcome == "CONVERTED"),
+    count("resolved", Incidence.outcome == "RESOLVED"),
+    count("dropped", Incidence.outcome == "DROPPED"),
+    count("open", Incidence.outcome == "IN_PROGRESS"),
+    average("avg_resolution_seconds", Incidence.time_to_resolve_seconds, RESOLVED_WITH_TIME),
+]
+KPI_DIMENSIONS = [
+    Dimension("screen", Incidence.app_screen, order_by="total", limit=5),
+    Dimension("category", Incidence.issue_category, order_by="total", limit=5),
+]
 
 
 class AnalyticsService:
     """
     Generates analytics, reports, and KPIs for the dashboard.
+    
+    Counts, averages and top-N breakdowns are computed by PostgreSQL (see
+    app/services/aggregation.py); only aggregates are loaded. Today's KPIs
+    are read from the real-time Redis counters when they are available, and
+    date ranges combine the daily rollups with a live query for today.
+    Percentiles are merged from the daily latency sketches.
     """
     
     def __init__(self, db: AsyncSession):
@@ -22,43 +49,58 @@ class AnalyticsService:
     async def get_kpis(self) -> KPIResponse:
         """Get current KPIs for dashboard."""
         today = date.today()
-        today_start = datetime.combine(today, datetime.min.time())
-        
-        # Get today's incidences
-        today_query = select(Incidence).where(Incidence.created_at >= today_start)
-        result = await self.db.execute(today_query)
-        today_incidences = result.scalars().all()
-        
-        total_today = len(today_incidences)
-        
-        # Count by outcome
-        converted = sum(1 for i in today_incidences if i.outcome == "CONVERTED")
-        resolved = sum(1 for i in today_incidences if i.outcome == "RESOLVED")
-        dropped = sum(1 for i in today_incidences if i.outcome == "DROPPED")
-        open_count = sum(1 for i in today_incidences if i.outcome == "IN_PROGRESS")
-        
-        # Calculate average resolution time
-        resolved_incidences = [i for i in today_incidences if i.time_to_resolve_seconds]
-        avg_resolution = 0
-        if resolved_incidences:
-            avg_resolution = sum(i.time_to_resolve_seconds for i in resolved_incidences) // len(resolved_incidences)
+        percentiles = await LatencySketchService(self.db).summary(today, today)
+        
+        if settings.KPI_COUNTERS_ENABLED:
+            try:
+                live = await kpi_counters.read_day(today)
+            except Exception as e:
+                print(f"⚠️ KPI counters unavailable, using the database: {e}")
+                live = None
+            if live:
+                counters = live["counters"]
+                resolution_count = counters.get("resolution_count", 0)
+                return self._kpi_response(
+                    total_today=counters.get("total", 0),
+                    converted=counters.get("outcome:CONVERTED", 0),
+                    open_count=counters.get("outcome:IN_PROGRESS", 0),
+                    avg_resolution=(counters.get("resolution_seconds", 0) // resolution_count
+                                    if resolution_count > 0 else 0),
+                    top_screens=live["screens"],
+                    top_categories=live["categories"],
+                    percentiles=percentiles
+                )
         
-        # Get top friction screens
-        screen_counts: Dict[str, int] = {}
-        for i in today_incidences:
-            if i.app_screen:
-                screen_counts[i.app_screen] = screen_counts.get(i.app_screen, 0) + 1
-        
-        top_screens = sorted(screen_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        today_start = datetime.combine(today, datetime.min.time())
+        result = await aggregate(
+            self.db, Incidence, KPI_METRICS, KPI_DIMENSIONS,
+            where=[Incidence.created_at >= today_start]
+        )
+        totals = result.totals
         
-        # Get top issue categories
-        category_counts: Dict[str, int] = {}
-        for i in today_incidences:
-            if i.issue_category:
-                category_counts[i.issue_category] = category_counts.get(i.issue_category, 0) + 1
+        total_today = totals["total"]
+        converted = totals["converted"]
+        open_count = totals["open"]
+        avg_resolution = int(totals["avg_resolution_seconds"] or 0)
         
-        top_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_screens = [(g["screen"], g["total"]) for g in result.breakdowns["screen"]]
+        top_categories = [(g["category"], g["total"]) for g in result.breakdowns["category"]]
         
+        return self._kpi_response(
+            total_today, converted, open_count, avg_resolution, top_screens, top_categories, percentiles
+        )
+    
+    def _kpi_response(
+        self,
+        total_today: int,
+        converted: int,
+        open_count: int,
+        avg_resolution: int,
+        top_screens: List[tuple],
+        top_categories: List[tuple],
+        percentiles: Dict[str, Dict[str, Optional[int]]]
+    ) -> KPIResponse:
+        """Build the KPI payload from today's counts."""
         # Calculate rates (mock self-serve data for POC)
         self_serve_count = max(0, total_today * 3)  # Assume 3x self-serve vs assisted
         total_orders = total_today + self_serve_count
@@ -71,6 +113,8 @@ class AnalyticsService:
             total_incidences_today=total_today,
             open_incidences=open_count,
             avg_resolution_time_seconds=avg_resolution,
+            resolution_time_percentiles=percentiles["resolution"],
+            first_response_percentiles=percentiles["first_response"],
             assisted_conversion_rate=round((converted / total_today * 100) if total_today > 0 else 0, 1),
             top_friction_screens=[{s[0]: s[1]} for s in top_screens],
             top_issue_categories=[{c[0]: c[1]} for c in top_categories]
@@ -80,30 +124,20 @@ class AnalyticsService:
         """Generate weekly analytics report."""
         today = date.today()
         week_ago = today - timedelta(days=7)
-        week_start = datetime.combine(week_ago, datetime.min.time())
         
-        # Get week's incidences
-        query = select(Incidence).where(Incidence.created_at >= week_start)
-        result = await self.db.execute(query)
-        incidences = result.scalars().all()
+        days = await RollupService(self.db).get_days(week_ago, today)
+        summary = merge_days(days)
+        percentiles = await LatencySketchService(self.db).summary(week_ago, today)
+        total_incidences = summary["total_incidences"]
         
-        total_incidences = len(incidences)
-        
-        # Calculate average resolution time
-        resolved = [i for i in incidences if i.time_to_resolve_seconds]
         avg_resolution_mins = 0
-        if resolved:
-            avg_resolution_mins = sum(i.time_to_resolve_seconds for i in resolved) / len(resolved) / 60
-        
-        # Get top friction reasons
-        reason_counts: Dict[str, int] = {}
-        for i in incidences:
-            if i.issue_category:
-                reason_counts[i.issue_category] = reason_counts.get(i.issue_category, 0) + 1
+        if summary["resolved_count"]:
+            avg_resolution_mins = summary["resolution_seconds_total"] / summary["resolved_count"] / 60
         
+        categories = sorted(summary["top_issue_categories"].items(), key=lambda x: x[1], reverse=True)[:10]
         top_reasons = [
             {"category": k, "count": v, "percentage": round(v / total_incidences * 100, 1)}
-            for k, v in sorted(reason_counts.items(), key=lambda x: x[1], reverse=True)[:10]
+            for k, v in categories
         ]
         
         # Generate recommendations
@@ -115,14 +149,31 @@ class AnalyticsService:
         return WeeklyReportResponse(
             period_start=week_ago,
             period_end=today,
-            total_orders=total_incidences * 4,  # Mock: assume 4x assisted
+            total_orders=summary["total_orders"],  # Mock: assume 4x assisted (see rollups)
             self_serve_rate=self_serve_rate,
             total_incidences=total_incidences,
             avg_resolution_time_minutes=round(avg_resolution_mins, 1),
+            resolution_time_percentiles=percentiles["resolution"],
+            first_response_percentiles=percentiles["first_response"],
             top_friction_reasons=top_reasons,
             product_recommendations=recommendations
         )
     
+    async def get_daily(self, start: date, end: date) -> List[dict]:
+        """Per-day analytics for a date range (rollups + live today)."""
+        return await RollupService(self.db).get_days(start, end)
+    
+    async def get_percentiles(
+        self,
+        metric: str,
+        start: date,
+        end: date,
+        group_by: Optional[str] = None
+    ) -> PercentilesResponse:
+        """Latency percentiles for a date range, optionally per channel / stage / day."""
+        groups = await LatencySketchService(self.db).percentiles(metric, start, end, group_by)
+        return PercentilesResponse(metric=metric, start=start, end=end, group_by=group_by, groups=groups)
+    
     def _generate_recommendations(self, top_reasons: List[Dict], avg_resolution: float) -> List[str]:
         """Generate product recommendations based on data."""
         recommendations = []
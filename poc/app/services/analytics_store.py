@@ -0,0 +1,368 @@
+"""
+Analytics Store - Parquet copy of the incidence data, queried with DuckDB.
+
+Heavy reports (funnels, cohorts, multi-month trends) run on an embedded
+DuckDB engine over Parquet files instead of the PostgreSQL that serves the
+webhooks. The export job ships new and changed rows incrementally:
+
+    ANALYTICS_STORE_DIR/<table>/month=YYYY-MM/part_<run>_<i>.parquet
+
+- each run streams the rows changed since the previous run (minus
+  ANALYTICS_EXPORT_OVERLAP_SECONDS) out of PostgreSQL with COPY ... TO CSV
+  and DuckDB rewrites them as Parquet, partitioned by month
+- a changed incidence is written again in a new file; every row carries
+  `_exported_at` and the DuckDB views keep the newest version of each id,
+  so overlapping runs and half-finished compactions are harmless
+- incidences count as changed by `updated_at`, kept by triggers on every
+  write (stage, channel, agent, classification, ...), not only by creation,
+  first response or resolution
+- months with ANALYTICS_COMPACT_MIN_FILES files or more are compacted into
+  one deduplicated file
+
+Phone numbers, call notes and message content are not exported.
+
+DuckDB is an optional dependency (``pip install duckdb``); without it the
+export job and the query endpoint report that the store is unavailable.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import asyncpg
+
+from app.config import settings
+from app.migrations import asyncpg_dsn
+from app.models.ids import uuid7
+
+try:
+    import duckdb
+except ImportError:  # Optional: only needed for the analytics store
+    duckdb = None
+
+
+ADVISORY_LOCK_ID = 4_726_013  # One worker exports at a time
+STATE_FILE = "_export_state.json"
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """A table exported to Parquet: PostgreSQL sources, columns and DuckDB types."""
+    name: str
+    sources: List[str]
+    columns: Dict[str, str]  # column -> DuckDB type
+    changed_since: str  # SQL condition on $1, the previous run
+    partition_by: str  # Timestamp column the month partition is derived from
+
+
+EXPORT_TABLES = [
+    ExportTable(
+        name="incidences",
+        sources=["incidences", "incidences_archive"],
+        columns={
+            "id": "UUID", "user_id": "VARCHAR", "order_id": "VARCHAR", "conversation_id": "VARCHAR",
+            "stage": "VARCHAR", "channel": "VARCHAR", "trigger": "VARCHAR", "app_screen": "VARCHAR",
+            "cart_value": "DOUBLE", "guest_count": "INTEGER", "event_type": "VARCHAR",
+            "friction_score": "DOUBLE", "outcome": "VARCHAR", "issue_category": "VARCHAR",
+            "root_cause": "VARCHAR", "resolution_type": "VARCHAR", "order_impact": "VARCHAR",
+            "agent_id": "VARCHAR", "created_at": "TIMESTAMP", "resolved_at": "TIMESTAMP",
+            "time_to_resolve_seconds": "INTEGER", "first_response_at": "TIMESTAMP",
+        },
+        # Any write sets updated_at (migration 0013); rows changed before it need one --full run
+        changed_since="updated_at >= $1",
+        partition_by="created_at",
+    ),
+    ExportTable(
+        name="incidence_timeline",
+        sources=["incidence_timeline", "incidence_timeline_archive"],
+        columns={
+            "id": "UUID", "incidence_id": "UUID", "event_type": "VARCHAR", "actor": "VARCHAR",
+            "created_at": "TIMESTAMP",
+        },
+        changed_since="created_at >= $1",
+        partition_by="created_at",
+    ),
+    ExportTable(
+        name="friction_signals",
+        sources=["friction_signals"],
+        columns={
+            "id": "UUID", "user_id": "VARCHAR", "session_id": "VARCHAR", "signal_type": "VARCHAR",
+            "value": "DOUBLE", "screen": "VARCHAR", "created_at": "TIMESTAMP",
+        },
+        changed_since="created_at >= $1",
+        partition_by="created_at",
+    ),
+]
+
+
+# Named reports run by /api/v1/analytics/query; $start / $end bound the window
+REPORTS = {
+    "funnel": """
+        SELECT stage, channel,
+               count(*) AS created,
+               count(first_response_at) AS responded,
+               count(*) FILTER (WHERE outcome <> 'IN_PROGRESS') AS closed,
+               count(*) FILTER (WHERE outcome = 'CONVERTED') AS converted,
+               round(100.0 * count(*) FILTER (WHERE outcome = 'CONVERTED') / count(*), 1) AS conversion_rate
+        FROM incidences
+        WHERE created_at >= $start AND created_at < $end
+        GROUP BY ALL
+        ORDER BY created DESC
+    """,
+    "cohorts": """
+        WITH firsts AS (
+            SELECT user_id, date_trunc('month', min(created_at)) AS cohort
+            FROM incidences GROUP BY user_id
+        ), activity AS (
+            SELECT DISTINCT user_id, date_trunc('month', created_at) AS month FROM incidences
+        )
+        SELECT cohort, datediff('month', cohort, month) AS months_since_first, count(*) AS users
+        FROM firsts JOIN activity USING (user_id)
+        WHERE cohort >= $start AND cohort < $end
+        GROUP BY ALL
+        ORDER BY ALL
+    """,
+    "monthly_trends": """
+        SELECT date_trunc('month', created_at) AS month,
+               count(*) AS incidences,
+               round(avg(friction_score), 2) AS avg_friction,
+               round(100.0 * count(*) FILTER (WHERE outcome = 'CONVERTED') / count(*), 1) AS conversion_rate,
+               quantile_cont(time_to_resolve_seconds, 0.5) AS p50_resolution_seconds,
+               quantile_cont(time_to_resolve_seconds, 0.9) AS p90_resolution_seconds
+        FROM incidences
+        WHERE created_at >= $start AND created_at < $end
+        GROUP BY ALL
+        ORDER BY month
+    """,
+    "screen_friction": """
+        SELECT screen, signals, sessions, coalesce(incidences, 0) AS incidences,
+               round(coalesce(incidences, 0) / sessions, 3) AS incidences_per_session
+        FROM (
+            SELECT screen, count(*) AS signals, count(DISTINCT session_id) AS sessions
+            FROM friction_signals
+            WHERE created_at >= $start AND created_at < $end
+            GROUP BY screen
+        ) AS s
+        LEFT JOIN (
+            SELECT app_screen AS screen, count(*) AS incidences
+            FROM incidences
+            WHERE created_at >= $start AND created_at < $end
+            GROUP BY app_screen
+        ) AS i USING (screen)
+        ORDER BY signals DESC
+        LIMIT 50
+    """,
+    "conversation_depth": """
+        SELECT i.channel, i.outcome, count(*) AS incidences,
+               round(avg(t.user_events), 1) AS avg_user_events,
+               round(avg(t.agent_events), 1) AS avg_agent_events
+        FROM incidences AS i
+        JOIN (
+            SELECT incidence_id,
+                   count(*) FILTER (WHERE actor = 'USER') AS user_events,
+                   count(*) FILTER (WHERE actor = 'AGENT') AS agent_events
+            FROM incidence_timeline
+            GROUP BY incidence_id
+        ) AS t ON t.incidence_id = i.id
+        WHERE i.created_at >= $start AND i.created_at < $end
+        GROUP BY ALL
+        ORDER BY ALL
+    """,
+}
+
+
+class AnalyticsStoreUnavailable(RuntimeError):
+    """DuckDB is not installed or nothing has been exported yet."""
+
+
+def _require_duckdb():
+    if duckdb is None:
+        raise AnalyticsStoreUnavailable("duckdb is not installed (pip install duckdb)")
+
+
+def _store_dir() -> Path:
+    return Path(settings.ANALYTICS_STORE_DIR)
+
+
+def _read_state() -> Dict[str, str]:
+    path = _store_dir() / STATE_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def _write_state(state: Dict[str, str]):
+    path = _store_dir() / STATE_FILE
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, path)
+
+
+def _parquet_glob(table: str) -> str:
+    return str(_store_dir() / table / "*" / "*.parquet")
+
+
+def _connect():
+    """In-memory DuckDB with one deduplicating view per exported table."""
+    _require_duckdb()
+    con = duckdb.connect(":memory:")
+    con.execute(f"SET threads = {settings.ANALYTICS_QUERY_THREADS}")
+    for table in EXPORT_TABLES:
+        if not any((_store_dir() / table.name).glob("*/*.parquet")):
+            continue
+        con.execute(f"""
+            CREATE VIEW {table.name} AS
+            SELECT * EXCLUDE (_exported_at, month)
+            FROM read_parquet('{_parquet_glob(table.name)}', hive_partitioning = true, union_by_name = true)
+            QUALIFY row_number() OVER (PARTITION BY id ORDER BY _exported_at DESC) = 1
+        """)
+    return con
+
+
+def _write_parquet(table: ExportTable, csv_path: str, run_id: str, exported_at: datetime) -> int:
+    """Convert an exported CSV into month-partitioned Parquet files. Returns rows written."""
+    con = duckdb.connect(":memory:")
+    try:
+        columns = ", ".join(f"'{name}': '{kind}'" for name, kind in table.columns.items())
+        con.execute(f"""
+            CREATE TEMP TABLE batch AS
+            SELECT *, TIMESTAMP '{exported_at.isoformat(sep=' ')}' AS _exported_at,
+                   strftime({table.partition_by}, '%Y-%m') AS month
+            FROM read_csv('{csv_path}', header = true, columns = {{{columns}}})
+        """)
+        rows = con.execute("SELECT count(*) FROM batch").fetchone()[0]
+        if rows:
+            con.execute(f"""
+                COPY batch TO '{_store_dir() / table.name}'
+                (FORMAT PARQUET, PARTITION_BY (month), OVERWRITE_OR_IGNORE,
+                 FILENAME_PATTERN 'part_{run_id}_{{i}}')
+            """)
+        return rows
+    finally:
+        con.close()
+
+
+def _compact(table: ExportTable, run_id: str) -> List[str]:
+    """Rewrite months with many files as one deduplicated file. Returns the months compacted."""
+    compacted = []
+    for month_dir in sorted((_store_dir() / table.name).glob("month=*")):
+        files = sorted(month_dir.glob("*.parquet"))
+        if len(files) < settings.ANALYTICS_COMPACT_MIN_FILES:
+            continue
+        target = month_dir / f"compacted_{run_id}.parquet"
+        con = duckdb.connect(":memory:")
+        try:
+            con.execute(f"""
+                COPY (
+                    SELECT * FROM read_parquet({[str(f) for f in files]}, hive_partitioning = false, union_by_name = true)
+                    QUALIFY row_number() OVER (PARTITION BY id ORDER BY _exported_at DESC) = 1
+                ) TO '{target}' (FORMAT PARQUET)
+            """)
+        finally:
+            con.close()
+        # The new file duplicates the old ones until they are gone; the views dedupe
+        for f in files:
+            f.unlink()
+        compacted.append(month_dir.name)
+    return compacted
+
+
+class AnalyticsStore:
+    """Incremental Parquet export and DuckDB reports."""
+    
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    async def export_table(self, table: ExportTable, since: Optional[datetime], run_id: str) -> int:
+        """Stream rows changed since `since` (all rows when None) into Parquet."""
+        columns = ", ".join(f'"{name}"' for name in table.columns)
+        where = f" WHERE {table.changed_since}" if since else ""
+        query = " UNION ALL ".join(f"SELECT {columns} FROM {source}{where}" for source in table.sources)
+        args = [since] if since else []
+        exported_at = datetime.utcnow()
+        
+        fd, csv_path = tempfile.mkstemp(suffix=".csv", prefix=f"export_{table.name}_")
+        os.close(fd)
+        try:
+            await self.conn.copy_from_query(query, *args, output=csv_path, format="csv", header=True)
+            return await asyncio.to_thread(_write_parquet, table, csv_path, run_id, exported_at)
+        finally:
+            os.unlink(csv_path)
+    
+    async def export(self, full: bool = False) -> Dict[str, int]:
+        """Export every table since its previous run (everything with full=True)."""
+        _require_duckdb()
+        _store_dir().mkdir(parents=True, exist_ok=True)
+        state = {} if full else _read_state()
+        run_id = uuid7().hex
+        report = {}
+        for table in EXPORT_TABLES:
+            started = datetime.utcnow()
+            since = None
+            if table.name in state:
+                since = datetime.fromisoformat(state[table.name]) - timedelta(
+                    seconds=settings.ANALYTICS_EXPORT_OVERLAP_SECONDS
+                )
+            report[table.name] = await self.export_table(table, since, run_id)
+            state[table.name] = started.isoformat()
+            _write_state(state)
+            
+            compacted = await asyncio.to_thread(_compact, table, run_id)
+            if compacted:
+                print(f"🗜️ Compacted {table.name}: {', '.join(compacted)}")
+        return report
+
+
+def run_report(report: str, start: date, end: date) -> Dict[str, Any]:
+    """Run a named report on DuckDB (blocking; call through asyncio.to_thread)."""
+    con = _connect()
+    try:
+        started = time.perf_counter()
+        try:
+            result = con.execute(REPORTS[report], {
+                "start": datetime.combine(start, datetime.min.time()),
+                "end": datetime.combine(end + timedelta(days=1), datetime.min.time()),
+            })
+        except duckdb.CatalogException as e:
+            raise AnalyticsStoreUnavailable(f"analytics store has no data for this report yet: {e}")
+        columns = [column[0] for column in result.description]
+        rows = [list(row) for row in result.fetchall()]
+        state = _read_state()
+        return {
+            "report": report,
+            "start": start,
+            "end": end,
+            "columns": columns,
+            "rows": rows,
+            "exported_at": min(state.values()) if state else None,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+    finally:
+        con.close()
+
+
+async def run_export_job(full: bool = False) -> Dict[str, int]:
+    """Export to the analytics store (one worker at a time)."""
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", ADVISORY_LOCK_ID):
+            return {}  # Another worker is on it
+        try:
+            report = await AnalyticsStore(conn).export(full)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+        exported = sum(report.values())
+        if exported:
+            print(f"📦 Exported {exported} row(s) to the analytics store: {report}")
+        return report
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    import sys
+    print(asyncio.run(run_export_job(full="--full" in sys.argv)))
@@ -0,0 +1,164 @@
+"""
+Archive Service - Hot/cold split for incidences and their timelines.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from sqlalchemy.orm import selectinload
+from typing import Optional, List
+from datetime import datetime, timedelta
+from uuid import UUID
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.ids import uuid7_datetime
+from app.models.incidence import (
+    Incidence, IncidenceTimeline, ArchivedIncidence, ArchivedIncidenceTimeline
+)
+
+
+class ArchiveService:
+    """
+    Keeps the live `incidences` / `incidence_timeline` tables small.
+    
+    Incidences resolved more than ARCHIVE_AFTER_DAYS ago are moved, with their
+    timelines, into `incidences_archive` / `incidence_timeline_archive` in
+    bounded batches. Reads fall back to the archive; an archived incidence that
+    becomes active again is restored to the live tables.
+    """
+    
+    INCIDENCE_COLUMNS = [c.name for c in Incidence.__table__.columns]
+    TIMELINE_COLUMNS = [c.name for c in IncidenceTimeline.__table__.columns]
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def archive_batch(self, cutoff: datetime, batch_size: int) -> int:
+        """
+        Move one batch of incidences resolved before `cutoff` to the archive.
+        
+        Rows are claimed with SKIP LOCKED, so concurrent workers never move
+        the same incidence. Returns the number of incidences moved.
+        """
+        query = (
+            select(Incidence.id)
+            .where(
+                Incidence.outcome != "IN_PROGRESS",
+                Incidence.resolved_at < cutoff
+            )
+            .order_by(Incidence.resolved_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        ids = (await self.db.execute(query)).scalars().all()
+        if not ids:
+            return 0
+        
+        await self._copy(IncidenceTimeline, ArchivedIncidenceTimeline, self.TIMELINE_COLUMNS,
+                         IncidenceTimeline.incidence_id.in_(ids))
+        await self._copy(Incidence, ArchivedIncidence, self.INCIDENCE_COLUMNS,
+                         Incidence.id.in_(ids))
+        # Timeline rows go with ON DELETE CASCADE
+        await self.db.execute(delete(Incidence).where(Incidence.id.in_(ids)))
+        
+        return len(ids)
+    
+    async def restore(self, incidence_id: UUID) -> bool:
+        """Move an archived incidence and its timeline back to the live tables."""
+        exists = await self.db.scalar(
+            select(ArchivedIncidence.id)
+            .where(ArchivedIncidence.id == incidence_id)
+            .with_for_update()
+        )
+        if not exists:
+            return False
+        
+        # The incidence's timeline partition may predate the partitions kept live
+        await self.db.execute(
+            select(func.ensure_monthly_partitions(
+                "incidence_timeline", 0, uuid7_datetime(incidence_id).date()
+            ))
+        )
+        await self._copy(ArchivedIncidence, Incidence, self.INCIDENCE_COLUMNS,
+                         ArchivedIncidence.id == incidence_id)
+        await self._copy(ArchivedIncidenceTimeline, IncidenceTimeline, self.TIMELINE_COLUMNS,
+                         ArchivedIncidenceTimeline.incidence_id == incidence_id)
+        await self.db.execute(
+            delete(ArchivedIncidenceTimeline).where(ArchivedIncidenceTimeline.incidence_id == incidence_id)
+        )
+        await self.db.execute(delete(ArchivedIncidence).where(ArchivedIncidence.id == incidence_id))
+        await self.db.flush()
+        
+        print(f"♻️ Restored archived incidence {incidence_id}")
+        return True
+    
+    async def get_by_id(self, incidence_id: UUID) -> Optional[ArchivedIncidence]:
+        """Get archived incidence by ID with timeline."""
+        query = (
+            select(ArchivedIncidence)
+            .options(selectinload(ArchivedIncidence.timeline))
+            .where(ArchivedIncidence.id == incidence_id)
+        )
+        result = await self.db.execute(query)
+        return result.scalar_one_or_none()
+    
+    async def get_id_by_conversation(self, conversation_id: str) -> Optional[UUID]:
+        """Get the id of the archived incidence for a Freshchat conversation."""
+        return await self.db.scalar(
+            select(ArchivedIncidence.id).where(ArchivedIncidence.conversation_id == conversation_id)
+        )
+    
+    async def get_by_user(self, user_id: str, limit: int = 10) -> List[ArchivedIncidence]:
+        """Get user's archived incidences, newest first."""
+        query = (
+            select(ArchivedIncidence)
+            .options(selectinload(ArchivedIncidence.timeline))
+            .where(ArchivedIncidence.user_id == user_id)
+            .order_by(ArchivedIncidence.created_at.desc())
+            .limit(limit)
+        )
+        result = await self.db.execute(query)
+        return result.scalars().all()
+    
+    async def _copy(self, source, target, columns: List[str], condition):
+        """INSERT INTO target (columns) SELECT columns FROM source WHERE condition."""
+        source_table = source.__table__
+        await self.db.execute(
+            target.__table__.insert().from_select(
+                columns,
+                select(*[source_table.c[name] for name in columns]).where(condition)
+            )
+        )
+
+
+async def run_archive_job(
+    older_than_days: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    max_batches: int = 100
+) -> int:
+    """
+    Archive incidences resolved more than `older_than_days` ago.
+    
+    Each batch runs in its own transaction so locks and WAL stay bounded.
+    Returns the total number of incidences moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days or settings.ARCHIVE_AFTER_DAYS)
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    
+    total = 0
+    for _ in range(max_batches):
+        async with async_session_maker() as session:
+            moved = await ArchiveService(session).archive_batch(cutoff, batch_size)
+            await session.commit()
+        total += moved
+        if moved < batch_size:
+            break
+    
+    if total:
+        print(f"🗄️ Archived {total} incidences resolved before {cutoff:%Y-%m-%d}")
+    return total
+
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(run_archive_job())
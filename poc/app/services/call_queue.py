@@ -0,0 +1,495 @@
+"""
+Call Queue - Pending call-backs in a Redis priority queue, claimed by agents with a lease.
+
+    calls:queue:{group}   sorted set: incidence_id -> priority score (lowest is called first)
+    calls:leases          sorted set: incidence_id -> lease expiry (epoch seconds)
+    calls:waiting         sorted set: incidence_id -> enqueued_at, queued (not leased) items only
+    calls:item:{id}       hash: the call-back (phone, cart, group, score, enqueued_at, ...)
+                          plus token / agent_id / claims while and after it is leased
+    calls:scheduled       sorted set: incidence_id -> release time, calls waiting for their window
+    calls:deadlines       sorted set: incidence_id -> SLA deadline (window end, or the promise time)
+    calls:groups          set of groups that have had a queue
+
+The score is the enqueue time minus a head start in seconds for cart value,
+friction score and a high-importance event, so a ₹60,000 wedding is called
+before a small order that came in a little earlier, and every call still
+rises as it waits without ever being rescored. Enqueue, claim, renew and
+complete are each one Lua script, O(log n) in the queue size.
+
+A claim pops the best call of a group and leases it to the agent with a
+random token. Acknowledging it (ack) first takes the lease atomically (it
+must be unexpired and the agent's own), then assigns the agent on the
+incidence and removes the call, or requeues it if that write fails.
+Renewing extends the lease, and a lease that runs out puts the call back
+with its original score. Expired leases are returned by every
+claim and by the sweep job, which also reconciles the queue with the open
+CALL incidences in PostgreSQL (adding missed ones, dropping calls that were
+resolved or picked up elsewhere).
+
+A call-back for a later window is kept in `calls:scheduled` until
+call_scheduler releases it into its queue shortly before the window opens,
+counted as waiting from the window start. Every call has an SLA deadline
+(the end of its window, or CALL_PROMISE_SECONDS after the request); calls
+still open past it are the missed-SLA count.
+
+Wait percentiles of the queued calls are read by rank from `calls:waiting`,
+one O(log n) lookup each.
+
+The scripts touch item hashes and group queues found while they run (an
+expired lease's item, the queue named in an item), which cannot be declared
+in KEYS up front. They therefore need a single Redis node (or replicas of
+one), not Redis Cluster or a key-routing proxy. Keys known to the caller are
+passed in KEYS; the others are built from QUEUE_PREFIX / ITEM_PREFIX, which
+are filled into the scripts from this module.
+"""
+
+import asyncio
+import secrets
+import time
+from string import Template
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker, redis_client
+from app.models.incidence import Incidence
+from app.services import agent_load, rules_engine
+
+
+QUEUE_PREFIX = "calls:queue:"
+ITEM_PREFIX = "calls:item:"
+LEASES_KEY = "calls:leases"
+WAITING_KEY = "calls:waiting"
+SCHEDULED_KEY = "calls:scheduled"
+DEADLINES_KEY = "calls:deadlines"
+GROUPS_KEY = "calls:groups"
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+def _lua(source: str) -> str:
+    """Fill the key prefixes into a script, so Lua and Python build key names alike."""
+    return Template(source).substitute(QUEUE_PREFIX=QUEUE_PREFIX, ITEM_PREFIX=ITEM_PREFIX)
+
+
+# Expired leases back into their queues; ARGV[1] = now. Shared by claim and the sweep.
+REQUEUE_EXPIRED = _lua("""
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(expired) do
+    local item = '${ITEM_PREFIX}' .. id
+    local f = redis.call('HMGET', item, 'group', 'score', 'enqueued_at')
+    redis.call('ZREM', KEYS[1], id)
+    if f[1] then
+        redis.call('ZADD', '${QUEUE_PREFIX}' .. f[1], f[2], id)
+        redis.call('ZADD', KEYS[2], f[3], id)
+        redis.call('HDEL', item, 'token', 'agent_id', 'lease_expires_at', 'acked_at')
+    end
+end
+return #expired
+""")
+
+# KEYS: leases, waiting, queue, item, scheduled, deadlines, groups
+# ARGV: score, enqueued_at, group, deadline, release_at ("" = queue now), field/value pairs...
+ENQUEUE_SCRIPT = _lua("""
+if redis.call('EXISTS', KEYS[4]) == 1 then return 0 end
+local id = KEYS[4]:sub(#'${ITEM_PREFIX}' + 1)
+redis.call('HSET', KEYS[4], unpack(ARGV, 6))
+redis.call('HSET', KEYS[4], 'group', ARGV[3], 'score', ARGV[1], 'enqueued_at', ARGV[2], 'deadline', ARGV[4])
+redis.call('ZADD', KEYS[6], ARGV[4], id)
+if ARGV[5] == '' then
+    redis.call('ZADD', KEYS[3], ARGV[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[2], id)
+else
+    redis.call('HSET', KEYS[4], 'release_at', ARGV[5])
+    redis.call('ZADD', KEYS[5], ARGV[5], id)
+end
+redis.call('SADD', KEYS[7], ARGV[3])
+return 1
+""")
+
+# KEYS: scheduled, waiting; ARGV: now, incidence ids. Queues the ones still scheduled
+# to be released by now (a rescheduled call keeps its id under a later score),
+# returns [id, group, ...]
+RELEASE_SCRIPT = _lua("""
+local released = {}
+local now = tonumber(ARGV[1])
+for i = 2, #ARGV do
+    local id = ARGV[i]
+    local release_at = redis.call('ZSCORE', KEYS[1], id)
+    if release_at and tonumber(release_at) <= now then
+        redis.call('ZREM', KEYS[1], id)
+        local item = '${ITEM_PREFIX}' .. id
+        local f = redis.call('HMGET', item, 'group', 'score', 'enqueued_at')
+        if f[1] then
+            redis.call('ZADD', '${QUEUE_PREFIX}' .. f[1], f[2], id)
+            redis.call('ZADD', KEYS[2], f[3], id)
+            redis.call('HDEL', item, 'release_at')
+            table.insert(released, id)
+            table.insert(released, f[1])
+        end
+    end
+end
+return released
+""")
+
+# KEYS: leases, waiting, queue; ARGV: now, lease seconds, agent_id, token
+CLAIM_SCRIPT = _lua("""
+local function requeue()
+""" + REQUEUE_EXPIRED + """
+end
+requeue()
+local top = redis.call('ZRANGE', KEYS[3], 0, 0)
+if #top == 0 then return false end
+local id = top[1]
+local item = '${ITEM_PREFIX}' .. id
+local expires = tonumber(ARGV[1]) + tonumber(ARGV[2])
+redis.call('ZREM', KEYS[3], id)
+redis.call('ZREM', KEYS[2], id)
+redis.call('ZADD', KEYS[1], expires, id)
+redis.call('HSET', item, 'token', ARGV[4], 'agent_id', ARGV[3], 'lease_expires_at', expires)
+redis.call('HINCRBY', item, 'claims', 1)
+return redis.call('HGETALL', item)
+""")
+
+# KEYS: leases, item; ARGV: token, new expiry
+RENEW_SCRIPT = _lua("""
+if redis.call('HGET', KEYS[2], 'token') ~= ARGV[1] then return 0 end
+local id = KEYS[2]:sub(#'${ITEM_PREFIX}' + 1)
+if not redis.call('ZSCORE', KEYS[1], id) then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[2], id)
+redis.call('HSET', KEYS[2], 'lease_expires_at', ARGV[2])
+return 1
+""")
+
+# KEYS: leases, item; ARGV: token, agent_id, now, new expiry. Takes an unexpired,
+# not yet acked lease of that agent for the incidence write: the call stays
+# leased (so a crash before complete() requeues it at the new expiry) and no
+# second ack can pass.
+ACK_SCRIPT = _lua("""
+local f = redis.call('HMGET', KEYS[2], 'token', 'agent_id', 'acked_at')
+if f[1] ~= ARGV[1] or f[2] ~= ARGV[2] or f[3] then return 0 end
+local id = KEYS[2]:sub(#'${ITEM_PREFIX}' + 1)
+local expires = redis.call('ZSCORE', KEYS[1], id)
+if not expires or tonumber(expires) <= tonumber(ARGV[3]) then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[4], id)
+redis.call('HSET', KEYS[2], 'acked_at', ARGV[3], 'lease_expires_at', ARGV[4])
+return 1
+""")
+
+# KEYS: leases, waiting, item; ARGV: token. Puts a leased call back into its queue.
+REQUEUE_SCRIPT = _lua("""
+local f = redis.call('HMGET', KEYS[3], 'group', 'score', 'enqueued_at', 'token')
+if not f[1] or f[4] ~= ARGV[1] then return 0 end
+local id = KEYS[3]:sub(#'${ITEM_PREFIX}' + 1)
+if redis.call('ZREM', KEYS[1], id) == 0 then return 0 end
+redis.call('ZADD', '${QUEUE_PREFIX}' .. f[1], f[2], id)
+redis.call('ZADD', KEYS[2], f[3], id)
+redis.call('HDEL', KEYS[3], 'token', 'agent_id', 'lease_expires_at', 'acked_at')
+return 1
+""")
+
+# KEYS: leases, waiting, item, scheduled, deadlines; ARGV: token ("" = remove whatever its state)
+REMOVE_SCRIPT = _lua("""
+local f = redis.call('HMGET', KEYS[3], 'group', 'token')
+if not f[1] then return 0 end
+if ARGV[1] ~= '' and f[2] ~= ARGV[1] then return 0 end
+local id = KEYS[3]:sub(#'${ITEM_PREFIX}' + 1)
+redis.call('ZREM', '${QUEUE_PREFIX}' .. f[1], id)
+redis.call('ZREM', KEYS[1], id)
+redis.call('ZREM', KEYS[2], id)
+redis.call('ZREM', KEYS[4], id)
+redis.call('ZREM', KEYS[5], id)
+redis.call('DEL', KEYS[3])
+return 1
+""")
+
+_redis = redis_client
+_requeue = _redis.register_script(REQUEUE_EXPIRED)
+_enqueue = _redis.register_script(ENQUEUE_SCRIPT)
+_release = _redis.register_script(RELEASE_SCRIPT)
+_claim = _redis.register_script(CLAIM_SCRIPT)
+_renew = _redis.register_script(RENEW_SCRIPT)
+_ack = _redis.register_script(ACK_SCRIPT)
+_requeue_lease = _redis.register_script(REQUEUE_SCRIPT)
+_remove = _redis.register_script(REMOVE_SCRIPT)
+
+
+def priority_seconds(cart_value: Optional[float], friction_score: Optional[float], event_type: Optional[str]) -> float:
+    """Head start in the queue, in seconds of waiting."""
+    head_start = min(
+        (cart_value or 0) / 1000 * settings.CALL_PRIORITY_SECONDS_PER_1000_INR,
+        settings.CALL_PRIORITY_MAX_CART_SECONDS
+    )
+    head_start += (friction_score or 0) * settings.CALL_PRIORITY_SECONDS_PER_FRICTION_POINT
+    if event_type and rules_engine.current().high_importance_events[event_type]:
+        head_start += settings.CALL_PRIORITY_HIGH_IMPORTANCE_SECONDS
+    return head_start
+
+
+def _item(raw: Dict[str, str]) -> dict:
+    """Decode an item hash."""
+    item = dict(raw)
+    for name in ("cart_value", "friction_score", "score", "enqueued_at", "deadline", "release_at", "lease_expires_at"):
+        if item.get(name):
+            item[name] = float(item[name])
+    item["claims"] = int(item.get("claims", 0))
+    item["event_type"] = item.get("event_type") or None
+    return item
+
+
+def epoch(at: datetime) -> float:
+    """Epoch seconds of a datetime; naive ones are UTC, as stored."""
+    return (at if at.tzinfo else at.replace(tzinfo=timezone.utc)).timestamp()
+
+
+async def enqueue(incidence, enqueued_at: Optional[float] = None) -> Optional[float]:
+    """
+    Queue the incidence's call-back, or schedule it if its call window opens
+    later. Returns when it is (or was) released to agents, or None if it is
+    already queued, scheduled or leased.
+    """
+    now = time.time()
+    if incidence.call_window_start is not None:
+        enqueued_at = epoch(incidence.call_window_start)
+        deadline = epoch(incidence.call_window_end) if incidence.call_window_end else enqueued_at
+        release_at = enqueued_at - settings.CALL_SCHEDULE_LEAD_SECONDS
+    else:
+        enqueued_at = enqueued_at or now
+        deadline = enqueued_at + settings.CALL_PROMISE_SECONDS
+        release_at = now
+    group = agent_load.group_for(incidence.cart_value, incidence.event_type)
+    score = enqueued_at - priority_seconds(incidence.cart_value, incidence.friction_score, incidence.event_type)
+    fields = {
+        "incidence_id": str(incidence.id),
+        "user_id": incidence.user_id,
+        "phone": incidence.user_phone or "",
+        "cart_value": incidence.cart_value or 0,
+        "event_type": incidence.event_type or "",
+        "friction_score": incidence.friction_score or 0,
+    }
+    args = [score, enqueued_at, group, deadline, release_at if release_at > now else ""]
+    for name, value in fields.items():
+        args += [name, value]
+    added = await _enqueue(
+        keys=[
+            LEASES_KEY, WAITING_KEY, f"{QUEUE_PREFIX}{group}", f"{ITEM_PREFIX}{incidence.id}",
+            SCHEDULED_KEY, DEADLINES_KEY, GROUPS_KEY
+        ],
+        args=args
+    )
+    return release_at if added else None
+
+
+async def scheduled_until(until: float) -> List[Tuple[str, float]]:
+    """(incidence_id, release time) of the scheduled calls released by `until`."""
+    return await _redis.zrangebyscore(SCHEDULED_KEY, "-inf", until, withscores=True)
+
+
+async def release(incidence_ids: List[str], until: Optional[float] = None) -> Dict[str, str]:
+    """
+    Move scheduled calls due by `until` (default now) into their queues;
+    {incidence_id: group} of those this call released. Calls scheduled for
+    later, e.g. rescheduled since a timer was set, are left alone.
+    """
+    if not incidence_ids:
+        return {}
+    until = time.time() if until is None else until
+    released = await _release(keys=[SCHEDULED_KEY, WAITING_KEY], args=[until, *incidence_ids])
+    return dict(zip(released[::2], released[1::2]))
+
+
+async def _best_group() -> Optional[str]:
+    """The group whose next call has the lowest score."""
+    queues = await groups()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for name in queues:
+            pipe.zrange(f"{QUEUE_PREFIX}{name}", 0, 0, withscores=True)
+        heads = await pipe.execute()
+    best = min(((head[0][1], name) for name, head in zip(queues, heads) if head), default=None)
+    return best[1] if best else None
+
+
+async def claim(group: Optional[str], agent_id: str) -> Optional[dict]:
+    """
+    Lease the highest-priority call of a group (of any group if None) to an
+    agent; None when there is nothing to call.
+    """
+    group = group or await _best_group()
+    if group is None:
+        return None
+    now = time.time()
+    raw = await _claim(
+        keys=[LEASES_KEY, WAITING_KEY, f"{QUEUE_PREFIX}{group}"],
+        args=[now, settings.CALL_LEASE_SECONDS, agent_id, secrets.token_urlsafe(16)]
+    )
+    if not raw:
+        return None
+    return _item(dict(zip(raw[::2], raw[1::2])))
+
+
+async def renew(incidence_id: str, token: str) -> Optional[float]:
+    """Extend a lease; returns the new expiry, or None if the lease was lost."""
+    expires = time.time() + settings.CALL_LEASE_SECONDS
+    renewed = await _renew(keys=[LEASES_KEY, f"{ITEM_PREFIX}{incidence_id}"], args=[token, expires])
+    return expires if renewed else None
+
+
+async def ack(incidence_id: str, token: str, agent_id: str) -> bool:
+    """
+    Take the agent's lease for acknowledging the call: False if the lease
+    expired, belongs to another token or agent, or was already acked. Follow
+    with complete() once the incidence is written, or requeue() if that fails.
+    """
+    now = time.time()
+    return bool(await _ack(
+        keys=[LEASES_KEY, f"{ITEM_PREFIX}{incidence_id}"],
+        args=[token, agent_id, now, now + settings.CALL_LEASE_SECONDS]
+    ))
+
+
+async def requeue(incidence_id: str, token: str) -> bool:
+    """Give a leased call back to its queue with its original score."""
+    return bool(await _requeue_lease(
+        keys=[LEASES_KEY, WAITING_KEY, f"{ITEM_PREFIX}{incidence_id}"], args=[token]
+    ))
+
+
+def _remove_keys(incidence_id: str) -> List[str]:
+    return [LEASES_KEY, WAITING_KEY, f"{ITEM_PREFIX}{incidence_id}", SCHEDULED_KEY, DEADLINES_KEY]
+
+
+async def complete(incidence_id: str, token: str) -> bool:
+    """Remove an acknowledged call; False if the lease was lost meanwhile."""
+    return bool(await _remove(keys=_remove_keys(incidence_id), args=[token]))
+
+
+async def discard(incidence_id: str) -> bool:
+    """Remove a call whatever its state (resolved, or picked up outside the queue)."""
+    return bool(await _remove(keys=_remove_keys(incidence_id), args=[""]))
+
+
+async def groups() -> List[str]:
+    return sorted(await _redis.smembers(GROUPS_KEY))
+
+
+async def peek(group: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """Queued (unleased) calls in the order they would be claimed, of one group or all of them."""
+    queues = [group] if group else await groups()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for name in queues:
+            pipe.zrange(f"{QUEUE_PREFIX}{name}", 0, limit - 1, withscores=True)
+        heads = await pipe.execute()
+    best = sorted(((score, member) for head in heads for member, score in head))[:limit]
+    async with _redis.pipeline(transaction=False) as pipe:
+        for _, member in best:
+            pipe.hgetall(f"{ITEM_PREFIX}{member}")
+        items = await pipe.execute()
+    return [_item(raw) for raw in items if raw]
+
+
+async def stats() -> dict:
+    """
+    Queue depth per group, leased and scheduled calls, calls past their SLA
+    deadline, and wait percentiles of the queued calls.
+    """
+    queues = await groups()
+    now = time.time()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for name in queues:
+            pipe.zcard(f"{QUEUE_PREFIX}{name}")
+        pipe.zcard(LEASES_KEY)
+        pipe.zcard(SCHEDULED_KEY)
+        pipe.zcount(DEADLINES_KEY, "-inf", now)
+        pipe.zcard(WAITING_KEY)
+        *depths, leased, scheduled, missed_sla, waiting = await pipe.execute()
+    
+    # calls:waiting is ordered oldest first, so the q-quantile wait is at rank (1 - q) * (n - 1)
+    ranks = [round((1 - q) * (waiting - 1)) for q in PERCENTILES] if waiting else []
+    async with _redis.pipeline(transaction=False) as pipe:
+        for rank in ranks:
+            pipe.zrange(WAITING_KEY, rank, rank, withscores=True)
+        found = await pipe.execute()
+    waits = {
+        f"p{round(q * 100)}": (round(now - entry[0][1]) if entry else None)
+        for q, entry in zip(PERCENTILES, found)
+    } if waiting else {f"p{round(q * 100)}": None for q in PERCENTILES}
+    return {
+        "depth": dict(zip(queues, depths)),
+        "queued": waiting,
+        "leased": leased,
+        "scheduled": scheduled,
+        "missed_sla": missed_sla,
+        "wait_seconds": waits,
+    }
+
+
+async def upcoming(hours: int) -> List[dict]:
+    """Scheduled calls released in each of the next `hours` hours (the first from now)."""
+    now = time.time()
+    bounds = [now + hour * 3600 for hour in range(hours + 1)]
+    async with _redis.pipeline(transaction=False) as pipe:
+        for start, end in zip(bounds, bounds[1:]):
+            pipe.zcount(SCHEDULED_KEY, start, f"({end}")
+        counts = await pipe.execute()
+    return [
+        {"from": datetime.fromtimestamp(start, timezone.utc).isoformat(), "calls": count}
+        for start, count in zip(bounds, counts)
+    ]
+
+
+# Sweep -----------------------------------------------------------------------
+
+PENDING_CALLS = select(
+    Incidence.id, Incidence.user_id, Incidence.user_phone, Incidence.cart_value,
+    Incidence.event_type, Incidence.friction_score, Incidence.created_at,
+    Incidence.call_window_start, Incidence.call_window_end
+).where(
+    Incidence.channel == "CALL",
+    Incidence.outcome == "IN_PROGRESS",
+    Incidence.user_phone.isnot(None),
+    Incidence.agent_id.is_(None)
+)
+
+
+async def _queued_ids() -> set:
+    queues = await groups()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for name in queues:
+            pipe.zrange(f"{QUEUE_PREFIX}{name}", 0, -1)
+        pipe.zrange(LEASES_KEY, 0, -1)
+        pipe.zrange(SCHEDULED_KEY, 0, -1)
+        members = await pipe.execute()
+    return {member for found in members for member in found}
+
+
+async def run_call_queue_sweep() -> Dict[str, int]:
+    """
+    Return expired leases to their queues and reconcile the queue and the
+    schedule with the open CALL incidences: add the missing ones (queued from
+    their creation time or scheduled for their window), drop the ones no
+    longer waiting for a call.
+    """
+    requeued = await _requeue(keys=[LEASES_KEY, WAITING_KEY], args=[time.time()])
+    # Queue first: calls are queued after their commit, so a call queued after
+    # this read is never dropped for missing from the older database read
+    queued = await _queued_ids()
+    async with async_session_maker() as session:
+        rows = (await session.execute(PENDING_CALLS)).all()
+    expected = {str(row.id): row for row in rows}
+    
+    added = 0
+    for incidence_id in expected.keys() - queued:
+        row = expected[incidence_id]
+        added += await enqueue(row, enqueued_at=epoch(row.created_at)) is not None
+    dropped = 0
+    for incidence_id in queued - expected.keys():
+        dropped += await discard(incidence_id)
+    report = {"requeued": requeued, "added": added, "dropped": dropped}
+    if added or dropped:
+        print(f"📐 Call queue drifted, repaired: {report}")
+    return report
+
+
+if __name__ == "__main__":
+    print(asyncio.run(run_call_queue_sweep()))
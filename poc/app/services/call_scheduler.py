@@ -0,0 +1,91 @@
+"""
+Call Scheduler - Releases scheduled call-backs into the agent queue as their windows open.
+
+A call-back requested for a later window waits in the Redis sorted set
+`calls:scheduled` (see call_queue), scored by its release time: the window
+start minus CALL_SCHEDULE_LEAD_SECONDS. That set is shared by every worker
+and survives restarts. Each worker mirrors the next
+CALL_SCHEDULER_HORIZON_SECONDS of it into an in-process TimerWheel,
+reloading every CALL_SCHEDULER_LOAD_SECONDS (calls this worker schedules go
+in at once), so a tick costs O(1) however many calls are scheduled and Redis
+is only called when something comes due.
+
+Every worker fires the same calls; the release script moves a call from the
+schedule into its queue only if it is still scheduled and due, so exactly
+one release wins and the others are no-ops. A wheel may still hold the old
+time of a rescheduled call (other workers learn of it on their next load);
+that timer finds the call not yet due and does nothing. A worker that is down simply misses
+its ticks: the others, or its own next load, release what is overdue.
+"""
+
+import time
+from typing import Dict, List
+
+from app.config import settings
+from app.services import agent_load, call_queue
+from app.services.timer_wheel import TimerWheel
+
+
+_wheel = TimerWheel(time.time(), tick_seconds=settings.CALL_SCHEDULER_TICK_SECONDS)
+_overdue: List[str] = []  # Came due outside a tick; released on the next one
+_loaded_at = 0.0
+_released = 0
+
+
+def track(incidence_id: str, release_at: float):
+    """Put a call this worker just (re)scheduled into its wheel (if within the horizon)."""
+    _wheel.cancel(incidence_id)
+    if release_at - time.time() > settings.CALL_SCHEDULER_HORIZON_SECONDS:
+        return
+    if _wheel.schedule(incidence_id, release_at):
+        _overdue.append(incidence_id)
+
+
+async def _load(now: float) -> List[str]:
+    """Mirror the horizon from Redis; returns the calls already due."""
+    due = []
+    for incidence_id, release_at in await call_queue.scheduled_until(now + settings.CALL_SCHEDULER_HORIZON_SECONDS):
+        if _wheel.schedule(incidence_id, release_at):
+            due.append(incidence_id)
+    return due
+
+
+async def release(incidence_ids: List[str]) -> Dict[str, str]:
+    """Release due calls into their queues; {incidence_id: group} of those this worker released."""
+    global _released
+    # Wheel timers fire at the start of their tick, up to a tick before release_at
+    released = await call_queue.release(incidence_ids, time.time() + settings.CALL_SCHEDULER_TICK_SECONDS)
+    if released:
+        _released += len(released)
+        print(f"⏰ Released {len(released)} scheduled call-back(s) to the agent queue")
+        try:
+            await agent_load.calls_released(released)
+        except Exception as e:
+            print(f"⚠️ Agent load update failed (reconciliation will repair it): {e}")
+    return released
+
+
+async def run_call_scheduler_tick():
+    """Background job: advance the wheel and release whatever came due."""
+    global _loaded_at
+    now = time.time()
+    due = _wheel.advance(now)
+    if _overdue:
+        due += _overdue
+        _overdue.clear()
+    if now - _loaded_at >= settings.CALL_SCHEDULER_LOAD_SECONDS:
+        due += await _load(now)
+        _loaded_at = now
+    if due:
+        await release(due)
+
+
+async def stats() -> dict:
+    """Scheduled and missed-SLA counts, upcoming releases per hour, and this worker's wheel."""
+    queue = await call_queue.stats()
+    return {
+        "scheduled": queue["scheduled"],
+        "missed_sla": queue["missed_sla"],
+        "upcoming": await call_queue.upcoming(settings.CALL_SCHEDULE_FORECAST_HOURS),
+        "worker": {"in_wheel": len(_wheel), "released": _released},
+    }
@@ -2,9 +2,9 @@
 Channel Router Service - Routes users to appropriate support channels.
 """
 
-from typing import Optional, List
-from app.config import settings
+from typing import Optional, Sequence
 from app.schemas.channel import ChannelRouteRequest, ChannelRouteResponse
+from app.services import agent_load, rules_engine
 
 
 class ChannelRouter:
@@ -12,15 +12,16 @@ class ChannelRouter:
     Routes users to appropriate support channels based on order value and event type.
     Enforces cost boundaries to optimize support spend.
     
-    Rules:
+    Default rules (versioned and hot-reloadable, see rules_engine):
     - < ₹5,000: No human support (self-serve only)
     - ₹5,000 - ₹25,000: Chat only
     - > ₹25,000: Chat + Call
     - High-importance events: Always Chat + Call
-    """
     
-    # High importance event types that always get premium support
-    HIGH_IMPORTANCE_EVENTS = ["WEDDING", "CORPORATE", "RELIGIOUS", "GOVERNMENT"]
+    The outcome is then checked against live agent load (see agent_load): a
+    full group hands over to a fallback group with room, and CALL is withdrawn
+    when the call-back could not be kept.
+    """
     
     def get_allowed_channels(self, request: ChannelRouteRequest) -> ChannelRouteResponse:
         """
@@ -28,70 +29,53 @@ class ChannelRouter:
         
         Args:
             request: Channel routing request with order value and context
-            
+        
         Returns:
             ChannelRouteResponse with allowed channels and routing info
         """
-        order_value = request.order_value
-        event_type = request.event_type
-        
-        # Rule 1: High-importance events always get full access
-        if event_type and event_type.upper() in self.HIGH_IMPORTANCE_EVENTS:
-            return ChannelRouteResponse(
-                allowed_channels=["CHAT", "CALL"],
-                show_help_button=True,
-                priority="HIGH",
-                help_trigger_text="Talk to our catering expert",
-                route_to_group="premium_support",
-                reason=f"High-importance event type: {event_type}"
-            )
-        
-        # Rule 2: Apply order value thresholds
-        if order_value < settings.THRESHOLD_LOW:
-            # < ₹5,000: No human support
-            return ChannelRouteResponse(
-                allowed_channels=[],
-                show_help_button=False,
-                priority="LOW",
-                help_trigger_text=None,
-                route_to_group=None,
-                reason=f"Order value ₹{order_value:,.0f} below ₹{settings.THRESHOLD_LOW:,.0f} threshold"
-            )
-        
-        elif order_value < settings.THRESHOLD_HIGH:
-            # ₹5,000 - ₹25,000: Chat only
-            return ChannelRouteResponse(
-                allowed_channels=["CHAT"],
-                show_help_button=True,
-                priority="NORMAL",
-                help_trigger_text="Chat with us",
-                route_to_group="general_support",
-                reason=f"Order value ₹{order_value:,.0f} qualifies for chat support"
-            )
-        
-        else:
-            # > ₹25,000: Chat + Call
-            return ChannelRouteResponse(
-                allowed_channels=["CHAT", "CALL"],
-                show_help_button=True,
-                priority="HIGH",
-                help_trigger_text="Talk to our catering expert",
-                route_to_group="premium_support",
-                reason=f"Order value ₹{order_value:,.0f} qualifies for premium support"
-            )
+        outcome, waits = agent_load.adjust(rules_engine.route(request.order_value, request.event_type))
+        return outcome.response(request.order_value, request.event_type, waits)
     
     def should_show_help(self, order_value: float, event_type: Optional[str] = None) -> bool:
         """Quick check if help button should be shown."""
-        if event_type and event_type.upper() in self.HIGH_IMPORTANCE_EVENTS:
-            return True
-        return order_value >= settings.THRESHOLD_LOW
+        return agent_load.adjust(rules_engine.route(order_value, event_type))[0].show_help_button
     
     def get_priority(self, order_value: float, event_type: Optional[str] = None) -> str:
         """Get support priority level."""
-        if event_type and event_type.upper() in self.HIGH_IMPORTANCE_EVENTS:
-            return "HIGH"
-        if order_value >= settings.THRESHOLD_HIGH:
-            return "HIGH"
-        if order_value >= settings.THRESHOLD_LOW:
-            return "NORMAL"
-        return "LOW"
+        return rules_engine.route(order_value, event_type).priority
+    
+    def route_batch(
+        self,
+        order_values: Sequence[float],
+        event_types: Optional[Sequence[Optional[str]]] = None,
+        include_reasons: bool = False
+    ) -> dict:
+        """
+        Route many carts at once; same rules as get_allowed_channels.
+        
+        Returns one decision per outcome of the active rules (adjusted for agent
+        load once each, not per item) and one index into them per item, so
+        items share decision objects instead of each getting a response;
+        reasons (which mention the order value) are formatted per item only
+        when asked for.
+        """
+        rules = rules_engine.current()
+        index = rules.route_batch(order_values, event_types)
+        adjusted = [agent_load.adjust(outcome) for outcome in rules.outcomes]
+        reasons = None
+        if include_reasons:
+            outcomes = [outcome for outcome, _ in adjusted]
+            reasons = [
+                outcomes[i].reason.format(order_value=value, event_type=event_type)
+                for i, value, event_type in zip(
+                    index.tolist(), order_values, event_types if event_types is not None else [None] * len(index)
+                )
+            ]
+        return {
+            "rules_version": rules.version,
+            "decisions": [
+                {**outcome.decision(), "estimated_wait_seconds": waits} for outcome, waits in adjusted
+            ],
+            "decision_index": index.tolist(),
+            "reasons": reasons,
+        }
@@ -2,9 +2,12 @@
 Friction Service - Calculates friction score based on user behavior.
 """
 
-from typing import Optional
-from app.config import settings
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
 from app.schemas.context import FrictionDetectRequest, FrictionDetectResponse
+from app.services import rules_engine
 
 
 class FrictionService:
@@ -12,7 +15,7 @@ class FrictionService:
     Monitors user behavior and calculates friction score.
     Score is calculated when user initiates chat option.
     
-    Friction Weights:
+    Default weights (versioned and hot-reloadable, see rules_engine):
     - Inactivity on checkout (>60s): 30 points
     - Back navigation loops (>3): 25 points
     - Excessive price checking (>5): 20 points
@@ -21,27 +24,14 @@ class FrictionService:
     - Payment failures: 40 points
     """
     
-    # Signal weights
-    WEIGHTS = {
-        "inactivity": 30,      # Triggered when >60s inactive
-        "back_nav": 25,        # Triggered when >3 back navigations
-        "price_check": 20,     # Triggered when >5 price checks
-        "high_value_event": 15,
-        "first_time_user": 10,
-        "payment_failure": 40,
+    # Counter signals: breakdown key -> (weight key, request field, threshold key)
+    COUNTER_SIGNALS = {
+        "inactivity": ("inactivity", "inactivity_seconds", "inactivity_seconds"),
+        "back_navigation": ("back_nav", "back_nav_count", "back_nav_count"),
+        "price_checking": ("price_check", "price_check_count", "price_check_count"),
+        "payment_failure": ("payment_failure", "payment_retry_count", "payment_retry_count"),
     }
     
-    # Thresholds for triggering signals
-    THRESHOLDS = {
-        "inactivity_seconds": 60,
-        "back_nav_count": 3,
-        "price_check_count": 5,
-        "payment_retry_count": 1,
-    }
-    
-    # High-value event types
-    HIGH_VALUE_EVENTS = ["WEDDING", "CORPORATE", "RELIGIOUS", "GOVERNMENT"]
-    
     # Suggested help messages based on context
     HELP_MESSAGES = {
         "checkout": "Need help completing your order?",
@@ -58,46 +48,47 @@ class FrictionService:
         
         Args:
             request: Friction detection request with behavior signals
-            
+        
         Returns:
             FrictionDetectResponse with score, breakdown, and help recommendation
         """
+        rules = rules_engine.current()
         score = 0
         breakdown = {}
         
         # Check inactivity
-        if request.inactivity_seconds > self.THRESHOLDS["inactivity_seconds"]:
-            points = self.WEIGHTS["inactivity"]
+        if request.inactivity_seconds > rules.thresholds["inactivity_seconds"]:
+            points = rules.weights["inactivity"]
             score += points
             breakdown["inactivity"] = points
         
         # Check back navigation
-        if request.back_nav_count > self.THRESHOLDS["back_nav_count"]:
-            points = self.WEIGHTS["back_nav"]
+        if request.back_nav_count > rules.thresholds["back_nav_count"]:
+            points = rules.weights["back_nav"]
             score += points
             breakdown["back_navigation"] = points
         
         # Check price checking
-        if request.price_check_count > self.THRESHOLDS["price_check_count"]:
-            points = self.WEIGHTS["price_check"]
+        if request.price_check_count > rules.thresholds["price_check_count"]:
+            points = rules.weights["price_check"]
             score += points
             breakdown["price_checking"] = points
         
         # Check payment failures
-        if request.payment_retry_count > self.THRESHOLDS["payment_retry_count"]:
-            points = self.WEIGHTS["payment_failure"]
+        if request.payment_retry_count > rules.thresholds["payment_retry_count"]:
+            points = rules.weights["payment_failure"]
             score += points
             breakdown["payment_failure"] = points
         
         # Check high-value event
-        if request.event_type and request.event_type.upper() in self.HIGH_VALUE_EVENTS:
-            points = self.WEIGHTS["high_value_event"]
+        if request.event_type and rules.high_value_events[request.event_type]:
+            points = rules.weights["high_value_event"]
             score += points
             breakdown["high_value_event"] = points
         
         # Check first-time user
         if request.is_first_time_user:
-            points = self.WEIGHTS["first_time_user"]
+            points = rules.weights["first_time_user"]
             score += points
             breakdown["first_time_user"] = points
         
@@ -105,7 +96,7 @@ class FrictionService:
         score = min(score, 100)
         
         # Determine if help should be shown
-        should_show_help = score >= settings.FRICTION_THRESHOLD
+        should_show_help = score >= rules.help_threshold
         
         # Get appropriate help message
         help_message = self._get_help_message(request.current_screen, request.payment_retry_count)
@@ -133,6 +124,73 @@ class FrictionService:
         
         return self.HELP_MESSAGES["default"]
     
+    def calculate_scores(
+        self,
+        inactivity_seconds: Sequence[int],
+        back_nav_count: Sequence[int],
+        price_check_count: Sequence[int],
+        payment_retry_count: Sequence[int],
+        is_first_time_user: Sequence[bool],
+        event_type: Sequence[Optional[str]],
+        current_screen: Sequence[Optional[str]]
+    ) -> Dict[str, np.ndarray]:
+        """
+        Score many sessions at once; same rules as calculate_score.
+        
+        Takes one sequence (or array) per request field, all of equal length,
+        and returns arrays: `friction_score`, `should_show_help`, `help_message`
+        (object array, None when no help is shown) and `breakdown`, a dict of
+        per-signal points (0 where the signal did not fire). Free-text columns
+        are classified once per distinct value, not per session.
+        """
+        rules = rules_engine.current()
+        counters = {
+            "inactivity_seconds": inactivity_seconds,
+            "back_nav_count": back_nav_count,
+            "price_check_count": price_check_count,
+            "payment_retry_count": payment_retry_count,
+        }
+        columns = {field: np.asarray(values, dtype=np.int64) for field, values in counters.items()}
+        
+        breakdown: Dict[str, np.ndarray] = {}
+        for key, (weight, field, threshold) in self.COUNTER_SIGNALS.items():
+            fired = columns[field] > rules.thresholds[threshold]
+            breakdown[key] = fired * np.int64(rules.weights[weight])
+        
+        events, event_index = self._distinct(event_type)
+        high_value = np.array([bool(event) and rules.high_value_events[event] for event in events], dtype=bool)
+        breakdown["high_value_event"] = high_value[event_index] * np.int64(rules.weights["high_value_event"])
+        breakdown["first_time_user"] = (
+            np.asarray(is_first_time_user, dtype=bool) * np.int64(rules.weights["first_time_user"])
+        )
+        
+        score = np.minimum(sum(breakdown.values()), 100).astype(np.float64)
+        should_show_help = score >= rules.help_threshold
+        
+        # Help message: payment retries win, otherwise decided by the screen
+        screens, screen_index = self._distinct(current_screen)
+        messages = np.array(
+            [self._get_help_message(screen, 0) for screen in screens] + [self.HELP_MESSAGES["payment"]],
+            dtype=object
+        )
+        message_index = np.where(columns["payment_retry_count"] > 0, len(screens), screen_index)
+        help_message = messages[message_index]
+        help_message[~should_show_help] = None
+        
+        return {
+            "friction_score": score,
+            "should_show_help": should_show_help,
+            "help_message": help_message,
+            "breakdown": breakdown,
+        }
+    
+    @staticmethod
+    def _distinct(values: Sequence[Optional[str]]):
+        """(distinct values, index of each element's value in them); a hash pass, no sort."""
+        distinct = list(set(values))
+        position = {value: i for i, value in enumerate(distinct)}
+        return distinct, np.fromiter(map(position.__getitem__, values), dtype=np.intp, count=len(values))
+    
     def get_score_interpretation(self, score: float) -> str:
         """Get human-readable interpretation of score."""
         if score >= 80:
@@ -0,0 +1,201 @@
+"""
+Friction Stream - Rolling per-session friction scores, updated as signals arrive.
+
+Every committed friction signal updates its session's state in Redis:
+
+    friction:session:{session_id}   hash, expires FRICTION_SESSION_TTL_SECONDS after the last signal
+        user_id, screen               latest values
+        inactivity_seconds            latest reported inactivity
+        back_nav_count, price_check_count, payment_retry_count   running counts
+        score                         score after the last update
+        help_triggered_at             set while the session is at or above FRICTION_THRESHOLD
+
+Signals are applied in batches: one pipelined round trip updates and reads
+back every session of the batch, FrictionService.calculate_scores rescores
+them together (event type comes from the user's context in Redis), and a
+second round trip stores the scores and claims `help_triggered_at` with
+HSETNX. Only the claim that succeeds emits the `friction.help` live event,
+so a session triggers help once per crossing, however many workers process
+its signals; dropping back below the threshold clears the claim.
+
+Latency from receiving a signal to publishing its trigger is kept in an
+in-process QuantileSketch (microseconds) and reported by `stats()`.
+"""
+
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.database import on_commit, redis_client, run_in_background
+from app.services import live_events, user_context
+from app.services.friction_service import FrictionService
+from app.services.quantile_sketch import QuantileSketch
+
+
+PENDING_KEY = "friction_stream_signals"
+
+# signal_type -> (state field, how the signal's value updates it)
+SIGNAL_FIELDS = {
+    "inactivity": ("inactivity_seconds", "set"),
+    "back_nav": ("back_nav_count", "incr"),
+    "price_check": ("price_check_count", "incr"),
+    "payment_retry": ("payment_retry_count", "incr"),
+    "payment_failure": ("payment_retry_count", "incr"),
+}
+COUNTERS = ("inactivity_seconds", "back_nav_count", "price_check_count", "payment_retry_count")
+
+_redis = redis_client
+_scorer = FrictionService()
+
+_latency_us = QuantileSketch()
+_processed = 0
+_triggered = 0
+
+
+@dataclass
+class StreamSignal:
+    user_id: str
+    session_id: str
+    signal_type: str
+    value: Optional[float]
+    screen: Optional[str]
+    received_at: float  # time.perf_counter() when the API received it
+
+
+def session_key(session_id: str) -> str:
+    return f"friction:session:{session_id}"
+
+
+def record(session, signals: Iterable[StreamSignal]):
+    """Queue signals on the session; streamed after the transaction commits."""
+    if settings.FRICTION_STREAM_ENABLED:
+        on_commit(session, PENDING_KEY, submit).extend(signals)
+
+
+def submit(signals: List[StreamSignal]):
+    """Process signals in the background (for writers that bypass the ORM session)."""
+    if not settings.FRICTION_STREAM_ENABLED:
+        return
+    run_in_background(_process_safely(signals))
+
+
+async def _process_safely(signals):
+    try:
+        await process(signals)
+    except Exception as e:
+        print(f"⚠️ Friction stream update failed for {len(signals)} signal(s): {e}")
+
+
+async def process(signals: List[StreamSignal]) -> List[dict]:
+    """Apply signals to their sessions, rescore them and emit help triggers. Returns the triggers."""
+    global _processed, _triggered
+    
+    sessions: Dict[str, List[StreamSignal]] = defaultdict(list)
+    for signal in signals:
+        if signal.signal_type in SIGNAL_FIELDS or signal.screen:
+            sessions[signal.session_id].append(signal)
+    if not sessions:
+        return []
+    ids = list(sessions)
+    ttl = settings.FRICTION_SESSION_TTL_SECONDS
+    
+    reads = []  # Reply index of each session's HGETALL; its user's event type follows
+    async with _redis.pipeline(transaction=False) as pipe:
+        for session_id in ids:
+            key = session_key(session_id)
+            latest = sessions[session_id][-1]
+            fields = {"user_id": latest.user_id}
+            for signal in sessions[session_id]:
+                if signal.screen:
+                    fields["screen"] = signal.screen
+                field, update = SIGNAL_FIELDS.get(signal.signal_type, (None, None))
+                if update == "incr":
+                    pipe.hincrby(key, field, int(signal.value or 1))
+                elif update == "set":
+                    fields[field] = int(signal.value or 0)
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, ttl)
+            reads.append(len(pipe))
+            pipe.hgetall(key)
+            pipe.hget(user_context.key(latest.user_id), "event_type")
+        replies = await pipe.execute()
+    
+    states = [replies[i] for i in reads]
+    event_types = [replies[i + 1] for i in reads]
+    
+    scores = _scorer.calculate_scores(
+        **{field: [int(float(state.get(field) or 0)) for state in states] for field in COUNTERS},
+        is_first_time_user=[False] * len(ids),  # Not part of the app's context
+        event_type=event_types,
+        current_screen=[state.get("screen") for state in states]
+    )
+    
+    now = datetime.utcnow().isoformat()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for i, session_id in enumerate(ids):
+            key = session_key(session_id)
+            pipe.hset(key, "score", float(scores["friction_score"][i]))
+            if scores["should_show_help"][i]:
+                pipe.hsetnx(key, "help_triggered_at", now)
+            else:
+                pipe.hdel(key, "help_triggered_at")
+        replies = await pipe.execute()
+    
+    triggers = []
+    for i, session_id in enumerate(ids):
+        claimed = replies[2 * i + 1]
+        if not scores["should_show_help"][i] or not claimed:
+            continue
+        received_at = min(signal.received_at for signal in sessions[session_id])
+        triggers.append({
+            "session_id": session_id,
+            "user_id": states[i].get("user_id"),
+            "screen": states[i].get("screen"),
+            "friction_score": float(scores["friction_score"][i]),
+            "help_message": scores["help_message"][i],
+            "breakdown": {signal: int(points[i]) for signal, points in scores["breakdown"].items() if points[i]},
+            "received_at": received_at,
+        })
+    if triggers:
+        # Latency up to the publish call; the XADD round trip itself is not included
+        emitted_at = time.perf_counter()
+        for trigger in triggers:
+            latency = emitted_at - trigger.pop("received_at")
+            _latency_us.add(latency * 1_000_000)
+            trigger["latency_ms"] = round(latency * 1000, 3)
+        await live_events.publish([("friction.help", trigger) for trigger in triggers])
+    
+    _processed += len(signals)
+    _triggered += len(triggers)
+    return triggers
+
+
+async def get_session(session_id: str) -> Optional[dict]:
+    """Current rolling state of a session, or None once it has expired."""
+    state = await _redis.hgetall(session_key(session_id))
+    if not state:
+        return None
+    return {
+        "session_id": session_id,
+        "user_id": state.get("user_id"),
+        "screen": state.get("screen"),
+        **{field: int(float(state.get(field) or 0)) for field in COUNTERS},
+        "friction_score": float(state.get("score") or 0),
+        "help_triggered_at": state.get("help_triggered_at"),
+        "ttl_seconds": await _redis.ttl(session_key(session_id)),
+    }
+
+
+def stats() -> dict:
+    """Signals processed and help triggers emitted by this worker, with trigger latency."""
+    percentiles = _latency_us.percentiles()
+    return {
+        "signals_processed": _processed,
+        "help_triggers": _triggered,
+        "trigger_latency_ms": {
+            name: None if value is None else value / 1000 for name, value in percentiles.items()
+        },
+    }
@@ -0,0 +1,303 @@
+"""
+Heavy Hitters - Top-K friction screens and issue categories from Space-Saving sketches.
+
+`app_screen` and `issue_category` are free text (Freshchat tags, arbitrary
+screen names), so exact per-value counts grow with cardinality. Instead each
+dimension keeps a Space-Saving summary of at most HEAVY_HITTER_CAPACITY
+counters per hour and per day in `heavy_hitter_sketches`:
+
+    screen    incidences per app_screen, at creation
+    category  categorisation events per issue_category: each time an
+              incidence is given a category, including recategorisations
+
+Writes are recorded on the SQLAlchemy session and, after commit, added to an
+in-process sketch per (dimension, hour). The flush job merges those into the
+stored hour and day rows (SELECT ... FOR UPDATE, merge, write), so request
+handlers never contend on a shared row. A window is answered by merging day
+rows for whole days and hour rows for the partial edges; hour rows are kept
+for HEAVY_HITTER_HOUR_RETENTION_DAYS, so older windows should be whole days.
+
+Space-Saving sketches only grow, so the category left by a recategorised
+incidence keeps its count: `category` ranks how often a category is
+assigned, not how many incidences currently carry it (query
+`issue_category` for that). Backfilled days count each incidence's final
+category once.
+
+Space-Saving never under-counts: a reported count exceeds the true count by
+at most its `error`, and every error is bounded by total / capacity. Merged
+sketches keep the same guarantee (Agarwal et al., "Mergeable Summaries").
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker, on_commit
+from app.models.incidence import Incidence, ArchivedIncidence, HeavyHitterSketch
+
+
+PENDING_KEY = "heavy_hitter_changes"
+DIMENSIONS = ("screen", "category")
+
+# (dimension, hour) -> sketch of writes not yet flushed to the database
+_buffer: Dict[Tuple[str, datetime], "SpaceSaving"] = {}
+_flush_lock = asyncio.Lock()
+
+
+class SpaceSaving:
+    """
+    Space-Saving summary: at most `capacity` items with (count, error).
+    
+    When full, a new item replaces the item with the smallest count and
+    inherits that count as its error, so `count - error <= true <= count`.
+    """
+    
+    __slots__ = ("capacity", "total", "items")
+    
+    def __init__(self, capacity: int, total: int = 0, items: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.total = total
+        self.items: Dict[str, List[int]] = {name: list(value) for name, value in (items or {}).items()}
+    
+    def add(self, item: str, count: int = 1) -> "SpaceSaving":
+        self.total += count
+        if item in self.items:
+            self.items[item][0] += count
+        elif len(self.items) < self.capacity:
+            self.items[item] = [count, 0]
+        else:
+            smallest = min(self.items, key=lambda name: self.items[name][0])
+            floor = self.items.pop(smallest)[0]
+            self.items[item] = [floor + count, floor]
+        return self
+    
+    def _floor(self) -> int:
+        """Upper bound on the count of any item this sketch does not track."""
+        if len(self.items) < self.capacity:
+            return 0
+        return min(count for count, _ in self.items.values())
+    
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combine two summaries; an item missing from a full one may have up to its floor."""
+        own_floor, other_floor = self._floor(), other._floor()
+        merged: Dict[str, List[int]] = {}
+        for name in set(self.items) | set(other.items):
+            count, error = self.items.get(name, [own_floor, own_floor])
+            other_count, other_error = other.items.get(name, [other_floor, other_floor])
+            merged[name] = [count + other_count, error + other_error]
+        
+        self.capacity = max(self.capacity, other.capacity)
+        self.total += other.total
+        largest = sorted(merged.items(), key=lambda item: item[1][0], reverse=True)[:self.capacity]
+        self.items = dict(largest)
+        return self
+    
+    @property
+    def max_error(self) -> int:
+        """Largest over-count of any reported item (<= total / capacity)."""
+        return max((error for _, error in self.items.values()), default=0)
+    
+    def top(self, k: int) -> List[dict]:
+        """The k items with the largest counts: [{"name", "count", "error"}]."""
+        largest = sorted(self.items.items(), key=lambda item: item[1][0], reverse=True)[:k]
+        return [{"name": name, "count": count, "error": error} for name, (count, error) in largest]
+    
+    def to_json(self) -> dict:
+        return {"capacity": self.capacity, "total": self.total, "items": self.items}
+    
+    @classmethod
+    def from_json(cls, data: Optional[dict]) -> "SpaceSaving":
+        data = data or {}
+        return cls(data.get("capacity", settings.HEAVY_HITTER_CAPACITY), data.get("total", 0), data.get("items"))
+
+
+def _hour(at: datetime) -> datetime:
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def record(session, dimension: str, item: Optional[str], at: datetime):
+    """Queue one occurrence of `item` on the session; buffered after commit."""
+    if not settings.HEAVY_HITTERS_ENABLED or not item:
+        return
+    on_commit(session, PENDING_KEY, _buffer_items).append((dimension, item, _hour(at)))
+
+
+def _buffer_items(items: List[Tuple[str, str, datetime]]):
+    for dimension, item, hour in items:
+        sketch = _buffer.get((dimension, hour))
+        if sketch is None:
+            sketch = _buffer[(dimension, hour)] = SpaceSaving(settings.HEAVY_HITTER_CAPACITY)
+        sketch.add(item)
+
+
+class HeavyHitterService:
+    """Stores hour / day Space-Saving sketches and answers top-K over any window."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def merge_into(self, dimension: str, granularity: str, bucket_start: datetime, sketch: SpaceSaving):
+        """Merge `sketch` into a stored row, creating it if needed (row locked while merging)."""
+        await self.db.execute(
+            insert(HeavyHitterSketch)
+            .values(
+                dimension=dimension, granularity=granularity, bucket_start=bucket_start,
+                sketch=SpaceSaving(sketch.capacity).to_json()
+            )
+            .on_conflict_do_nothing()
+        )
+        row = await self.db.scalar(
+            select(HeavyHitterSketch)
+            .where(
+                HeavyHitterSketch.dimension == dimension,
+                HeavyHitterSketch.granularity == granularity,
+                HeavyHitterSketch.bucket_start == bucket_start
+            )
+            .with_for_update()
+        )
+        row.sketch = SpaceSaving.from_json(row.sketch).merge(sketch).to_json()
+        row.updated_at = datetime.utcnow()
+    
+    async def _load(self, dimension: str, granularity: str, start: datetime, end: datetime) -> SpaceSaving:
+        result = await self.db.execute(
+            select(HeavyHitterSketch.sketch).where(
+                HeavyHitterSketch.dimension == dimension,
+                HeavyHitterSketch.granularity == granularity,
+                HeavyHitterSketch.bucket_start >= start,
+                HeavyHitterSketch.bucket_start < end
+            )
+        )
+        merged = SpaceSaving(settings.HEAVY_HITTER_CAPACITY)
+        for sketch in result.scalars():
+            merged.merge(SpaceSaving.from_json(sketch))
+        return merged
+    
+    async def get_sketch(self, dimension: str, start: datetime, end: datetime) -> SpaceSaving:
+        """Merged sketch of [start, end): day rows for whole days, hour rows for the edges."""
+        start, end = _hour(start), _hour(end - timedelta(microseconds=1)) + timedelta(hours=1)
+        first_day = datetime.combine(start.date(), datetime.min.time())
+        if first_day < start:
+            first_day += timedelta(days=1)
+        last_day = datetime.combine(end.date(), datetime.min.time())
+        
+        if first_day >= last_day:
+            return await self._load(dimension, "hour", start, end)
+        sketch = await self._load(dimension, "day", first_day, last_day)
+        sketch.merge(await self._load(dimension, "hour", start, first_day))
+        sketch.merge(await self._load(dimension, "hour", last_day, end))
+        return sketch
+    
+    async def top_k(self, dimension: str, start: datetime, end: datetime, k: int = 5) -> dict:
+        """Top-k items of a window with their over-count bounds."""
+        sketch = await self.get_sketch(dimension, start, end)
+        return {
+            "dimension": dimension,
+            "start": start,
+            "end": end,
+            "total": sketch.total,
+            "max_error": sketch.max_error,
+            "items": sketch.top(k),
+        }
+
+
+async def flush_heavy_hitters() -> int:
+    """Merge the in-process sketches into their hour and day rows. Returns buckets flushed."""
+    async with _flush_lock:
+        pending = dict(_buffer)
+        _buffer.clear()
+        if not pending:
+            return 0
+        try:
+            async with async_session_maker() as session:
+                service = HeavyHitterService(session)
+                # Fixed order so concurrent workers lock the rows in the same order
+                for (dimension, hour), sketch in sorted(pending.items()):
+                    await service.merge_into(dimension, "hour", hour, sketch)
+                days: Dict[Tuple[str, datetime], SpaceSaving] = {}
+                for (dimension, hour), sketch in pending.items():
+                    day = datetime.combine(hour.date(), datetime.min.time())
+                    days.setdefault((dimension, day), SpaceSaving(sketch.capacity)).merge(sketch)
+                for (dimension, day), sketch in sorted(days.items()):
+                    await service.merge_into(dimension, "day", day, sketch)
+                await session.commit()
+        except Exception:
+            # Put the writes back for the next flush
+            for key, sketch in pending.items():
+                if key in _buffer:
+                    sketch.merge(_buffer[key])
+                _buffer[key] = sketch
+            raise
+        return len(pending)
+
+
+async def backfill_day(day: date) -> None:
+    """
+    Replace a day's sketches with ones built from the incidence tables.
+    
+    History has no write times for categories, so both dimensions are
+    attributed to the day the incidence was created. Hour rows are not
+    backfilled.
+    """
+    start = datetime.combine(day, datetime.min.time())
+    end = start + timedelta(days=1)
+    columns = {"screen": "app_screen", "category": "issue_category"}
+    async with async_session_maker() as session:
+        for dimension, column in columns.items():
+            source = union_all(*[
+                select(getattr(model, column).label("item"))
+                .where(model.created_at >= start, model.created_at < end, getattr(model, column).is_not(None))
+                for model in (Incidence, ArchivedIncidence)
+            ]).subquery()
+            counts = await session.execute(
+                select(source.c.item, func.count()).group_by(source.c.item).order_by(func.count().desc())
+            )
+            sketch = SpaceSaving(settings.HEAVY_HITTER_CAPACITY)
+            for item, n in counts:
+                sketch.add(item, n)
+            await session.execute(
+                delete(HeavyHitterSketch).where(
+                    HeavyHitterSketch.dimension == dimension,
+                    HeavyHitterSketch.granularity == "day",
+                    HeavyHitterSketch.bucket_start == start
+                )
+            )
+            session.add(HeavyHitterSketch(
+                dimension=dimension, granularity="day", bucket_start=start, sketch=sketch.to_json()
+            ))
+        await session.commit()
+
+
+async def run_heavy_hitter_flush():
+    """Flush buffered writes and drop hour rows older than HEAVY_HITTER_HOUR_RETENTION_DAYS."""
+    await flush_heavy_hitters()
+    cutoff = datetime.combine(date.today(), datetime.min.time()) - timedelta(
+        days=settings.HEAVY_HITTER_HOUR_RETENTION_DAYS
+    )
+    async with async_session_maker() as session:
+        await session.execute(
+            delete(HeavyHitterSketch).where(
+                HeavyHitterSketch.granularity == "hour",
+                HeavyHitterSketch.bucket_start < cutoff
+            )
+        )
+        await session.commit()
+
+
+if __name__ == "__main__":
+    import sys
+    
+    if len(sys.argv) > 2 and sys.argv[1] == "backfill":
+        first = date.fromisoformat(sys.argv[2])
+        last = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today() - timedelta(days=1)
+        day = first
+        while day <= last:
+            asyncio.run(backfill_day(day))
+            day += timedelta(days=1)
+        print(f"🔥 Backfilled heavy-hitter sketches for {first}..{last}")
+    else:
+        print(asyncio.run(flush_heavy_hitters()))
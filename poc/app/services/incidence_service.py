@@ -3,14 +3,33 @@ Incidence Service - Core business logic for managing support incidences.
 """
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
-from sqlalchemy.orm import selectinload
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import select, text, update
+from sqlalchemy.orm import noload, selectinload
+from typing import Dict, Optional, List, Union
+from dataclasses import replace
+from datetime import datetime, timedelta
 from uuid import UUID
 
-from app.models.incidence import Incidence, IncidenceTimeline
+from app.models.incidence import Incidence, IncidenceIdMap, IncidenceTimeline, ArchivedIncidence, ActorEnum
 from app.schemas.incidence import IncidenceCreate, IncidenceUpdate, TimelineEventCreate
+from app.services.archive_service import ArchiveService
+from app.services import agent_load, heavy_hitters, live_events, response_cache
+from app.services.kpi_counters import KpiState, record_change
+from app.services.latency_sketches import LatencySketchService
+
+
+# Updates to these fields move the real-time KPI counters
+KPI_FIELDS = {"outcome", "issue_category"}
+
+# End of a safe changes-feed window: now, or the start of the oldest write
+# transaction still in flight (its rows may yet commit with earlier timestamps)
+CHANGES_WATERMARK = text("""
+    SELECT LEAST(
+        clock_timestamp(),
+        (SELECT min(xact_start) FROM pg_stat_activity
+         WHERE datname = current_database() AND backend_xid IS NOT NULL)
+    ) AT TIME ZONE 'utc'
+""")
 
 
 class IncidenceService:
@@ -28,7 +47,7 @@ class IncidenceService:
         
         Args:
             data: Incidence creation data
-            
+        
         Returns:
             Created Incidence object with timeline loaded
         """
@@ -50,12 +69,32 @@ class IncidenceService:
         
         self.db.add(incidence)
         await self.db.flush()
+        record_change(self.db, None, KpiState.of(incidence))
+        heavy_hitters.record(self.db, "screen", incidence.app_screen, incidence.created_at)
+        response_cache.invalidate_on_commit(self.db, *response_cache.ANALYTICS_KEYS)
         
         # Return with timeline eagerly loaded to avoid greenlet issues
-        return await self.get_by_id(incidence.id)
+        incidence = await self.get_by_id(incidence.id)
+        agent_load.record(self.db, incidence)
+        live_events.publish_on_commit(self.db, "incidence.created", live_events.incidence_payload(incidence))
+        return incidence
+    
+    async def _resolve_id(self, incidence_id: UUID) -> UUID:
+        """
+        Map a pre-UUIDv7 incidence id to its current id.
+        
+        Ids issued before migration 0004 are still held by Freshchat/Freshdesk;
+        UUIDv7 ids are returned unchanged without a query.
+        """
+        if incidence_id.version == 7:
+            return incidence_id
+        
+        new_id = await self.db.scalar(
+            select(IncidenceIdMap.new_id).where(IncidenceIdMap.old_id == incidence_id)
+        )
+        return new_id or incidence_id
     
-    async def get_by_id(self, incidence_id: UUID) -> Optional[Incidence]:
-        """Get incidence by ID with timeline."""
+    async def _get_live(self, incidence_id: UUID) -> Optional[Incidence]:
         query = (
             select(Incidence)
             .options(selectinload(Incidence.timeline))
@@ -64,32 +103,97 @@ class IncidenceService:
         result = await self.db.execute(query)
         return result.scalar_one_or_none()
     
+    async def get_by_id(
+        self,
+        incidence_id: UUID,
+        restore_archived: bool = False
+    ) -> Optional[Union[Incidence, ArchivedIncidence]]:
+        """
+        Get incidence by ID with timeline.
+        
+        Falls back to the archive when the incidence is not in the live table.
+        Archived incidences are read-only; callers that are about to modify the
+        incidence pass restore_archived=True to move it back first.
+        """
+        incidence_id = await self._resolve_id(incidence_id)
+        incidence = await self._get_live(incidence_id)
+        if incidence is not None:
+            return incidence
+        
+        archive = ArchiveService(self.db)
+        if restore_archived:
+            # False also when a concurrent restore won the row lock; it is live then
+            await archive.restore(incidence_id)
+            return await self._get_live(incidence_id)
+        return await archive.get_by_id(incidence_id)
+    
     async def get_by_conversation(self, conversation_id: str) -> Optional[Incidence]:
-        """Get incidence by Freshchat conversation ID."""
+        """
+        Get incidence by Freshchat conversation ID.
+        
+        Only webhooks look incidences up by conversation, and a new event on an
+        archived conversation makes it active again, so it is restored.
+        """
         query = (
             select(Incidence)
             .options(selectinload(Incidence.timeline))
             .where(Incidence.conversation_id == conversation_id)
         )
         result = await self.db.execute(query)
-        return result.scalar_one_or_none()
+        incidence = result.scalar_one_or_none()
+        if incidence is not None:
+            return incidence
+        
+        archive = ArchiveService(self.db)
+        archived_id = await archive.get_id_by_conversation(conversation_id)
+        if archived_id is None:
+            return None
+        # A concurrent webhook may have restored it while we waited for its row
+        # lock (restore() is then False): the live row is visible to the next read
+        await archive.restore(archived_id)
+        return await self._get_live(archived_id)
     
-    async def get_by_user(self, user_id: str, limit: int = 10) -> List[Incidence]:
-        """Get user's incidence history."""
+    async def get_by_user(
+        self,
+        user_id: str,
+        limit: int = 10
+    ) -> List[Union[Incidence, ArchivedIncidence]]:
+        """Get user's incidence history, newest first, across live and archived rows."""
         query = (
             select(Incidence)
+            .options(selectinload(Incidence.timeline))
             .where(Incidence.user_id == user_id)
             .order_by(Incidence.created_at.desc())
             .limit(limit)
         )
         result = await self.db.execute(query)
-        return result.scalars().all()
+        incidences = list(result.scalars().all())
+        incidences.extend(await ArchiveService(self.db).get_by_user(user_id, limit))
+        
+        incidences.sort(key=lambda i: i.created_at, reverse=True)
+        return incidences[:limit]
+    
+    async def get_open_ids_by_user(self, user_ids: List[str]) -> Dict[str, UUID]:
+        """Id of each user's latest open incidence (users without one are left out)."""
+        if not user_ids:
+            return {}
+        query = (
+            select(Incidence.user_id, Incidence.id)
+            .where(Incidence.user_id.in_(user_ids), Incidence.outcome == "IN_PROGRESS")
+            .order_by(Incidence.user_id, Incidence.created_at.desc())
+            .distinct(Incidence.user_id)
+        )
+        result = await self.db.execute(query)
+        return {user_id: incidence_id for user_id, incidence_id in result.all()}
     
     async def update(self, incidence_id: UUID, data: IncidenceUpdate) -> Optional[Incidence]:
-        """Update incidence fields."""
+        """Update incidence fields (restores the incidence if it was archived)."""
         update_data = data.model_dump(exclude_unset=True)
+        incidence_id = await self._resolve_id(incidence_id)
         
         if update_data:
+            await ArchiveService(self.db).restore(incidence_id)
+            before = await self._kpi_state(incidence_id) if KPI_FIELDS & update_data.keys() else None
             query = (
                 update(Incidence)
                 .where(Incidence.id == incidence_id)
@@ -97,8 +201,20 @@ class IncidenceService:
             )
             await self.db.execute(query)
             await self.db.flush()
+            if before:
+                after = await self._kpi_state(incidence_id)
+                record_change(self.db, before, after)
+                if after.category != before.category:
+                    heavy_hitters.record(self.db, "category", after.category, datetime.utcnow())
+                response_cache.invalidate_on_commit(self.db, *response_cache.ANALYTICS_KEYS)
         
-        return await self.get_by_id(incidence_id)
+        incidence = await self.get_by_id(incidence_id)
+        if update_data and incidence is not None:
+            agent_load.record(self.db, incidence)
+            live_events.publish_on_commit(self.db, "incidence.updated", {
+                **live_events.incidence_payload(incidence), "fields": sorted(update_data)
+            })
+        return incidence
     
     async def close(
         self,
@@ -111,18 +227,26 @@ class IncidenceService:
     ) -> Optional[Incidence]:
         """
         Close an incidence with resolution details.
-        Calculates time_to_resolve automatically.
+        Calculates time_to_resolve automatically and records it in the
+        day's resolution-time sketch (replacing the previous value when an
+        incidence is closed again).
         """
-        incidence = await self.get_by_id(incidence_id)
+        incidence = await self.get_by_id(incidence_id, restore_archived=True)
         if not incidence:
             return None
         
         resolved_at = datetime.utcnow()
         time_to_resolve = int((resolved_at - incidence.created_at).total_seconds())
+        before = await self._kpi_state(incidence.id)
+        previous = (await self.db.execute(
+            select(
+                Incidence.channel, Incidence.stage, Incidence.resolved_at, Incidence.time_to_resolve_seconds
+            ).where(Incidence.id == incidence.id)
+        )).one()
         
         query = (
             update(Incidence)
-            .where(Incidence.id == incidence_id)
+            .where(Incidence.id == incidence.id)
             .values(
                 outcome=outcome,
                 order_impact=order_impact,
@@ -135,15 +259,48 @@ class IncidenceService:
         )
         await self.db.execute(query)
         await self.db.flush()
+        if before:
+            record_change(self.db, before, replace(
+                before, outcome=outcome, resolution_seconds=time_to_resolve, category=issue_category
+            ))
+            if issue_category != before.category:
+                heavy_hitters.record(self.db, "category", issue_category, resolved_at)
+        await LatencySketchService(self.db).record_resolution(
+            incidence.channel, incidence.stage, resolved_at, time_to_resolve,
+            previous=tuple(previous)
+        )
+        response_cache.invalidate_on_commit(self.db, *response_cache.ANALYTICS_KEYS)
         
-        return await self.get_by_id(incidence_id)
+        incidence = await self.get_by_id(incidence.id)
+        agent_load.record(self.db, incidence)
+        live_events.publish_on_commit(self.db, "incidence.resolved", live_events.incidence_payload(incidence))
+        return incidence
+    
+    async def _kpi_state(self, incidence_id: UUID) -> Optional[KpiState]:
+        """Lock the incidence row and read the fields the KPI counters track."""
+        query = (
+            select(
+                Incidence.created_at, Incidence.outcome, Incidence.time_to_resolve_seconds,
+                Incidence.app_screen, Incidence.issue_category
+            )
+            .where(Incidence.id == incidence_id)
+            .with_for_update()
+        )
+        row = (await self.db.execute(query)).one_or_none()
+        return KpiState.of(row) if row else None
     
     async def log_timeline(
         self,
         incidence_id: UUID,
         event: TimelineEventCreate
     ) -> IncidenceTimeline:
-        """Add event to incidence timeline."""
+        """
+        Add event to incidence timeline.
+        
+        The first AGENT event sets first_response_at and is recorded in the
+        day's first-response sketch.
+        """
+        incidence_id = await self._resolve_id(incidence_id)
         timeline_event = IncidenceTimeline(
             incidence_id=incidence_id,
             event_type=event.event_type,
@@ -156,15 +313,93 @@ class IncidenceService:
         await self.db.flush()
         await self.db.refresh(timeline_event)
         
+        if timeline_event.actor == ActorEnum.AGENT.value:
+            await self._record_first_response(incidence_id, timeline_event.created_at)
+        live_events.publish_on_commit(self.db, "timeline.message", {
+            "incidence_id": str(incidence_id),
+            "event_id": str(timeline_event.id),
+            "event_type": timeline_event.event_type,
+            "actor": timeline_event.actor,
+            "content": timeline_event.content,
+            "created_at": timeline_event.created_at,
+        })
+        
         return timeline_event
     
-    async def get_open_incidences(self, limit: int = 50) -> List[Incidence]:
-        """Get all incidences with timeline loaded."""
+    async def _record_first_response(self, incidence_id: UUID, responded_at: datetime):
+        """Set first_response_at unless already set; only the first agent event matches."""
+        query = (
+            update(Incidence)
+            .where(Incidence.id == incidence_id, Incidence.first_response_at.is_(None))
+            .values(first_response_at=responded_at)
+            .returning(Incidence.created_at, Incidence.channel, Incidence.stage)
+            .execution_options(synchronize_session=False)
+        )
+        first = (await self.db.execute(query)).one_or_none()
+        if first:
+            await LatencySketchService(self.db).record_first_response(
+                first.channel, first.stage, responded_at,
+                int((responded_at - first.created_at).total_seconds())
+            )
+            response_cache.invalidate_on_commit(self.db, *response_cache.ANALYTICS_KEYS)
+    
+    async def get_open_incidences(
+        self,
+        limit: int = 50,
+        before: Optional[UUID] = None
+    ) -> List[Incidence]:
+        """
+        Get the latest incidences with timeline loaded, newest first.
+        
+        Ids are time-ordered UUIDv7, so ordering and keyset pagination use the
+        primary key alone: pass the last id of a page as `before` for the next.
+        """
         query = (
             select(Incidence)
             .options(selectinload(Incidence.timeline))
-            .order_by(Incidence.created_at.desc())
+            .order_by(Incidence.id.desc())
             .limit(limit)
         )
+        if before:
+            query = query.where(Incidence.id < before)
         result = await self.db.execute(query)
         return result.scalars().all()
+    
+    async def get_changes(self, since: Optional[datetime], limit: int = 200) -> dict:
+        """
+        Incidences written and timeline events added in [since, cursor).
+        
+        Pass the returned cursor as the next `since`. Windows end before the
+        oldest in-flight write transaction, so nothing can still commit into
+        a window already returned. Without `since` only the cursor is returned
+        (load the list first, then follow the feed). A window holding more than
+        `limit` incidences or events is cut short and `has_more` is set.
+        """
+        cursor = await self.db.scalar(CHANGES_WATERMARK)
+        if since is None or cursor <= since:
+            return {"incidences": [], "events": [], "cursor": max(cursor, since or cursor), "has_more": False}
+        
+        sources = (
+            (select(Incidence).options(noload(Incidence.timeline)), Incidence.updated_at),
+            (select(IncidenceTimeline), IncidenceTimeline.created_at),
+        )
+        fetched = []
+        has_more = False
+        for query, column in sources:
+            rows = (await self.db.execute(
+                query.where(column >= since, column < cursor).order_by(column).limit(limit + 1)
+            )).scalars().all()
+            if len(rows) > limit:
+                has_more = True
+                cut = getattr(rows[limit], column.key)
+                if cut == since:
+                    # More than `limit` rows share the first timestamp: return them all
+                    cut = since + timedelta(microseconds=1)
+                    rows = (await self.db.execute(
+                        query.where(column >= since, column < cut).order_by(column)
+                    )).scalars().all()
+                cursor = min(cursor, cut)
+            fetched.append((rows, column.key))
+        
+        incidences, events = ([row for row in rows if getattr(row, key) < cursor] for rows, key in fetched)
+        return {"incidences": incidences, "events": events, "cursor": cursor, "has_more": has_more}
@@ -0,0 +1,254 @@
+"""
+KPI Counters - Real-time dashboard counters maintained in Redis at write time.
+
+Every change to an incidence that affects the KPIs (create, close, reopen,
+re-categorise) is turned into counter deltas for the day the incidence was
+created:
+
+    kpi:{day}             hash: total, outcome:<OUTCOME>, resolution_seconds, resolution_count
+    kpi:{day}:screens     sorted set: app_screen -> incidences
+    kpi:{day}:categories  sorted set: issue_category -> incidences
+
+IncidenceService records the changes on the SQLAlchemy session; they are
+applied in one MULTI/EXEC pipeline only after the transaction commits, so a
+rolled-back request never touches the counters. Anything missed (Redis down,
+process killed between commit and apply) is repaired by the reconciliation
+job, which rebuilds the counters from PostgreSQL and reports the drift.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.database import async_session_maker, on_commit, redis_client
+from app.models.incidence import Incidence
+from app.services import live_events
+from app.services.aggregation import Dimension, aggregate, count, total
+
+
+PENDING_KEY = "kpi_counter_changes"
+OUTCOMES = ("IN_PROGRESS", "RESOLVED", "DROPPED", "CONVERTED")
+
+_redis = redis_client
+
+
+@dataclass(frozen=True)
+class KpiState:
+    """The fields of one incidence that the KPI counters depend on."""
+    day: date
+    outcome: Optional[str]
+    resolution_seconds: Optional[int]
+    screen: Optional[str]
+    category: Optional[str]
+    
+    @classmethod
+    def of(cls, incidence) -> "KpiState":
+        return cls(
+            day=incidence.created_at.date(),
+            outcome=incidence.outcome,
+            resolution_seconds=incidence.time_to_resolve_seconds,
+            screen=incidence.app_screen,
+            category=incidence.issue_category
+        )
+
+
+def day_key(day: date) -> str:
+    return f"kpi:{day.isoformat()}"
+
+
+def record_change(session, before: Optional[KpiState], after: Optional[KpiState]):
+    """Queue a KPI change on the session; applied to Redis after commit."""
+    if not settings.KPI_COUNTERS_ENABLED or before == after:
+        return
+    on_commit(session, PENDING_KEY, _apply_safely).append((before, after))
+
+
+def _deltas(before: Optional[KpiState], after: Optional[KpiState]) -> List[Tuple[str, str, str, int]]:
+    """(command, key, field, amount) increments that turn `before` into `after`."""
+    ops = []
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        key = day_key(state.day)
+        ops.append(("hincrby", key, "total", sign))
+        if state.outcome:
+            ops.append(("hincrby", key, f"outcome:{state.outcome}", sign))
+        if state.resolution_seconds and state.resolution_seconds > 0:
+            ops.append(("hincrby", key, "resolution_seconds", sign * state.resolution_seconds))
+            ops.append(("hincrby", key, "resolution_count", sign))
+        if state.screen:
+            ops.append(("zincrby", f"{key}:screens", state.screen, sign))
+        if state.category:
+            ops.append(("zincrby", f"{key}:categories", state.category, sign))
+    return ops
+
+
+async def apply_changes(changes: List[Tuple[Optional[KpiState], Optional[KpiState]]]) -> Dict[str, Dict[str, int]]:
+    """Apply queued changes atomically (one MULTI/EXEC). Returns the hash deltas per day."""
+    totals: Dict[Tuple[str, str, str], int] = {}
+    for before, after in changes:
+        for command, key, field, amount in _deltas(before, after):
+            totals[(command, key, field)] = totals.get((command, key, field), 0) + amount
+    
+    ttl = settings.KPI_COUNTER_TTL_DAYS * 86400
+    async with _redis.pipeline(transaction=True) as pipe:
+        keys = set()
+        for (command, key, field), amount in totals.items():
+            if amount == 0:
+                continue
+            if command == "hincrby":
+                pipe.hincrby(key, field, amount)
+            else:
+                pipe.zincrby(key, amount, field)
+                pipe.zremrangebyscore(key, "-inf", 0)
+            keys.add(key)
+        for key in keys:
+            pipe.expire(key, ttl)
+        await pipe.execute()
+    
+    deltas: Dict[str, Dict[str, int]] = {}
+    for (command, key, field), amount in totals.items():
+        if command == "hincrby" and amount:
+            deltas.setdefault(key[len("kpi:"):], {})[field] = amount
+    return deltas
+
+
+async def _apply_safely(changes):
+    try:
+        deltas = await apply_changes(changes)
+    except Exception as e:
+        print(f"⚠️ KPI counter update failed (reconciliation will repair it): {e}")
+        return
+    if deltas and settings.LIVE_EVENTS_ENABLED:
+        try:
+            await live_events.publish([("kpi.delta", {"days": deltas})])
+        except Exception as e:
+            print(f"⚠️ KPI delta publish failed: {e}")
+
+
+async def read_day(day: date) -> Optional[dict]:
+    """
+    Counters of one day in a single pipelined round trip.
+    
+    Returns None when the day has no counters yet (cold Redis), so callers
+    can fall back to PostgreSQL.
+    """
+    key = day_key(day)
+    async with _redis.pipeline(transaction=False) as pipe:
+        pipe.hgetall(key)
+        pipe.zrevrange(f"{key}:screens", 0, 4, withscores=True)
+        pipe.zrevrange(f"{key}:categories", 0, 4, withscores=True)
+        counters, screens, categories = await pipe.execute()
+    
+    if not counters:
+        return None
+    counters = {field: int(value) for field, value in counters.items()}
+    return {
+        "counters": counters,
+        "screens": [(name, int(score)) for name, score in screens if score > 0],
+        "categories": [(name, int(score)) for name, score in categories if score > 0],
+    }
+
+
+# Reconciliation --------------------------------------------------------------
+
+RECONCILE_METRICS = [
+    count("total"),
+    *[count(f"outcome:{outcome}", Incidence.outcome == outcome) for outcome in OUTCOMES],
+    total("resolution_seconds", Incidence.time_to_resolve_seconds, Incidence.time_to_resolve_seconds > 0),
+    count("resolution_count", Incidence.time_to_resolve_seconds > 0),
+]
+RECONCILE_DIMENSIONS = [
+    Dimension("screens", Incidence.app_screen, order_by="total"),
+    Dimension("categories", Incidence.issue_category, order_by="total"),
+]
+
+
+async def _counters_from_db(day: date) -> dict:
+    start = datetime.combine(day, datetime.min.time())
+    async with async_session_maker() as session:
+        result = await aggregate(
+            session, Incidence, RECONCILE_METRICS, RECONCILE_DIMENSIONS,
+            where=[Incidence.created_at >= start, Incidence.created_at < start + timedelta(days=1)]
+        )
+    return {
+        "counters": {name: int(value or 0) for name, value in result.totals.items() if value},
+        "screens": {g["screens"]: g["total"] for g in result.breakdowns["screens"]},
+        "categories": {g["categories"]: g["total"] for g in result.breakdowns["categories"]},
+    }
+
+
+async def _counters_from_redis(day: date) -> dict:
+    key = day_key(day)
+    async with _redis.pipeline(transaction=False) as pipe:
+        pipe.hgetall(key)
+        pipe.zrange(f"{key}:screens", 0, -1, withscores=True)
+        pipe.zrange(f"{key}:categories", 0, -1, withscores=True)
+        counters, screens, categories = await pipe.execute()
+    return {
+        "counters": {field: int(value) for field, value in counters.items() if int(value)},
+        "screens": {name: int(score) for name, score in screens if score > 0},
+        "categories": {name: int(score) for name, score in categories if score > 0},
+    }
+
+
+def _drift(expected: dict, actual: dict) -> Dict[str, Dict[str, int]]:
+    """{section: {field: actual - expected}} for every field that differs."""
+    drift = {}
+    for section in expected:
+        fields = set(expected[section]) | set(actual[section])
+        diffs = {
+            field: actual[section].get(field, 0) - expected[section].get(field, 0)
+            for field in fields
+            if actual[section].get(field, 0) != expected[section].get(field, 0)
+        }
+        if diffs:
+            drift[section] = diffs
+    return drift
+
+
+async def rebuild_day(day: date) -> Dict[str, Dict[str, int]]:
+    """Recompute one day's counters from PostgreSQL, overwrite Redis, return the drift found."""
+    expected = await _counters_from_db(day)
+    actual = await _counters_from_redis(day)
+    drift = _drift(expected, actual)
+    
+    key = day_key(day)
+    ttl = settings.KPI_COUNTER_TTL_DAYS * 86400
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.delete(key, f"{key}:screens", f"{key}:categories")
+        pipe.hset(key, mapping={"total": 0, **expected["counters"]})
+        for section in ("screens", "categories"):
+            if expected[section]:
+                pipe.zadd(f"{key}:{section}", expected[section])
+                pipe.expire(f"{key}:{section}", ttl)
+        pipe.expire(key, ttl)
+        await pipe.execute()
+    return drift
+
+
+async def run_kpi_reconciliation(days: Optional[int] = None) -> Dict[str, dict]:
+    """
+    Rebuild the counters of the last `days` days (today included) and report drift.
+    
+    Writes that land between the PostgreSQL read and the Redis rewrite can
+    leave a small drift behind; the next run repairs it.
+    """
+    days = days or settings.KPI_RECONCILE_DAYS
+    today = date.today()
+    report = {}
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        drift = await rebuild_day(day)
+        if drift:
+            report[day.isoformat()] = drift
+            print(f"📐 KPI counters for {day} drifted, rebuilt: {drift}")
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(asyncio.run(run_kpi_reconciliation(days)))
@@ -0,0 +1,205 @@
+"""
+Latency Sketches - Resolution / first-response percentiles from per-day sketches.
+
+One QuantileSketch is kept per (day, metric, channel, stage) in
+`latency_sketches` and updated in the same transaction as the write that
+produced the measurement:
+
+    resolution      IncidenceService.close(), on the day the incidence is resolved
+                    (re-closing moves the old value out of its day's sketch)
+    first_response  IncidenceService.log_timeline(), on the first AGENT event
+
+A date range is answered by merging the rows of its days (at most
+days x channels x stages small JSON maps) instead of sorting raw rows.
+`rebuild` recomputes the sketches of a date range from the incidence
+tables, for history recorded before the sketches existed.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import async_session_maker
+from app.models.incidence import Incidence, ArchivedIncidence, LatencySketch
+from app.services.quantile_sketch import QuantileSketch
+
+
+METRICS = ("resolution", "first_response")
+GROUP_BY = ("channel", "stage", "day")
+
+SketchKey = Tuple[date, str, str, str]  # (day, metric, channel, stage)
+
+
+class LatencySketchService:
+    """Records latency measurements into daily sketches and reads percentiles back."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def record(self, metric: str, day: date, channel: str, stage: str, delta: QuantileSketch):
+        """
+        Add a delta sketch to the stored one (atomic under the row lock of the upsert).
+        The raw delta is merged so its negative counts (removed values) apply;
+        only the stored result drops buckets at or below zero.
+        """
+        if not delta.buckets:
+            return
+        delta_json = bindparam("delta", delta.to_json(), type_=JSONB)
+        statement = insert(LatencySketch).values(
+            day=day, metric=metric, channel=channel, stage=stage,
+            sketch=func.sketch_merge(literal({}, JSONB), delta_json),
+            updated_at=datetime.utcnow()
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[LatencySketch.day, LatencySketch.metric, LatencySketch.channel, LatencySketch.stage],
+            set_={
+                "sketch": func.sketch_merge(LatencySketch.sketch, delta_json),
+                "updated_at": statement.excluded.updated_at
+            }
+        )
+        await self.db.execute(statement)
+    
+    async def record_resolution(
+        self,
+        channel: str,
+        stage: str,
+        resolved_at: datetime,
+        seconds: int,
+        previous: Optional[Tuple[str, str, Optional[datetime], Optional[int]]] = None
+    ):
+        """
+        Record a resolution time. `previous` (channel, stage, resolved_at,
+        seconds) is the incidence's last recorded resolution, removed first
+        from the sketch it was added to, even if it was rerouted since.
+        """
+        deltas: Dict[Tuple[date, str, str], QuantileSketch] = defaultdict(QuantileSketch)
+        if previous:
+            old_channel, old_stage, old_resolved_at, old_seconds = previous
+            if old_resolved_at is not None and old_seconds is not None:
+                deltas[(old_resolved_at.date(), old_channel, old_stage)].remove(old_seconds)
+        deltas[(resolved_at.date(), channel, stage)].add(seconds)
+        # Fixed row order so concurrent closes lock the rows in the same order
+        for day, row_channel, row_stage in sorted(deltas):
+            await self.record("resolution", day, row_channel, row_stage, deltas[(day, row_channel, row_stage)])
+    
+    async def record_first_response(self, channel: str, stage: str, responded_at: datetime, seconds: int):
+        await self.record("first_response", responded_at.date(), channel, stage, QuantileSketch().add(seconds))
+    
+    async def get_sketches(
+        self,
+        metric: str,
+        start: date,
+        end: date,
+        group_by: Optional[str] = None
+    ) -> Dict[Optional[str], QuantileSketch]:
+        """Sketches of start..end (inclusive) merged per `group_by` value (one entry for None)."""
+        result = await self.db.execute(
+            select(LatencySketch)
+            .where(LatencySketch.metric == metric, LatencySketch.day >= start, LatencySketch.day <= end)
+        )
+        merged: Dict[Optional[str], QuantileSketch] = defaultdict(QuantileSketch)
+        for row in result.scalars():
+            group = None
+            if group_by == "day":
+                group = row.day.isoformat()
+            elif group_by:
+                group = getattr(row, group_by)
+            merged[group].merge(QuantileSketch.from_json(row.sketch))
+        return merged
+    
+    async def percentiles(
+        self,
+        metric: str,
+        start: date,
+        end: date,
+        group_by: Optional[str] = None
+    ) -> List[dict]:
+        """[{"group", "count", "p50", "p90", "p99"}] for start..end, sorted by group."""
+        sketches = await self.get_sketches(metric, start, end, group_by)
+        if group_by is None and None not in sketches:
+            sketches[None] = QuantileSketch()
+        return [
+            {"group": group, "count": sketch.count, **sketch.percentiles()}
+            for group, sketch in sorted(sketches.items(), key=lambda item: item[0] or "")
+        ]
+    
+    async def summary(self, start: date, end: date) -> Dict[str, Dict[str, Optional[int]]]:
+        """Overall p50/p90/p99 of every metric for start..end."""
+        return {
+            metric: (await self.get_sketches(metric, start, end)).get(None, QuantileSketch()).percentiles()
+            for metric in METRICS
+        }
+    
+    async def compute(self, start: date, end: date) -> Dict[SketchKey, QuantileSketch]:
+        """Sketches of start..end computed from live and archived incidences (streamed)."""
+        start_at = datetime.combine(start, datetime.min.time())
+        end_at = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        
+        queries = []
+        for model in (Incidence, ArchivedIncidence):
+            queries.append(
+                select(
+                    literal("resolution").label("metric"), model.resolved_at.label("at"),
+                    model.channel, model.stage, model.time_to_resolve_seconds.label("seconds")
+                )
+                .where(
+                    model.resolved_at >= start_at, model.resolved_at < end_at,
+                    model.outcome != "IN_PROGRESS", model.time_to_resolve_seconds.is_not(None)
+                )
+            )
+            queries.append(
+                select(
+                    literal("first_response").label("metric"), model.first_response_at.label("at"),
+                    model.channel, model.stage,
+                    func.extract("epoch", model.first_response_at - model.created_at).label("seconds")
+                )
+                .where(model.first_response_at >= start_at, model.first_response_at < end_at)
+            )
+        
+        sketches: Dict[SketchKey, QuantileSketch] = defaultdict(QuantileSketch)
+        result = await self.db.stream(union_all(*queries))
+        async for row in result:
+            sketches[(row.at.date(), row.metric, row.channel, row.stage)].add(float(row.seconds))
+        return sketches
+    
+    async def rebuild(self, start: date, end: date) -> int:
+        """Replace the stored sketches of start..end with recomputed ones. Returns rows written."""
+        sketches = await self.compute(start, end)
+        await self.db.execute(
+            delete(LatencySketch).where(LatencySketch.day >= start, LatencySketch.day <= end)
+        )
+        now = datetime.utcnow()
+        rows = [
+            {"day": day, "metric": metric, "channel": channel, "stage": stage,
+             "sketch": sketch.to_json(), "updated_at": now}
+            for (day, metric, channel, stage), sketch in sketches.items()
+            if sketch.count
+        ]
+        if rows:
+            await self.db.execute(insert(LatencySketch), rows)
+        return len(rows)
+
+
+async def run_sketch_rebuild(start: date, end: date) -> int:
+    """Rebuild the sketches of start..end (inclusive) in one transaction."""
+    async with async_session_maker() as session:
+        written = await LatencySketchService(session).rebuild(start, end)
+        await session.commit()
+    print(f"📏 Rebuilt {written} latency sketch(es) for {start}..{end}")
+    return written
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    
+    if len(sys.argv) > 2 and sys.argv[1] == "rebuild":
+        first = date.fromisoformat(sys.argv[2])
+        last = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+        asyncio.run(run_sketch_rebuild(first, last))
+    else:
+        print("Usage: python -m app.services.latency_sketches rebuild <start> [end]")
@@ -0,0 +1,244 @@
+"""
+Live Events - Domain events pushed to connected consoles (SSE / WebSocket).
+
+    incidence.created    incidence.updated    incidence.resolved
+    timeline.message     kpi.delta            friction.help
+
+IncidenceService queues events on the SQLAlchemy session; after the
+transaction commits they are appended to the Redis stream `events:live`
+(XADD, capped at LIVE_EVENTS_STREAM_MAXLEN). A stream rather than plain
+pub/sub so that the entry id doubles as the resume cursor: a reconnecting
+client sends its last id and gets everything after it replayed before the
+live tail.
+
+Each API process runs a single reader (XREAD BLOCK) that fans events out to
+its local subscribers, filtering per client before queueing. Client queues
+are bounded by LIVE_EVENTS_CLIENT_BUFFER: a client that falls that far
+behind, or whose cursor has been trimmed from the stream, receives a
+`reset` event and is disconnected, and should reload from the REST API.
+"""
+
+import asyncio
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.config import settings
+from app.database import on_commit, redis_client
+
+
+STREAM_KEY = "events:live"
+PENDING_KEY = "live_events"
+EVENT_TYPES = (
+    "incidence.created", "incidence.updated", "incidence.resolved", "timeline.message", "kpi.delta",
+    "friction.help"
+)
+
+_redis = redis_client
+
+
+@dataclass
+class LiveEvent:
+    id: str
+    type: str
+    data: dict
+
+
+def _cursor(event_id: str) -> Tuple[int, int]:
+    milliseconds, _, sequence = event_id.partition("-")
+    return int(milliseconds), int(sequence or 0)
+
+
+def valid_cursor(event_id: str) -> bool:
+    try:
+        _cursor(event_id)
+        return True
+    except ValueError:
+        return False
+
+
+def incidence_payload(incidence) -> dict:
+    """The fields consoles filter and render list rows by."""
+    return {
+        "incidence_id": str(incidence.id),
+        "user_id": incidence.user_id,
+        "channel": incidence.channel,
+        "stage": incidence.stage,
+        "outcome": incidence.outcome,
+        "agent_id": incidence.agent_id,
+        "cart_value": incidence.cart_value,
+        "friction_score": incidence.friction_score,
+    }
+
+
+def publish_on_commit(session, event_type: str, data: dict):
+    """Queue an event on the session; published after the transaction commits."""
+    if settings.LIVE_EVENTS_ENABLED:
+        on_commit(session, PENDING_KEY, _publish_safely).append((event_type, data))
+
+
+async def publish(events: List[Tuple[str, dict]]):
+    """Append events to the stream in one round trip."""
+    published_at = datetime.utcnow().isoformat()
+    async with _redis.pipeline(transaction=False) as pipe:
+        for event_type, data in events:
+            pipe.xadd(
+                STREAM_KEY,
+                {"type": event_type, "data": json.dumps({**data, "at": published_at}, default=str)},
+                maxlen=settings.LIVE_EVENTS_STREAM_MAXLEN,
+                approximate=True
+            )
+        await pipe.execute()
+
+
+async def _publish_safely(events):
+    try:
+        await publish(events)
+    except Exception as e:
+        print(f"⚠️ Live event publish failed (consoles resync on their next reset): {e}")
+
+
+def _parse(entry_id: str, fields: Dict[str, str]) -> LiveEvent:
+    return LiveEvent(entry_id, fields.get("type", ""), json.loads(fields.get("data") or "{}"))
+
+
+@dataclass
+class EventFilter:
+    """Per-client filter: type prefixes ("incidence" matches incidence.*), channel, incidence, user."""
+    types: FrozenSet[str] = frozenset()
+    channel: Optional[str] = None
+    incidence_id: Optional[str] = None
+    user_id: Optional[str] = None
+    
+    def matches(self, live_event: LiveEvent) -> bool:
+        if self.types and not any(
+            live_event.type == prefix or live_event.type.startswith(prefix + ".") for prefix in self.types
+        ):
+            return False
+        data = live_event.data
+        if self.channel and data.get("channel") not in (None, self.channel):
+            return False
+        if self.incidence_id and data.get("incidence_id") not in (None, self.incidence_id):
+            return False
+        if self.user_id and data.get("user_id") not in (None, self.user_id):
+            return False
+        return True
+
+
+@dataclass(eq=False)
+class Subscription:
+    filter: EventFilter
+    queue: asyncio.Queue
+    overflowed: bool = False
+    replayed_until: Tuple[int, int] = (0, 0)  # Queued events up to here were already replayed
+
+
+class Broadcaster:
+    """One stream reader per process, fanning out to local subscribers."""
+    
+    def __init__(self):
+        self._subscribers: Set[Subscription] = set()
+        self._reader: Optional[asyncio.Task] = None
+        self._reader_lock = asyncio.Lock()  # The tail lookup awaits; keeps concurrent subscribers to one reader
+    
+    @property
+    def connected(self) -> int:
+        return len(self._subscribers)
+    
+    async def _ensure_reader(self):
+        async with self._reader_lock:
+            if self._reader is None or self._reader.done():
+                # Start from the current tail, read before returning so a replay
+                # that follows cannot miss events published in between
+                latest = await _redis.xrevrange(STREAM_KEY, count=1)
+                self._reader = asyncio.create_task(self._read(latest[0][0] if latest else "0-0"))
+    
+    async def _read(self, last_id: str):
+        while self._subscribers:
+            try:
+                response = await _redis.xread(
+                    {STREAM_KEY: last_id}, block=settings.LIVE_EVENTS_HEARTBEAT_SECONDS * 1000, count=500
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Live event stream read failed, retrying: {e}")
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response or ():
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    self._fan_out(_parse(entry_id, fields))
+    
+    def _fan_out(self, live_event: LiveEvent):
+        for subscription in list(self._subscribers):
+            if subscription.overflowed or not subscription.filter.matches(live_event):
+                continue
+            try:
+                subscription.queue.put_nowait(live_event)
+            except asyncio.QueueFull:
+                # Slow client: stop queueing and tell it to resync
+                subscription.overflowed = True
+                self._subscribers.discard(subscription)
+    
+    async def subscribe(self, event_filter: EventFilter, cursor: Optional[str] = None) -> AsyncIterator[LiveEvent]:
+        """
+        Events matching `event_filter`: those after `cursor` first, then live.
+        
+        Ends with a `reset` event when the client overflowed its buffer or its
+        cursor is no longer in the stream.
+        """
+        subscription = Subscription(event_filter, asyncio.Queue(maxsize=settings.LIVE_EVENTS_CLIENT_BUFFER))
+        self._subscribers.add(subscription)
+        try:
+            await self._ensure_reader()
+            if cursor:
+                # Subscribed first so nothing published during the replay is lost
+                async for live_event in self._replay(subscription, cursor):
+                    yield live_event
+            
+            while not subscription.overflowed:
+                try:
+                    live_event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.LIVE_EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield LiveEvent("", "heartbeat", {})
+                    continue
+                if _cursor(live_event.id) > subscription.replayed_until:
+                    yield live_event
+            yield LiveEvent("", "reset", {"reason": "client fell behind or cursor expired"})
+        finally:
+            self._subscribers.discard(subscription)
+    
+    async def _replay(self, subscription: Subscription, cursor: str) -> AsyncIterator[LiveEvent]:
+        first = await _redis.xrange(STREAM_KEY, count=1)
+        if first and _cursor(first[0][0]) > _cursor(cursor) and _cursor(cursor) != (0, 0):
+            # Entries after the cursor were trimmed; the client must reload
+            subscription.overflowed = True
+            return
+        
+        start = cursor
+        while True:
+            entries = await _redis.xrange(STREAM_KEY, min=f"({start}", count=500)
+            for entry_id, fields in entries:
+                subscription.replayed_until = _cursor(entry_id)
+                live_event = _parse(entry_id, fields)
+                if subscription.filter.matches(live_event):
+                    yield live_event
+            if len(entries) < 500:
+                return
+            start = entries[-1][0]
+    
+    async def stop(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+
+
+broadcaster = Broadcaster()
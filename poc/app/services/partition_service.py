@@ -0,0 +1,111 @@
+"""
+Partition Service - Creates and retires monthly partitions.
+"""
+
+import re
+from datetime import date
+from typing import Dict, List
+
+import asyncpg
+
+from app.config import settings
+from app.migrations import asyncpg_dsn
+
+
+ADVISORY_LOCK_ID = 4_726_006  # Only one worker maintains partitions at a time
+
+_PARTITION_NAME = re.compile(r"^(?P<parent>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+class PartitionService:
+    """
+    Maintains the monthly partitions of the append-only tables (migration 0006).
+    
+    - Creates partitions PARTITION_MONTHS_AHEAD months ahead so inserts never
+      miss a partition.
+    - Retention: partitions entirely older than the table's retention are
+      detached (CONCURRENTLY, so writers are not blocked) and dropped. Deleting
+      a month of data is a metadata operation instead of a bulk DELETE.
+    
+    Uses a plain asyncpg connection because DETACH ... CONCURRENTLY cannot run
+    inside a transaction block.
+    """
+    
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    @staticmethod
+    def retention_months() -> Dict[str, int]:
+        """Retention per partitioned table in months (0 keeps data forever)."""
+        return {
+            "incidence_timeline": settings.TIMELINE_RETENTION_MONTHS,
+            "friction_signals": settings.FRICTION_SIGNAL_RETENTION_MONTHS,
+        }
+    
+    async def ensure_partitions(self, table: str, months_ahead: int) -> int:
+        """Create missing partitions up to `months_ahead`. Returns number created."""
+        return await self.conn.fetchval(
+            "SELECT ensure_monthly_partitions($1, $2)", table, months_ahead
+        )
+    
+    async def list_partitions(self, table: str) -> List[str]:
+        """Names of the monthly partitions attached to `table`."""
+        rows = await self.conn.fetch(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = $1::regclass
+            ORDER BY child.relname
+            """,
+            table
+        )
+        return [row["relname"] for row in rows]
+    
+    async def drop_expired(self, table: str, retention_months: int) -> List[str]:
+        """Detach and drop partitions whose whole month is past retention."""
+        today = date.today()
+        months_now = today.year * 12 + today.month - 1
+        oldest_kept = months_now - retention_months
+        
+        dropped = []
+        for name in await self.list_partitions(table):
+            match = _PARTITION_NAME.match(name)
+            if not match or match.group("parent") != table:
+                continue
+            partition_month = int(match.group("year")) * 12 + int(match.group("month")) - 1
+            if partition_month >= oldest_kept:
+                continue
+            
+            await self.conn.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" CONCURRENTLY')
+            await self.conn.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+        
+        return dropped
+
+
+async def run_partition_maintenance() -> Dict[str, dict]:
+    """Create upcoming partitions and drop expired ones for every partitioned table."""
+    conn = await asyncpg.connect(asyncpg_dsn())
+    report = {}
+    try:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", ADVISORY_LOCK_ID):
+            return report  # Another worker is on it
+        
+        service = PartitionService(conn)
+        for table, retention in service.retention_months().items():
+            created = await service.ensure_partitions(table, settings.PARTITION_MONTHS_AHEAD)
+            dropped = await service.drop_expired(table, retention) if retention else []
+            report[table] = {"created": created, "dropped": dropped}
+            if created or dropped:
+                print(f"🧩 {table}: created {created} partition(s), dropped {dropped or 'none'}")
+        
+        await conn.execute("SELECT pg_advisory_unlock($1)", ADVISORY_LOCK_ID)
+        return report
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    import asyncio
+    print(asyncio.run(run_partition_maintenance()))
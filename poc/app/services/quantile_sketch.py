@@ -0,0 +1,111 @@
+"""
+Quantile Sketch - Mergeable percentile estimates over durations.
+
+A log-bucketed histogram (the DDSketch / HDR histogram idea): a value v
+lands in bucket ceil(log(v) / log(gamma)) with gamma = (1 + a) / (1 - a),
+and a bucket is reported as the midpoint of its range, so every quantile is
+within relative error `a` (1%) of an actual sample. Buckets are plain
+counts, which makes sketches exact to merge (add the counts) and lets a
+value be taken back out (subtract it), e.g. when an incidence is closed
+twice. A day of resolution times fits in a few hundred buckets whatever
+the volume.
+
+Values are durations in seconds and are clamped to >= 1, so bucket 0 is
+"one second or less". Serialized as JSON {"<bucket>": count}; the same
+RELATIVE_ACCURACY must be used everywhere sketches are merged.
+"""
+
+import math
+from typing import Dict, Iterable, Optional, Sequence
+
+
+RELATIVE_ACCURACY = 0.01
+PERCENTILES = (0.5, 0.9, 0.99)
+
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket_of(value: float) -> int:
+    """Bucket index of a value (seconds)."""
+    return max(0, math.ceil(math.log(max(value, 1)) / _LOG_GAMMA))
+
+
+def bucket_value(bucket: int) -> float:
+    """Representative value of a bucket: within RELATIVE_ACCURACY of anything in it."""
+    if bucket <= 0:
+        return 1.0
+    return 2 * _GAMMA ** bucket / (_GAMMA + 1)
+
+
+class QuantileSketch:
+    """Sparse bucket -> count histogram with relative-error quantiles."""
+    
+    __slots__ = ("buckets",)
+    
+    def __init__(self, buckets: Optional[Dict[int, int]] = None):
+        self.buckets: Dict[int, int] = dict(buckets or {})
+    
+    def add(self, value: float, count: int = 1) -> "QuantileSketch":
+        bucket = bucket_of(value)
+        n = self.buckets.get(bucket, 0) + count
+        if n:
+            self.buckets[bucket] = n
+        else:
+            self.buckets.pop(bucket, None)
+        return self
+    
+    def remove(self, value: float) -> "QuantileSketch":
+        """Take one occurrence of `value` back out (counts may go negative in a delta)."""
+        return self.add(value, -1)
+    
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for bucket, n in other.buckets.items():
+            merged = self.buckets.get(bucket, 0) + n
+            if merged:
+                self.buckets[bucket] = merged
+            else:
+                self.buckets.pop(bucket, None)
+        return self
+    
+    @property
+    def count(self) -> int:
+        return sum(n for n in self.buckets.values() if n > 0)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated q-quantile (0 <= q <= 1); None for an empty sketch."""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            n = self.buckets[bucket]
+            if n <= 0:
+                continue
+            seen += n
+            if seen > rank:
+                return bucket_value(bucket)
+        return bucket_value(max(self.buckets))
+    
+    def percentiles(self, quantiles: Sequence[float] = PERCENTILES) -> Dict[str, Optional[int]]:
+        """{"p50": seconds, "p90": ..., "p99": ...}, rounded to whole seconds."""
+        result = {}
+        for q in quantiles:
+            value = self.quantile(q)
+            result[f"p{q * 100:g}"] = round(value) if value is not None else None
+        return result
+    
+    def to_json(self) -> Dict[str, int]:
+        return {str(bucket): n for bucket, n in self.buckets.items()}
+    
+    @classmethod
+    def from_json(cls, data: Optional[Dict[str, int]]) -> "QuantileSketch":
+        return cls({int(bucket): int(n) for bucket, n in (data or {}).items()})
+    
+    @classmethod
+    def of(cls, values: Iterable[float]) -> "QuantileSketch":
+        sketch = cls()
+        for value in values:
+            sketch.add(value)
+        return sketch
@@ -0,0 +1,209 @@
+"""
+Response Cache - Redis-backed cache for expensive analytics responses.
+
+    fresh    (age < ttl)                 served from Redis
+    stale    (age < ttl + stale, or      served from Redis while one background
+              invalidated)               task recomputes it
+    missing                              computed once cluster-wide; concurrent
+                                         requests wait for that result
+
+Recomputes are single-flight twice over: within a process concurrent
+callers share one in-flight future, and across workers a Redis lock
+(SET NX PX with a token) lets one worker compute while the others poll for
+the result, falling back to computing themselves after
+ANALYTICS_CACHE_WAIT_SECONDS.
+
+Writes that change the numbers call `invalidate_on_commit`; after the
+transaction commits the entries are marked stale rather than deleted, so a
+burst of writes costs one background recompute instead of a stampede.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+import redis.asyncio as redis
+from fastapi import Response
+
+from app.config import settings
+from app.database import on_commit, redis_client, run_in_background
+
+
+PENDING_KEY = "response_cache_invalidations"
+# Responses that change with every incidence write
+ANALYTICS_KEYS = ("analytics:kpis", "analytics:weekly-report")
+
+_redis = redis_client
+_inflight: Dict[str, asyncio.Future] = {}
+
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Flag existing entries only: HSET on a missing key would create a half entry
+_MARK_STALE = """
+for _, key in ipairs(KEYS) do
+    if redis.call('exists', key) == 1 then
+        redis.call('hset', key, 'invalidated', '1')
+    end
+end
+return 0
+"""
+
+
+@dataclass
+class CachedResponse:
+    value: Any
+    age_seconds: float
+    status: str  # HIT | STALE | MISS
+
+
+def _entry_key(key: str) -> str:
+    return f"cache:{key}"
+
+
+def _lock_key(key: str) -> str:
+    return f"cache:{key}:lock"
+
+
+async def _read(key: str) -> Optional[dict]:
+    entry = await _redis.hgetall(_entry_key(key))
+    if not entry:
+        return None
+    return {
+        "value": json.loads(entry["value"]),
+        "age": time.time() - float(entry["computed_at"]),
+        "invalidated": entry.get("invalidated") == "1",
+    }
+
+
+async def _compute_and_store(key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+    value = await compute()
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.hset(_entry_key(key), mapping={
+            "value": json.dumps(value, default=str),
+            "computed_at": time.time(),
+            "invalidated": "0",
+        })
+        pipe.expire(_entry_key(key), ttl + settings.ANALYTICS_CACHE_STALE_SECONDS)
+        await pipe.execute()
+    return value
+
+
+async def _acquire(key: str) -> Optional[str]:
+    token = uuid.uuid4().hex
+    acquired = await _redis.set(_lock_key(key), token, nx=True, px=settings.ANALYTICS_CACHE_LOCK_SECONDS * 1000)
+    return token if acquired else None
+
+
+async def _release(key: str, token: str):
+    await _redis.eval(_RELEASE_LOCK, 1, _lock_key(key), token)
+
+
+async def _refresh_in_background(key: str, compute: Callable[[], Awaitable[Any]], ttl: int):
+    token = await _acquire(key)
+    if token is None:
+        return  # Another worker is refreshing
+    try:
+        await _compute_and_store(key, compute, ttl)
+    except Exception as e:
+        print(f"⚠️ Background refresh of {key} failed (serving stale): {e}")
+    finally:
+        await _release(key, token)
+
+
+async def _fill(key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> CachedResponse:
+    """Compute a missing entry once cluster-wide."""
+    deadline = time.monotonic() + settings.ANALYTICS_CACHE_WAIT_SECONDS
+    while True:
+        token = await _acquire(key)
+        if token is not None:
+            try:
+                return CachedResponse(await _compute_and_store(key, compute, ttl), 0, "MISS")
+            finally:
+                await _release(key, token)
+        
+        # Another worker is computing it: wait for its result
+        await asyncio.sleep(0.05)
+        entry = await _read(key)
+        if entry is not None:
+            return CachedResponse(entry["value"], entry["age"], "HIT")
+        if time.monotonic() > deadline:
+            return CachedResponse(await compute(), 0, "MISS")
+
+
+async def _get(key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> CachedResponse:
+    entry = await _read(key)
+    if entry is not None:
+        if entry["age"] < ttl and not entry["invalidated"]:
+            return CachedResponse(entry["value"], entry["age"], "HIT")
+        if entry["age"] < ttl + settings.ANALYTICS_CACHE_STALE_SECONDS:
+            run_in_background(_refresh_in_background(key, compute, ttl))
+            return CachedResponse(entry["value"], entry["age"], "STALE")
+    return await _fill(key, compute, ttl)
+
+
+async def get_or_compute(key: str, compute: Callable[[], Awaitable[Any]], ttl: int) -> CachedResponse:
+    """
+    Cached value of `key`, computing it with `compute()` when needed.
+    
+    `compute` must return a JSON-serialisable value and open its own database
+    session: it may run in the background after the request has finished.
+    Falls back to computing directly when Redis is unavailable.
+    """
+    if not settings.ANALYTICS_CACHE_ENABLED:
+        return CachedResponse(await compute(), 0, "MISS")
+    
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        try:
+            result = await _get(key, compute, ttl)
+        except redis.RedisError as e:
+            print(f"⚠️ Response cache unavailable, computing {key}: {e}")
+            result = CachedResponse(await compute(), 0, "MISS")
+        future.set_result(result)
+        return result
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Marks it retrieved: the caller re-raises it below
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+
+def set_headers(response: Response, cached: CachedResponse):
+    """Expose the cache status and the age of the served value."""
+    response.headers["Age"] = str(int(cached.age_seconds))
+    response.headers["X-Cache"] = cached.status
+
+
+async def invalidate(keys: Iterable[str]):
+    """Mark entries stale: the next read serves them once more and refreshes them."""
+    keys = list(keys)
+    if not keys:
+        return
+    await _redis.eval(_MARK_STALE, len(keys), *[_entry_key(key) for key in keys])
+
+
+def invalidate_on_commit(session, *keys: str):
+    """Queue cache keys on the session; marked stale after the transaction commits."""
+    if settings.ANALYTICS_CACHE_ENABLED:
+        on_commit(session, PENDING_KEY, lambda pending: _invalidate_safely(sorted(pending)), set).update(keys)
+
+
+async def _invalidate_safely(keys):
+    try:
+        await invalidate(keys)
+    except Exception as e:
+        print(f"⚠️ Cache invalidation failed (entries expire after their TTL): {e}")
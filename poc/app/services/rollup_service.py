@@ -0,0 +1,250 @@
+"""
+Rollup Service - Daily analytics rollups in `analytics_daily`.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, cast, Date, union_all
+from sqlalchemy.dialects.postgresql import insert
+from typing import Optional, List, Dict, Set
+from datetime import datetime, date, timedelta
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.incidence import Incidence, ArchivedIncidence, AnalyticsDaily
+from app.services.aggregation import Dimension, aggregate, count, total
+
+
+SELF_SERVE_PER_ASSISTED = 3  # Mock self-serve orders per assisted order (POC, as in get_kpis)
+
+ROLLUP_COLUMNS = ["created_at", "outcome", "time_to_resolve_seconds", "app_screen", "issue_category"]
+SUMMED_FIELDS = [
+    "total_orders", "orders_without_help", "orders_with_help", "total_incidences",
+    "converted_count", "resolved_count", "resolution_seconds_total"
+]
+
+
+def _day_bounds(day: date):
+    start = datetime.combine(day, datetime.min.time())
+    return start, start + timedelta(days=1)
+
+
+def merge_days(days: List[dict]) -> dict:
+    """Sum daily rollups into one summary for the range."""
+    merged = {field: 0 for field in SUMMED_FIELDS}
+    categories: Dict[str, int] = {}
+    screens: Dict[str, int] = {}
+    for day in days:
+        for field in SUMMED_FIELDS:
+            merged[field] += day[field] or 0
+        for name, n in (day["top_issue_categories"] or {}).items():
+            categories[name] = categories.get(name, 0) + n
+        for name, n in (day["top_friction_screens"] or {}).items():
+            screens[name] = screens.get(name, 0) + n
+    
+    resolved = merged["resolved_count"]
+    merged["avg_time_to_resolve_seconds"] = merged["resolution_seconds_total"] // resolved if resolved else 0
+    merged["top_issue_categories"] = categories
+    merged["top_friction_screens"] = screens
+    return merged
+
+
+class RollupService:
+    """
+    Computes one row of `analytics_daily` per day and serves date ranges.
+    
+    Closed days (before today) are read from their rollup; today is always
+    aggregated live. Days are aggregated over live and archived incidences,
+    so a rollup can be (re)built for any day in the past. Incidences are
+    attributed to the day they were created, so closing an old incidence
+    changes an earlier day: the rollup job re-rolls the recent days and
+    every day that had an incidence resolved since its last run.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def compute_day(self, day: date) -> dict:
+        """Aggregate one day from the incidence tables (live + archive)."""
+        start, end = _day_bounds(day)
+        source = union_all(*[
+            select(*[getattr(model, name) for name in ROLLUP_COLUMNS])
+            .where(model.created_at >= start, model.created_at < end)
+            for model in (Incidence, ArchivedIncidence)
+        ]).subquery("day_incidences")
+        c = source.c
+        
+        result = await aggregate(
+            self.db, source,
+            metrics=[
+                count("total"),
+                count("converted", c.outcome == "CONVERTED"),
+                count("resolved", c.time_to_resolve_seconds > 0),
+                total("resolution_seconds", c.time_to_resolve_seconds, c.time_to_resolve_seconds > 0),
+            ],
+            dimensions=[
+                Dimension("category", c.issue_category, order_by="total"),
+                Dimension("screen", c.app_screen, order_by="total"),
+            ]
+        )
+        totals = result.totals
+        incidences = totals["total"]
+        resolved = totals["resolved"]
+        resolution_seconds = int(totals["resolution_seconds"] or 0)
+        
+        return {
+            "date": day,
+            "total_orders": incidences * (1 + SELF_SERVE_PER_ASSISTED),
+            "orders_without_help": incidences * SELF_SERVE_PER_ASSISTED,
+            "orders_with_help": incidences,
+            "total_incidences": incidences,
+            "converted_count": totals["converted"],
+            "resolved_count": resolved,
+            "resolution_seconds_total": resolution_seconds,
+            "avg_time_to_resolve_seconds": resolution_seconds // resolved if resolved else 0,
+            "top_issue_categories": {g["category"]: g["total"] for g in result.breakdowns["category"]},
+            "top_friction_screens": {g["screen"]: g["total"] for g in result.breakdowns["screen"]},
+        }
+    
+    async def rollup_day(self, day: date) -> dict:
+        """Compute a day and upsert its `analytics_daily` row."""
+        values = await self.compute_day(day)
+        now = datetime.utcnow()
+        statement = insert(AnalyticsDaily).values(**values, created_at=now, updated_at=now)
+        statement = statement.on_conflict_do_update(
+            index_elements=[AnalyticsDaily.date],
+            set_={
+                **{name: statement.excluded[name] for name in values if name != "date"},
+                "updated_at": now
+            }
+        )
+        await self.db.execute(statement)
+        return values
+    
+    async def get_days(self, start: date, end: date) -> List[dict]:
+        """
+        Daily analytics for start..end (inclusive), oldest first.
+        
+        Closed days come from their rollups (missing ones are rolled up on
+        the spot); today is aggregated live and not stored.
+        """
+        today = date.today()
+        closed_end = min(end, today - timedelta(days=1))
+        
+        rows = {}
+        if start <= closed_end:
+            result = await self.db.execute(
+                select(AnalyticsDaily).where(AnalyticsDaily.date >= start, AnalyticsDaily.date <= closed_end)
+            )
+            for row in result.scalars():
+                rows[row.date] = {
+                    "date": row.date,
+                    **{field: getattr(row, field) for field in SUMMED_FIELDS},
+                    "avg_time_to_resolve_seconds": row.avg_time_to_resolve_seconds,
+                    "top_issue_categories": row.top_issue_categories or {},
+                    "top_friction_screens": row.top_friction_screens or {},
+                }
+            
+            day = start
+            while day <= closed_end:
+                if day not in rows:
+                    rows[day] = await self.rollup_day(day)
+                day += timedelta(days=1)
+        
+        if start <= today <= end:
+            rows[today] = await self.compute_day(today)
+        
+        return [rows[day] for day in sorted(rows)]
+    
+    async def days_resolved_since(self, since: datetime) -> Set[date]:
+        """Creation days of incidences resolved since `since` (late updates)."""
+        result = await self.db.execute(
+            select(cast(Incidence.created_at, Date))
+            .where(Incidence.outcome != "IN_PROGRESS", Incidence.resolved_at >= since)
+            .distinct()
+        )
+        return set(result.scalars().all())
+    
+    async def missing_days(self, limit: int) -> List[date]:
+        """Up to `limit` closed days since the first incidence without a rollup, newest first."""
+        earliest = None
+        for model in (Incidence, ArchivedIncidence):
+            first = await self.db.scalar(select(func.min(model.created_at)))
+            if first and (earliest is None or first < earliest):
+                earliest = first
+        if earliest is None:
+            return []
+        
+        yesterday = date.today() - timedelta(days=1)
+        existing = set((await self.db.execute(
+            select(AnalyticsDaily.date).where(AnalyticsDaily.date >= earliest.date())
+        )).scalars().all())
+        
+        missing = []
+        day = yesterday
+        while day >= earliest.date() and len(missing) < limit:
+            if day not in existing:
+                missing.append(day)
+            day -= timedelta(days=1)
+        return missing
+
+
+async def run_rollup_job(backfill_days: Optional[int] = None) -> List[date]:
+    """
+    Roll up closed days that may have changed.
+    
+    - the last ROLLUP_LOOKBACK_DAYS days (reopened / re-categorised incidences)
+    - days with incidences resolved since the previous run (late closures)
+    - up to `backfill_days` historical days that have no rollup yet
+    
+    Each day is committed separately. Returns the days rolled up.
+    """
+    today = date.today()
+    backfill_days = settings.ROLLUP_BACKFILL_DAYS_PER_RUN if backfill_days is None else backfill_days
+    
+    async with async_session_maker() as session:
+        service = RollupService(session)
+        days = {today - timedelta(days=n) for n in range(1, settings.ROLLUP_LOOKBACK_DAYS + 1)}
+        
+        last_run = await session.scalar(select(func.max(AnalyticsDaily.updated_at)))
+        if last_run:
+            # Overlap by one interval: rolling a day up twice is harmless
+            days |= await service.days_resolved_since(
+                last_run - timedelta(seconds=settings.ROLLUP_INTERVAL_SECONDS)
+            )
+        days |= set(await service.missing_days(backfill_days))
+        days.discard(today)
+    
+    for day in sorted(days):
+        async with async_session_maker() as session:
+            await RollupService(session).rollup_day(day)
+            await session.commit()
+    
+    if days:
+        print(f"📊 Rolled up {len(days)} day(s) into analytics_daily")
+    return sorted(days)
+
+
+async def run_backfill(start: date, end: date) -> int:
+    """Roll up every day from start to end (inclusive, capped at yesterday)."""
+    end = min(end, date.today() - timedelta(days=1))
+    day, rolled = start, 0
+    while day <= end:
+        async with async_session_maker() as session:
+            await RollupService(session).rollup_day(day)
+            await session.commit()
+        day += timedelta(days=1)
+        rolled += 1
+    print(f"📊 Backfilled {rolled} day(s) of analytics_daily")
+    return rolled
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        first = date.fromisoformat(sys.argv[2])
+        last = date.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else date.today()
+        asyncio.run(run_backfill(first, last))
+    else:
+        asyncio.run(run_rollup_job())
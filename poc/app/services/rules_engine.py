@@ -0,0 +1,354 @@
+"""
+Rules Engine - Versioned channel routing and friction rules, hot-swapped at runtime.
+
+The rules live in one JSON document (app/schemas/rules.py: RuleSet), stored
+append-only in `routing_rules`; the highest version is active and version 0
+is the built-in default built from settings. Each worker compiles the active
+document into a decision table:
+
+    order value  -> bisect over the sorted tier bounds -> prebuilt outcome
+    event type   -> EventSet: a frozenset of upper-case types, plus a memo of
+                    each spelling seen, so a request costs one dict lookup
+                    instead of .upper() and a list scan
+
+Publishing a version inserts a row and, after the transaction commits,
+announces the version on the Redis pub/sub channel `rules:updated`. Every
+worker's listener then loads and compiles the latest row and replaces the
+module-level reference in a single assignment. Requests read `current()`
+once, so each evaluates against one consistent version. Listeners reload
+from the database whenever they (re)subscribe, so a notification missed
+while disconnected is caught up on.
+"""
+
+import asyncio
+import math
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from string import Formatter
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import async_session_maker, on_commit, redis_client
+from app.models.incidence import RoutingRuleSet
+from app.schemas.channel import ChannelRouteResponse
+from app.schemas.rules import ChannelOutcome, RuleSet
+
+
+CHANNEL = "rules:updated"
+PENDING_KEY = "rules_versions"
+
+_redis = redis_client
+_listener: Optional[asyncio.Task] = None
+
+
+def default_rules() -> RuleSet:
+    """The rules that applied before the store existed (thresholds from settings)."""
+    premium = {
+        "allowed_channels": ["CHAT", "CALL"],
+        "priority": "HIGH",
+        "help_trigger_text": "Talk to our catering expert",
+        "route_to_group": "premium_support",
+    }
+    return RuleSet.model_validate({
+        "channel": {
+            "tiers": [
+                {
+                    "min_order_value": 0,
+                    "allowed_channels": [],
+                    "priority": "LOW",
+                    "reason": "Order value ₹{order_value:,.0f} below ₹{max:,.0f} threshold",
+                },
+                {
+                    "min_order_value": settings.THRESHOLD_LOW,
+                    "allowed_channels": ["CHAT"],
+                    "priority": "NORMAL",
+                    "help_trigger_text": "Chat with us",
+                    "route_to_group": "general_support",
+                    "reason": "Order value ₹{order_value:,.0f} qualifies for chat support",
+                },
+                {
+                    "min_order_value": settings.THRESHOLD_HIGH,
+                    **premium,
+                    "reason": "Order value ₹{order_value:,.0f} qualifies for premium support",
+                },
+            ],
+            "high_importance_events": ["WEDDING", "CORPORATE", "RELIGIOUS", "GOVERNMENT"],
+            "high_importance": {**premium, "reason": "High-importance event type: {event_type}"},
+        },
+        "friction": {
+            "weights": {
+                "inactivity": 30,
+                "back_nav": 25,
+                "price_check": 20,
+                "high_value_event": 15,
+                "first_time_user": 10,
+                "payment_failure": 40,
+            },
+            "thresholds": {
+                "inactivity_seconds": 60,
+                "back_nav_count": 3,
+                "price_check_count": 5,
+                "payment_retry_count": 1,
+            },
+            "high_value_events": ["WEDDING", "CORPORATE", "RELIGIOUS", "GOVERNMENT"],
+            "help_threshold": settings.FRICTION_THRESHOLD,
+        },
+    })
+
+
+class EventSet(dict):
+    """
+    Case-insensitive event type set: `event_set[event_type]` -> bool.
+    
+    A dict of the spellings seen so far, so a lookup is a plain dict hit;
+    only an unseen spelling is upper-cased (in __missing__) and remembered.
+    """
+    
+    MAX_MEMO = 1024  # Spellings remembered; beyond this lookups still work, just uncached
+    
+    def __init__(self, events: Iterable[str]):
+        super().__init__()
+        self.events = frozenset(event_type.upper() for event_type in events)
+    
+    def __missing__(self, event_type: Optional[str]) -> bool:
+        found = bool(event_type) and event_type.upper() in self.events
+        if len(self) < self.MAX_MEMO:
+            self[event_type] = found
+        return found
+
+
+@dataclass(frozen=True)
+class Outcome:
+    """A prebuilt routing decision."""
+    allowed_channels: Tuple[str, ...]
+    show_help_button: bool
+    priority: str
+    help_trigger_text: Optional[str]
+    route_to_group: Optional[str]
+    reason: str  # Template with {min} and {max} already filled in
+    
+    def decision(self) -> dict:
+        """The outcome without its per-request reason, shared by every batch item it applies to."""
+        return {
+            "allowed_channels": list(self.allowed_channels),
+            "show_help_button": self.show_help_button,
+            "priority": self.priority,
+            "help_trigger_text": self.help_trigger_text,
+            "route_to_group": self.route_to_group,
+        }
+    
+    def response(
+        self,
+        order_value: float,
+        event_type: Optional[str],
+        estimated_wait_seconds: Optional[Dict[str, int]] = None
+    ) -> ChannelRouteResponse:
+        return ChannelRouteResponse(
+            allowed_channels=list(self.allowed_channels),
+            show_help_button=self.show_help_button,
+            priority=self.priority,
+            help_trigger_text=self.help_trigger_text,
+            route_to_group=self.route_to_group,
+            reason=self.reason.format(order_value=order_value, event_type=event_type),
+            estimated_wait_seconds=estimated_wait_seconds
+        )
+
+
+def _escape(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+def _bind_bounds(template: str, low: float, high: float) -> str:
+    """Fill in a tier's constant {min} / {max} so requests only format what varies."""
+    parts = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        parts.append(_escape(literal))
+        if field in ("min", "max"):
+            parts.append(_escape(Formatter().format_field(low if field == "min" else high, spec)))
+        elif field is not None:
+            parts.append("{" + field + (f"!{conversion}" if conversion else "") + (f":{spec}" if spec else "") + "}")
+    return "".join(parts)
+
+
+def _outcome(rule: ChannelOutcome, low: float = 0.0, high: float = math.inf) -> Outcome:
+    try:
+        reason = _bind_bounds(rule.reason, low, high)
+        reason.format(order_value=0.0, event_type="")
+    except (KeyError, IndexError, ValueError) as e:
+        raise ValueError(f"Invalid reason template {rule.reason!r}: {e}")
+    return Outcome(
+        allowed_channels=tuple(rule.allowed_channels),
+        show_help_button=bool(rule.allowed_channels),
+        priority=rule.priority,
+        help_trigger_text=rule.help_trigger_text,
+        route_to_group=rule.route_to_group,
+        reason=reason
+    )
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """Decision table for one rules version."""
+    version: int
+    document: RuleSet
+    comment: Optional[str]
+    created_at: Optional[datetime]
+    
+    bounds: Tuple[float, ...]  # Lower bounds of tiers 1..n
+    tiers: Tuple[Outcome, ...]
+    high_importance: Outcome
+    high_importance_events: EventSet
+    outcomes: Tuple[Outcome, ...]  # Batch decision index -> outcome: the tiers, then high_importance
+    
+    weights: Dict[str, int]
+    thresholds: Dict[str, int]
+    high_value_events: EventSet
+    help_threshold: float
+    
+    def route(self, order_value: float, event_type: Optional[str] = None) -> Outcome:
+        if event_type and self.high_importance_events[event_type]:
+            return self.high_importance
+        return self.tiers[bisect_right(self.bounds, order_value)]
+    
+    def route_batch(
+        self,
+        order_values: Sequence[float],
+        event_types: Optional[Sequence[Optional[str]]] = None
+    ) -> np.ndarray:
+        """
+        Index into `outcomes` for each request; same decisions as route().
+        
+        Order values are bucketed with one searchsorted over the tier bounds;
+        event types are looked up in one C-level pass over the memoised set.
+        """
+        values = np.asarray(order_values, dtype=np.float64)
+        index = np.searchsorted(np.asarray(self.bounds, dtype=np.float64), values, side="right")
+        if event_types is not None:
+            high_importance = np.fromiter(
+                map(self.high_importance_events.__getitem__, event_types), dtype=bool, count=len(values)
+            )
+            index[high_importance] = len(self.tiers)
+        return index
+
+
+def compile_rules(
+    rules: RuleSet,
+    version: int = 0,
+    comment: Optional[str] = None,
+    created_at: Optional[datetime] = None
+) -> CompiledRules:
+    """Build the decision table. Raises ValueError for an invalid reason template."""
+    channel, friction = rules.channel, rules.friction
+    bounds = [tier.min_order_value for tier in channel.tiers]
+    tiers = tuple(
+        _outcome(tier, low, high) for tier, low, high in zip(channel.tiers, bounds, bounds[1:] + [math.inf])
+    )
+    high_importance = _outcome(channel.high_importance)
+    outcomes = tiers + (high_importance,)
+    return CompiledRules(
+        version=version,
+        document=rules,
+        comment=comment,
+        created_at=created_at,
+        bounds=tuple(bounds[1:]),
+        tiers=tiers,
+        high_importance=high_importance,
+        high_importance_events=EventSet(channel.high_importance_events),
+        outcomes=outcomes,
+        weights=dict(friction.weights),
+        thresholds=dict(friction.thresholds),
+        high_value_events=EventSet(friction.high_value_events),
+        help_threshold=friction.help_threshold
+    )
+
+
+_active = compile_rules(default_rules())
+
+
+def current() -> CompiledRules:
+    """The active rules; read once per request."""
+    return _active
+
+
+def route(order_value: float, event_type: Optional[str] = None) -> Outcome:
+    """Channel routing decision under the active rules (CompiledRules.route, inlined for the hot path)."""
+    rules = _active
+    if event_type and rules.high_importance_events[event_type]:
+        return rules.high_importance
+    return rules.tiers[bisect_right(rules.bounds, order_value)]
+
+
+async def refresh() -> CompiledRules:
+    """Load the latest stored version and swap it in if it is newer."""
+    global _active
+    async with async_session_maker() as db:
+        row = await db.scalar(select(RoutingRuleSet).order_by(RoutingRuleSet.version.desc()).limit(1))
+    if row is not None and row.version > _active.version:
+        compiled = compile_rules(RuleSet.model_validate(row.rules), row.version, row.comment, row.created_at)
+        if compiled.version > _active.version:  # A concurrent refresh may have won
+            _active = compiled
+            print(f"📐 Routing rules v{compiled.version} active")
+    return _active
+
+
+async def publish(db, rules: RuleSet, comment: Optional[str] = None) -> RoutingRuleSet:
+    """
+    Store a new version; workers switch to it after the transaction commits.
+    
+    Raises ValueError if the rules do not compile.
+    """
+    compile_rules(rules)
+    row = RoutingRuleSet(rules=rules.model_dump(mode="json"), comment=comment)
+    db.add(row)
+    await db.flush()
+    on_commit(db, PENDING_KEY, lambda versions: _announce(max(versions))).append(row.version)
+    return row
+
+
+async def _announce(version: int):
+    try:
+        await refresh()
+        await _redis.publish(CHANNEL, version)
+    except Exception as e:
+        print(f"⚠️ Announcing routing rules v{version} failed (workers pick it up when they resubscribe): {e}")
+
+
+async def _listen():
+    while True:
+        pubsub = _redis.pubsub()
+        try:
+            await pubsub.subscribe(CHANNEL)
+            await refresh()  # Catch up on versions published while unsubscribed
+            async for message in pubsub.listen():
+                if message["type"] == "message" and int(message["data"]) > _active.version:
+                    await refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Routing rules listener failed, resubscribing: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+async def start():
+    """Load the active rules and start listening for new versions (call from the app lifespan)."""
+    global _listener
+    try:
+        await refresh()
+    except Exception as e:
+        print(f"⚠️ Routing rules not loaded, using v{_active.version}: {e}")
+    if settings.RULES_HOT_RELOAD_ENABLED and _listener is None:
+        _listener = asyncio.create_task(_listen(), name="rules-listener")
+
+
+async def stop():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
@@ -0,0 +1,293 @@
+"""
+Search Service - Full-text search over incidences and their timelines.
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, func, literal, literal_column, or_, union_all
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from uuid import UUID
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.ids import uuid7_floor
+from app.models.incidence import (
+    Incidence, IncidenceTimeline, ArchivedIncidence, ArchivedIncidenceTimeline
+)
+
+
+# Must match the text search configuration used in migration 0007
+TEXT_SEARCH_CONFIG = literal_column("'english'::regconfig")
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=25, MinWords=8, MaxFragments=2"
+
+RESULT_COLUMNS = [
+    "id", "user_id", "user_phone", "order_id", "conversation_id", "stage", "channel",
+    "outcome", "issue_category", "created_at", "resolved_at"
+]
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchService:
+    """
+    Ranked search over timeline content and key incidence fields.
+    
+    Both live and archived incidences are searched. Each tsvector index is
+    asked for at most SEARCH_MAX_CANDIDATES matches, newest incidences first
+    (ids are UUIDv7, so this walks the newest timeline partitions first);
+    those candidates are ranked and paginated. Snippets are only highlighted
+    for the returned page.
+    """
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def search(
+        self,
+        query: Optional[str] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        include_archived: bool = True,
+        limit: int = 20,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Search incidences by text (`query`) and/or partial user id / phone (`user`).
+        
+        Args:
+            query: Web-search style text ("refund -cancelled", "\"late delivery\"")
+            user: Substring of the user id or phone (3+ characters)
+            since / until: Incidence creation window (naive UTC)
+        
+        Returns:
+            {"results": [...], "has_more": bool} ordered by rank, newest first on ties
+        """
+        tsq = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, query) if query else None
+        incidence_tables = [Incidence, ArchivedIncidence] if include_archived else [Incidence]
+        
+        if tsq is not None:
+            timeline_tables = [IncidenceTimeline, ArchivedIncidenceTimeline] if include_archived else [IncidenceTimeline]
+            hits = union_all(
+                *[self._timeline_hits(model, tsq, since, until) for model in timeline_tables],
+                *[self._field_hits(model, tsq, since, until) for model in incidence_tables]
+            ).subquery("hits")
+            scored = (
+                select(hits.c.incidence_id, func.sum(hits.c.rank).label("score"))
+                .group_by(hits.c.incidence_id)
+                .cte("scored")
+            )
+            rows = union_all(*[
+                self._result_rows(model, user, scored) for model in incidence_tables
+            ])
+        else:
+            rows = union_all(*[
+                self._result_rows(model, user, None, since, until) for model in incidence_tables
+            ])
+        
+        page = rows.subquery("page")
+        result = await self.db.execute(
+            select(page)
+            .order_by(page.c.score.desc(), page.c.id.desc())
+            .offset(offset)
+            .limit(limit + 1)
+        )
+        results = [dict(row) for row in result.mappings()]
+        has_more = len(results) > limit
+        results = results[:limit]
+        
+        if tsq is not None and results:
+            snippets = await self._snippets(tsq, [r["id"] for r in results], include_archived)
+            for r in results:
+                r.update(snippets.get(r["id"], {}))
+        
+        return {"results": results, "has_more": has_more}
+    
+    def _id_window(self, id_column, since: Optional[datetime], until: Optional[datetime]) -> list:
+        """Creation-time window as a range on UUIDv7 ids (prunes timeline partitions)."""
+        conditions = []
+        if since:
+            conditions.append(id_column >= uuid7_floor(since))
+        if until:
+            conditions.append(id_column < uuid7_floor(until))
+        return conditions
+    
+    def _timeline_hits(self, model, tsq, since, until):
+        return (
+            select(
+                model.incidence_id,
+                func.ts_rank_cd(model.search_vector, tsq).label("rank")
+            )
+            .where(model.search_vector.bool_op("@@")(tsq), *self._id_window(model.incidence_id, since, until))
+            .order_by(model.incidence_id.desc())
+            .limit(settings.SEARCH_MAX_CANDIDATES)
+        )
+    
+    def _field_hits(self, model, tsq, since, until):
+        return (
+            select(
+                model.id.label("incidence_id"),
+                func.ts_rank_cd(model.search_vector, tsq).label("rank")
+            )
+            .where(model.search_vector.bool_op("@@")(tsq), *self._id_window(model.id, since, until))
+            .order_by(model.id.desc())
+            .limit(settings.SEARCH_MAX_CANDIDATES)
+        )
+    
+    def _result_rows(self, model, user, scored, since=None, until=None):
+        """Incidence columns + score + archived flag, restricted to matches."""
+        columns = [getattr(model, name) for name in RESULT_COLUMNS]
+        archived = literal(model is ArchivedIncidence).label("archived")
+        
+        if scored is not None:
+            query = select(*columns, scored.c.score, archived).join(scored, scored.c.incidence_id == model.id)
+        else:
+            query = (
+                select(*columns, literal(0.0).label("score"), archived)
+                .where(*self._id_window(model.id, since, until))
+                .order_by(model.id.desc())
+                .limit(settings.SEARCH_MAX_CANDIDATES)
+            )
+        
+        if user:
+            pattern = f"%{_escape_like(user)}%"
+            query = query.where(or_(model.user_id.ilike(pattern), model.user_phone.ilike(pattern)))
+        return query
+    
+    async def _snippets(self, tsq, incidence_ids: List[UUID], include_archived: bool) -> Dict[UUID, dict]:
+        """Best matching timeline event per incidence, highlighted; falls back to incidence fields."""
+        timeline_tables = [IncidenceTimeline, ArchivedIncidenceTimeline] if include_archived else [IncidenceTimeline]
+        incidence_tables = [Incidence, ArchivedIncidence] if include_archived else [Incidence]
+        
+        candidates = union_all(
+            *[
+                select(
+                    model.incidence_id,
+                    model.id.label("event_id"),
+                    model.created_at.label("event_created_at"),
+                    func.ts_rank_cd(model.search_vector, tsq).label("rank"),
+                    model.content.label("document")
+                )
+                .where(model.incidence_id.in_(incidence_ids), model.search_vector.bool_op("@@")(tsq))
+                for model in timeline_tables
+            ],
+            *[
+                select(
+                    model.id.label("incidence_id"),
+                    literal(None, type_=model.id.type).label("event_id"),
+                    literal(None, type_=model.created_at.type).label("event_created_at"),
+                    literal(-1.0).label("rank"),
+                    func.concat_ws(
+                        " — ", model.issue_category, model.root_cause, model.call_notes, model.resolution_type
+                    ).label("document")
+                )
+                .where(model.id.in_(incidence_ids))
+                for model in incidence_tables
+            ]
+        ).subquery("candidates")
+        
+        # Pick the best candidate per incidence first: ts_headline is the costly part,
+        # so it runs once per incidence rather than on every matching event
+        best = (
+            select(
+                candidates.c.incidence_id,
+                candidates.c.event_id,
+                candidates.c.event_created_at,
+                candidates.c.document
+            )
+            .distinct(candidates.c.incidence_id)
+            .order_by(candidates.c.incidence_id, candidates.c.rank.desc())
+        ).subquery("best")
+        highlighted = select(
+            best.c.incidence_id,
+            best.c.event_id,
+            best.c.event_created_at,
+            func.ts_headline(TEXT_SEARCH_CONFIG, best.c.document, tsq, HEADLINE_OPTIONS).label("snippet")
+        )
+        result = await self.db.execute(highlighted)
+        return {
+            row["incidence_id"]: {
+                "event_id": row["event_id"],
+                "event_created_at": row["event_created_at"],
+                "snippet": row["snippet"] or None
+            }
+            for row in result.mappings()
+        }
+
+
+# Reindex -------------------------------------------------------------------
+
+def _search_vector_expression(model):
+    """The SQL function from migration 0007 that computes a row's search_vector."""
+    if model in (IncidenceTimeline, ArchivedIncidenceTimeline):
+        return func.timeline_search_vector(model.content)
+    return func.incidence_search_vector(
+        model.issue_category, model.root_cause, model.call_notes, model.resolution_type,
+        model.order_id, model.event_type, model.app_screen
+    )
+
+
+async def reindex_batch(db: AsyncSession, model, after: Optional[UUID], batch_size: int, full: bool) -> List[UUID]:
+    """
+    Compute search_vector for the next `batch_size` rows with id > `after`.
+    
+    Without `full`, only rows whose vector is still NULL (written before
+    migration 0007) are updated. Returns the ids visited, in order.
+    """
+    batch = select(model.id).order_by(model.id).limit(batch_size)
+    if after:
+        batch = batch.where(model.id > after)
+    ids = (await db.execute(batch)).scalars().all()
+    if not ids:
+        return []
+    
+    statement = (
+        update(model)
+        .where(model.id.in_(ids))
+        .values(search_vector=_search_vector_expression(model))
+        .execution_options(synchronize_session=False)
+    )
+    if not full:
+        statement = statement.where(model.search_vector.is_(None))
+    await db.execute(statement)
+    return ids
+
+
+async def run_search_reindex(full: bool = False, batch_size: Optional[int] = None) -> Dict[str, int]:
+    """
+    Backfill (or with `full`, rebuild) search vectors of every searchable table.
+    
+    Walks each table in id order, one transaction per batch, so it can be
+    stopped and re-run at any time. Returns rows visited per table.
+    """
+    batch_size = batch_size or settings.SEARCH_REINDEX_BATCH_SIZE
+    report = {}
+    
+    for model in (Incidence, ArchivedIncidence, IncidenceTimeline, ArchivedIncidenceTimeline):
+        after, visited = None, 0
+        while True:
+            async with async_session_maker() as session:
+                ids = await reindex_batch(session, model, after, batch_size, full)
+                await session.commit()
+            if not ids:
+                break
+            after, visited = ids[-1], visited + len(ids)
+            if visited % (batch_size * 20) == 0:
+                print(f"🔎 {model.__tablename__}: {visited} rows reindexed...")
+        
+        report[model.__tablename__] = visited
+        print(f"🔎 {model.__tablename__}: reindexed {visited} rows")
+    
+    return report
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    
+    if len(sys.argv) > 1 and sys.argv[1] == "reindex":
+        asyncio.run(run_search_reindex(full="--all" in sys.argv))
+    else:
+        print("Usage: python -m app.services.search_service reindex [--all]")
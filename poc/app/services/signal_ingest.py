@@ -0,0 +1,282 @@
+"""
+Signal Ingest - Buffered bulk writer for friction signals.
+
+The mobile app posts signals in batches (JSON, optionally gzip-compressed,
+or msgpack). Accepted signals are appended to an in-process buffer, and a
+single flusher per worker writes it to friction_signals with COPY whenever
+SIGNAL_INGEST_FLUSH_ROWS rows are waiting or SIGNAL_INGEST_FLUSH_SECONDS
+have passed, so one round trip carries thousands of rows instead of one.
+
+Memory is bounded: buffered plus in-flight rows never exceed
+SIGNAL_INGEST_BUFFER_ROWS. When Postgres falls behind, requests wait up to
+SIGNAL_INGEST_ENQUEUE_TIMEOUT_SECONDS for room and are then rejected
+(503, the app retries), rather than growing the buffer. A batch whose COPY
+keeps failing is dropped after SIGNAL_INGEST_MAX_RETRIES attempts and
+counted. The buffer is flushed on shutdown.
+
+A 202 therefore means buffered, not committed: a worker that crashes loses
+up to one buffer of signals, which is acceptable for analytics signals but
+is why /context/friction-signal (one committed row per call) remains.
+
+msgpack is an optional dependency (``pip install msgpack``); without it
+msgpack bodies are rejected as unsupported.
+"""
+
+import asyncio
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import asyncpg
+
+from app.config import settings
+from app.migrations import asyncpg_dsn
+from app.models.ids import uuid7
+from app.schemas.context import FrictionSignalBatch, FrictionSignalCreate
+
+try:
+    import msgpack
+except ImportError:  # Optional: only needed for msgpack request bodies
+    msgpack = None
+
+
+COLUMNS = ("id", "user_id", "session_id", "signal_type", "value", "screen", "created_at")
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+class InvalidPayload(ValueError):
+    """The body could not be decoded."""
+
+
+class PayloadTooLarge(InvalidPayload):
+    """The body, or what it decompresses to, exceeds SIGNAL_INGEST_MAX_BODY_BYTES."""
+
+
+class UnsupportedPayload(ValueError):
+    """Unknown content type or encoding."""
+
+
+class BufferFull(Exception):
+    """No room in the buffer within the enqueue timeout."""
+
+
+def _gunzip(body: bytes, limit: int) -> bytes:
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        data = decompressor.decompress(body, limit + 1)
+    except zlib.error as e:
+        raise InvalidPayload(f"Invalid gzip body: {e}")
+    if len(data) > limit or decompressor.unconsumed_tail:
+        raise PayloadTooLarge(f"Decompressed body exceeds {limit} bytes")
+    return data
+
+
+async def read_body(chunks: AsyncIterator[bytes], content_length: Optional[str]) -> bytes:
+    """
+    Read a request body, refusing it (PayloadTooLarge) as soon as it exceeds
+    SIGNAL_INGEST_MAX_BODY_BYTES: up front from Content-Length, and while
+    streaming for chunked or understated bodies.
+    """
+    limit = settings.SIGNAL_INGEST_MAX_BODY_BYTES
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            raise InvalidPayload(f"Invalid Content-Length: {content_length}")
+        if declared > limit:
+            raise PayloadTooLarge(f"Body exceeds {limit} bytes")
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > limit:
+            raise PayloadTooLarge(f"Body exceeds {limit} bytes")
+    return bytes(body)
+
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Any:
+    """Raw request body -> Python objects, per Content-Encoding and Content-Type."""
+    limit = settings.SIGNAL_INGEST_MAX_BODY_BYTES
+    if len(body) > limit:
+        raise PayloadTooLarge(f"Body exceeds {limit} bytes")
+    
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "gzip":
+        body = _gunzip(body, limit)
+    elif encoding != "identity":
+        raise UnsupportedPayload(f"Unsupported Content-Encoding: {encoding}")
+    
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+    if media_type in MSGPACK_TYPES:
+        if msgpack is None:
+            raise UnsupportedPayload("msgpack is not installed on this server; send JSON")
+        try:
+            return msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise InvalidPayload(f"Invalid msgpack body: {e}")
+    if media_type != "application/json":
+        raise UnsupportedPayload(f"Unsupported Content-Type: {media_type}")
+    try:
+        return json.loads(body)
+    except ValueError as e:
+        raise InvalidPayload(f"Invalid JSON body: {e}")
+
+
+def parse_batch(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> List[FrictionSignalCreate]:
+    """
+    Decode and validate a batch: {"signals": [...]} or a bare array.
+    
+    Raises InvalidPayload / UnsupportedPayload, or pydantic's ValidationError.
+    """
+    data = decode_body(body, content_type, content_encoding)
+    if isinstance(data, list):
+        data = {"signals": data}
+    return FrictionSignalBatch.model_validate(data).signals
+
+
+def to_records(signals: Sequence[FrictionSignalCreate], created_at: datetime) -> List[tuple]:
+    """COPY rows in COLUMNS order."""
+    return [
+        (uuid7(), s.user_id, s.session_id, s.signal_type, s.value, s.screen, created_at)
+        for s in signals
+    ]
+
+
+class SignalBuffer:
+    """Bounded buffer of friction_signals rows, written with COPY by one flusher task."""
+    
+    def __init__(
+        self,
+        table: str = "friction_signals",
+        max_rows: Optional[int] = None,
+        flush_rows: Optional[int] = None,
+        flush_seconds: Optional[float] = None
+    ):
+        self.table = table
+        self.max_rows = max_rows or settings.SIGNAL_INGEST_BUFFER_ROWS
+        self.flush_rows = flush_rows or settings.SIGNAL_INGEST_FLUSH_ROWS
+        self.flush_seconds = flush_seconds or settings.SIGNAL_INGEST_FLUSH_SECONDS
+        
+        self._rows: List[tuple] = []
+        self._in_flight = 0
+        self._space = asyncio.Condition()
+        self._due = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._conn: Optional[asyncpg.Connection] = None
+        
+        self.accepted = 0
+        self.written = 0
+        self.dropped = 0
+        self.rejected = 0
+        self.flushes = 0
+    
+    @property
+    def pending(self) -> int:
+        """Rows buffered or being written."""
+        return len(self._rows) + self._in_flight
+    
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run(), name=f"signal-flusher:{self.table}")
+    
+    def _reject_if_stopping(self, rows: List[tuple]):
+        # No flusher runs after stop(); rows accepted now would never be written
+        if self._stopping:
+            self.rejected += len(rows)
+            raise BufferFull("Shutting down, not accepting signals")
+    
+    async def add(self, rows: List[tuple], timeout: Optional[float] = None):
+        """Buffer rows, waiting up to `timeout` seconds for room. Raises BufferFull (also once stopping)."""
+        if len(rows) > self.max_rows:
+            raise ValueError(f"At most {self.max_rows} rows per call")
+        self._reject_if_stopping(rows)
+        self._ensure_flusher()
+        timeout = settings.SIGNAL_INGEST_ENQUEUE_TIMEOUT_SECONDS if timeout is None else timeout
+        async with self._space:
+            try:
+                await asyncio.wait_for(
+                    self._space.wait_for(lambda: self.pending + len(rows) <= self.max_rows), timeout
+                )
+            except asyncio.TimeoutError:
+                self.rejected += len(rows)
+                raise BufferFull(f"{self.pending} signals waiting to be written")
+            # stop() may have begun while this call waited for room
+            self._reject_if_stopping(rows)
+            self._rows.extend(rows)
+            self.accepted += len(rows)
+            if len(self._rows) >= self.flush_rows:
+                self._due.set()
+    
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._due.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._due.clear()
+            try:
+                await self._write_pending()
+            except Exception as e:
+                print(f"⚠️ Friction signal flush failed: {e}")
+    
+    async def _write_pending(self):
+        async with self._write_lock:
+            if not self._rows:
+                return
+            batch, self._rows = self._rows, []
+            self._in_flight = len(batch)
+            try:
+                await self._copy(batch)
+            finally:
+                self._in_flight = 0
+                async with self._space:
+                    self._space.notify_all()
+    
+    async def _copy(self, batch: List[tuple]):
+        for attempt in range(1, settings.SIGNAL_INGEST_MAX_RETRIES + 1):
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._conn = await asyncpg.connect(asyncpg_dsn())
+                await self._conn.copy_records_to_table(self.table, records=batch, columns=COLUMNS)
+                self.written += len(batch)
+                self.flushes += 1
+                return
+            except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError) as e:
+                error = e
+                await asyncio.sleep(0.5 * attempt)
+        self.dropped += len(batch)
+        print(f"⚠️ Dropped {len(batch)} friction signals after {attempt} failed COPY attempts: {error}")
+    
+    async def flush(self):
+        """Write everything buffered so far."""
+        while self._rows:
+            await self._write_pending()
+    
+    async def stop(self):
+        """Stop the flusher, write what is left and close the connection (call on shutdown)."""
+        # Let a COPY in progress finish rather than cancelling it
+        self._stopping = True
+        self._due.set()
+        if self._flusher is not None:
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+    
+    def stats(self) -> dict:
+        return {
+            "buffered": self.pending,
+            "capacity": self.max_rows,
+            "accepted": self.accepted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+        }
+
+
+signal_buffer = SignalBuffer()
@@ -0,0 +1,112 @@
+"""
+Timer Wheel - Hierarchical timing wheel for many timers with O(1) insert, cancel and tick.
+
+Time is cut into ticks. Level 0 has one slot per tick for the next
+`slots[0]` ticks; each slot of level l spans a whole revolution of level
+l - 1. A timer goes into the lowest level whose horizon covers it. When
+a level-l slot comes round, its timers are re-inserted and fall into lower
+levels, so every timer moves down at most once per level before it fires
+from level 0. Timers beyond the top level wait in an overflow map, checked
+once per top-level slot.
+
+With the default (60, 60, 24) slots and 1 s ticks, level 0 covers the next
+minute at second resolution, level 1 the next hour, and level 2 the next day.
+"""
+
+import math
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+class TimerWheel:
+    """Due keys come back from advance(); schedule() again to move a timer, cancel() to drop it."""
+    
+    def __init__(self, now: float, tick_seconds: float = 1.0, slots: Sequence[int] = (60, 60, 24)):
+        self.tick_seconds = tick_seconds
+        self.slots = tuple(slots)
+        self.spans = tuple(math.prod(self.slots[:level]) for level in range(len(self.slots)))
+        self.levels: List[List[Dict[Hashable, int]]] = [[{} for _ in range(n)] for n in self.slots]
+        self.overflow: Dict[Hashable, int] = {}
+        self.where: Dict[Hashable, Tuple[int, int]] = {}  # key -> (level, slot); level -1 = overflow
+        self.current = self._tick_of(now)
+    
+    def _tick_of(self, at: float) -> int:
+        return math.floor(at / self.tick_seconds)
+    
+    def __len__(self) -> int:
+        return len(self.where)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.where
+    
+    def _place(self, key: Hashable, tick: int, due: List[Hashable]):
+        if tick <= self.current:
+            due.append(key)
+            return
+        for level, (n, span) in enumerate(zip(self.slots, self.spans)):
+            if tick // span - self.current // span < n:
+                slot = (tick // span) % n
+                self.levels[level][slot][key] = tick
+                self.where[key] = (level, slot)
+                return
+        self.overflow[key] = tick
+        self.where[key] = (-1, 0)
+    
+    def schedule(self, key: Hashable, at: float) -> bool:
+        """
+        Set `key` to fire at epoch time `at`, replacing any earlier timer for it.
+        Returns True if it is already due (it is then not kept; handle it now).
+        """
+        self.cancel(key)
+        due: List[Hashable] = []
+        self._place(key, self._tick_of(at), due)
+        return bool(due)
+    
+    def cancel(self, key: Hashable) -> bool:
+        location = self.where.pop(key, None)
+        if location is None:
+            return False
+        level, slot = location
+        if level < 0:
+            del self.overflow[key]
+        else:
+            del self.levels[level][slot][key]
+        return True
+    
+    def due_at(self, key: Hashable) -> Optional[float]:
+        """Epoch time (start of the tick) a key fires at."""
+        location = self.where.get(key)
+        if location is None:
+            return None
+        level, slot = location
+        tick = self.overflow[key] if level < 0 else self.levels[level][slot][key]
+        return tick * self.tick_seconds
+    
+    def advance(self, now: float) -> List[Hashable]:
+        """Move the wheel to `now` and return the keys that came due, in firing order."""
+        target = self._tick_of(now)
+        due: List[Hashable] = []
+        while self.current < target:
+            self.current += 1
+            tick = self.current
+            # Cascade from the top so timers fall all the way down within this tick
+            for level in range(len(self.slots) - 1, 0, -1):
+                span = self.spans[level]
+                if tick % span == 0:
+                    if level == len(self.slots) - 1 and self.overflow:
+                        waiting, self.overflow = self.overflow, {}
+                        for key, at in waiting.items():
+                            del self.where[key]
+                            self._place(key, at, due)
+                    bucket = self.levels[level][(tick // span) % self.slots[level]]
+                    if bucket:
+                        self.levels[level][(tick // span) % self.slots[level]] = {}
+                        for key, at in bucket.items():
+                            del self.where[key]
+                            self._place(key, at, due)
+            bucket = self.levels[0][tick % self.slots[0]]
+            if bucket:
+                self.levels[0][tick % self.slots[0]] = {}
+                for key in bucket:
+                    del self.where[key]
+                due.extend(bucket)
+        return due
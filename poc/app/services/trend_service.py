@@ -0,0 +1,378 @@
+"""
+Trend Service - Time series over incidences and friction signals.
+
+Series are read from pre-aggregated bucket tables (incidence_trends,
+friction_signal_trends) holding additive measures per minute / hour / day
+and dimension combination, so a 90-day chart sums a few thousand small rows
+instead of scanning the raw tables.
+
+The refresh job keeps the buckets current incrementally:
+
+    minute, hour   recomputed from the raw rows of every bucket that changed
+                   since the last run: new rows, and incidences resolved
+                   since then (their outcome moves the conversion rate)
+    day            recomputed from its hour buckets
+
+Outcome changes that do not set resolved_at (e.g. a reopen through update)
+are picked up by `rebuild`. Reads fill gaps (every bucket of the range is
+returned) and downsample long ranges to at most TREND_MAX_POINTS points by
+merging consecutive buckets.
+"""
+
+import math
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, func, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.incidence import (
+    Incidence, ArchivedIncidence, FrictionSignal, IncidenceTrend, FrictionSignalTrend
+)
+
+
+ADVISORY_LOCK_ID = 4_726_012  # One worker refreshes the buckets at a time
+
+BUCKETS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+FILLS = ("null", "zero", "previous")
+
+
+@dataclass(frozen=True)
+class TrendMetric:
+    """numerator / denominator * scale per point; a plain sum when there is no denominator."""
+    numerator: str
+    denominator: Optional[str] = None
+    scale: float = 1
+
+
+@dataclass(frozen=True)
+class TrendSource:
+    model: type
+    dimensions: Dict[str, str]  # API name -> column of the trend table
+    measures: Tuple[str, ...]  # Additive columns
+    samples: str  # Measure reported as the sample size of a point
+    metrics: Dict[str, TrendMetric]
+
+
+SOURCES = {
+    "incidences": TrendSource(
+        model=IncidenceTrend,
+        dimensions={
+            "screen": "app_screen", "event_type": "event_type", "channel": "channel", "stage": "stage"
+        },
+        measures=("incidences", "converted", "friction_sum", "friction_count"),
+        samples="incidences",
+        metrics={
+            "count": TrendMetric("incidences"),
+            "avg_friction": TrendMetric("friction_sum", "friction_count"),
+            "conversion_rate": TrendMetric("converted", "incidences", 100),
+        },
+    ),
+    "friction_signals": TrendSource(
+        model=FrictionSignalTrend,
+        dimensions={"screen": "screen", "signal_type": "signal_type"},
+        measures=("signals", "value_sum", "value_count"),
+        samples="signals",
+        metrics={
+            "count": TrendMetric("signals"),
+            "avg_value": TrendMetric("value_sum", "value_count"),
+        },
+    ),
+}
+
+
+def truncate(at: datetime, bucket: str) -> datetime:
+    """Start of the minute / hour / day containing `at`."""
+    if bucket == "minute":
+        return at.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _incidence_buckets(granularity: str, buckets: List[datetime], now: datetime):
+    """INSERT ... SELECT of incidence_trends rows for `buckets`, from live + archived incidences."""
+    low, high = min(buckets), max(buckets) + BUCKETS[granularity]
+    source = union_all(*[
+        select(
+            model.created_at, model.app_screen, model.event_type, model.channel, model.stage,
+            model.outcome, model.friction_score
+        )
+        .where(model.created_at >= low, model.created_at < high)
+        for model in (Incidence, ArchivedIncidence)
+    ]).subquery("raw")
+    c = source.c
+    bucket_start = func.date_trunc(granularity, c.created_at)
+    app_screen = func.coalesce(c.app_screen, "")
+    event_type = func.coalesce(c.event_type, "")
+    query = (
+        select(
+            literal(granularity), bucket_start, app_screen, event_type, c.channel, c.stage,
+            func.count(), func.count().filter(c.outcome == "CONVERTED"),
+            func.coalesce(func.sum(c.friction_score), 0), func.count(c.friction_score),
+            literal(now)
+        )
+        .where(bucket_start.in_(buckets))
+        .group_by(bucket_start, app_screen, event_type, c.channel, c.stage)
+    )
+    columns = [
+        "granularity", "bucket_start", "app_screen", "event_type", "channel", "stage",
+        "incidences", "converted", "friction_sum", "friction_count", "updated_at"
+    ]
+    return insert(IncidenceTrend).from_select(columns, query)
+
+
+def _signal_buckets(granularity: str, buckets: List[datetime], now: datetime):
+    """INSERT ... SELECT of friction_signal_trends rows for `buckets`."""
+    low, high = min(buckets), max(buckets) + BUCKETS[granularity]
+    bucket_start = func.date_trunc(granularity, FrictionSignal.created_at)
+    screen = func.coalesce(FrictionSignal.screen, "")
+    query = (
+        select(
+            literal(granularity), bucket_start, screen, FrictionSignal.signal_type,
+            func.count(), func.coalesce(func.sum(FrictionSignal.value), 0), func.count(FrictionSignal.value),
+            literal(now)
+        )
+        .where(
+            FrictionSignal.created_at >= low, FrictionSignal.created_at < high,
+            bucket_start.in_(buckets)
+        )
+        .group_by(bucket_start, screen, FrictionSignal.signal_type)
+    )
+    columns = ["granularity", "bucket_start", "screen", "signal_type", "signals", "value_sum", "value_count",
+               "updated_at"]
+    return insert(FrictionSignalTrend).from_select(columns, query)
+
+
+RAW_BUCKETS = {"incidences": _incidence_buckets, "friction_signals": _signal_buckets}
+
+
+class TrendService:
+    """Maintains the trend bucket tables and serves gap-filled, downsampled series."""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    # Maintenance --------------------------------------------------------------
+    
+    async def recompute(self, source: str, minutes: Set[datetime]):
+        """Recompute the minute, hour and day buckets containing `minutes`."""
+        if not minutes:
+            return
+        model = SOURCES[source].model
+        dimensions = list(SOURCES[source].dimensions.values())
+        measures = SOURCES[source].measures
+        now = datetime.utcnow()
+        minute_cutoff = now - timedelta(days=settings.TREND_MINUTE_RETENTION_DAYS)
+        
+        raw = {
+            # Minute buckets past their retention would only be purged again
+            "minute": sorted({truncate(m, "minute") for m in minutes if m >= minute_cutoff}),
+            "hour": sorted({truncate(m, "hour") for m in minutes}),
+        }
+        for granularity, buckets in raw.items():
+            if not buckets:
+                continue
+            await self.db.execute(
+                delete(model).where(model.granularity == granularity, model.bucket_start.in_(buckets))
+            )
+            await self.db.execute(RAW_BUCKETS[source](granularity, buckets, now))
+        
+        days = sorted({truncate(minute, "day") for minute in minutes})
+        await self.db.execute(delete(model).where(model.granularity == "day", model.bucket_start.in_(days)))
+        day_start = func.date_trunc("day", model.bucket_start)
+        hours = (
+            select(
+                literal("day"), day_start, *[getattr(model, name) for name in dimensions],
+                *[func.sum(getattr(model, name)) for name in measures],
+                literal(now)
+            )
+            .where(
+                model.granularity == "hour",
+                model.bucket_start >= days[0], model.bucket_start < days[-1] + BUCKETS["day"],
+                day_start.in_(days)
+            )
+            .group_by(day_start, *[getattr(model, name) for name in dimensions])
+        )
+        columns = ["granularity", "bucket_start", *dimensions, *measures, "updated_at"]
+        await self.db.execute(insert(model).from_select(columns, hours))
+    
+    async def changed_minutes(self, source: str, since: datetime) -> Set[datetime]:
+        """Minute buckets whose rows changed since `since`."""
+        if source == "friction_signals":
+            minute = func.date_trunc("minute", FrictionSignal.created_at)
+            query = select(minute).where(FrictionSignal.created_at >= since).distinct()
+        else:
+            minute = func.date_trunc("minute", Incidence.created_at).label("minute")
+            query = union_all(
+                select(minute).where(Incidence.created_at >= since),
+                select(minute).where(Incidence.outcome != "IN_PROGRESS", Incidence.resolved_at >= since)
+            )
+            query = select(query.subquery().c[0]).distinct()
+        return set((await self.db.execute(query)).scalars().all())
+    
+    async def purge_minutes(self):
+        """Drop minute buckets older than TREND_MINUTE_RETENTION_DAYS."""
+        cutoff = datetime.utcnow() - timedelta(days=settings.TREND_MINUTE_RETENTION_DAYS)
+        for source in SOURCES.values():
+            model = source.model
+            await self.db.execute(
+                delete(model).where(model.granularity == "minute", model.bucket_start < cutoff)
+            )
+    
+    # Reads --------------------------------------------------------------------
+    
+    async def series(
+        self,
+        source: str,
+        metric: str,
+        bucket: str,
+        start: datetime,
+        end: datetime,
+        group_by: Optional[str] = None,
+        fill: str = "null",
+        limit: int = 10,
+        max_points: Optional[int] = None
+    ) -> dict:
+        """
+        One series per group (or a single overall series) over [start, end).
+        
+        Every bucket of the range gets a point; buckets without data have a
+        sample count of 0 and a value filled per `fill` (sums are always 0).
+        When the range has more than `max_points` buckets, consecutive buckets
+        are merged and `step_seconds` reports the resulting point width.
+        Only the `limit` groups with the most samples are returned.
+        """
+        spec = SOURCES[source]
+        definition = spec.metrics[metric]
+        model = spec.model
+        width = BUCKETS[bucket]
+        start = truncate(start, bucket)
+        
+        n_buckets = max(1, math.ceil((end - start) / width))
+        per_point = math.ceil(n_buckets / (max_points or settings.TREND_MAX_POINTS))
+        step = width * per_point
+        n_points = math.ceil(n_buckets / per_point)
+        
+        group_columns = [getattr(model, spec.dimensions[group_by]).label("group")] if group_by else []
+        point = func.floor(func.extract("epoch", model.bucket_start - start) / step.total_seconds())
+        query = (
+            select(
+                point.label("point"), *group_columns,
+                *[func.sum(getattr(model, name)).label(name) for name in spec.measures]
+            )
+            .where(model.granularity == bucket, model.bucket_start >= start, model.bucket_start < end)
+            .group_by(text("1"), *[column.element for column in group_columns])
+        )
+        
+        groups: Dict[Optional[str], Dict[int, dict]] = {}
+        for row in (await self.db.execute(query)).mappings():
+            groups.setdefault(row["group"] if group_by else None, {})[int(row["point"])] = row
+        
+        largest = sorted(
+            groups.items(),
+            key=lambda item: sum(row[spec.samples] or 0 for row in item[1].values()),
+            reverse=True
+        )[:limit]
+        if not group_by and not largest:
+            largest = [(None, {})]
+        
+        series = []
+        for group, points in largest:
+            values, previous = [], None
+            for i in range(n_points):
+                row = points.get(i)
+                samples = int(row[spec.samples] or 0) if row else 0
+                value = self._value(definition, row)
+                if value is None and definition.denominator:
+                    value = {"null": None, "zero": 0.0, "previous": previous}[fill]
+                previous = value if value is not None else previous
+                values.append({"t": start + step * i, "value": value, "samples": samples})
+            series.append({"group": group if group != "" else "(none)", "points": values})
+        
+        return {
+            "source": source,
+            "metric": metric,
+            "bucket": bucket,
+            "step_seconds": int(step.total_seconds()),
+            "start": start,
+            "end": end,
+            "group_by": group_by,
+            "series": series,
+        }
+    
+    def _value(self, definition: TrendMetric, row) -> Optional[float]:
+        numerator = float(row[definition.numerator] or 0) if row else 0.0
+        if not definition.denominator:
+            return numerator
+        denominator = float(row[definition.denominator] or 0) if row else 0.0
+        if not denominator:
+            return None
+        return round(numerator / denominator * definition.scale, 2)
+
+
+async def run_trend_refresh() -> Dict[str, int]:
+    """
+    Recompute the buckets changed since the last run (one worker at a time).
+    
+    The previous run is the newest updated_at of the source's trend rows,
+    overlapped by two intervals; without one, only the current hour is
+    refreshed (use `rebuild` for history).
+    """
+    report = {}
+    async with async_session_maker() as session:
+        if not await session.scalar(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_ID))):
+            return report  # Another worker is on it
+        
+        service = TrendService(session)
+        now = datetime.utcnow()
+        for name, spec in SOURCES.items():
+            last_run = await session.scalar(select(func.max(spec.model.updated_at)))
+            if last_run:
+                since = last_run - timedelta(seconds=2 * settings.TREND_REFRESH_INTERVAL_SECONDS)
+            else:
+                since = truncate(now, "hour")
+            minutes = await service.changed_minutes(name, since)
+            await service.recompute(name, minutes)
+            report[name] = len(minutes)
+        await service.purge_minutes()
+        await session.commit()
+    return report
+
+
+async def rebuild(start: datetime, end: datetime) -> int:
+    """Recompute every bucket of [start, end), one day per transaction. Returns days rebuilt."""
+    day, rebuilt = truncate(start, "day"), 0
+    while day < end:
+        minutes = {day + BUCKETS["minute"] * i for i in range(24 * 60)}
+        async with async_session_maker() as session:
+            if not await session.scalar(select(func.pg_try_advisory_xact_lock(ADVISORY_LOCK_ID))):
+                raise RuntimeError("A trend refresh is running, try again")
+            service = TrendService(session)
+            for name in SOURCES:
+                await service.recompute(name, minutes)
+            await session.commit()
+        day += BUCKETS["day"]
+        rebuilt += 1
+    print(f"📈 Rebuilt trend buckets for {rebuilt} day(s)")
+    return rebuilt
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+    
+    if len(sys.argv) > 2 and sys.argv[1] == "rebuild":
+        first = datetime.fromisoformat(sys.argv[2])
+        last = datetime.fromisoformat(sys.argv[3]) if len(sys.argv) > 3 else datetime.utcnow()
+        asyncio.run(rebuild(first, last))
+    else:
+        print(asyncio.run(run_trend_refresh()))
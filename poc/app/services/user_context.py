@@ -0,0 +1,137 @@
+"""
+User Context - Field-level storage of the mobile app's user context in Redis.
+
+Each user's context is one hash, expiring CONTEXT_TTL_SECONDS after the
+last update:
+
+    context:{user_id}   hash
+        current_screen, session_id, event_date, ...   one field per ContextUpdate field
+        cart                                          cart items, compact JSON rows
+                                                      [item_id, name, quantity, price]
+
+An update writes only the fields it carries (HSET) and refreshes the TTL in
+the same pipelined round trip, so a screen change sends a few bytes instead
+of the whole context, and fields left out by one call keep their last
+value. The cart is replaced as a whole when `cart_items` is sent.
+
+Reads decode fields back to their schema types; `read(user_id, fields)`
+fetches only the named fields with HMGET, and `read_many` reads hundreds of
+users in one pipelined round trip.
+"""
+
+import json
+from typing import Dict, Iterable, List, Optional
+
+from app.config import settings
+from app.database import redis_client
+from app.schemas.context import ContextUpdate
+
+
+CART_FIELD = "cart"
+CART_COLUMNS = ("item_id", "name", "quantity", "price")
+
+# Field -> decoder of its hash value; cart_items is stored as CART_FIELD
+INT_FIELDS = ("guest_count", "inactivity_seconds", "back_nav_count", "price_check_count", "payment_retry_count")
+FLOAT_FIELDS = ("cart_value",)
+DECODERS = {
+    name: int if name in INT_FIELDS else float if name in FLOAT_FIELDS else str
+    for name in ContextUpdate.model_fields
+    if name not in ("user_id", "cart_items")
+}
+FIELDS = tuple(DECODERS) + ("cart_items",)
+
+_redis = redis_client
+
+
+def key(user_id: str) -> str:
+    return f"context:{user_id}"
+
+
+def _hash_field(name: str) -> str:
+    return CART_FIELD if name == "cart_items" else name
+
+
+def encode(context: ContextUpdate) -> Dict[str, str]:
+    """Hash fields of the values an update carries."""
+    fields = {}
+    for name in DECODERS:
+        value = getattr(context, name)
+        if value is not None:
+            fields[name] = str(value)
+    if context.cart_items is not None:
+        fields[CART_FIELD] = json.dumps(
+            [[item.item_id, item.name, item.quantity, item.price] for item in context.cart_items],
+            separators=(",", ":")
+        )
+    return fields
+
+
+def decode(raw: Dict[str, Optional[str]]) -> dict:
+    """Context dict of hash fields; missing fields are left out."""
+    context = {}
+    for field, value in raw.items():
+        if value is None:
+            continue
+        if field == CART_FIELD:
+            context["cart_items"] = [dict(zip(CART_COLUMNS, row)) for row in json.loads(value)]
+        elif field in DECODERS:
+            context[field] = DECODERS[field](value)
+    return context
+
+
+def unknown_fields(names: Iterable[str]) -> List[str]:
+    return [name for name in names if name not in FIELDS]
+
+
+async def update(context: ContextUpdate) -> List[str]:
+    """Merge the update's fields into the user's context and refresh its TTL; returns the fields written."""
+    fields = encode(context)
+    name = key(context.user_id)
+    async with _redis.pipeline(transaction=False) as pipe:
+        if fields:
+            pipe.hset(name, mapping=fields)
+        pipe.expire(name, settings.CONTEXT_TTL_SECONDS)
+        await pipe.execute()
+    return ["cart_items" if field == CART_FIELD else field for field in fields]
+
+
+def _queue_read(pipe, user_id: str, names: Optional[List[str]]):
+    if names:
+        pipe.hmget(key(user_id), names)
+        pipe.exists(key(user_id))
+    else:
+        pipe.hgetall(key(user_id))
+
+
+def _decode_read(replies: list, names: Optional[List[str]]) -> Optional[dict]:
+    if names:
+        values, exists = replies
+        return decode(dict(zip(names, values))) if exists else None
+    raw, = replies
+    return decode(raw) if raw else None
+
+
+async def read(user_id: str, fields: Optional[List[str]] = None) -> Optional[dict]:
+    """The user's context (only `fields`, if given), or None once it has expired."""
+    names = [_hash_field(name) for name in fields] if fields else None
+    async with _redis.pipeline(transaction=False) as pipe:
+        _queue_read(pipe, user_id, names)
+        replies = await pipe.execute()
+    return _decode_read(replies, names)
+
+
+async def read_many(user_ids: List[str], fields: Optional[List[str]] = None) -> Dict[str, Optional[dict]]:
+    """Contexts of many users in one round trip; {user_id: context or None}."""
+    unique = list(dict.fromkeys(user_ids))
+    if not unique:
+        return {}
+    names = [_hash_field(name) for name in fields] if fields else None
+    per_user = 2 if names else 1
+    async with _redis.pipeline(transaction=False) as pipe:
+        for user_id in unique:
+            _queue_read(pipe, user_id, names)
+        replies = await pipe.execute()
+    return {
+        user_id: _decode_read(replies[i * per_user:(i + 1) * per_user], names)
+        for i, user_id in enumerate(unique)
+    }
@@ -0,0 +1,168 @@
+"""
+Analytics Aggregation Benchmark
+
+Seeds a scratch schema with N incidences spread over the last 7 days and
+times the weekly report and today's KPIs two ways:
+
+- rows:      the previous implementation (load every incidence of the window
+             as an ORM object, count and tally in Python)
+- push-down: AnalyticsService, which runs GROUPING SETS aggregates in SQL
+
+Reports latency (best of --repeat runs) and peak Python memory per approach.
+
+Usage (from poc/):
+    python -m benchmarks.bench_analytics                        # 100k and 1M
+    python -m benchmarks.bench_analytics --rows 100000 --repeat 5
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.config import settings
+from app.migrations import apply_migrations, asyncpg_dsn
+from app.models.incidence import Incidence
+from app.services.analytics_service import AnalyticsService
+
+
+SEED_SQL = """
+INSERT INTO incidences (
+    id, user_id, stage, channel, trigger, app_screen, cart_value, event_type,
+    friction_score, outcome, issue_category, created_at, resolved_at, time_to_resolve_seconds
+)
+SELECT
+    uuid_v7_at(ts), 'user_' || (g % 50000),
+    CASE WHEN g % 3 = 0 THEN 'POST_ORDER' ELSE 'PRE_ORDER' END,
+    CASE WHEN g % 20 = 0 THEN 'CALL' WHEN g % 7 = 0 THEN 'WHATSAPP' ELSE 'IN_APP_CHAT' END,
+    'USER_INITIATED',
+    (ARRAY['checkout', 'menu', 'cart', 'payment', 'platter', 'address', 'guests'])[1 + g % 7],
+    g % 60000,
+    (ARRAY['WEDDING', 'BIRTHDAY', 'CORPORATE', 'HOUSEWARMING'])[1 + g % 4],
+    g % 100,
+    CASE WHEN g % 25 = 0 THEN 'IN_PROGRESS'
+         ELSE (ARRAY['RESOLVED', 'CONVERTED', 'DROPPED'])[1 + g % 3] END,
+    (ARRAY['pricing', 'menu', 'delivery', 'payment', 'customization', 'other'])[1 + g % 6],
+    ts,
+    CASE WHEN g % 25 <> 0 THEN ts + make_interval(secs => 60 + g % 1200) END,
+    CASE WHEN g % 25 <> 0 THEN 60 + g % 1200 END
+FROM generate_series(1, $1) AS g,
+     LATERAL (SELECT NOW() - make_interval(secs => (g::float * 604800 / $1)) AS ts) AS t
+"""
+
+
+async def weekly_report_from_rows(db: AsyncSession) -> Dict:
+    """The pre-push-down weekly report: every row of the week through Python."""
+    week_start = datetime.combine(date.today() - timedelta(days=7), datetime.min.time())
+    incidences = (await db.execute(select(Incidence).where(Incidence.created_at >= week_start))).scalars().all()
+
+    resolved = [i for i in incidences if i.time_to_resolve_seconds]
+    avg_minutes = sum(i.time_to_resolve_seconds for i in resolved) / len(resolved) / 60 if resolved else 0
+    counts: Dict[str, int] = {}
+    for i in incidences:
+        if i.issue_category:
+            counts[i.issue_category] = counts.get(i.issue_category, 0) + 1
+    top = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:10]
+    return {"total": len(incidences), "avg_minutes": avg_minutes, "top": top}
+
+
+async def kpis_from_rows(db: AsyncSession) -> Dict:
+    """The pre-push-down KPIs: every row of today through Python."""
+    today_start = datetime.combine(date.today(), datetime.min.time())
+    incidences = (await db.execute(select(Incidence).where(Incidence.created_at >= today_start))).scalars().all()
+
+    screens: Dict[str, int] = {}
+    categories: Dict[str, int] = {}
+    for i in incidences:
+        if i.app_screen:
+            screens[i.app_screen] = screens.get(i.app_screen, 0) + 1
+        if i.issue_category:
+            categories[i.issue_category] = categories.get(i.issue_category, 0) + 1
+    return {
+        "total": len(incidences),
+        "converted": sum(1 for i in incidences if i.outcome == "CONVERTED"),
+        "open": sum(1 for i in incidences if i.outcome == "IN_PROGRESS"),
+        "screens": sorted(screens.items(), key=lambda x: x[1], reverse=True)[:5],
+        "categories": sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5],
+    }
+
+
+async def measure(session_factory, func, repeat: int) -> Dict:
+    best = float("inf")
+    tracemalloc.start()
+    for _ in range(repeat):
+        async with session_factory() as db:
+            started = time.perf_counter()
+            await func(db)
+            best = min(best, time.perf_counter() - started)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"ms": best * 1000, "peak_mb": peak / 1024 / 1024}
+
+
+async def bench_rows(rows: int, repeat: int) -> list:
+    schema = f"bench_analytics_{uuid.uuid4().hex[:8]}"
+    conn = await asyncpg.connect(asyncpg_dsn())
+    engine = None
+    try:
+        await conn.execute(f"CREATE SCHEMA {schema}")
+        await conn.execute(f"SET search_path TO {schema}, public")
+        await apply_migrations(conn)
+        print(f"🌱 Seeding {rows:,} incidences over the last 7 days...")
+        await conn.execute(SEED_SQL, rows)
+        await conn.execute("ANALYZE incidences")
+
+        engine = create_async_engine(
+            settings.DATABASE_URL,
+            connect_args={"server_settings": {"search_path": f"{schema},public"}}
+        )
+
+        def session_factory():
+            return AsyncSession(engine, expire_on_commit=False)
+
+        cases = [
+            ("weekly report", "rows", weekly_report_from_rows),
+            ("weekly report", "push-down", lambda db: AnalyticsService(db).get_weekly_report()),
+            ("kpis (today)", "rows", kpis_from_rows),
+            ("kpis (today)", "push-down", lambda db: AnalyticsService(db).get_kpis()),
+        ]
+        results = []
+        for report, approach, func in cases:
+            print(f"⏱️  {report} / {approach}...")
+            results.append({"rows": rows, "report": report, "approach": approach,
+                            **await measure(session_factory, func, repeat)})
+        return results
+    finally:
+        if engine is not None:
+            await engine.dispose()
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await conn.close()
+
+
+async def main(row_counts: list, repeat: int):
+    results = []
+    for rows in row_counts:
+        results.extend(await bench_rows(rows, repeat))
+
+    print(f"\n{'rows/week':>10}  {'report':<15}{'approach':<11}{'ms':>10}{'peak MB':>10}")
+    for r in results:
+        print(f"{r['rows']:>10,}  {r['report']:<15}{r['approach']:<11}{r['ms']:>10,.1f}{r['peak_mb']:>10,.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row-loading vs SQL push-down analytics benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
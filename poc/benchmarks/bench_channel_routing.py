@@ -0,0 +1,110 @@
+"""
+Batch Channel Routing Benchmark
+
+Routes N synthetic carts two ways, in-process (no network, database or Redis):
+
+- single: one POST /api/v1/channel/route per cart (what the listing screens do today)
+- batch:  POST /api/v1/channel/route/batch with --batch carts per call
+
+both through the FastAPI stack (httpx ASGI transport), and at service level:
+ChannelRouter.get_allowed_channels in a loop vs ChannelRouter.route_batch.
+Checks the batch decisions match the single-item ones first.
+
+Usage (from poc/):
+    python -m benchmarks.bench_channel_routing
+    python -m benchmarks.bench_channel_routing --carts 100000 --batch 10000 --single 5000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI
+
+from app.routers.channel import router
+from app.schemas.channel import ChannelRouteRequest
+from app.services.channel_router import ChannelRouter
+
+
+EVENT_TYPES = [None, "wedding", "Wedding", "birthday", "corporate", "housewarming", "religious", "anniversary"]
+
+
+def make_carts(count: int, seed: int = 7) -> Tuple[List[float], List[Optional[str]]]:
+    rng = random.Random(seed)
+    return (
+        [round(rng.uniform(0, 60_000), 2) for _ in range(count)],
+        [rng.choice(EVENT_TYPES) for _ in range(count)],
+    )
+
+
+def check_agreement(service: ChannelRouter, values: List[float], events: List[Optional[str]]):
+    batch = service.route_batch(values, events, include_reasons=True)
+    for i, (value, event_type) in enumerate(zip(values, events)):
+        single = service.get_allowed_channels(ChannelRouteRequest(order_value=value, event_type=event_type))
+        expected = single.model_dump()
+        reason = expected.pop("reason")
+        assert batch["decisions"][batch["decision_index"][i]] == expected, i
+        assert batch["reasons"][i] == reason, i
+
+
+def bench_service(service: ChannelRouter, values, events, batch: int) -> List[Tuple[str, float]]:
+    started = time.perf_counter()
+    for value, event_type in zip(values, events):
+        service.get_allowed_channels(ChannelRouteRequest(order_value=value, event_type=event_type))
+    single = len(values) / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for start in range(0, len(values), batch):
+        service.route_batch(values[start:start + batch], events[start:start + batch])
+    batched = len(values) / (time.perf_counter() - started)
+    return [("service, single", single), ("service, batch", batched)]
+
+
+async def bench_http(values, events, batch: int, single_count: int) -> List[Tuple[str, float]]:
+    app = FastAPI()
+    app.include_router(router)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        started = time.perf_counter()
+        for value, event_type in zip(values[:single_count], events[:single_count]):
+            response = await client.post("/api/v1/channel/route", json={"order_value": value, "event_type": event_type})
+            response.raise_for_status()
+        single = single_count / (time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for start in range(0, len(values), batch):
+            response = await client.post("/api/v1/channel/route/batch", json={
+                "order_values": values[start:start + batch],
+                "event_types": events[start:start + batch],
+            })
+            response.raise_for_status()
+        batched = len(values) / (time.perf_counter() - started)
+    return [("HTTP, single", single), ("HTTP, batch", batched)]
+
+
+def main(carts: int, batch: int, single_count: int):
+    print(f"🎲 Generating {carts:,} carts...")
+    values, events = make_carts(carts)
+    service = ChannelRouter()
+    check_agreement(service, values[:10_000], events[:10_000])
+
+    print("⏱️  Service level...")
+    results = bench_service(service, values, events, batch)
+    print(f"⏱️  HTTP ({single_count:,} single requests, batches of {batch:,})...")
+    results += asyncio.run(bench_http(values, events, batch, min(single_count, carts)))
+
+    print(f"\n{'path':<18}{'carts/s':>14}")
+    for name, per_sec in results:
+        print(f"{name:<18}{per_sec:>14,.0f}")
+    print(f"   HTTP batch is {results[3][1] / results[2][1]:,.0f}x the single-item endpoint")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single vs batch channel routing benchmark")
+    parser.add_argument("--carts", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=5_000, help="Carts per batch call")
+    parser.add_argument("--single", type=int, default=5_000, help="Single-item HTTP requests to time")
+    args = parser.parse_args()
+    main(args.carts, args.batch, args.single)
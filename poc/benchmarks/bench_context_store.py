@@ -0,0 +1,117 @@
+"""
+User Context Storage Benchmark
+
+Replays app sessions of context updates and compares, per update:
+
+- blob:   the whole context sent by the app and written with one SETEX of its JSON
+          (how /context/update stored context before field-level hashes)
+- fields: only the changed fields sent, merged with HSET + EXPIRE in one pipeline
+
+Sizes are request bodies and the Redis commands as sent on the wire (RESP),
+packed locally, so no Redis server is needed. Encoding time is per update.
+
+Usage (from poc/):
+    python -m benchmarks.bench_context_store                  # 2,000 sessions
+    python -m benchmarks.bench_context_store --sessions 10000 --cart-items 12
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import List, Tuple
+
+from redis.connection import Connection
+
+from app.config import settings
+from app.schemas.context import ContextUpdate
+from app.services import user_context
+
+
+SCREENS = ["menu", "platter", "customize", "cart", "checkout", "payment"]
+EVENT_TYPES = ["wedding", "birthday", "corporate", "house_party"]
+
+
+def make_sessions(count: int, cart_items: int, seed: int = 7) -> List[List[Tuple[dict, dict]]]:
+    """Per session, the (full context, changed fields) of each update the app sends."""
+    rng = random.Random(seed)
+    sessions = []
+    for n in range(count):
+        items = [
+            {"item_id": f"item_{rng.randrange(5000)}", "name": f"Dish {rng.randrange(5000)}",
+             "quantity": rng.randrange(1, 40), "price": round(rng.uniform(80, 900), 2)}
+            for _ in range(cart_items)
+        ]
+        state = {
+            "user_id": f"user_{n}", "session_id": f"session_{n}", "current_screen": "menu",
+            "cart_items": items, "cart_value": round(sum(i["quantity"] * i["price"] for i in items), 2),
+            "guest_count": rng.randrange(10, 300), "event_date": "2026-11-14",
+            "event_type": rng.choice(EVENT_TYPES), "selected_platter": f"Platter {rng.randrange(40)}",
+            "inactivity_seconds": 0, "back_nav_count": 0, "price_check_count": 0, "payment_retry_count": 0,
+        }
+        updates = []
+        for _ in range(rng.randrange(10, 40)):
+            roll = rng.random()
+            if roll < 0.6:
+                change = {"current_screen": rng.choice(SCREENS)}
+            elif roll < 0.9:
+                field = rng.choice(["inactivity_seconds", "back_nav_count", "price_check_count"])
+                change = {field: state[field] + rng.randrange(1, 30)}
+            else:
+                item = rng.choice(state["cart_items"])
+                item["quantity"] = rng.randrange(1, 40)
+                change = {
+                    "cart_items": [dict(i) for i in state["cart_items"]],
+                    "cart_value": round(sum(i["quantity"] * i["price"] for i in state["cart_items"]), 2),
+                }
+            state.update(change)
+            updates.append((json.loads(json.dumps(state)), {"user_id": state["user_id"], **change}))
+        sessions.append(updates)
+    return sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--cart-items", type=int, default=8)
+    args = parser.parse_args()
+
+    updates = [u for session in make_sessions(args.sessions, args.cart_items) for u in session]
+    wire = Connection()
+    ttl = settings.CONTEXT_TTL_SECONDS
+
+    def resp_bytes(*commands) -> int:
+        return sum(len(chunk) for command in commands for chunk in wire.pack_command(*command))
+
+    blob_body = blob_redis = 0
+    started = time.perf_counter()
+    for full, _ in updates:
+        context = ContextUpdate.model_validate(full)
+        value = json.dumps(context.model_dump(exclude_none=True))
+        blob_body += len(json.dumps(full))
+        blob_redis += resp_bytes(("SETEX", f"user_context:{context.user_id}", ttl, value))
+    blob_seconds = time.perf_counter() - started
+
+    field_body = field_redis = 0
+    started = time.perf_counter()
+    for _, change in updates:
+        context = ContextUpdate.model_validate(change)
+        fields = user_context.encode(context)
+        name = user_context.key(context.user_id)
+        field_body += len(json.dumps(change))
+        field_redis += resp_bytes(
+            ("HSET", name, *[part for item in fields.items() for part in item]),
+            ("EXPIRE", name, ttl)
+        )
+    field_seconds = time.perf_counter() - started
+
+    n = len(updates)
+    print(f"{n:,} updates from {args.sessions:,} sessions, {args.cart_items} cart items each\n")
+    print(f"{'':8} {'body B/update':>14} {'redis B/update':>15} {'encode us/update':>17}")
+    print(f"{'blob':8} {blob_body / n:>14.0f} {blob_redis / n:>15.0f} {blob_seconds / n * 1e6:>17.1f}")
+    print(f"{'fields':8} {field_body / n:>14.0f} {field_redis / n:>15.0f} {field_seconds / n * 1e6:>17.1f}")
+    print(f"\nbody {blob_body / field_body:.1f}x smaller, redis {blob_redis / field_redis:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
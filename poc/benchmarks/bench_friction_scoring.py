@@ -0,0 +1,112 @@
+"""
+Friction Scoring Benchmark
+
+Scores N synthetic sessions two ways:
+
+- scalar:     FrictionService.calculate_score, one FrictionDetectRequest at a time
+              (the /friction/detect path; request objects are built outside the timer)
+- vectorised: FrictionService.calculate_scores over columns (the /friction/detect/batch path)
+
+Checks that both agree on the first 1,000 sessions, then reports the best of
+--repeat runs and sessions per second. No database is needed.
+
+Usage (from poc/):
+    python -m benchmarks.bench_friction_scoring                   # 1k, 100k and 1M
+    python -m benchmarks.bench_friction_scoring --sessions 100000 --repeat 5
+"""
+
+import argparse
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.schemas.context import FrictionDetectRequest
+from app.services.friction_service import FrictionService
+
+
+EVENT_TYPES = [None, "WEDDING", "BIRTHDAY", "CORPORATE", "HOUSEWARMING", "RELIGIOUS"]
+SCREENS = [None, "checkout", "cart", "menu", "platter", "payment", "customize", "address", "guests"]
+
+# Scalar requests are built and scored in chunks to bound memory at 1M sessions
+CHUNK = 100_000
+
+
+def make_columns(sessions: int, seed: int = 7) -> Dict[str, List]:
+    rng = np.random.default_rng(seed)
+    return {
+        "inactivity_seconds": rng.integers(0, 180, sessions).tolist(),
+        "back_nav_count": rng.integers(0, 8, sessions).tolist(),
+        "price_check_count": rng.integers(0, 10, sessions).tolist(),
+        "payment_retry_count": rng.integers(0, 3, sessions).tolist(),
+        "is_first_time_user": (rng.random(sessions) < 0.3).tolist(),
+        "event_type": [EVENT_TYPES[i] for i in rng.integers(0, len(EVENT_TYPES), sessions)],
+        "current_screen": [SCREENS[i] for i in rng.integers(0, len(SCREENS), sessions)],
+    }
+
+
+def requests_for(columns: Dict[str, List], start: int, end: int) -> List[FrictionDetectRequest]:
+    return [
+        FrictionDetectRequest.model_construct(
+            user_id=f"user_{i}", cart_value=0, **{field: values[i] for field, values in columns.items()}
+        )
+        for i in range(start, end)
+    ]
+
+
+def score_scalar(service: FrictionService, columns: Dict[str, List]) -> float:
+    """Seconds spent in calculate_score over every session."""
+    sessions = len(columns["inactivity_seconds"])
+    elapsed = 0.0
+    for start in range(0, sessions, CHUNK):
+        requests = requests_for(columns, start, min(start + CHUNK, sessions))
+        started = time.perf_counter()
+        for request in requests:
+            service.calculate_score(request)
+        elapsed += time.perf_counter() - started
+    return elapsed
+
+
+def score_vectorised(service: FrictionService, columns: Dict[str, List]) -> float:
+    started = time.perf_counter()
+    service.calculate_scores(**columns)
+    return time.perf_counter() - started
+
+
+def check_agreement(service: FrictionService, columns: Dict[str, List], sample: int = 1000):
+    sample = min(sample, len(columns["inactivity_seconds"]))
+    head = {field: values[:sample] for field, values in columns.items()}
+    batch = service.calculate_scores(**head)
+    for i, request in enumerate(requests_for(head, 0, sample)):
+        single = service.calculate_score(request)
+        breakdown = {signal: int(points[i]) for signal, points in batch["breakdown"].items() if points[i]}
+        assert single.friction_score == batch["friction_score"][i], i
+        assert single.should_show_help == batch["should_show_help"][i], i
+        assert single.help_message == batch["help_message"][i], i
+        assert single.breakdown == breakdown, i
+
+
+def main(session_counts: List[int], repeat: int):
+    service = FrictionService()
+    results = []
+    for sessions in session_counts:
+        print(f"🎲 Generating {sessions:,} sessions...")
+        columns = make_columns(sessions)
+        check_agreement(service, columns)
+        for approach, func in (("scalar", score_scalar), ("vectorised", score_vectorised)):
+            print(f"⏱️  {approach}...")
+            best = min(func(service, columns) for _ in range(repeat))
+            results.append({"sessions": sessions, "approach": approach, "ms": best * 1000,
+                            "per_sec": sessions / best if best else float("inf")})
+
+    print(f"\n{'sessions':>10}  {'approach':<12}{'ms':>10}{'sessions/s':>14}")
+    for r in results:
+        print(f"{r['sessions']:>10,}  {r['approach']:<12}{r['ms']:>10,.1f}{r['per_sec']:>14,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scalar vs vectorised friction scoring benchmark")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.sessions, args.repeat)
@@ -0,0 +1,118 @@
+"""
+Channel Routing Rules Benchmark
+
+Routes N synthetic requests two ways:
+
+- legacy:   the original ChannelRouter branches (event_type.upper() + list
+            membership, then if/elif on settings thresholds), kept here as reference
+- compiled: rules_engine.route, the decision table built from the active
+            rules (memoised event-type set + bisect over tier bounds)
+
+Checks both give identical responses on every request, then times the routing
+decision alone and the full ChannelRouteResponse, best of --repeat runs.
+No database or Redis is needed (built-in default rules).
+
+Usage (from poc/):
+    python -m benchmarks.bench_rules_engine
+    python -m benchmarks.bench_rules_engine --requests 1000000 --repeat 5
+"""
+
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+from app.config import settings
+from app.schemas.channel import ChannelRouteResponse
+from app.services import rules_engine
+
+
+# Mixed-case spellings as clients send them
+EVENT_TYPES = [None, "wedding", "Wedding", "WEDDING", "birthday", "Birthday", "corporate", "housewarming",
+               "religious", "Government", "anniversary"]
+HIGH_IMPORTANCE_EVENTS = ["WEDDING", "CORPORATE", "RELIGIOUS", "GOVERNMENT"]
+
+
+def legacy_decision(order_value: float, event_type: Optional[str]) -> str:
+    if event_type and event_type.upper() in HIGH_IMPORTANCE_EVENTS:
+        return "HIGH"
+    if order_value < settings.THRESHOLD_LOW:
+        return "LOW"
+    elif order_value < settings.THRESHOLD_HIGH:
+        return "NORMAL"
+    return "HIGH"
+
+
+def legacy_response(order_value: float, event_type: Optional[str]) -> ChannelRouteResponse:
+    if event_type and event_type.upper() in HIGH_IMPORTANCE_EVENTS:
+        return ChannelRouteResponse(
+            allowed_channels=["CHAT", "CALL"], show_help_button=True, priority="HIGH",
+            help_trigger_text="Talk to our catering expert", route_to_group="premium_support",
+            reason=f"High-importance event type: {event_type}"
+        )
+    if order_value < settings.THRESHOLD_LOW:
+        return ChannelRouteResponse(
+            allowed_channels=[], show_help_button=False, priority="LOW", help_trigger_text=None,
+            route_to_group=None,
+            reason=f"Order value ₹{order_value:,.0f} below ₹{settings.THRESHOLD_LOW:,.0f} threshold"
+        )
+    elif order_value < settings.THRESHOLD_HIGH:
+        return ChannelRouteResponse(
+            allowed_channels=["CHAT"], show_help_button=True, priority="NORMAL",
+            help_trigger_text="Chat with us", route_to_group="general_support",
+            reason=f"Order value ₹{order_value:,.0f} qualifies for chat support"
+        )
+    return ChannelRouteResponse(
+        allowed_channels=["CHAT", "CALL"], show_help_button=True, priority="HIGH",
+        help_trigger_text="Talk to our catering expert", route_to_group="premium_support",
+        reason=f"Order value ₹{order_value:,.0f} qualifies for premium support"
+    )
+
+
+def compiled_decision(order_value: float, event_type: Optional[str]) -> str:
+    return rules_engine.route(order_value, event_type).priority
+
+
+def compiled_response(order_value: float, event_type: Optional[str]) -> ChannelRouteResponse:
+    return rules_engine.route(order_value, event_type).response(order_value, event_type)
+
+
+def make_requests(count: int, seed: int = 7) -> List[Tuple[float, Optional[str]]]:
+    rng = random.Random(seed)
+    return [(rng.choice([rng.uniform(0, 60_000), 5000.0, 25000.0]), rng.choice(EVENT_TYPES)) for _ in range(count)]
+
+
+def best_of(func, requests, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for order_value, event_type in requests:
+            func(order_value, event_type)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(count: int, repeat: int):
+    print(f"🎲 Generating {count:,} routing requests...")
+    requests = make_requests(count)
+    for order_value, event_type in requests[:100_000]:
+        assert legacy_response(order_value, event_type) == compiled_response(order_value, event_type)
+
+    results = []
+    for name, func in (("legacy decision", legacy_decision), ("compiled decision", compiled_decision),
+                       ("legacy response", legacy_response), ("compiled response", compiled_response)):
+        print(f"⏱️  {name}...")
+        seconds = best_of(func, requests, repeat)
+        results.append((name, seconds * 1e9 / count, count / seconds))
+
+    print(f"\n{'path':<20}{'ns/request':>12}{'requests/s':>14}")
+    for name, ns, per_sec in results:
+        print(f"{name:<20}{ns:>12,.0f}{per_sec:>14,.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Legacy vs compiled channel routing benchmark")
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.requests, args.repeat)
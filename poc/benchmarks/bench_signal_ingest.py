@@ -0,0 +1,182 @@
+"""
+Bulk Friction Signal Ingestion Benchmark
+
+Measures what one worker can ingest, in three parts:
+
+- decode:     parse + validate request bodies of --batch signals (JSON, gzip JSON,
+              msgpack), the CPU cost of /context/friction-signals/batch per signal
+- baseline:   one INSERT + commit per signal (what /context/friction-signal costs)
+- buffered:   --concurrency producers decode msgpack bodies and feed a SignalBuffer,
+              which COPYs into the table; timed until the last row is written
+
+Rows go to a scratch table shaped like friction_signals (same columns and
+indexes, not partitioned), dropped afterwards. The target is 50,000
+signals/s for the buffered path.
+
+Usage (from poc/):
+    python -m benchmarks.bench_signal_ingest                       # 1M signals, batches of 500
+    python -m benchmarks.bench_signal_ingest --signals 200000 --batch 1000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import random
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.migrations import asyncpg_dsn
+from app.models.ids import uuid7
+from app.services import signal_ingest
+from app.services.signal_ingest import SignalBuffer, parse_batch, to_records
+
+
+TABLE = "bench_friction_signals"
+TARGET_PER_SEC = 50_000
+SIGNAL_TYPES = ["inactivity", "back_nav", "price_check", "payment_retry"]
+SCREENS = ["checkout", "cart", "menu", "platter", "payment", "customize"]
+
+
+def make_signals(count: int, seed: int = 7) -> List[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "user_id": f"user_{rng.randrange(50_000)}",
+            "session_id": f"session_{rng.randrange(200_000)}",
+            "signal_type": rng.choice(SIGNAL_TYPES),
+            "value": rng.randrange(0, 180),
+            "screen": rng.choice(SCREENS),
+        }
+        for _ in range(count)
+    ]
+
+
+def encode_bodies(signals: List[dict], batch: int) -> Dict[str, List[tuple]]:
+    """encoding -> [(body, content_type, content_encoding)]"""
+    chunks = [signals[i:i + batch] for i in range(0, len(signals), batch)]
+    bodies = {
+        "json": [(json.dumps({"signals": c}).encode(), "application/json", None) for c in chunks],
+        "gzip json": [
+            (gzip.compress(json.dumps({"signals": c}).encode(), 6), "application/json", "gzip") for c in chunks
+        ],
+    }
+    if signal_ingest.msgpack is not None:
+        bodies["msgpack"] = [
+            (signal_ingest.msgpack.packb({"signals": c}), "application/msgpack", None) for c in chunks
+        ]
+    return bodies
+
+
+def bench_decode(bodies: Dict[str, List[tuple]], signals: int) -> List[dict]:
+    results = []
+    for encoding, payloads in bodies.items():
+        started = time.perf_counter()
+        for payload in payloads:
+            parse_batch(*payload)
+        elapsed = time.perf_counter() - started
+        size = sum(len(body) for body, _, _ in payloads)
+        results.append({"encoding": encoding, "per_sec": signals / elapsed, "bytes": size / signals})
+    return results
+
+
+async def create_table(conn: asyncpg.Connection):
+    await conn.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await conn.execute(f"""
+        CREATE TABLE {TABLE} (
+            id UUID PRIMARY KEY,
+            user_id VARCHAR(255) NOT NULL,
+            session_id VARCHAR(255) NOT NULL,
+            signal_type VARCHAR(50) NOT NULL,
+            value NUMERIC(10, 2),
+            screen VARCHAR(100),
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+    await conn.execute(f"CREATE INDEX ON {TABLE} (user_id, session_id)")
+    await conn.execute(f"CREATE INDEX ON {TABLE} (created_at)")
+
+
+async def bench_baseline(conn: asyncpg.Connection, signals: List[dict]) -> float:
+    """Signals per second, one autocommitted INSERT each."""
+    started = time.perf_counter()
+    for s in signals:
+        await conn.execute(
+            f"INSERT INTO {TABLE} (id, user_id, session_id, signal_type, value, screen, created_at) "
+            f"VALUES ($1, $2, $3, $4, $5, $6, $7)",
+            uuid7(), s["user_id"], s["session_id"], s["signal_type"], s["value"], s["screen"], datetime.utcnow()
+        )
+    return len(signals) / (time.perf_counter() - started)
+
+
+async def bench_buffered(payloads: List[tuple], signals: int, concurrency: int) -> dict:
+    buffer = SignalBuffer(table=TABLE)
+    queue: asyncio.Queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+
+    async def producer():
+        while not queue.empty():
+            batch = parse_batch(*queue.get_nowait())
+            await buffer.add(to_records(batch, datetime.utcnow()), timeout=60)
+            await asyncio.sleep(0)  # Yield like a request handler would
+
+    started = time.perf_counter()
+    await asyncio.gather(*(producer() for _ in range(concurrency)))
+    accepted = time.perf_counter() - started
+    await buffer.stop()
+    elapsed = time.perf_counter() - started
+    assert buffer.written == signals, buffer.stats()
+    return {"per_sec": signals / elapsed, "accept_per_sec": signals / accepted, "flushes": buffer.flushes}
+
+
+async def main(signals: int, batch: int, concurrency: int, baseline_signals: int):
+    print(f"🎲 Generating {signals:,} signals...")
+    data = make_signals(signals)
+    bodies = encode_bodies(data, batch)
+
+    print("⏱️  Decoding request bodies...")
+    decode = bench_decode(bodies, signals)
+
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        await create_table(conn)
+        print(f"⏱️  Baseline: {baseline_signals:,} single-row INSERTs...")
+        baseline = await bench_baseline(conn, data[:baseline_signals])
+        await conn.execute(f"TRUNCATE {TABLE}")
+
+        encoding = "msgpack" if "msgpack" in bodies else "gzip json"
+        print(f"⏱️  Buffered COPY: {signals:,} signals from {encoding} bodies, {concurrency} producers...")
+        buffered = await bench_buffered(bodies[encoding], signals, concurrency)
+        await conn.execute(f"DROP TABLE {TABLE}")
+    finally:
+        await conn.close()
+
+    print(f"\n{'decode':<12}{'signals/s':>14}{'bytes/signal':>14}")
+    for r in decode:
+        print(f"{r['encoding']:<12}{r['per_sec']:>14,.0f}{r['bytes']:>14,.1f}")
+
+    print(f"\n{'write path':<34}{'signals/s':>14}")
+    print(f"{'single-row INSERT':<34}{baseline:>14,.0f}")
+    print(f"{'buffered COPY (accepted)':<34}{buffered['accept_per_sec']:>14,.0f}")
+    print(f"{'buffered COPY (written, end to end)':<34}{buffered['per_sec']:>14,.0f}")
+    print(f"   {buffered['flushes']} COPY flushes, {buffered['per_sec'] / baseline:,.0f}x the single-row path")
+
+    verdict = "✅" if buffered["per_sec"] >= TARGET_PER_SEC else "❌"
+    print(f"{verdict} Target {TARGET_PER_SEC:,} signals/s per worker")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk friction signal ingestion benchmark")
+    parser.add_argument("--signals", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=500, help="Signals per request body")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent producers (requests)")
+    parser.add_argument("--baseline-signals", type=int, default=5_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.signals, args.batch, args.concurrency, args.baseline_signals))
@@ -0,0 +1,111 @@
+"""
+UUIDv4 vs UUIDv7 Primary Key Benchmark
+
+Inserts the same number of rows into two scratch tables shaped like
+incidence_timeline, one keyed by uuid.uuid4 and one by app.models.ids.uuid7,
+using COPY in fixed-size batches. Reports insert throughput (overall and for
+the last batch, where random inserts suffer most) and primary-key index size.
+
+Usage (from poc/):
+    python -m benchmarks.bench_uuid_keys                 # 10M rows
+    python -m benchmarks.bench_uuid_keys --rows 1000000 --batch 50000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime
+
+import asyncpg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.migrations import asyncpg_dsn
+from app.models.ids import uuid7
+
+
+GENERATORS = {
+    "uuid4": uuid.uuid4,
+    "uuid7": uuid7,
+}
+
+
+async def bench_generator(conn: asyncpg.Connection, name: str, rows: int, batch: int) -> dict:
+    table = f"bench_keys_{name}"
+    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+    await conn.execute(f"""
+        CREATE TABLE {table} (
+            id UUID PRIMARY KEY,
+            event_type VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP NOT NULL
+        )
+    """)
+
+    generate = GENERATORS[name]
+    inserted = 0
+    total_seconds = 0.0
+    last_batch_rate = 0.0
+
+    while inserted < rows:
+        size = min(batch, rows - inserted)
+        now = datetime.utcnow()
+        records = [(generate(), "MESSAGE", now) for _ in range(size)]
+
+        started = time.perf_counter()
+        await conn.copy_records_to_table(table, records=records)
+        elapsed = time.perf_counter() - started
+
+        total_seconds += elapsed
+        last_batch_rate = size / elapsed
+        inserted += size
+
+    index_bytes = await conn.fetchval(f"SELECT pg_relation_size('{table}_pkey')")
+    table_bytes = await conn.fetchval(f"SELECT pg_relation_size('{table}')")
+
+    leaf_density = None
+    try:
+        leaf_density = await conn.fetchval(
+            f"SELECT avg_leaf_density FROM pgstatindex('{table}_pkey')"
+        )
+    except asyncpg.PostgresError:
+        pass  # pgstattuple extension not installed
+
+    await conn.execute(f"DROP TABLE {table}")
+
+    return {
+        "generator": name,
+        "rows_per_sec": rows / total_seconds,
+        "last_batch_rows_per_sec": last_batch_rate,
+        "index_mb": index_bytes / 1024 / 1024,
+        "table_mb": table_bytes / 1024 / 1024,
+        "leaf_density": leaf_density,
+    }
+
+
+async def main(rows: int, batch: int):
+    conn = await asyncpg.connect(asyncpg_dsn())
+    try:
+        results = []
+        for name in GENERATORS:
+            print(f"⏱️  Inserting {rows:,} rows keyed by {name}...")
+            results.append(await bench_generator(conn, name, rows, batch))
+    finally:
+        await conn.close()
+
+    print(f"\n{'generator':<10}{'rows/s':>12}{'last batch/s':>14}{'pk index MB':>13}{'table MB':>10}{'leaf %':>8}")
+    for r in results:
+        density = f"{r['leaf_density']:.1f}" if r["leaf_density"] is not None else "n/a"
+        print(
+            f"{r['generator']:<10}{r['rows_per_sec']:>12,.0f}{r['last_batch_rows_per_sec']:>14,.0f}"
+            f"{r['index_mb']:>13,.1f}{r['table_mb']:>10,.1f}{density:>8}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UUIDv4 vs UUIDv7 primary key benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.batch))
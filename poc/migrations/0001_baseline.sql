@@ -1,4 +1,5 @@
--- Initialize database tables for Support-Led Ordering System
+-- 0001: Baseline schema for Support-Led Ordering System
+-- (formerly init.sql)
 
 -- Enable UUID extension
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
@@ -31,6 +32,8 @@ CREATE TABLE IF NOT EXISTS incidences (
     
     -- Metadata
     agent_id VARCHAR(255),
+    user_phone VARCHAR(20),
+    call_notes TEXT,
     created_at TIMESTAMP DEFAULT NOW(),
     resolved_at TIMESTAMP,
     time_to_resolve_seconds INTEGER
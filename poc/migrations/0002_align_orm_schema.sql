@@ -0,0 +1,93 @@
+-- 0002: Repair drift between databases created by Base.metadata.create_all
+-- and the canonical schema in 0001.
+--
+-- Older deployments created their tables from the ORM models, which used
+-- JSON instead of JSONB, FLOAT instead of DECIMAL, a TIMESTAMP for
+-- analytics_daily.date and no CHECK constraints or server-side defaults.
+-- Databases created from init.sql were missing user_phone / call_notes.
+-- Every statement here is a no-op on a database that already matches 0001.
+
+-- Columns added to the ORM after init.sql was written
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS user_phone VARCHAR(20);
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS call_notes TEXT;
+
+-- Column types
+ALTER TABLE incidences
+    ALTER COLUMN cart_value TYPE DECIMAL(10,2),
+    ALTER COLUMN friction_score TYPE DECIMAL(5,2);
+
+ALTER TABLE incidence_timeline
+    ALTER COLUMN event_metadata TYPE JSONB USING event_metadata::jsonb;
+
+ALTER TABLE friction_signals
+    ALTER COLUMN value TYPE DECIMAL(10,2);
+
+ALTER TABLE analytics_daily
+    ALTER COLUMN date TYPE DATE USING date::date,
+    ALTER COLUMN top_issue_categories TYPE JSONB USING top_issue_categories::jsonb,
+    ALTER COLUMN top_friction_screens TYPE JSONB USING top_friction_screens::jsonb;
+
+-- Server-side defaults (create_all only set Python-side defaults)
+ALTER TABLE incidences
+    ALTER COLUMN id SET DEFAULT uuid_generate_v4(),
+    ALTER COLUMN cart_value SET DEFAULT 0,
+    ALTER COLUMN friction_score SET DEFAULT 0,
+    ALTER COLUMN outcome SET DEFAULT 'IN_PROGRESS',
+    ALTER COLUMN created_at SET DEFAULT NOW();
+ALTER TABLE incidence_timeline
+    ALTER COLUMN id SET DEFAULT uuid_generate_v4(),
+    ALTER COLUMN created_at SET DEFAULT NOW();
+ALTER TABLE friction_signals
+    ALTER COLUMN id SET DEFAULT uuid_generate_v4(),
+    ALTER COLUMN created_at SET DEFAULT NOW();
+ALTER TABLE analytics_daily
+    ALTER COLUMN id SET DEFAULT uuid_generate_v4(),
+    ALTER COLUMN created_at SET DEFAULT NOW();
+
+-- CHECK constraints, using the names PostgreSQL gives the inline checks in 0001.
+-- Added NOT VALID so legacy rows written through the free-text close endpoint
+-- do not block the migration; new rows are still checked.
+DO $$
+DECLARE
+    spec RECORD;
+BEGIN
+    FOR spec IN
+        SELECT * FROM (VALUES
+            ('incidences', 'incidences_stage_check',
+             'CHECK (stage IN (''PRE_ORDER'', ''POST_ORDER''))'),
+            ('incidences', 'incidences_channel_check',
+             'CHECK (channel IN (''IN_APP_CHAT'', ''CALL'', ''WHATSAPP''))'),
+            ('incidences', 'incidences_trigger_check',
+             'CHECK (trigger IN (''USER_INITIATED'', ''SYSTEM_INITIATED''))'),
+            ('incidences', 'incidences_outcome_check',
+             'CHECK (outcome IN (''IN_PROGRESS'', ''RESOLVED'', ''DROPPED'', ''CONVERTED''))'),
+            ('incidences', 'incidences_order_impact_check',
+             'CHECK (order_impact IN (''PLACED'', ''MODIFIED'', ''LOST'', ''NONE''))'),
+            ('incidence_timeline', 'incidence_timeline_actor_check',
+             'CHECK (actor IN (''USER'', ''AGENT'', ''SYSTEM''))')
+        ) AS t(table_name, constraint_name, definition)
+    LOOP
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_constraint
+            WHERE conname = spec.constraint_name
+              AND conrelid = spec.table_name::regclass
+        ) THEN
+            EXECUTE format(
+                'ALTER TABLE %I ADD CONSTRAINT %I %s NOT VALID',
+                spec.table_name, spec.constraint_name, spec.definition
+            );
+        END IF;
+    END LOOP;
+END
+$$;
+
+-- Indexes create_all named differently from 0001 (ix_* vs idx_*)
+DROP INDEX IF EXISTS ix_incidences_user_id;
+DROP INDEX IF EXISTS ix_incidences_created_at;
+DROP INDEX IF EXISTS ix_incidence_timeline_incidence_id;
+DROP INDEX IF EXISTS ix_analytics_daily_date;
+CREATE INDEX IF NOT EXISTS idx_incidences_user_id ON incidences(user_id);
+CREATE INDEX IF NOT EXISTS idx_incidences_created_at ON incidences(created_at);
+CREATE INDEX IF NOT EXISTS idx_incidences_outcome ON incidences(outcome);
+CREATE INDEX IF NOT EXISTS idx_timeline_incidence_id ON incidence_timeline(incidence_id);
+CREATE INDEX IF NOT EXISTS idx_friction_user_session ON friction_signals(user_id, session_id);
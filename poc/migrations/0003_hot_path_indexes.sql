@@ -0,0 +1,28 @@
+-- migrate: no-transaction
+-- 0003: Indexes for the hot read paths.
+--
+-- Built CONCURRENTLY so the migration does not block webhook writes on a
+-- live database. If a build is interrupted, drop the INVALID index by hand
+-- and delete version 3 from schema_migrations before re-running.
+
+-- GET /api/v1/call/pending:
+--   channel = 'CALL' AND outcome = 'IN_PROGRESS' ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_channel_outcome_created
+    ON incidences (channel, outcome, created_at);
+
+-- Open queue / open-count KPI: only a small fraction of rows is IN_PROGRESS
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_in_progress
+    ON incidences (created_at)
+    WHERE outcome = 'IN_PROGRESS';
+
+-- Webhook fallback (handle_message_create, strategy 2):
+--   conversation_id IS NULL AND created_at >= cutoff ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_unlinked_created
+    ON incidences ((conversation_id IS NULL), created_at);
+
+-- IncidenceService.get_by_user: user_id = ? ORDER BY created_at DESC
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_user_created
+    ON incidences (user_id, created_at);
+
+-- Superseded by idx_incidences_user_created (user_id is its leading column)
+DROP INDEX CONCURRENTLY IF EXISTS idx_incidences_user_id;
@@ -0,0 +1,51 @@
+-- 0004: Time-ordered UUIDv7 primary keys.
+--
+-- New rows get UUIDv7 ids (48-bit millisecond timestamp prefix), so B-tree
+-- inserts land on the right-most leaf instead of a random page and
+-- "ORDER BY id" matches insertion order. The application generates the same
+-- layout in app/models/ids.py; the server default covers raw SQL inserts.
+--
+-- This migration is DDL only. Existing UUIDv4 rows are re-keyed from their
+-- created_at out of band, in committed batches with progress:
+--
+--     python -m app.migrations rekey
+--
+-- which must finish before 0006 (it refuses to partition v4 incidence ids).
+-- Old incidence ids are kept in incidence_id_map because they were handed
+-- out to Freshchat / Freshdesk; IncidenceService.get_by_id resolves them
+-- transparently. Run REINDEX TABLE on the four tables afterwards to compact
+-- the indexes.
+
+-- UUIDv7 for a given instant (RFC 9562): unix_ts_ms | ver=7 | rand_a | var=10 | rand_b
+CREATE OR REPLACE FUNCTION uuid_v7_at(ts TIMESTAMPTZ) RETURNS UUID AS $$
+DECLARE
+    unix_ms BIGINT := floor(extract(epoch FROM ts) * 1000);
+    bytes BYTEA := uuid_send(uuid_generate_v4());  -- random bits, variant already 10
+BEGIN
+    bytes := overlay(bytes PLACING substring(int8send(unix_ms) FROM 3) FROM 1 FOR 6);
+    bytes := set_byte(bytes, 6, (get_byte(bytes, 6) & 15) | 112);
+    RETURN encode(bytes, 'hex')::uuid;
+END
+$$ LANGUAGE plpgsql VOLATILE;
+
+CREATE OR REPLACE FUNCTION uuid_generate_v7() RETURNS UUID AS $$
+    SELECT uuid_v7_at(clock_timestamp());
+$$ LANGUAGE sql VOLATILE;
+
+ALTER TABLE incidences ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE incidence_timeline ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE friction_signals ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE analytics_daily ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+
+-- Old -> new incidence ids, for ids already shared outside the database
+CREATE TABLE IF NOT EXISTS incidence_id_map (
+    old_id UUID PRIMARY KEY,
+    new_id UUID NOT NULL
+);
+
+-- Let timeline rows follow their incidence when it is re-keyed
+ALTER TABLE incidence_timeline DROP CONSTRAINT IF EXISTS incidence_timeline_incidence_id_fkey;
+ALTER TABLE incidence_timeline
+    ADD CONSTRAINT incidence_timeline_incidence_id_fkey
+    FOREIGN KEY (incidence_id) REFERENCES incidences(id)
+    ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,33 @@
+-- migrate: no-transaction
+-- 0005: Cold storage for resolved incidences.
+--
+-- ArchiveService moves incidences resolved more than ARCHIVE_AFTER_DAYS ago,
+-- together with their timelines, out of the live tables in bounded batches.
+-- The archive tables have the same columns as the live ones; any later
+-- migration that adds a column to incidences / incidence_timeline must add
+-- it here too. Runs outside a transaction so the live-table index below
+-- can be built CONCURRENTLY; every statement is idempotent.
+
+CREATE TABLE IF NOT EXISTS incidences_archive (
+    LIKE incidences INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    archived_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE IF NOT EXISTS incidence_timeline_archive (
+    LIKE incidence_timeline INCLUDING DEFAULTS INCLUDING CONSTRAINTS,
+    PRIMARY KEY (id)
+);
+
+-- Read paths: get_by_id (PK), get_by_conversation, get_by_user, timeline
+CREATE UNIQUE INDEX IF NOT EXISTS idx_incidences_archive_conversation_id
+    ON incidences_archive (conversation_id);
+CREATE INDEX IF NOT EXISTS idx_incidences_archive_user_created
+    ON incidences_archive (user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_timeline_archive_incidence_id
+    ON incidence_timeline_archive (incidence_id);
+
+-- Archiver scan: oldest resolved incidences first
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_resolved_at
+    ON incidences (resolved_at)
+    WHERE outcome <> 'IN_PROGRESS';
@@ -0,0 +1,158 @@
+-- 0006: Monthly range partitioning for the append-only tables.
+--
+-- friction_signals is partitioned on created_at.
+--
+-- incidence_timeline is partitioned on incidence_id rather than created_at.
+-- Incidence ids are UUIDv7 (0004), whose leading 48 bits are the creation
+-- time in ms, so a month of incidences is a contiguous uuid range and
+-- partitions are still one per calendar month. Why not created_at:
+--   * The hot read, an incidence's timeline loaded with the incidence,
+--     filters on incidence_id only. Keyed on created_at it could not prune
+--     and would probe the incidence_id index of every partition; keyed on
+--     incidence_id it hits exactly one.
+--   * An incidence's events never straddle partitions, so archiving an
+--     incidence and retention drops act on whole conversations.
+-- The cost: reads bounded only by time cannot prune. The changes feed
+-- (created_at >= cursor) and analytics exports scan the created_at index
+-- (0013) of every attached partition; TIMELINE_RETENTION_MONTHS bounds how
+-- many there are (plus the 3 created ahead). Retention is measured
+-- from the incidence's creation, not the event's: a late reply on an old
+-- incidence lands in, and is dropped with, that incidence's partition.
+--
+-- Partitions are named <table>_pYYYY_MM and created ahead of time by
+-- ensure_monthly_partitions(), called here and daily by
+-- app/services/partition_service.py, which also detaches and drops
+-- partitions past their retention. Existing rows are copied into the new
+-- partitions in this transaction.
+
+-- Smallest UUIDv7 at a given instant (lower bound of a uuid range partition)
+CREATE OR REPLACE FUNCTION uuid_v7_floor(ts TIMESTAMPTZ) RETURNS UUID AS $$
+    SELECT (lpad(to_hex(floor(extract(epoch FROM ts) * 1000)::BIGINT), 12, '0')
+            || '00000000000000000000')::uuid;
+$$ LANGUAGE sql STABLE;
+
+-- Create monthly partitions of `parent` from start_month (default: this month)
+-- through this month + months_ahead. Returns the number created.
+CREATE OR REPLACE FUNCTION ensure_monthly_partitions(
+    parent TEXT,
+    months_ahead INT,
+    start_month DATE DEFAULT NULL
+) RETURNS INT AS $$
+DECLARE
+    key_type REGTYPE;
+    cur_month DATE := date_trunc('month', COALESCE(start_month, CURRENT_DATE))::date;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    lower_bound TEXT;
+    upper_bound TEXT;
+    created INT := 0;
+BEGIN
+    SELECT a.atttypid::regtype INTO key_type
+    FROM pg_partitioned_table p
+    JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+    WHERE p.partrelid = parent::regclass;
+
+    WHILE cur_month <= last_month LOOP
+        partition_name := format('%s_p%s', parent, to_char(cur_month, 'YYYY_MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            IF key_type = 'uuid'::regtype THEN
+                lower_bound := quote_literal(uuid_v7_floor(cur_month::timestamp AT TIME ZONE 'UTC'));
+                upper_bound := quote_literal(uuid_v7_floor((cur_month + INTERVAL '1 month')::timestamp AT TIME ZONE 'UTC'));
+            ELSE
+                lower_bound := quote_literal(cur_month::timestamp);
+                upper_bound := quote_literal((cur_month + INTERVAL '1 month')::timestamp);
+            END IF;
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+                partition_name, parent, lower_bound, upper_bound
+            );
+            created := created + 1;
+        END IF;
+        cur_month := (cur_month + INTERVAL '1 month')::date;
+    END LOOP;
+
+    RETURN created;
+END
+$$ LANGUAGE plpgsql;
+
+
+-- incidence_timeline -------------------------------------------------------
+
+-- Partition bounds assume UUIDv7 incidence ids (0004's out-of-band re-key)
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM incidences WHERE substr(id::text, 15, 1) <> '7') THEN
+        RAISE EXCEPTION 'incidences has UUIDv4 ids: run "python -m app.migrations rekey", then migrate again';
+    END IF;
+END
+$$;
+
+ALTER TABLE incidence_timeline RENAME TO incidence_timeline_old;
+ALTER INDEX incidence_timeline_pkey RENAME TO incidence_timeline_old_pkey;
+ALTER INDEX IF EXISTS idx_timeline_incidence_id RENAME TO idx_timeline_old_incidence_id;
+
+CREATE TABLE incidence_timeline (
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
+    incidence_id UUID NOT NULL REFERENCES incidences(id) ON DELETE CASCADE ON UPDATE CASCADE,
+
+    event_type VARCHAR(50) NOT NULL,
+    actor VARCHAR(20) NOT NULL CONSTRAINT incidence_timeline_actor_check
+        CHECK (actor IN ('USER', 'AGENT', 'SYSTEM')),
+    content TEXT,
+    event_metadata JSONB,
+
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    -- The partition key must be part of the primary key
+    PRIMARY KEY (id, incidence_id)
+) PARTITION BY RANGE (incidence_id);
+
+CREATE INDEX idx_timeline_incidence_id ON incidence_timeline (incidence_id, created_at);
+
+SELECT ensure_monthly_partitions(
+    'incidence_timeline', 3,
+    (SELECT min(created_at)::date FROM incidences)
+);
+
+-- Orphaned rows (NULL incidence_id) cannot be routed to a partition
+INSERT INTO incidence_timeline (id, incidence_id, event_type, actor, content, event_metadata, created_at)
+SELECT id, incidence_id, event_type, actor, content, event_metadata, COALESCE(created_at, NOW())
+FROM incidence_timeline_old
+WHERE incidence_id IS NOT NULL;
+
+DROP TABLE incidence_timeline_old;
+
+
+-- friction_signals ---------------------------------------------------------
+
+ALTER TABLE friction_signals RENAME TO friction_signals_old;
+ALTER INDEX friction_signals_pkey RENAME TO friction_signals_old_pkey;
+ALTER INDEX IF EXISTS idx_friction_user_session RENAME TO idx_friction_old_user_session;
+
+CREATE TABLE friction_signals (
+    id UUID NOT NULL DEFAULT uuid_generate_v7(),
+    user_id VARCHAR(255) NOT NULL,
+    session_id VARCHAR(255) NOT NULL,
+
+    signal_type VARCHAR(50) NOT NULL,
+    value DECIMAL(10,2),
+    screen VARCHAR(100),
+
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE INDEX idx_friction_user_session ON friction_signals (user_id, session_id);
+CREATE INDEX idx_friction_created_at ON friction_signals (created_at);
+
+SELECT ensure_monthly_partitions(
+    'friction_signals', 3,
+    (SELECT min(created_at)::date FROM friction_signals_old)
+);
+
+INSERT INTO friction_signals (id, user_id, session_id, signal_type, value, screen, created_at)
+SELECT id, user_id, session_id, signal_type, value, screen, COALESCE(created_at, NOW())
+FROM friction_signals_old;
+
+DROP TABLE friction_signals_old;
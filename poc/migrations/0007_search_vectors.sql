@@ -0,0 +1,86 @@
+-- 0007: Full-text search columns for incidences and timelines.
+--
+-- A `search_vector` tsvector column is added to the live and archive
+-- incidence / timeline tables and kept current by BEFORE triggers. Existing
+-- rows start with a NULL vector and are filled in by the reindex job
+-- (python -m app.services.search_service reindex), so this migration only
+-- changes metadata and never rewrites the tables.
+--
+-- The GIN index on the partitioned incidence_timeline is created here, while
+-- every vector is still NULL; indexes on the plain tables are built
+-- CONCURRENTLY by 0008.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- What is searchable. The reindex job recomputes vectors with the same
+-- functions, so change them here (in a new migration) and reindex --all.
+CREATE OR REPLACE FUNCTION timeline_search_vector(content TEXT) RETURNS TSVECTOR AS $$
+    SELECT to_tsvector('english', COALESCE(content, ''));
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION incidence_search_vector(
+    issue_category TEXT,
+    root_cause TEXT,
+    call_notes TEXT,
+    resolution_type TEXT,
+    order_id TEXT,
+    event_type TEXT,
+    app_screen TEXT
+) RETURNS TSVECTOR AS $$
+    SELECT setweight(to_tsvector('english', COALESCE(issue_category, '')), 'A')
+        || setweight(to_tsvector('english', COALESCE(root_cause, '') || ' ' || COALESCE(call_notes, '')), 'B')
+        || setweight(to_tsvector('english', COALESCE(resolution_type, '')), 'C')
+        || setweight(to_tsvector('simple', concat_ws(' ', order_id, event_type, app_screen)), 'D');
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION timeline_search_vector_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := timeline_search_vector(NEW.content);
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION incidence_search_vector_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.search_vector := incidence_search_vector(
+        NEW.issue_category, NEW.root_cause, NEW.call_notes, NEW.resolution_type,
+        NEW.order_id, NEW.event_type, NEW.app_screen
+    );
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+
+-- Columns (archive tables mirror the live ones, see 0005)
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+ALTER TABLE incidences_archive ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+ALTER TABLE incidence_timeline ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+ALTER TABLE incidence_timeline_archive ADD COLUMN IF NOT EXISTS search_vector TSVECTOR;
+
+
+-- Triggers
+CREATE TRIGGER trg_incidences_search_vector
+    BEFORE INSERT OR UPDATE OF issue_category, root_cause, call_notes, resolution_type,
+        order_id, event_type, app_screen
+    ON incidences
+    FOR EACH ROW EXECUTE FUNCTION incidence_search_vector_trigger();
+
+CREATE TRIGGER trg_incidences_archive_search_vector
+    BEFORE INSERT OR UPDATE OF issue_category, root_cause, call_notes, resolution_type,
+        order_id, event_type, app_screen
+    ON incidences_archive
+    FOR EACH ROW EXECUTE FUNCTION incidence_search_vector_trigger();
+
+CREATE TRIGGER trg_timeline_search_vector
+    BEFORE INSERT OR UPDATE OF content
+    ON incidence_timeline
+    FOR EACH ROW EXECUTE FUNCTION timeline_search_vector_trigger();
+
+CREATE TRIGGER trg_timeline_archive_search_vector
+    BEFORE INSERT OR UPDATE OF content
+    ON incidence_timeline_archive
+    FOR EACH ROW EXECUTE FUNCTION timeline_search_vector_trigger();
+
+
+-- Cascades to every partition, including ones created later
+CREATE INDEX idx_timeline_search ON incidence_timeline USING GIN (search_vector);
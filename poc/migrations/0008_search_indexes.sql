@@ -0,0 +1,22 @@
+-- migrate: no-transaction
+-- 0008: Search indexes on the unpartitioned tables.
+--
+-- Full-text (GIN on search_vector, see 0007) and trigram indexes for
+-- partial user id / phone matches ("%98765%"). Built CONCURRENTLY so the
+-- live tables keep accepting writes; every statement is idempotent.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_search
+    ON incidences USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_archive_search
+    ON incidences_archive USING GIN (search_vector);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_timeline_archive_search
+    ON incidence_timeline_archive USING GIN (search_vector);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_user_id_trgm
+    ON incidences USING GIN (user_id gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_user_phone_trgm
+    ON incidences USING GIN (user_phone gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_archive_user_id_trgm
+    ON incidences_archive USING GIN (user_id gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_archive_user_phone_trgm
+    ON incidences_archive USING GIN (user_phone gin_trgm_ops);
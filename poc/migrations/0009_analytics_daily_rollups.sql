@@ -0,0 +1,16 @@
+-- migrate: no-transaction
+-- 0009: Make analytics_daily rows mergeable across days.
+--
+-- RollupService writes one row per day. A date-range report adds the rows
+-- up, so each row also keeps the sums behind its averages and the full
+-- per-category / per-screen counts (top_* hold every value, not a top-N;
+-- both are low-cardinality). Every statement is idempotent.
+
+ALTER TABLE analytics_daily ADD COLUMN IF NOT EXISTS converted_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE analytics_daily ADD COLUMN IF NOT EXISTS resolved_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE analytics_daily ADD COLUMN IF NOT EXISTS resolution_seconds_total BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE analytics_daily ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP NOT NULL DEFAULT NOW();
+
+-- Backfill of days older than ARCHIVE_AFTER_DAYS reads the archive by day
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_archive_created_at
+    ON incidences_archive (created_at);
@@ -0,0 +1,45 @@
+-- 0010: Per-day latency sketches for resolution-time percentiles.
+--
+-- latency_sketches holds one mergeable quantile sketch (a log-bucketed
+-- histogram, see app/services/quantile_sketch.py) per day, metric, channel
+-- and stage. The sketch is a JSONB map {bucket: count}; writers send a
+-- delta sketch and sketch_merge() adds it to the stored one under the row
+-- lock taken by INSERT ... ON CONFLICT, so concurrent closes never lose an
+-- update. Percentiles for any date range merge the rows of its days.
+--
+-- Metrics:
+--   resolution      time_to_resolve_seconds, on the day the incidence was resolved
+--   first_response  first AGENT timeline event - created_at, on the day of that event
+--
+-- first_response_at is new on incidences (and mirrored on the archive, as
+-- required by 0005); it is set once, by the first agent event.
+
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS first_response_at TIMESTAMP;
+ALTER TABLE incidences_archive ADD COLUMN IF NOT EXISTS first_response_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS latency_sketches (
+    day DATE NOT NULL,
+    metric VARCHAR(30) NOT NULL,
+    channel VARCHAR(20) NOT NULL,
+    stage VARCHAR(20) NOT NULL,
+    sketch JSONB NOT NULL DEFAULT '{}',
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (day, metric, channel, stage),
+    CONSTRAINT latency_sketches_metric_check CHECK (metric IN ('resolution', 'first_response'))
+);
+
+-- Bucket-wise sum of two sketches; buckets that drop to zero (or below,
+-- when a value that was never recorded is removed) are left out.
+CREATE OR REPLACE FUNCTION sketch_merge(a JSONB, b JSONB) RETURNS JSONB AS $$
+    SELECT COALESCE(jsonb_object_agg(bucket, n), '{}'::jsonb)
+    FROM (
+        SELECT bucket, SUM(n::BIGINT) AS n
+        FROM (
+            SELECT key AS bucket, value AS n FROM jsonb_each_text(COALESCE(a, '{}'::jsonb))
+            UNION ALL
+            SELECT key, value FROM jsonb_each_text(COALESCE(b, '{}'::jsonb))
+        ) AS buckets
+        GROUP BY bucket
+        HAVING SUM(n::BIGINT) > 0
+    ) AS merged;
+$$ LANGUAGE sql IMMUTABLE;
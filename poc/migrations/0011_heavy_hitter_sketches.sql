@@ -0,0 +1,19 @@
+-- 0011: Space-Saving sketches for top friction screens / issue categories.
+--
+-- One row per dimension ('screen', 'category'), granularity ('hour', 'day')
+-- and bucket start. `sketch` is a serialized SpaceSaving summary
+-- ({capacity, total, items: {name: [count, error]}}) of bounded size, so
+-- top-K over any window merges a handful of small rows whatever the
+-- cardinality of app_screen / issue_category. Rows are written by the
+-- heavy-hitter flush job (app/services/heavy_hitters.py); hour rows are
+-- dropped after HEAVY_HITTER_HOUR_RETENTION_DAYS.
+
+CREATE TABLE IF NOT EXISTS heavy_hitter_sketches (
+    dimension VARCHAR(30) NOT NULL,
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    sketch JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (dimension, granularity, bucket_start),
+    CONSTRAINT heavy_hitter_sketches_granularity_check CHECK (granularity IN ('hour', 'day'))
+);
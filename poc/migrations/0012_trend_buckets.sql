@@ -0,0 +1,46 @@
+-- 0012: Pre-aggregated time buckets for the trends API.
+--
+-- incidence_trends and friction_signal_trends hold one row per granularity
+-- ('minute', 'hour', 'day'), bucket start and combination of group-by
+-- dimensions, with additive measures only (counts and sums), so buckets
+-- and groups can be merged by summing. NULL dimensions are stored as ''
+-- to keep them in the primary key.
+--
+-- Rows are maintained by the trend refresh job (app/services/trend_service.py):
+-- minute and hour buckets are recomputed from the raw rows they cover, day
+-- buckets from their hours. Minute rows are dropped after
+-- TREND_MINUTE_RETENTION_DAYS; hour and day rows are kept, and outlive
+-- friction_signals partitions dropped by retention.
+
+CREATE TABLE IF NOT EXISTS incidence_trends (
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    app_screen VARCHAR(100) NOT NULL DEFAULT '',
+    event_type VARCHAR(50) NOT NULL DEFAULT '',
+    channel VARCHAR(20) NOT NULL,
+    stage VARCHAR(20) NOT NULL,
+    incidences INTEGER NOT NULL DEFAULT 0,
+    converted INTEGER NOT NULL DEFAULT 0,
+    friction_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    friction_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (granularity, bucket_start, app_screen, event_type, channel, stage),
+    CONSTRAINT incidence_trends_granularity_check CHECK (granularity IN ('minute', 'hour', 'day'))
+);
+
+CREATE TABLE IF NOT EXISTS friction_signal_trends (
+    granularity VARCHAR(10) NOT NULL,
+    bucket_start TIMESTAMP NOT NULL,
+    screen VARCHAR(100) NOT NULL DEFAULT '',
+    signal_type VARCHAR(50) NOT NULL,
+    signals INTEGER NOT NULL DEFAULT 0,
+    value_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    value_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (granularity, bucket_start, screen, signal_type),
+    CONSTRAINT friction_signal_trends_granularity_check CHECK (granularity IN ('minute', 'hour', 'day'))
+);
+
+-- The refresh job finds its last run with max(updated_at)
+CREATE INDEX IF NOT EXISTS idx_incidence_trends_updated_at ON incidence_trends (updated_at);
+CREATE INDEX IF NOT EXISTS idx_friction_signal_trends_updated_at ON friction_signal_trends (updated_at);
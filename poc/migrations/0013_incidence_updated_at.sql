@@ -0,0 +1,49 @@
+-- 0013: Change tracking for the incidence changes feed.
+--
+-- incidences.updated_at is set by a BEFORE trigger on every insert and
+-- update, and touched by a statement-level trigger whenever timeline events
+-- are inserted for the incidence. incidence_timeline.created_at now defaults
+-- to the database clock instead of the application's.
+--
+-- Both use clock_timestamp() (UTC) rather than now(): the changes feed
+-- (IncidenceService.get_changes) only hands out windows that end before the
+-- oldest in-flight write transaction started, which is safe only if a row's
+-- timestamp is taken when it is written, not when its transaction began.
+--
+-- Existing rows keep a NULL updated_at; clients bootstrap from the list
+-- endpoint and then follow the feed. The updated_at index is built
+-- CONCURRENTLY by 0014.
+
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+ALTER TABLE incidences_archive ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+ALTER TABLE incidence_timeline ALTER COLUMN created_at SET DEFAULT (clock_timestamp() AT TIME ZONE 'utc');
+ALTER TABLE incidence_timeline_archive ALTER COLUMN created_at SET DEFAULT (clock_timestamp() AT TIME ZONE 'utc');
+
+CREATE OR REPLACE FUNCTION incidence_updated_at_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at := clock_timestamp() AT TIME ZONE 'utc';
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION timeline_touch_incidence_trigger() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE incidences SET updated_at = clock_timestamp() AT TIME ZONE 'utc'
+    WHERE id IN (SELECT DISTINCT incidence_id FROM inserted);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_incidences_updated_at
+    BEFORE INSERT OR UPDATE ON incidences
+    FOR EACH ROW EXECUTE FUNCTION incidence_updated_at_trigger();
+
+-- Once per statement: restoring an archived incidence inserts all its events at once
+CREATE TRIGGER trg_timeline_touch_incidence
+    AFTER INSERT ON incidence_timeline
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT EXECUTE FUNCTION timeline_touch_incidence_trigger();
+
+-- New events by time, across partitions (partitioned indexes cannot be built CONCURRENTLY)
+CREATE INDEX IF NOT EXISTS idx_timeline_created_at ON incidence_timeline (created_at);
@@ -0,0 +1,5 @@
+-- migrate: no-transaction
+-- 0014: Index serving the incidence changes feed (updated_at windows, see 0013).
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_incidences_updated_at
+    ON incidences (updated_at);
@@ -0,0 +1,15 @@
+-- 0015: Versioned routing and friction rules.
+--
+-- Each row is a complete rules document (channel tiers, high-importance
+-- events, friction weights and thresholds); the highest version is active.
+-- Rows are never updated, so rolling back means publishing an old document
+-- again. Workers compile the active version into a decision table and swap
+-- it in when notified over Redis pub/sub (app/services/rules_engine.py);
+-- with no rows they use the built-in defaults (version 0).
+
+CREATE TABLE IF NOT EXISTS routing_rules (
+    version SERIAL PRIMARY KEY,
+    rules JSONB NOT NULL,
+    comment TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc')
+);
@@ -0,0 +1,11 @@
+-- 0016: Scheduled call-backs.
+--
+-- A call-back requested for later carries its window; until the window is
+-- about to open it waits in the Redis schedule (calls:scheduled) instead of
+-- the agent queue. The columns let the queue sweep rebuild the schedule and
+-- keep future call-backs out of the agent load index.
+
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS call_window_start TIMESTAMP;
+ALTER TABLE incidences ADD COLUMN IF NOT EXISTS call_window_end TIMESTAMP;
+ALTER TABLE incidences_archive ADD COLUMN IF NOT EXISTS call_window_start TIMESTAMP;
+ALTER TABLE incidences_archive ADD COLUMN IF NOT EXISTS call_window_end TIMESTAMP;
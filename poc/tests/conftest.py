@@ -0,0 +1,105 @@
+"""
+Shared fixtures. Tests that need PostgreSQL or Redis run against the
+DATABASE_URL / REDIS_URL of the environment (.env) and are skipped when
+those are unreachable.
+
+Usage (from poc/):
+    python -m pytest tests
+"""
+
+import os
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+import asyncpg
+import pytest
+import redis.asyncio as redis
+from dotenv import load_dotenv
+
+# Load environment variables before the app reads settings
+load_dotenv()
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.config import settings
+from app.migrations import apply_migrations, asyncpg_dsn
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_session():
+    """AsyncSession on a scratch schema built from the migrations, dropped afterwards."""
+    try:
+        conn = await asyncpg.connect(asyncpg_dsn(os.getenv("DATABASE_URL")), timeout=5)
+    except (OSError, asyncpg.PostgresError) as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}")
+    schema = f"test_{uuid.uuid4().hex[:8]}"
+    await conn.execute(f"CREATE SCHEMA {schema}")
+    engine = None
+    try:
+        await conn.execute(f"SET search_path TO {schema}, public")
+        await apply_migrations(conn)
+        engine = create_async_engine(
+            settings.DATABASE_URL,
+            connect_args={"server_settings": {"search_path": f"{schema},public"}}
+        )
+        async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            yield session
+    finally:
+        if engine is not None:
+            await engine.dispose()
+        await conn.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        await conn.close()
+
+
+@pytest.fixture
+async def redis_client():
+    """Client on a scratch Redis database (REDIS_TEST_DB, default 15), flushed before and after."""
+    client = redis.Redis.from_url(settings.REDIS_URL, db=int(os.getenv("REDIS_TEST_DB", "15")), decode_responses=True)
+    try:
+        await client.ping()
+    except (OSError, redis.RedisError) as e:
+        await client.aclose()
+        pytest.skip(f"Redis unavailable: {e}")
+    await client.flushdb()
+    try:
+        yield client
+    finally:
+        await client.flushdb()
+        await client.aclose()
+
+
+@pytest.fixture
+def use_redis(redis_client, monkeypatch):
+    """Point services' module-level `_redis` (and their Lua scripts) at the scratch database."""
+    from redis.commands.core import AsyncScript
+    
+    def bind(*modules):
+        for module in modules:
+            monkeypatch.setattr(module, "_redis", redis_client)
+            for value in vars(module).values():
+                if isinstance(value, AsyncScript):
+                    monkeypatch.setattr(value, "registered_client", redis_client)
+        return redis_client
+    return bind
+
+
+@pytest.fixture
+def call_back():
+    """Factory of call-back incidences, with the fields call_queue.enqueue reads."""
+    def make(window_start: Optional[datetime] = None, **fields) -> SimpleNamespace:
+        incidence = SimpleNamespace(
+            id=uuid.uuid4(), user_id="user_42", user_phone="+919800000000",
+            cart_value=3000.0, event_type=None, friction_score=0.0,
+            call_window_start=window_start,
+            call_window_end=window_start + timedelta(minutes=30) if window_start else None
+        )
+        vars(incidence).update(fields)
+        return incidence
+    return make
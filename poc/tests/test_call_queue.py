@@ -0,0 +1,31 @@
+import pytest
+
+from app.services import call_queue
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_ack_takes_the_lease_once_and_only_for_its_agent(use_redis, call_back):
+    client = use_redis(call_queue)
+    incidence = call_back()
+    await call_queue.enqueue(incidence)
+    
+    item = await call_queue.claim(None, "agent_a")
+    assert item["incidence_id"] == str(incidence.id)
+    
+    assert not await call_queue.ack(item["incidence_id"], item["token"], "agent_b")
+    assert not await call_queue.ack(item["incidence_id"], "stolen", "agent_a")
+    assert await call_queue.ack(item["incidence_id"], item["token"], "agent_a")
+    assert not await call_queue.ack(item["incidence_id"], item["token"], "agent_a")
+    
+    # Acked but not yet completed: nobody else can claim it
+    assert await call_queue.claim(None, "agent_b") is None
+    
+    # The incidence write failed: back in the queue for the next agent
+    assert await call_queue.requeue(item["incidence_id"], item["token"])
+    again = await call_queue.claim(None, "agent_b")
+    assert again["incidence_id"] == item["incidence_id"] and again["token"] != item["token"]
+    assert await call_queue.ack(again["incidence_id"], again["token"], "agent_b")
+    assert await call_queue.complete(again["incidence_id"], again["token"])
+    assert not await client.exists(f"{call_queue.ITEM_PREFIX}{incidence.id}")
@@ -0,0 +1,48 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.services import call_queue, call_scheduler
+from app.services.timer_wheel import TimerWheel
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_wheel(monkeypatch):
+    """A clean worker wheel per test, so timers never leak between tests."""
+    monkeypatch.setattr(call_scheduler, "_wheel", TimerWheel(time.time(), settings.CALL_SCHEDULER_TICK_SECONDS))
+    monkeypatch.setattr(call_scheduler, "_overdue", [])
+
+
+async def test_rescheduled_call_is_not_released_at_its_old_time(use_redis, call_back):
+    client = use_redis(call_queue)
+    now = datetime.utcnow()
+    incidence = call_back(now + timedelta(minutes=30), cart_value=12000.0, event_type="WEDDING", friction_score=20.0)
+    incidence_id = str(incidence.id)
+    
+    old_release_at = await call_queue.enqueue(incidence)
+    call_scheduler.track(incidence_id, old_release_at)
+    assert incidence_id in call_scheduler._wheel
+    
+    # Rescheduled beyond the horizon, as POST /call/request does it
+    await call_queue.discard(incidence_id)
+    incidence.call_window_start = now + timedelta(hours=5)
+    incidence.call_window_end = incidence.call_window_start + timedelta(minutes=30)
+    new_release_at = await call_queue.enqueue(incidence)
+    call_scheduler.track(incidence_id, new_release_at)
+    assert incidence_id not in call_scheduler._wheel
+    assert new_release_at - time.time() > settings.CALL_SCHEDULER_HORIZON_SECONDS
+    
+    # Another worker's wheel still fires the old timer
+    assert await call_queue.release([incidence_id], old_release_at + 1) == {}
+    assert await client.zscore(call_queue.SCHEDULED_KEY, incidence_id) == new_release_at
+    assert await client.zcard(call_queue.WAITING_KEY) == 0
+    
+    released = await call_queue.release([incidence_id], new_release_at)
+    assert list(released) == [incidence_id]
+    assert await client.zscore(call_queue.SCHEDULED_KEY, incidence_id) is None
+    assert await client.zscore(call_queue.WAITING_KEY, incidence_id) is not None
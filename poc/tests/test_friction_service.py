@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from app.schemas.context import FrictionDetectRequest
+from app.services.friction_service import FrictionService
+
+
+def random_requests(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        FrictionDetectRequest(
+            user_id=f"user_{n}",
+            inactivity_seconds=rng.choice([0, 59, 60, 61, 300]),
+            back_nav_count=rng.randrange(0, 6),
+            price_check_count=rng.randrange(0, 8),
+            payment_retry_count=rng.randrange(0, 3),
+            is_first_time_user=rng.random() < 0.3,
+            event_type=rng.choice([None, "", "WEDDING", "wedding", "Corporate", "BIRTHDAY"]),
+            current_screen=rng.choice([None, "checkout", "Cart", "menu_list", "customize", "payment", "home"])
+        )
+        for n in range(count)
+    ]
+
+
+def test_batch_scores_match_single_scores():
+    service = FrictionService()
+    requests = random_requests(2000)
+    batch = service.calculate_scores(
+        [r.inactivity_seconds for r in requests],
+        [r.back_nav_count for r in requests],
+        [r.price_check_count for r in requests],
+        [r.payment_retry_count for r in requests],
+        [r.is_first_time_user for r in requests],
+        [r.event_type for r in requests],
+        [r.current_screen for r in requests]
+    )
+    
+    for i, request in enumerate(requests):
+        single = service.calculate_score(request)
+        assert batch["friction_score"][i] == single.friction_score
+        assert bool(batch["should_show_help"][i]) == single.should_show_help
+        assert batch["help_message"][i] == single.help_message
+        fired = {key: int(points[i]) for key, points in batch["breakdown"].items() if points[i]}
+        assert fired == single.breakdown
+    
+    # Both branches of the help decision are exercised
+    assert batch["should_show_help"].any() and not batch["should_show_help"].all()
+
+
+def test_empty_batch():
+    scores = FrictionService().calculate_scores([], [], [], [], [], [], [])
+    assert scores["friction_score"].shape == (0,)
+    assert all(isinstance(points, np.ndarray) for points in scores["breakdown"].values())
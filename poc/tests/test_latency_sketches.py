@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.models.incidence import LatencySketch
+from app.services.latency_sketches import LatencySketchService
+from app.services.quantile_sketch import QuantileSketch
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def stored_buckets(db, day, channel="CALL", stage="PRE_ORDER") -> dict:
+    result = await db.execute(
+        select(LatencySketch.sketch).where(
+            LatencySketch.metric == "resolution", LatencySketch.day == day,
+            LatencySketch.channel == channel, LatencySketch.stage == stage
+        )
+    )
+    sketch = result.scalar_one_or_none()
+    return QuantileSketch.from_json(sketch).buckets if sketch is not None else {}
+
+
+async def test_reclose_replaces_previous_resolution(db_session):
+    service = LatencySketchService(db_session)
+    first = datetime(2026, 3, 2, 10, 0)
+    second = datetime(2026, 3, 2, 15, 0)
+    later = datetime(2026, 3, 5, 9, 0)
+    
+    await service.record_resolution("CALL", "PRE_ORDER", first, 100)
+    await service.record_resolution("CALL", "PRE_ORDER", first, 40)
+    assert await stored_buckets(db_session, first.date()) == QuantileSketch().add(100).add(40).buckets
+    
+    # Reopened and closed again the same day: 100 is replaced, not counted twice
+    await service.record_resolution("CALL", "PRE_ORDER", second, 900, previous=("CALL", "PRE_ORDER", first, 100))
+    assert await stored_buckets(db_session, first.date()) == QuantileSketch().add(40).add(900).buckets
+    
+    # Closed again on another day: the value leaves the old day's sketch
+    await service.record_resolution("CALL", "PRE_ORDER", later, 3600, previous=("CALL", "PRE_ORDER", second, 900))
+    assert await stored_buckets(db_session, first.date()) == QuantileSketch().add(40).buckets
+    assert await stored_buckets(db_session, later.date()) == QuantileSketch().add(3600).buckets
+    
+    # Removing a value that was never recorded leaves no negative bucket behind
+    await service.record_resolution("CALL", "PRE_ORDER", later, 60, previous=("CALL", "PRE_ORDER", later, 7))
+    assert await stored_buckets(db_session, later.date()) == QuantileSketch().add(3600).add(60).buckets
+
+
+async def test_reclose_after_reroute_removes_from_previous_channel(db_session):
+    service = LatencySketchService(db_session)
+    first = datetime(2026, 3, 2, 10, 0)
+    second = datetime(2026, 3, 2, 15, 0)
+    
+    await service.record_resolution("IN_APP_CHAT", "PRE_ORDER", first, 100)
+    await service.record_resolution("CALL", "PRE_ORDER", second, 700, previous=("IN_APP_CHAT", "PRE_ORDER", first, 100))
+    assert await stored_buckets(db_session, first.date(), channel="IN_APP_CHAT") == {}
+    assert await stored_buckets(db_session, first.date(), channel="CALL") == QuantileSketch().add(700).buckets
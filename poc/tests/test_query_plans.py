@@ -0,0 +1,283 @@
+"""
+Query Plan Regression Check
+
+Builds the schema from the migrations in a throwaway PostgreSQL schema,
+seeds it with a realistic dataset, runs EXPLAIN on every hot query the API
+issues and fails if any plan contains a sequential scan, or if a query on
+a partitioned table touches more partitions than expected. Skipped when
+PostgreSQL is unreachable.
+
+Usage (from poc/):
+    python -m pytest tests/test_query_plans.py                      # 200k incidences (default)
+    QUERY_PLAN_ROWS=50000 python -m pytest tests/test_query_plans.py
+
+Run it after adding a migration or changing one of the queries below.
+"""
+
+import json
+import os
+import uuid
+
+import asyncpg
+import pytest
+
+from app.migrations import apply_migrations, asyncpg_dsn
+
+
+pytestmark = pytest.mark.anyio
+
+
+# Hot queries, written as the services/routers issue them. Keep in sync with
+# the code paths named in each entry. {incidence_id} and {recent_ids} are
+# filled in from the seeded data.
+HOT_QUERIES = {
+    "call.get_pending_calls": """
+        SELECT * FROM incidences
+        WHERE channel = 'CALL' AND outcome = 'IN_PROGRESS' AND user_phone IS NOT NULL
+        ORDER BY created_at DESC LIMIT 20
+    """,
+    "webhooks.handle_message_create (fallback)": """
+        SELECT * FROM incidences
+        WHERE conversation_id IS NULL AND created_at >= NOW() - INTERVAL '5 minutes'
+        ORDER BY created_at DESC LIMIT 1
+    """,
+    "open incidences count": """
+        SELECT count(*) FROM incidences WHERE outcome = 'IN_PROGRESS'
+    """,
+    "IncidenceService.get_by_id": """
+        SELECT * FROM incidences WHERE id = '{incidence_id}'
+    """,
+    "IncidenceService.get_by_conversation": """
+        SELECT * FROM incidences WHERE conversation_id = 'conv_4242'
+    """,
+    "IncidenceService.get_by_user": """
+        SELECT * FROM incidences WHERE user_id = 'user_42'
+        ORDER BY created_at DESC LIMIT 10
+    """,
+    "IncidenceService.get_open_ids_by_user": """
+        SELECT DISTINCT ON (user_id) user_id, id FROM incidences
+        WHERE user_id IN ('user_42', 'user_4242', 'user_424') AND outcome = 'IN_PROGRESS'
+        ORDER BY user_id, created_at DESC
+    """,
+    "IncidenceService.get_open_incidences": """
+        SELECT * FROM incidences ORDER BY id DESC LIMIT 50
+    """,
+    "IncidenceService.get_open_incidences (before cursor)": """
+        SELECT * FROM incidences WHERE id < '{incidence_id}' ORDER BY id DESC LIMIT 50
+    """,
+    "IncidenceService.get_changes (incidences)": """
+        SELECT * FROM incidences
+        WHERE updated_at >= (NOW() AT TIME ZONE 'utc')
+          AND updated_at < (NOW() AT TIME ZONE 'utc') + INTERVAL '5 seconds'
+        ORDER BY updated_at LIMIT 201
+    """,
+    "IncidenceService.get_changes (timeline events)": """
+        SELECT * FROM incidence_timeline
+        WHERE created_at >= (NOW() AT TIME ZONE 'utc')
+          AND created_at < (NOW() AT TIME ZONE 'utc') + INTERVAL '5 seconds'
+        ORDER BY created_at LIMIT 201
+    """,
+    "IncidenceService.get_by_id (pre-UUIDv7 id)": """
+        SELECT new_id FROM incidence_id_map WHERE old_id = '{incidence_id}'
+    """,
+    "selectinload(Incidence.timeline)": """
+        SELECT * FROM incidence_timeline
+        WHERE incidence_id IN ({recent_ids})
+    """,
+    "ArchiveService.archive_batch": """
+        SELECT id FROM incidences
+        WHERE outcome <> 'IN_PROGRESS' AND resolved_at < NOW() - INTERVAL '30 days'
+        ORDER BY resolved_at LIMIT 500
+        FOR UPDATE SKIP LOCKED
+    """,
+    "ArchiveService.get_by_user": """
+        SELECT * FROM incidences_archive WHERE user_id = 'user_42'
+        ORDER BY created_at DESC LIMIT 10
+    """,
+    "SearchService.search (timeline hits)": """
+        SELECT incidence_id, ts_rank_cd(search_vector, websearch_to_tsquery('english', 'refund'))
+        FROM incidence_timeline
+        WHERE search_vector @@ websearch_to_tsquery('english', 'refund')
+        ORDER BY incidence_id DESC LIMIT 2000
+    """,
+    "SearchService.search (field hits)": """
+        SELECT id FROM incidences
+        WHERE search_vector @@ websearch_to_tsquery('english', 'delivery')
+        ORDER BY id DESC LIMIT 2000
+    """,
+    "SearchService.search (partial user / phone)": """
+        SELECT id FROM incidences
+        WHERE user_id ILIKE '%er_1234%' OR user_phone ILIKE '%0001234%'
+        ORDER BY id DESC LIMIT 2000
+    """,
+    "AnalyticsService.get_kpis": """
+        SELECT GROUPING(app_screen, issue_category), app_screen, issue_category,
+               count(*), count(*) FILTER (WHERE outcome = 'CONVERTED'),
+               avg(time_to_resolve_seconds) FILTER (WHERE time_to_resolve_seconds > 0)
+        FROM incidences WHERE created_at >= date_trunc('day', NOW())
+        GROUP BY GROUPING SETS ((), (app_screen), (issue_category))
+    """,
+    "AnalyticsService.get_weekly_report": """
+        SELECT GROUPING(issue_category), issue_category, count(*),
+               avg(time_to_resolve_seconds) FILTER (WHERE time_to_resolve_seconds > 0)
+        FROM incidences WHERE created_at >= date_trunc('day', NOW()) - INTERVAL '7 days'
+        GROUP BY GROUPING SETS ((), (issue_category))
+    """,
+}
+
+
+SEED_INCIDENCES_SQL = """
+INSERT INTO incidences (
+    id, user_id, conversation_id, stage, channel, trigger, app_screen, cart_value,
+    event_type, friction_score, outcome, issue_category, user_phone,
+    created_at, resolved_at, time_to_resolve_seconds
+)
+SELECT
+    uuid_v7_at(NOW() - make_interval(secs => g * 60)),
+    'user_' || (g % 20000),
+    CASE WHEN g % 50 = 0 THEN NULL ELSE 'conv_' || g END,
+    CASE WHEN g % 3 = 0 THEN 'POST_ORDER' ELSE 'PRE_ORDER' END,
+    CASE WHEN g % 20 = 0 THEN 'CALL' WHEN g % 7 = 0 THEN 'WHATSAPP' ELSE 'IN_APP_CHAT' END,
+    'USER_INITIATED',
+    (ARRAY['checkout', 'menu', 'cart', 'payment', 'platter'])[1 + g % 5],
+    (g % 60000),
+    (ARRAY['WEDDING', 'BIRTHDAY', 'CORPORATE', 'HOUSEWARMING'])[1 + g % 4],
+    (g % 100),
+    CASE WHEN g % 25 = 0 THEN 'IN_PROGRESS'
+         ELSE (ARRAY['RESOLVED', 'CONVERTED', 'DROPPED'])[1 + g % 3] END,
+    (ARRAY['pricing', 'menu', 'delivery', 'payment'])[1 + g % 4],
+    CASE WHEN g % 20 = 0 THEN '+91' || lpad(g::text, 10, '0') END,
+    NOW() - make_interval(secs => g * 60),
+    NOW() - make_interval(secs => g * 60 - 600),
+    600
+FROM generate_series(1, $1) AS g
+"""
+
+# Queries on partitioned tables -> (sql, partitioned table, max partitions scanned)
+PRUNED_QUERIES = {
+    "timeline of one incidence (get_by_id)": (
+        "SELECT * FROM incidence_timeline WHERE incidence_id = '{incidence_id}'",
+        "incidence_timeline", 1
+    ),
+    "timelines of the latest incidences (get_open_incidences)": (
+        "SELECT * FROM incidence_timeline WHERE incidence_id IN ({recent_ids})",
+        "incidence_timeline", 2
+    ),
+    "friction signals, last 7 days": (
+        "SELECT signal_type, count(*) FROM friction_signals "
+        "WHERE created_at >= NOW() - INTERVAL '7 days' GROUP BY signal_type",
+        "friction_signals", 2
+    ),
+    "search, last 7 days (SearchService since=)": (
+        "SELECT incidence_id FROM incidence_timeline "
+        "WHERE search_vector @@ websearch_to_tsquery('english', 'refund') "
+        "AND incidence_id >= uuid_v7_floor(NOW() - INTERVAL '7 days')",
+        "incidence_timeline", 2
+    ),
+}
+
+
+SEED_TIMELINE_SQL = """
+INSERT INTO incidence_timeline (incidence_id, event_type, actor, content, created_at)
+SELECT
+    i.id, 'MESSAGE', 'USER',
+    (ARRAY['When will my order be delivered?', 'Can I change the menu for 50 guests?',
+           'Payment failed but the money was debited', 'Need a quote for a wedding platter'])
+        [1 + (n + length(i.user_id)) % 4]
+        || CASE WHEN i.user_id LIKE '%777' AND n = 2 THEN ' Please process my refund.' ELSE '' END,
+    i.created_at + make_interval(secs => n)
+FROM incidences i, generate_series(1, 3) AS n
+"""
+
+SEED_FRICTION_SQL = """
+INSERT INTO friction_signals (user_id, session_id, signal_type, value, screen, created_at)
+SELECT
+    'user_' || (g % 20000),
+    'session_' || (g / 10),
+    (ARRAY['inactivity', 'back_nav', 'price_check', 'payment_retry'])[1 + g % 4],
+    g % 120,
+    (ARRAY['checkout', 'menu', 'cart', 'payment', 'platter'])[1 + g % 5],
+    NOW() - make_interval(secs => g * 30)
+FROM generate_series(1, $1 * 2) AS g
+"""
+
+
+def scanned_relations(plan: dict) -> set:
+    """Every relation read anywhere in the plan tree."""
+    found = {plan["Relation Name"]} if "Relation Name" in plan else set()
+    for child in plan.get("Plans", []):
+        found |= scanned_relations(child)
+    return found
+
+
+def find_seq_scans(plan: dict) -> list:
+    """Return the relations read by a Seq Scan anywhere in the plan tree."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+@pytest.fixture(scope="module")
+def anyio_backend():
+    # Module scope, so the seeded database below is built once for all queries
+    return "asyncio"
+
+
+@pytest.fixture(scope="module")
+async def plan_db():
+    """Connection on a seeded scratch schema, and the placeholders of the queries."""
+    rows = int(os.getenv("QUERY_PLAN_ROWS", "200000"))
+    try:
+        conn = await asyncpg.connect(asyncpg_dsn(os.getenv("DATABASE_URL")), timeout=5)
+    except (OSError, asyncpg.PostgresError) as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}")
+    scratch_schema = f"plan_check_{uuid.uuid4().hex[:8]}"
+    try:
+        await conn.execute(f"CREATE SCHEMA {scratch_schema}")
+        await conn.execute(f"SET search_path TO {scratch_schema}, public")
+        await apply_migrations(conn)
+
+        # Seeded rows reach back `rows` minutes; create partitions for them
+        oldest = await conn.fetchval("SELECT (NOW() - make_interval(mins => $1))::date", rows)
+        for table in ("incidence_timeline", "friction_signals"):
+            await conn.execute("SELECT ensure_monthly_partitions($1, 3, $2)", table, oldest)
+
+        await conn.execute(SEED_INCIDENCES_SQL, rows)
+        await conn.execute(SEED_TIMELINE_SQL)
+        await conn.execute(SEED_FRICTION_SQL, rows)
+        await conn.execute("ANALYZE incidences, incidence_timeline, friction_signals")
+
+        recent = await conn.fetch("SELECT id FROM incidences ORDER BY id DESC LIMIT 50")
+        placeholders = {
+            "incidence_id": recent[0]["id"],
+            "recent_ids": ", ".join(f"'{row['id']}'" for row in recent),
+        }
+        yield conn, placeholders
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {scratch_schema} CASCADE")
+        await conn.close()
+
+
+async def explain(plan_db, sql: str) -> dict:
+    conn, placeholders = plan_db
+    raw = await conn.fetchval(f"EXPLAIN (FORMAT JSON) {sql.format(**placeholders)}")
+    return json.loads(raw)[0]["Plan"]
+
+
+@pytest.mark.parametrize("name", HOT_QUERIES)
+async def test_hot_query_has_no_seq_scan(plan_db, name):
+    seq_scans = find_seq_scans(await explain(plan_db, HOT_QUERIES[name]))
+    assert not seq_scans, f"{name}: Seq Scan on {', '.join(seq_scans)}"
+
+
+@pytest.mark.parametrize("name", PRUNED_QUERIES)
+async def test_partitioned_query_is_pruned(plan_db, name):
+    sql, table, max_partitions = PRUNED_QUERIES[name]
+    plan = await explain(plan_db, sql)
+    partitions = sorted(r for r in scanned_relations(plan) if r.startswith(f"{table}_p"))
+    assert len(partitions) <= max_partitions, (
+        f"{name}: scans {len(partitions)} partitions (max {max_partitions}): {', '.join(partitions)}"
+    )
@@ -0,0 +1,85 @@
+import random
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+from app.config import settings
+from app.schemas.rules import RuleSet
+from app.services import rules_engine
+
+
+def rules_document(**channel) -> dict:
+    document = rules_engine.default_rules().model_dump(mode="json")
+    document["channel"].update(channel)
+    return document
+
+
+def test_default_rules_route_by_tier_and_event():
+    rules = rules_engine.compile_rules(rules_engine.default_rules())
+    
+    low = rules.route(settings.THRESHOLD_LOW - 1)
+    assert low.priority == "LOW" and not low.show_help_button
+    assert low.response(100.0, None).reason == f"Order value ₹100 below ₹{settings.THRESHOLD_LOW:,.0f} threshold"
+    
+    assert rules.route(settings.THRESHOLD_LOW).allowed_channels == ("CHAT",)  # Bounds are inclusive
+    assert rules.route(settings.THRESHOLD_HIGH).priority == "HIGH"
+    
+    # High-importance events override the tier, whatever their case
+    wedding = rules.route(0, "wedding")
+    assert wedding is rules.high_importance and wedding.route_to_group == "premium_support"
+    assert wedding.response(0, "wedding").reason == "High-importance event type: wedding"
+    assert rules.route(0, "BIRTHDAY") is rules.tiers[0]
+
+
+def test_route_batch_matches_route():
+    rules = rules_engine.compile_rules(rules_engine.default_rules())
+    rng = random.Random(7)
+    bounds = [0.0, settings.THRESHOLD_LOW, settings.THRESHOLD_HIGH]
+    values = [rng.choice(bounds) + rng.choice([-0.01, 0, 0.01, rng.uniform(0, 50_000)]) for _ in range(2000)]
+    events = [rng.choice([None, "", "WEDDING", "Corporate", "BIRTHDAY"]) for _ in values]
+    
+    index = rules.route_batch(values, events)
+    assert [rules.outcomes[i] for i in index] == [rules.route(v, e) for v, e in zip(values, events)]
+    assert np.array_equal(rules.route_batch(values), [rules.tiers.index(rules.route(v)) for v in values])
+
+
+def test_active_rules_are_used_by_route(monkeypatch):
+    rules = rules_engine.compile_rules(RuleSet.model_validate(rules_document(tiers=[
+        {"min_order_value": 0, "priority": "LOW", "reason": "Under ₹{max:,.0f}"},
+        {"min_order_value": 1000, "allowed_channels": ["CALL"], "priority": "HIGH", "reason": "From ₹{min:,.0f}"},
+    ])), version=3)
+    monkeypatch.setattr(rules_engine, "_active", rules)
+    
+    assert rules_engine.current().version == 3
+    assert rules_engine.route(999).reason == "Under ₹1,000"
+    assert rules_engine.route(1000).allowed_channels == ("CALL",)
+    assert rules_engine.route(1000).reason == "From ₹1,000"
+
+
+def test_invalid_reason_template_is_rejected():
+    rules = RuleSet.model_validate(rules_document(high_importance={"priority": "HIGH", "reason": "For {guest}"}))
+    with pytest.raises(ValueError, match="Invalid reason template"):
+        rules_engine.compile_rules(rules)
+
+
+@pytest.mark.parametrize("tiers", [
+    [{"min_order_value": 100, "priority": "LOW", "reason": "-"}],
+    [
+        {"min_order_value": 0, "priority": "LOW", "reason": "-"},
+        {"min_order_value": 500, "priority": "NORMAL", "reason": "-"},
+        {"min_order_value": 500, "priority": "HIGH", "reason": "-"},
+    ],
+    [],
+])
+def test_ruleset_rejects_invalid_tiers(tiers):
+    with pytest.raises(ValidationError):
+        RuleSet.model_validate(rules_document(tiers=tiers))
+
+
+def test_ruleset_requires_every_weight_and_threshold():
+    document = rules_document()
+    del document["friction"]["weights"]["payment_failure"]
+    del document["friction"]["thresholds"]["back_nav_count"]
+    with pytest.raises(ValidationError, match="back_nav_count, payment_failure"):
+        RuleSet.model_validate(document)
@@ -0,0 +1,68 @@
+import random
+
+from app.services.timer_wheel import TimerWheel
+
+
+def test_timers_fire_on_their_tick_at_every_level():
+    wheel = TimerWheel(0, slots=(60, 60, 24))
+    for key, at in {"second": 5, "minute": 61, "hour": 3_601, "day": 90_000}.items():
+        assert not wheel.schedule(key, at)
+    assert len(wheel) == 4
+    
+    assert wheel.advance(4) == []
+    assert wheel.advance(5) == ["second"]
+    assert wheel.advance(60) == []
+    assert wheel.advance(61) == ["minute"]
+    assert wheel.advance(3_600) == []
+    assert wheel.advance(3_601) == ["hour"]
+    assert wheel.advance(89_999) == []
+    assert wheel.advance(90_000) == ["day"]
+    assert len(wheel) == 0
+
+
+def test_past_timers_are_due_at_once_and_not_kept():
+    wheel = TimerWheel(100)
+    assert wheel.schedule("late", 99.5)
+    assert wheel.schedule("now", 100.2)  # Same tick as the wheel
+    assert "late" not in wheel and "now" not in wheel
+
+
+def test_reschedule_replaces_and_cancel_drops():
+    wheel = TimerWheel(0)
+    wheel.schedule("call", 10)
+    wheel.schedule("call", 7_200)
+    assert wheel.due_at("call") == 7_200
+    assert wheel.advance(10) == []
+    
+    assert wheel.cancel("call")
+    assert not wheel.cancel("call")
+    assert wheel.due_at("call") is None
+    assert wheel.advance(10_000) == []
+
+
+def test_matches_a_sorted_schedule():
+    rng = random.Random(7)
+    wheel = TimerWheel(0, tick_seconds=0.5, slots=(4, 4, 4))  # Small, so timers cascade and overflow
+    timers = {}
+    for key in range(500):
+        at = rng.uniform(0, 200)
+        wheel.schedule(key, at)
+        timers[key] = at
+    for key in rng.sample(sorted(timers), 100):
+        if rng.random() < 0.5:
+            wheel.cancel(key)
+            del timers[key]
+        else:
+            timers[key] = rng.uniform(0, 200)
+            wheel.schedule(key, timers[key])
+    
+    now = 0.0
+    while now < 210:
+        later = now + rng.uniform(0, 5)
+        fired = wheel.advance(later)
+        expected = {key for key, at in timers.items() if int(now / 0.5) < int(at / 0.5) <= int(later / 0.5)}
+        assert set(fired) == expected and len(fired) == len(expected)
+        ticks = [int(timers[key] / 0.5) for key in fired]
+        assert ticks == sorted(ticks)
+        now = later
+    assert len(wheel) == 0